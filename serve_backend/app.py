@@ -1,8 +1,10 @@
 import uvicorn
 from app_factory import create_app
 
-# Create app
-app = create_app()
+# Create app, except in the spawned workers of the process pools: they import this module as __mp_main__
+# and must not build the app (extensions, log handlers) again
+if __name__ != "__mp_main__":
+    app = create_app()
 
 if __name__ == "__main__":
     uvicorn.run(
@@ -73,12 +73,14 @@ def initialize_extensions(app: ConstellationApp):
     """
     from extensions import (
         ext_database,
-        ext_routers
+        ext_routers,
+        ext_jobs
     )
 
     extensions = [
         ext_database,
-        ext_routers
+        ext_routers,
+        ext_jobs
     ]
     
     for ext in extensions:
@@ -43,6 +43,42 @@ class AppConfig(BaseSettings):
     SSH_PASSWORD: str = Field(..., description="SSH password")
     SSH_USER: str = Field(..., description="SSH username")
     SSH_HOST: str = Field(..., description="SSH host")
+    SSH_POOL_SIZE: int = Field(4, description="Pooled SSH connections kept to the STK host, also the limit of concurrent remote commands")
+    SSH_KEEPALIVE: int = Field(30, description="Interval (s) of keepalive packets on pooled SSH connections, 0 disables them")
+    STK_HOSTS: str = Field("", description="JSON list of STK execution hosts (name, python_exe, script_path, local or host/port/user/password/replace_base, max_jobs), empty uses the STK_LOCAL / SSH_* host")
+    STK_HOST_MAX_JOBS: int = Field(4, description="Default number of STK runs executed at the same time on one host")
+    SIMULATION_MAX_WORKERS: int = Field(4, description="Maximum number of concurrent STK invocations per constellation simulation")
+    STK_WORKER_ADDRESS: str = Field("", description="host:port of the warm STK worker daemon (stk_worker.py), empty starts stk_simulation.py for every run")
+    STK_BATCH_SIZE: int = Field(0, description="Satellites simulated per STK process, 0 spreads a constellation evenly over SIMULATION_MAX_WORKERS processes")
+    SIMULATION_CHUNK_SAMPLES: int = Field(20000, description="Simulation windows with more timesteps are split into overlapping chunks of at most this many timesteps simulated concurrently, 0 disables chunking")
+    SIMULATION_TEXT_REPORTS: bool = Field(True, description="Add the text reports (posLLA.txt, sensorProjection.txt, point/line/area.txt) of every satellite to report.zip")
+    SIMULATION_REVISIT_RESOLUTION: int = Field(1, description="Spacing (s) of the timestamps of the revisit_time_*.txt reports")
+    SIMULATION_REVISIT_RUNS: bool = Field(False, description="Write the revisit_time_*.txt reports as runs between consecutive passes instead of one line per timestamp")
+    SIMULATION_REPORT_WORKERS: int = Field(0, description="Processes generating the report and visualization data of a simulation, 0 uses the CPU count")
+    SIMULATION_REPORT_ZIP_FILE: bool = Field(False, description="Write report.zip into the job folder when the report is built, instead of only building it while it is downloaded")
+    SIMULATION_ZIP_COMPRESSION: str = Field("fast", description="Default compression of report.zip: store, fast (deflate level 1) or deflate (level 6)")
+    REPORT_DOWNLOAD_URL: str = Field("http://127.0.0.1:8401", description="Base URL of this service as reached by the browser of the visualization page, for the report.zip download")
+    SIMULATION_RESULT_STORE: bool = Field(True, description="Insert the access intervals, ephemerides and coverage of every simulation into the ClickHouse result tables (sim_access_intervals, sim_ephemeris, sim_coverage)")
+    SIMULATION_STORE_EPHEMERIS: bool = Field(False, description="Also insert the position of every time step into sim_ephemeris (one row per satellite and time step)")
+    EPHEMERIS_PRECOMPUTE: bool = Field(False, description="Run precompute_ephemeris.py from timer.py after every TLE ingest")
+    EPHEMERIS_DIR: str = Field("", description="Folder of the precomputed catalog ephemeris (precompute_ephemeris.py), empty uses OUTPUT_DIR/ephemeris")
+    EPHEMERIS_WINDOW_DAYS: float = Field(3.0, description="Days before and after the precompute time covered by the ephemeris store")
+    EPHEMERIS_STEP: float = Field(30.0, description="Sample step (s) of the ephemeris store")
+    EPHEMERIS_WORKERS: int = Field(0, description="Processes propagating the catalog in the ephemeris precompute, 0 uses the CPU count")
+    EPHEMERIS_FOR_SIMULATION: bool = Field(True, description="Native simulations interpolate the stored ephemeris of satellites with unchanged TLE instead of propagating them")
+    OVERFLIGHT_INDEX: bool = Field(True, description="Build the overflight index of the ground tracks after every ephemeris precompute")
+    OVERFLIGHT_CELL_DEG: float = Field(5.0, description="Lat/lon cell size (deg) of the overflight index, dividing 180")
+    OVERFLIGHT_BUCKET: float = Field(600.0, description="Time bucket (s) of the overflight index")
+    OVERFLIGHT_MIN_ELEVATION: float = Field(0.0, description="Elevation (deg) above which a satellite counts as flying over a target in the overflight index")
+    PASS_PREDICTION_WORKERS: int = Field(0, description="Processes of the catalog pass prediction (/satellites/passes), 0 uses the CPU count")
+    PASS_PREDICTION_STEP: float = Field(30.0, description="Default sample step (s) of the catalog pass prediction")
+    PASS_PREDICTION_MAX_DAYS: float = Field(7.0, description="Longest window (days) of a catalog pass prediction")
+    RESULT_CACHE_MAX_SIZE: int = Field(10240, description="Disk budget (MB) of the simulation result cache under OUTPUT_DIR/result_cache, 0 disables the cache")
+    SIMULATION_MAX_JOBS: int = Field(2, description="Simulation jobs running at the same time, later jobs wait in pending state")
+    SIMULATION_JOB_EVENT_BUFFER: int = Field(1000, description="Progress messages kept per simulation job for replay to reconnecting viewers")
+    SIMULATION_JOB_HISTORY: int = Field(50, description="Finished simulation jobs kept for status queries")
+    SIMULATION_DISCONNECT_GRACE: int = Field(30, description="Seconds a streamed simulation survives without any client before it is cancelled, negative never cancels")
+    SIMULATION_PROFILE_HISTORY: int = Field(200, description="Recent job profiles kept for the per-stage timing statistics")
 
     # Output directory
     OUTPUT_DIR: str = Field(..., description="Output directory path")
@@ -3,11 +3,13 @@ from .constellation_controller import router as constellation_router
 from .sensor_controller import router as sensor_router
 from .simulation_controller import router as simulation_router
 from .llm_controller import router as llm_router
+from .result_controller import router as result_router
 
 __all__ = [
     "satellite_router",
     "constellation_router",
     "sensor_router",
     "simulation_router",
-    "llm_router"
+    "llm_router",
+    "result_router"
 ]
@@ -0,0 +1,114 @@
+from fastapi import APIRouter, HTTPException
+from typing import Dict, Any, Optional
+
+router = APIRouter(prefix="/simulation_results", tags=["simulation_results"])
+
+
+def _check(result: Dict[str, Any]) -> Dict[str, Any]:
+    if "error" in result:
+        raise HTTPException(status_code=400, detail=result["error"])
+    return result
+
+
+@router.get("/access")
+async def get_access_intervals(simulation_id: Optional[str] = None, job_id: Optional[str] = None,
+                               satellite_id: Optional[str] = None, target_type: Optional[int] = None,
+                               target: Optional[str] = None, start_time: Optional[str] = None,
+                               end_time: Optional[str] = None, limit: int = 1000) -> Dict[str, Any]:
+    """
+    Get the access intervals stored by the simulations, eg: all passes over a point last month for a constellation
+
+    Args:
+        simulation_id: Single Star/Constellation ID
+        job_id: Job folder name
+        satellite_id: Satellite ID
+        target_type: 1 - point, 2 - line, 3 - area
+        target: Target (Longitude first, Latitude second) as in the simulation request eg:123 41
+        start_time: Only intervals ending after it (UTC)  eg:20130912032513
+        end_time: Only intervals starting before it (UTC)
+        limit: Maximum number of intervals
+
+    Returns:
+        Dict with the intervals sorted by start time
+    """
+    from services.result_service import ResultService
+    service = ResultService()
+    filters = {"simulation_id": simulation_id, "job_id": job_id, "satellite_id": satellite_id, "target_type": target_type,
+               "target": target, "start_time": start_time, "end_time": end_time}
+    return _check(await service.access_intervals(filters, limit))
+
+
+@router.get("/access_statistics")
+async def get_access_statistics(simulation_id: Optional[str] = None, job_id: Optional[str] = None,
+                                satellite_id: Optional[str] = None, target_type: Optional[int] = None,
+                                target: Optional[str] = None, start_time: Optional[str] = None,
+                                end_time: Optional[str] = None, limit: int = 1000) -> Dict[str, Any]:
+    """
+    Get the pass statistics of every satellite over the stored simulations
+
+    Args:
+        simulation_id: Single Star/Constellation ID
+        job_id: Job folder name
+        satellite_id: Satellite ID
+        target_type: 1 - point, 2 - line, 3 - area
+        target: Target (Longitude first, Latitude second) as in the simulation request eg:123 41
+        start_time: Only intervals ending after it (UTC)  eg:20130912032513
+        end_time: Only intervals starting before it (UTC)
+        limit: Maximum number of rows
+
+    Returns:
+        Dict with the number of jobs and passes and the pass durations per satellite and target type
+    """
+    from services.result_service import ResultService
+    service = ResultService()
+    filters = {"simulation_id": simulation_id, "job_id": job_id, "satellite_id": satellite_id, "target_type": target_type,
+               "target": target, "start_time": start_time, "end_time": end_time}
+    return _check(await service.access_statistics(filters, limit))
+
+
+@router.get("/coverage")
+async def get_coverage(simulation_id: Optional[str] = None, job_id: Optional[str] = None,
+                       target_type: Optional[int] = None, target: Optional[str] = None,
+                       start_time: Optional[str] = None, end_time: Optional[str] = None,
+                       limit: int = 1000) -> Dict[str, Any]:
+    """
+    Get the coverage statistics stored by the simulations
+
+    Args:
+        simulation_id: Single Star/Constellation ID
+        job_id: Job folder name
+        target_type: 1 - point, 2 - line, 3 - area
+        target: Target (Longitude first, Latitude second) as in the simulation request eg:123 41
+        start_time: Only simulations ending after it (UTC)  eg:20130912032513
+        end_time: Only simulations starting before it (UTC)
+        limit: Maximum number of rows
+
+    Returns:
+        Dict with the coverage, gaps and simultaneous satellites of every job and target type
+    """
+    from services.result_service import ResultService
+    service = ResultService()
+    filters = {"simulation_id": simulation_id, "job_id": job_id, "target_type": target_type, "target": target,
+               "start_time": start_time, "end_time": end_time}
+    return _check(await service.coverage(filters, limit))
+
+
+@router.get("/ephemeris")
+async def get_ephemeris(job_id: str, satellite_id: str, start_time: Optional[str] = None,
+                        end_time: Optional[str] = None, limit: int = 10000) -> Dict[str, Any]:
+    """
+    Get the positions of one satellite stored by a simulation (stored with SIMULATION_STORE_EPHEMERIS=True)
+
+    Args:
+        job_id: Job folder name
+        satellite_id: Satellite ID
+        start_time: Window start (UTC)  eg:20130912032513
+        end_time: Window end (UTC)
+        limit: Maximum number of positions
+
+    Returns:
+        Dict with the positions sorted by time
+    """
+    from services.result_service import ResultService
+    service = ResultService()
+    return _check(await service.ephemeris(job_id, satellite_id, start_time, end_time, limit))
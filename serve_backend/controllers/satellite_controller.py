@@ -1,6 +1,6 @@
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 
 router = APIRouter(prefix="/satellites", tags=["satellites"])
 
@@ -16,3 +16,72 @@ async def get_satellites() -> List[Dict[str, Any]]:
     from services.satellite_service import SatelliteService
     service = SatelliteService()
     return await service.get_all_satellites()
+
+
+@router.get("/positions")
+async def get_satellite_positions(ids: Optional[str] = None, time: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Get satellite positions interpolated from the precomputed ephemeris
+    
+    Args:
+        ids: Comma-separated satellite IDs, all stored satellites when omitted
+        time: UTC time eg:20130912032513, now when omitted
+        
+    Returns:
+        Dict with the time, the positions (ID, name, lon, lat, alt) and the satellites missing from the store
+    """
+    from services.satellite_service import SatelliteService
+    service = SatelliteService()
+    result = await service.satellite_positions([x.strip() for x in ids.split(',') if x.strip()] if ids else None, time)
+    if "error" in result:
+        raise HTTPException(status_code=404, detail=result["error"])
+    return result
+
+
+@router.get("/overflight")
+async def get_overflight(point_data: str = "", line_data: str = "", area_data: str = "",
+                         start_time: Optional[str] = None, end_time: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Get the catalog satellites that may fly over targets within a window, from the overflight index
+    
+    Args:
+        point_data: Point (Longitude first, Latitude second) eg:123 41
+        line_data: Line vertices eg:123 31|124 31
+        area_data: Polygon vertices eg:123 34|134 41|127 37
+        start_time: Window start (UTC) eg:20130912032513, now when omitted
+        end_time: Window end (UTC), end of the precomputed ephemeris when omitted
+        
+    Returns:
+        Dict with the window and the satellites (ID, name, first and last overflight bucket) sorted by first overflight
+    """
+    from services.satellite_service import SatelliteService
+    service = SatelliteService()
+    result = await service.overflight(point_data, line_data, area_data, start_time, end_time)
+    if "error" in result:
+        raise HTTPException(status_code=400, detail=result["error"])
+    return result
+
+
+@router.get("/passes")
+async def get_passes(point_data: str, start_time: Optional[str] = None, end_time: Optional[str] = None,
+                     step: Optional[float] = None, order: str = "start", limit: int = 1000) -> Dict[str, Any]:
+    """
+    Predict the passes of every active catalog satellite over a ground point
+    
+    Args:
+        point_data: Point (Longitude first, Latitude second) eg:123 41
+        start_time: Window start (UTC) eg:20130912032513, now when omitted
+        end_time: Window end (UTC), one day after the start when omitted
+        step: Sample step (s), PASS_PREDICTION_STEP when omitted
+        order: Ranking of the passes: start (earliest first), duration or elevation (largest first)
+        limit: Maximum number of passes
+        
+    Returns:
+        Dict with the ranked passes (ID, name, start, stop, duration, max_elevation) and the prefilter counts
+    """
+    from services.satellite_service import SatelliteService
+    service = SatelliteService()
+    result = await service.predict_passes(point_data, start_time, end_time, step, order, limit)
+    if "error" in result:
+        raise HTTPException(status_code=400, detail=result["error"])
+    return result
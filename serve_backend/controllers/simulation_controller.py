@@ -1,5 +1,5 @@
-from fastapi import APIRouter
-from typing import Dict, Any
+from fastapi import APIRouter, HTTPException, Header
+from typing import Dict, Any, List, Literal, Optional
 from pydantic import BaseModel
 
 router = APIRouter(tags=["simulation"])
@@ -15,7 +15,9 @@ class SimulationRequest(BaseModel):
     area_data: str  # Polygon data(Longitude first, Latitude second) eg:123 34|134 41|127 37
     line_data: str   # Line data(Longitude first, Latitude second) eg:123 31|124 31
     point_data: str  # Point Data (Longitude first, Latitude second) eg:123 41
-    algorithm_type: int  # Algorithm Type - STK
+    algorithm_type: int  # Algorithm Type 0 - STK 2 - native SGP4 (no STK required)
+    incremental: bool = False  # Without the result cache (RESULT_CACHE_MAX_SIZE=0), reuse the last run's results of unchanged satellites
+    overflight_filter: bool = False  # Leave out the constellation satellites the overflight index shows never fly over a target
 
 
 @router.post("/simulation_stream")
@@ -23,6 +25,9 @@ async def simulation_stream(data: SimulationRequest):
     """
     Execute simulation and stream results
     
+    The simulation runs as a background job, its id is returned in the X-Job-ID header
+    so the progress can be followed again through /simulation_jobs/{job_id}/events.
+    
     Args:
         data: Simulation request data
         
@@ -33,3 +38,145 @@ async def simulation_stream(data: SimulationRequest):
     service = SimulationService()
     return await service.simulation_stream(data.dict())
 
+
+@router.post("/simulation_jobs")
+async def submit_simulation_job(data: SimulationRequest) -> Dict[str, Any]:
+    """
+    Start a simulation in the background
+    
+    Args:
+        data: Simulation request data
+        
+    Returns:
+        Job status, including job_id
+    """
+    from services.simulation_service import SimulationService
+    service = SimulationService()
+    return service.submit_job(data.dict())
+
+
+@router.get("/simulation_jobs")
+async def list_simulation_jobs() -> List[Dict[str, Any]]:
+    """
+    Get the status of recent simulation jobs
+    
+    Returns:
+        List of job status, newest first
+    """
+    from services.simulation_service import SimulationService
+    service = SimulationService()
+    return service.list_jobs()
+
+
+@router.get("/simulation_jobs/{job_id}")
+async def get_simulation_job(job_id: str) -> Dict[str, Any]:
+    """
+    Get the status of a simulation job
+    
+    Args:
+        job_id: Job ID
+        
+    Returns:
+        Job status, result holds the final message once the job succeeded
+    """
+    from services.simulation_service import SimulationService
+    service = SimulationService()
+    result = service.get_job(job_id)
+    if "error" in result:
+        raise HTTPException(status_code=404, detail=result["error"])
+    return result
+
+
+@router.get("/simulation_jobs/{job_id}/events")
+async def simulation_job_events(job_id: str, last_event_id: Optional[int] = None,
+                                last_event_header: Optional[int] = Header(None, alias="Last-Event-ID")):
+    """
+    Stream the progress of a simulation job
+    
+    Buffered messages after Last-Event-ID (header, or last_event_id query parameter) are replayed first,
+    then the stream follows the job until it ends.
+    
+    Args:
+        job_id: Job ID
+        last_event_id: Id of the last event already received
+        last_event_header: Last-Event-ID header sent by EventSource on reconnect
+        
+    Returns:
+        Streaming response with simulation progress
+    """
+    from services.simulation_service import SimulationService
+    service = SimulationService()
+    response = service.job_events(job_id, last_event_header or last_event_id or 0)
+    if response is None:
+        raise HTTPException(status_code=404, detail=f"Simulation job {job_id} not found")
+    return response
+
+
+@router.post("/simulation_jobs/{job_id}/cancel")
+async def cancel_simulation_job(job_id: str) -> Dict[str, Any]:
+    """
+    Cancel a pending or running simulation job
+    
+    Args:
+        job_id: Job ID
+        
+    Returns:
+        Cancellation result
+    """
+    from services.simulation_service import SimulationService
+    service = SimulationService()
+    result = service.cancel_job(job_id)
+    if "error" in result:
+        raise HTTPException(status_code=404, detail=result["error"])
+    return result
+
+
+@router.get("/stk_workers")
+async def get_stk_workers() -> List[Dict[str, Any]]:
+    """
+    Get the load of the STK execution hosts
+    
+    Returns:
+        List of host statistics: running and queued runs, completed and failed runs, busy time and throughput
+    """
+    from services.simulation_service import SimulationService
+    service = SimulationService()
+    return service.stk_workers()
+
+
+@router.get("/simulation_profiles")
+async def get_simulation_profiles(limit: int = 0) -> Dict[str, Any]:
+    """
+    Get the duration percentiles (p50/p95) of every simulation stage over the recent jobs
+    
+    Args:
+        limit: Only consider the last limit successful jobs, 0 for all remembered jobs
+        
+    Returns:
+        Dict with the number of jobs, per-stage statistics and per-satellite stage statistics
+    """
+    from services.simulation_service import SimulationService
+    service = SimulationService()
+    return service.profile_statistics(limit)
+
+
+@router.get("/simulation_report")
+async def download_simulation_report(path: str, compression: Optional[Literal["store", "fast", "deflate"]] = None):
+    """
+    Download the report.zip of a finished simulation
+    
+    The archive is built while it is sent (chunked, zip64), unless it was written with the job.
+    
+    Args:
+        path: Job folder of the simulation
+        compression: store, fast (deflate level 1) or deflate, defaults to SIMULATION_ZIP_COMPRESSION
+        
+    Returns:
+        Streaming zip response
+    """
+    from services.simulation_service import SimulationService
+    service = SimulationService()
+    result = service.report_archive(path, compression)
+    if isinstance(result, dict):
+        raise HTTPException(status_code=404, detail=result["error"])
+    return result
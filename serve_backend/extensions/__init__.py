@@ -1,6 +1,7 @@
 from .base import Extension
 from .ext_database import ext_database
 from .ext_routers import ext_routers
+from .ext_jobs import ext_jobs
 
-__all__ = ["Extension", "ext_database", "ext_routers"]
+__all__ = ["Extension", "ext_database", "ext_routers", "ext_jobs"]
 
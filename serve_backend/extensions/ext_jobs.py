@@ -0,0 +1,219 @@
+import asyncio
+import logging
+import time
+import uuid
+from collections import OrderedDict, deque
+from typing import TYPE_CHECKING, Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from configs import app_config
+from .base import Extension
+
+if TYPE_CHECKING:
+    from constellation_app import ConstellationApp
+
+# Prefix of the final simulation message carrying the result url
+RESULT_PREFIX = "__RESULT__:"
+
+
+class SimulationJob:
+    """One simulation running in the background, its progress kept in a bounded ring buffer"""
+
+    def __init__(self, params: Dict[str, Any], buffer_size: int, cancel_on_disconnect: bool = False):
+        self.id = uuid.uuid4().hex
+        self.params = params
+        self.status = "pending"
+        self.result = None
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.task: Optional[asyncio.Task] = None
+        self.buffer = deque(maxlen=buffer_size)
+        self.last_seq = 0
+        self.viewers = 0
+        self.cancel_on_disconnect = cancel_on_disconnect
+        self._orphan_timer: Optional[asyncio.TimerHandle] = None
+        self._changed = asyncio.Condition()
+
+    @property
+    def done(self) -> bool:
+        return self.status in ("succeeded", "failed", "cancelled")
+
+    async def publish(self, message: str):
+        """
+        Append one progress message and wake up the viewers
+
+        Args:
+            message: Message text without the SSE "data: " framing
+        """
+        async with self._changed:
+            self.last_seq += 1
+            self.buffer.append((self.last_seq, message))
+            if message.startswith(RESULT_PREFIX):
+                self.result = message[len(RESULT_PREFIX):]
+            self._changed.notify_all()
+
+    async def finish(self, status: str):
+        async with self._changed:
+            self.status = status
+            self.finished = time.time()
+            self._changed.notify_all()
+
+    async def events(self, last_event_id: int = 0) -> AsyncIterator[Tuple[int, str]]:
+        """
+        Replay the buffered messages after last_event_id, then follow the job until it ends
+
+        Args:
+            last_event_id: Sequence number of the last message the viewer already has
+
+        Yields:
+            Tuples of (sequence number, message)
+        """
+        seq = last_event_id
+        while True:
+            async with self._changed:
+                await self._changed.wait_for(lambda: self.last_seq > seq or self.done)
+                pending = [(s, m) for s, m in self.buffer if s > seq]
+                done = self.done
+            for s, message in pending:
+                seq = s
+                yield s, message
+            if done and seq >= self.last_seq:
+                return
+
+    async def sse(self, last_event_id: int = 0) -> AsyncIterator[str]:
+        """Server-sent events of the job, the id field allows resuming with Last-Event-ID"""
+        self.viewers += 1
+        if self._orphan_timer is not None:
+            self._orphan_timer.cancel()
+            self._orphan_timer = None
+        try:
+            async for seq, message in self.events(last_event_id):
+                yield f"id: {seq}\ndata: {message}\n\n"
+        finally:
+            self.viewers -= 1
+            if self.viewers == 0 and self.cancel_on_disconnect and not self.done:
+                self._watch_orphan()
+
+    def _watch_orphan(self):
+        # Cancel the job when no viewer re-attaches within SIMULATION_DISCONNECT_GRACE seconds
+        grace = app_config.SIMULATION_DISCONNECT_GRACE
+        if grace < 0:
+            return
+        self._orphan_timer = asyncio.get_running_loop().call_later(grace, self._cancel_orphan)
+
+    def _cancel_orphan(self):
+        self._orphan_timer = None
+        if self.viewers == 0 and not self.done and self.task is not None:
+            logging.info(f"仿真任务 {self.id} 的客户端已断开连接，取消仿真任务")
+            self.task.cancel()
+
+    def info(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "level": self.params.get("level"),
+            "ID": self.params.get("ID"),
+            "created": self.created,
+            "started": self.started,
+            "finished": self.finished,
+            "last_event_id": self.last_seq,
+            "result": self.result
+        }
+
+
+class JobManager:
+    """Runs simulations as background tasks, independent of the connections watching them"""
+
+    def __init__(self):
+        self.jobs: "OrderedDict[str, SimulationJob]" = OrderedDict()
+        self._semaphore = None
+
+    def submit(self, params: Dict[str, Any], cancel_on_disconnect: bool = False) -> SimulationJob:
+        """
+        Start a simulation job
+
+        Args:
+            params: Simulation request data
+            cancel_on_disconnect: Cancel the job once its last viewer has been gone for SIMULATION_DISCONNECT_GRACE seconds
+
+        Returns:
+            The created job
+        """
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(max(1, app_config.SIMULATION_MAX_JOBS))
+        job = SimulationJob(params, app_config.SIMULATION_JOB_EVENT_BUFFER, cancel_on_disconnect)
+        self.jobs[job.id] = job
+        self._prune()
+        job.task = asyncio.create_task(self._run(job))
+        return job
+
+    async def _run(self, job: SimulationJob):
+        from services.simulation_service import SimulationService
+        try:
+            async with self._semaphore:
+                job.status = "running"
+                job.started = time.time()
+                async for event in SimulationService().simulation_events(job.params):
+                    await job.publish(event.removeprefix("data: ").rstrip("\n"))
+            await job.finish("succeeded" if job.result is not None else "failed")
+        except asyncio.CancelledError:
+            await job.publish("仿真任务已取消")
+            await job.finish("cancelled")
+        except Exception as e:
+            logging.error(f"仿真任务 {job.id} 执行出错: {e}")
+            await job.publish(f"仿真任务执行出错: {str(e)}")
+            await job.finish("failed")
+
+    def get(self, job_id: str) -> Optional[SimulationJob]:
+        return self.jobs.get(job_id)
+
+    def list_jobs(self) -> List[Dict[str, Any]]:
+        return [job.info() for job in reversed(self.jobs.values())]
+
+    def cancel(self, job_id: str) -> bool:
+        """
+        Cancel a pending or running job
+
+        Args:
+            job_id: Job identifier
+
+        Returns:
+            False when the job does not exist or has already ended
+        """
+        job = self.jobs.get(job_id)
+        if job is None or job.done:
+            return False
+        job.task.cancel()
+        return True
+
+    def _prune(self):
+        # Forget the oldest finished jobs beyond SIMULATION_JOB_HISTORY
+        finished = [job_id for job_id, job in self.jobs.items() if job.done]
+        for job_id in finished[:max(0, len(finished) - app_config.SIMULATION_JOB_HISTORY)]:
+            del self.jobs[job_id]
+
+    async def close(self):
+        """Cancel the jobs still running"""
+        tasks = [job.task for job in self.jobs.values() if not job.done and job.task is not None]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+# Global job manager instance
+job_manager = JobManager()
+
+
+class JobsExtension(Extension):
+    """Extension running simulations as background jobs"""
+
+    def init_app(self, app: "ConstellationApp") -> None:
+        """Initialize the simulation job manager"""
+        app.state.job_manager = job_manager
+
+        @app.on_event("shutdown")
+        async def shutdown():
+            await job_manager.close()
+
+
+ext_jobs = JobsExtension()
@@ -5,7 +5,8 @@ from controllers import (
     constellation_router,
     sensor_router,
     simulation_router,
-    llm_router
+    llm_router,
+    result_router
 )
 
 
@@ -29,6 +30,7 @@ class RoutersExtension(Extension):
         app.include_router(sensor_router)
         app.include_router(simulation_router)
         app.include_router(llm_router)
+        app.include_router(result_router)
 
 
 # Create router extension instance
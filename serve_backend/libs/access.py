@@ -0,0 +1,218 @@
+import math
+from typing import List, Tuple
+
+import numpy as np
+from sgp4.api import Satrec
+
+from libs.propagation import split_julian, teme_to_ecef, lla_to_ecef
+from libs.footprint import sensor_frames
+
+# Precision of the refined access start/stop times (s)
+ACCESS_TOLERANCE = 1e-3
+
+# Spacing of the samples taken along line targets (deg)
+LINE_SAMPLE_SPACING = 0.05
+
+# Upper bound of satellites x timesteps x target points tested at once by visibility
+VISIBILITY_CHUNK = 1 << 21
+
+
+def parse_points(data: str) -> np.ndarray:
+    """
+    Parse target coordinates from the SimulationRequest format
+
+    Args:
+        data: Longitude first, latitude second, points separated by "|", eg: 123 31|124 31
+
+    Returns:
+        Array (points, 2) of (lon, lat) in degrees
+    """
+    return np.array([[float(x) for x in p.split()] for p in data.split('|')], dtype=np.float64)
+
+
+def densify_polyline(points: np.ndarray, spacing: float = LINE_SAMPLE_SPACING) -> np.ndarray:
+    """
+    Sample a polyline so that consecutive samples are at most spacing degrees apart
+
+    Args:
+        points: Polyline vertices (points, 2) of (lon, lat) in degrees
+        spacing: Maximum sample spacing in degrees
+
+    Returns:
+        Samples (samples, 2) of (lon, lat), including every vertex
+    """
+    samples = [points[:1]]
+    for a, b in zip(points[:-1], points[1:]):
+        n = max(1, math.ceil(np.max(np.abs(b - a)) / spacing))
+        samples.append(a + (b - a) * (np.arange(1, n + 1) / n)[:, None])
+    return np.concatenate(samples)
+
+
+def target_geometry(points: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    ECEF positions and local vertical of ground targets
+
+    Args:
+        points: Targets (points, 2) of (lon, lat) in degrees
+
+    Returns:
+        Tuple of ECEF positions (points, 3) in km and geodetic up unit vectors (points, 3)
+    """
+    lon = np.radians(points[:, 0])
+    lat = np.radians(points[:, 1])
+    up = np.stack([np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)], axis=-1)
+    return lla_to_ecef(points[:, 0], points[:, 1]), up
+
+
+def visibility(r: np.ndarray, frames: np.ndarray, targets: np.ndarray, up: np.ndarray, hha, vha) -> np.ndarray:
+    """
+    Test whether any target is inside the rectangular field of view and above the horizon
+
+    Args:
+        r: Satellite ECEF positions (satellites, timesteps, 3) in km
+        frames: Sensor to ECEF rotations (satellites, timesteps, 3, 3)
+        targets: Target ECEF positions (points, 3) in km
+        up: Target up unit vectors (points, 3)
+        hha, vha: Half angles in degrees, scalars or (satellites,)
+
+    Returns:
+        Boolean matrix (satellites, timesteps)
+    """
+    n_sat, n_time = r.shape[:2]
+    seen = np.zeros((n_sat, n_time), dtype=bool)
+    # Time slices bound the (satellites, timesteps, points, 3) line of sight arrays of target_visibility
+    chunk = max(1, VISIBILITY_CHUNK // max(1, n_sat * len(targets)))
+    for t in range(0, n_time, chunk):
+        seen[:, t:t + chunk] = np.any(target_visibility(r[:, t:t + chunk], frames[:, t:t + chunk], targets, up, hha, vha), axis=-1)
+    return seen
+
+
+def target_visibility(r: np.ndarray, frames: np.ndarray, targets: np.ndarray, up: np.ndarray, hha, vha) -> np.ndarray:
+    """
+    Test every target for being inside the rectangular field of view and above the horizon
+
+    Args:
+        r: Satellite ECEF positions (satellites, timesteps, 3) in km
+        frames: Sensor to ECEF rotations (satellites, timesteps, 3, 3)
+        targets: Target ECEF positions (points, 3) in km
+        up: Target up unit vectors (points, 3)
+        hha, vha: Half angles in degrees, scalars or (satellites,)
+
+    Returns:
+        Boolean array (satellites, timesteps, points)
+    """
+    n_sat = r.shape[0]
+    tan_h = np.tan(np.radians(np.broadcast_to(hha, (n_sat,))))[:, None, None]
+    tan_v = np.tan(np.radians(np.broadcast_to(vha, (n_sat,))))[:, None, None]
+    # Line of sight from each target to each satellite, (satellites, timesteps, points, 3)
+    d = targets[None, None, :, :] - r[:, :, None, :]
+    above = np.einsum('stkj,kj->stk', d, up) < 0.0
+    # Components along the sensor axes
+    ds = d @ frames
+    z = ds[..., 2]
+    inside = (z > 0.0) & (np.abs(ds[..., 0]) <= tan_h * z) & (np.abs(ds[..., 1]) <= tan_v * z)
+    return inside & above
+
+
+def mask_edges(mask: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Locate the rising and falling edges of one visibility row
+
+    Args:
+        mask: Boolean visibility (timesteps,)
+
+    Returns:
+        Tuple of (rising, falling) sample indices. A rising edge i lies between samples i - 1 and i
+        (0 when visible at the start); a falling edge j lies between samples j - 1 and j
+        (timesteps when visible at the end)
+    """
+    padded = np.concatenate([[False], mask, [False]]).astype(np.int8)
+    diff = np.diff(padded)
+    return np.flatnonzero(diff == 1), np.flatnonzero(diff == -1)
+
+
+def _state_at(satrec: Satrec, angles, times: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    jd, fr = split_julian(times)
+    _, r, v = satrec.sgp4_array(jd, fr)
+    r, v = teme_to_ecef(r[None], v[None], times)
+    return r, sensor_frames(r, v, angles[2], angles[3], angles[4])
+
+
+def refine_edges(satrec: Satrec, angles, targets: np.ndarray, up: np.ndarray,
+                 lo: np.ndarray, hi: np.ndarray, rising: bool) -> np.ndarray:
+    """
+    Refine access edges by bisection, all edges of one satellite at once
+
+    Args:
+        satrec: Satellite record
+        angles: (hha, vha, roll, pitch, yaw) in degrees
+        targets: Target ECEF positions (points, 3)
+        up: Target up unit vectors (points, 3)
+        lo: Epoch seconds before each edge
+        hi: Epoch seconds after each edge
+        rising: True when the target is visible at hi, False when visible at lo
+
+    Returns:
+        Edge times, epoch seconds
+    """
+    lo = np.array(lo, dtype=np.float64)
+    hi = np.array(hi, dtype=np.float64)
+    if lo.size == 0:
+        return lo
+    iterations = max(0, math.ceil(math.log2(max(np.max(hi - lo), ACCESS_TOLERANCE) / ACCESS_TOLERANCE)))
+    for _ in range(iterations):
+        mid = (lo + hi) / 2
+        r, frames = _state_at(satrec, angles, mid)
+        seen = visibility(r, frames, targets, up, angles[0], angles[1])[0]
+        move_hi = seen if rising else ~seen
+        hi = np.where(move_hi, mid, hi)
+        lo = np.where(move_hi, lo, mid)
+    return (lo + hi) / 2
+
+
+def access_intervals(satrec: Satrec, angles, times: np.ndarray, mask: np.ndarray,
+                     targets: np.ndarray, up: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Turn one satellite's visibility row into access periods with sub-step start/stop times
+
+    Args:
+        satrec: Satellite record
+        angles: (hha, vha, roll, pitch, yaw) in degrees
+        times: Epoch seconds (timesteps,)
+        mask: Visibility (timesteps,) computed on times
+        targets: Target ECEF positions (points, 3)
+        up: Target up unit vectors (points, 3)
+
+    Returns:
+        Tuple of (starts, stops), epoch seconds
+    """
+    rising, falling = mask_edges(mask)
+    starts = times[np.minimum(rising, len(times) - 1)].copy()
+    stops = times[np.minimum(falling, len(times)) - 1].copy()
+
+    inner = rising > 0
+    starts[inner] = refine_edges(satrec, angles, targets, up, times[rising[inner] - 1], times[rising[inner]], True)
+    inner = falling < len(times)
+    stops[inner] = refine_edges(satrec, angles, targets, up, times[falling[inner] - 1], times[falling[inner]], False)
+    return starts, stops
+
+
+def batch_access(satrecs: List[Satrec], angles: np.ndarray, times: np.ndarray, r: np.ndarray, frames: np.ndarray,
+                 points: np.ndarray) -> List[Tuple[np.ndarray, np.ndarray]]:
+    """
+    Access periods of a batch of satellites to one point or line target
+
+    Args:
+        satrecs: Satellite records of the batch
+        angles: (satellites, 5) array of (hha, vha, roll, pitch, yaw) in degrees
+        times: Epoch seconds (timesteps,)
+        r: ECEF positions (satellites, timesteps, 3)
+        frames: Sensor to ECEF rotations (satellites, timesteps, 3, 3)
+        points: Target samples (points, 2) of (lon, lat) in degrees
+
+    Returns:
+        (starts, stops) of each satellite
+    """
+    targets, up = target_geometry(points)
+    mask = visibility(r, frames, targets, up, angles[:, 0], angles[:, 1])
+    return [access_intervals(satrec, angles[i], times, mask[i], targets, up) for i, satrec in enumerate(satrecs)]
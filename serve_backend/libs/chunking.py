@@ -0,0 +1,168 @@
+import math
+import os
+import shutil
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from libs.propagation import time_grid
+from libs.access import parse_points
+from libs.coverage import coverage_grid, percent_coverage
+from libs.native_engine import COVERAGE_BITS_FILE
+from libs.columnar import ACCESS_TARGETS, load_satellite_columns, access_periods, write_satellite_columns
+from libs.intervals import union
+
+# Format of SimulationRequest.start_time / end_time
+TIME_FORMAT = "%Y%m%d%H%M%S"
+
+# Timesteps simulated past the end of every chunk but the last, so access periods crossing a seam overlap
+CHUNK_OVERLAP_STEPS = 2
+
+# Periods closer than this (s) are merged when stitching, the reports have millisecond resolution
+MERGE_TOLERANCE = 1e-3
+
+# Folder inside a satellite result folder receiving the results of every chunk
+CHUNKS_DIR = "chunks"
+
+
+class TimeChunk:
+    """One sub-window of a simulation: samples from start up to stop are kept, the run goes on until end"""
+
+    def __init__(self, index: int, start: datetime, stop: datetime, end: datetime, last: bool):
+        self.index = index
+        self.start = start
+        self.stop = stop
+        self.end = end
+        self.last = last
+
+    def paras(self, simu_paras: Dict[str, Any]) -> Dict[str, Any]:
+        """Simulation request data of the chunk"""
+        return {**simu_paras, 'start_time': self.start.strftime(TIME_FORMAT), 'end_time': self.end.strftime(TIME_FORMAT)}
+
+    def kept_samples(self, step: float) -> Optional[int]:
+        """Timesteps of the chunk kept in the stitched results, None keeps all of them"""
+        if self.last:
+            return None
+        return round((self.stop - self.start).total_seconds() / step)
+
+
+def time_chunks(simu_paras: Dict[str, Any], max_samples: int) -> List[TimeChunk]:
+    """
+    Split a long simulation window into chunks aligned on the time grid
+
+    Windows are only split when the step is a whole number of seconds, so that every chunk boundary
+    falls on a sample of the full window.
+
+    Args:
+        simu_paras: Simulation request data
+        max_samples: Timesteps per chunk, 0 disables chunking
+
+    Returns:
+        Chunks in time order, a single chunk when the window is not split
+    """
+    start = datetime.strptime(simu_paras['start_time'], TIME_FORMAT)
+    end = datetime.strptime(simu_paras['end_time'], TIME_FORMAT)
+    step = float(simu_paras['interval'])
+    total_steps = math.ceil((end - start).total_seconds() / step)
+    if max_samples <= 0 or not step.is_integer() or total_steps + 1 <= max_samples:
+        return [TimeChunk(0, start, end, end, True)]
+
+    chunk_steps = math.ceil(total_steps / math.ceil((total_steps + 1) / max_samples))
+    count = math.ceil(total_steps / chunk_steps)
+    chunks = []
+    for index in range(count):
+        chunk_start = start + timedelta(seconds=index * chunk_steps * step)
+        if index == count - 1:
+            chunks.append(TimeChunk(index, chunk_start, end, end, True))
+        else:
+            chunk_stop = chunk_start + timedelta(seconds=chunk_steps * step)
+            chunk_end = min(chunk_stop + timedelta(seconds=CHUNK_OVERLAP_STEPS * step), end)
+            chunks.append(TimeChunk(index, chunk_start, chunk_stop, chunk_end, False))
+    return chunks
+
+
+def chunk_dir(save_path: str, index: int) -> str:
+    return os.path.join(save_path, CHUNKS_DIR, str(index))
+
+
+def merge_intervals(starts: np.ndarray, stops: np.ndarray, percents: np.ndarray = None,
+                    tolerance: float = MERGE_TOLERANCE) -> Tuple[np.ndarray, np.ndarray, Optional[np.ndarray]]:
+    """
+    Merge overlapping or touching periods
+
+    Args:
+        starts: Period start times, epoch seconds
+        stops: Period stop times, epoch seconds
+        percents: Optional value per period, merged periods keep the largest one
+        tolerance: Gap (s) still considered touching
+
+    Returns:
+        Tuple of (starts, stops, percents) sorted by start, percents None when not given
+    """
+    return union(starts, stops, percents, tolerance)
+
+
+def stitch_satellite(chunk_dirs: List[str], chunks: List[TimeChunk], simu_paras: Dict[str, Any], save_path: str):
+    """
+    Combine the results of every chunk of one satellite into its result folder
+
+    Position and footprint samples of the overlaps are dropped, access periods crossing a
+    seam are merged and area coverage is recomputed from the stitched grid bits when available.
+
+    Args:
+        chunk_dirs: Result folder of every chunk, in time order
+        chunks: Chunks of the simulation, see time_chunks
+        simu_paras: Simulation request data of the whole window
+        save_path: Result folder of the satellite
+    """
+    step = float(simu_paras['interval'])
+    shutil.copyfile(os.path.join(chunk_dirs[0], "TLE.txt"), os.path.join(save_path, "TLE.txt"))
+
+    parts = [load_satellite_columns(directory) for directory in chunk_dirs]
+    series = {name: [] for name in ("time", "lon", "lat", "alt", "footprint_lat", "footprint_lon")}
+    offsets, vertex_count, bits_parts = [np.zeros(1, dtype=np.int64)], 0, []
+    with_bits = all(os.path.exists(os.path.join(directory, COVERAGE_BITS_FILE)) for directory in chunk_dirs)
+    for directory, chunk, columns in zip(chunk_dirs, chunks, parts):
+        kept = chunk.kept_samples(step)
+        kept = len(columns["time"]) if kept is None else kept
+        for name in ("time", "lon", "lat", "alt"):
+            series[name].append(columns[name][:kept])
+        chunk_offsets = columns["footprint_offsets"][:kept + 1]
+        series["footprint_lat"].append(columns["footprint_lat"][:chunk_offsets[-1]])
+        series["footprint_lon"].append(columns["footprint_lon"][:chunk_offsets[-1]])
+        offsets.append(chunk_offsets[1:] + vertex_count)
+        vertex_count += int(chunk_offsets[-1])
+
+        if with_bits:
+            bits = np.unpackbits(np.load(os.path.join(directory, COVERAGE_BITS_FILE)), axis=1)
+            bits_parts.append(bits[:, :kept])
+
+    bits = None
+    if with_bits:
+        bits = np.packbits(np.concatenate(bits_parts, axis=1), axis=1)
+        np.save(os.path.join(save_path, COVERAGE_BITS_FILE), bits)
+
+    access = {}
+    for target_type in ACCESS_TARGETS:
+        periods = [access_periods(columns, target_type) for columns in parts]
+        starts = np.concatenate([p[0] for p in periods])
+        stops = np.concatenate([p[1] for p in periods])
+        if target_type != 3:
+            starts, stops, _ = merge_intervals(starts, stops)
+            access[target_type] = (starts, stops)
+            continue
+
+        starts, stops, percents = merge_intervals(starts, stops, np.concatenate([p[2] for p in periods]))
+        if bits is not None:
+            # Exact coverage of the merged passes, the pieces of a pass only know their own part
+            times = time_grid(simu_paras['start_time'], simu_paras['end_time'], simu_paras['interval'])
+            _, weights = coverage_grid(parse_points(simu_paras['area_data']))
+            first = np.searchsorted(times, starts, side='left')
+            last = np.searchsorted(times, stops, side='right')
+            percents = np.array([percent_coverage(bits, weights, a, b) for a, b in zip(first, last)], dtype=np.float64)
+        access[3] = (starts, stops, percents)
+
+    write_satellite_columns(save_path, *(np.concatenate(series[name]) for name in ("time", "lon", "lat", "alt")),
+                            np.concatenate(series["footprint_lat"]), np.concatenate(series["footprint_lon"]),
+                            np.concatenate(offsets), access)
@@ -0,0 +1,260 @@
+import json
+import math
+import os
+import struct
+import threading
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+
+# Result file of one satellite, written by stk_scripts/stk_backprogress.py and libs/native_engine.py:
+#   8 bytes magic, little-endian uint64 header length, UTF-8 JSON header
+#   {"columns": [{"name", "dtype", "length", "offset"}, ...], "attrs": {...}}, then every column as raw little-endian
+#   data, 64-byte aligned, offsets relative to the first aligned byte after the header
+COLUMNS_FILE = "columns.bin"
+COLUMNS_MAGIC = b"SCOLUMN1"
+COLUMNS_ALIGN = 64
+
+# Columns of a satellite result:
+#   time (float64 epoch seconds), lon / lat (float64 deg), alt (float64 km): one value per timestep
+#   footprint_lat / footprint_lon (float32 deg, 3 decimals): footprint vertices of every timestep, concatenated
+#   footprint_offsets (int64, timesteps + 1): vertices of timestep k are [offsets[k], offsets[k + 1])
+#   <target>_start / <target>_stop (float64 epoch seconds) and area_percent (float64 %): access periods
+ACCESS_TARGETS = {1: "point", 2: "line", 3: "area"}
+
+# Legacy text reports of a satellite result, converted on first read
+LEGACY_FILES = {1: "point.txt", 2: "line.txt", 3: "area.txt"}
+
+
+def _align(size: int) -> int:
+    return (size + COLUMNS_ALIGN - 1) // COLUMNS_ALIGN * COLUMNS_ALIGN
+
+
+def _write_header(f, entries, attrs: Optional[Dict[str, Any]]):
+    header = json.dumps({"columns": entries, "attrs": attrs or {}}, ensure_ascii=False).encode('utf-8')
+    f.write(COLUMNS_MAGIC)
+    f.write(struct.pack('<Q', len(header)))
+    f.write(header)
+    f.write(b'\0' * (_align(16 + len(header)) - 16 - len(header)))
+
+
+def write_columns(path: str, columns: Dict[str, np.ndarray], attrs: Optional[Dict[str, Any]] = None):
+    """
+    Write arrays as a columnar file, atomically
+
+    Args:
+        path: File path
+        columns: Column name to 1-D array, written with its own dtype in little-endian order
+        attrs: Optional JSON serializable metadata stored in the header, see read_attrs
+    """
+    entries, blobs, offset = [], [], 0
+    for name, values in columns.items():
+        values = np.ascontiguousarray(values)
+        values = values.astype(values.dtype.newbyteorder('<'), copy=False)
+        blob = values.tobytes()
+        entries.append({"name": name, "dtype": values.dtype.str, "length": int(values.size), "offset": offset})
+        blobs.append(blob)
+        offset += _align(len(blob))
+
+    # Unique per writer, legacy results may be converted by several report workers at once
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "wb") as f:
+        _write_header(f, entries, attrs)
+        for blob in blobs:
+            f.write(blob)
+            f.write(b'\0' * (_align(len(blob)) - len(blob)))
+    os.replace(tmp_path, path)
+
+
+def allocate_columns(path: str, columns: Dict[str, Tuple[Any, int]], attrs: Optional[Dict[str, Any]] = None):
+    """
+    Create a zero-filled (sparse) columnar file, filled in place through read_columns(path, writable=True),
+    eg: by several processes writing their own rows of a column too large to be held in memory
+
+    Args:
+        path: File path
+        columns: Column name to (dtype, length)
+        attrs: Optional JSON serializable metadata stored in the header, see read_attrs
+    """
+    entries, offset = [], 0
+    for name, (dtype, length) in columns.items():
+        dtype = np.dtype(dtype).newbyteorder('<')
+        entries.append({"name": name, "dtype": dtype.str, "length": int(length), "offset": offset})
+        offset += _align(int(length) * dtype.itemsize)
+    with open(path, "wb") as f:
+        _write_header(f, entries, attrs)
+        f.truncate(f.tell() + offset)
+
+
+def read_columns(path: str, mmap: bool = True, writable: bool = False) -> Dict[str, np.ndarray]:
+    """
+    Read a columnar file
+
+    Args:
+        path: File path
+        mmap: Map the file instead of reading it, columns are then read-only views paged in on access
+        writable: Map the file for writing, assignments to the columns go to the file
+
+    Returns:
+        Column name to 1-D array
+    """
+    with open(path, "rb") as f:
+        if f.read(8) != COLUMNS_MAGIC:
+            raise ValueError(f"不是有效的仿真结果文件: {path}")
+        header_size = struct.unpack('<Q', f.read(8))[0]
+        header = json.loads(f.read(header_size))
+        if not mmap:
+            f.seek(0)
+            data = np.frombuffer(f.read(), dtype=np.uint8)
+    if mmap or writable:
+        data = np.memmap(path, dtype=np.uint8, mode='r+' if writable else 'r')
+
+    start = _align(16 + header_size)
+    columns = {}
+    for entry in header["columns"]:
+        dtype = np.dtype(entry["dtype"])
+        begin = start + entry["offset"]
+        columns[entry["name"]] = data[begin:begin + entry["length"] * dtype.itemsize].view(dtype)
+    return columns
+
+
+def read_attrs(path: str) -> Dict[str, Any]:
+    """
+    Read the metadata stored in the header of a columnar file
+
+    Args:
+        path: File path
+
+    Returns:
+        Metadata passed to write_columns, empty for files written without any
+    """
+    with open(path, "rb") as f:
+        if f.read(8) != COLUMNS_MAGIC:
+            raise ValueError(f"不是有效的仿真结果文件: {path}")
+        header_size = struct.unpack('<Q', f.read(8))[0]
+        return json.loads(f.read(header_size)).get("attrs", {})
+
+
+def write_satellite_columns(save_path: str, times: np.ndarray, lon: np.ndarray, lat: np.ndarray, alt: np.ndarray,
+                            footprint_lat: np.ndarray, footprint_lon: np.ndarray, footprint_offsets: np.ndarray,
+                            access: Dict[int, Tuple[np.ndarray, ...]]):
+    """
+    Write the results of one satellite as COLUMNS_FILE
+
+    Args:
+        save_path: Result folder of the satellite
+        times: Epoch seconds (timesteps,)
+        lon: Longitude in degrees (timesteps,)
+        lat: Latitude in degrees (timesteps,)
+        alt: Altitude in km (timesteps,)
+        footprint_lat: Footprint vertex latitudes of every timestep, concatenated
+        footprint_lon: Footprint vertex longitudes of every timestep, concatenated
+        footprint_offsets: First vertex of every timestep, plus the total vertex count (timesteps + 1,)
+        access: Target type (1 - point, 2 - line, 3 - area) to (starts, stops) or, for the area, (starts, stops, percents)
+    """
+    columns = {
+        "time": np.asarray(times, dtype=np.float64),
+        "lon": np.asarray(lon, dtype=np.float64),
+        "lat": np.asarray(lat, dtype=np.float64),
+        "alt": np.asarray(alt, dtype=np.float64),
+        # Footprints are reported with 3 decimals, rounding first keeps float32 exact at that precision
+        "footprint_lat": np.round(np.asarray(footprint_lat, dtype=np.float64), 3).astype(np.float32).ravel(),
+        "footprint_lon": np.round(np.asarray(footprint_lon, dtype=np.float64), 3).astype(np.float32).ravel(),
+        "footprint_offsets": np.asarray(footprint_offsets, dtype=np.int64)
+    }
+    for target_type, target in ACCESS_TARGETS.items():
+        periods = access.get(target_type, ((), ()))
+        columns[f"{target}_start"] = np.asarray(periods[0], dtype=np.float64)
+        columns[f"{target}_stop"] = np.asarray(periods[1], dtype=np.float64)
+        if target_type == 3:
+            percents = periods[2] if len(periods) > 2 else np.full(len(periods[0]), np.nan)
+            columns["area_percent"] = np.asarray(percents, dtype=np.float64)
+    write_columns(os.path.join(save_path, COLUMNS_FILE), columns)
+
+
+def load_satellite_columns(satellite_dir: str, mmap: bool = True) -> Dict[str, np.ndarray]:
+    """
+    Read the results of one satellite, converting legacy text results (cached or incremental) on first read
+
+    Args:
+        satellite_dir: Result folder of the satellite
+        mmap: Map the file instead of reading it
+
+    Returns:
+        Column name to 1-D array, see COLUMNS_FILE
+    """
+    path = os.path.join(satellite_dir, COLUMNS_FILE)
+    if not os.path.exists(path) and os.path.exists(os.path.join(satellite_dir, "posLLA.txt")):
+        columns_from_text(satellite_dir)
+    return read_columns(path, mmap)
+
+
+def access_periods(columns: Dict[str, np.ndarray], target_type: int) -> Tuple[np.ndarray, np.ndarray, Optional[np.ndarray]]:
+    """
+    Access periods of one target
+
+    Args:
+        columns: Satellite columns, see load_satellite_columns
+        target_type: 1 - point, 2 - line, 3 - area
+
+    Returns:
+        Tuple of (starts, stops, percents) in epoch seconds, percents None for point and line
+    """
+    target = ACCESS_TARGETS[target_type]
+    percents = columns["area_percent"] if target_type == 3 else None
+    return columns[f"{target}_start"], columns[f"{target}_stop"], percents
+
+
+def _parse_time(value: str) -> float:
+    return datetime.strptime(value.strip(), "%Y-%m-%d %H:%M:%S.%f").replace(tzinfo=timezone.utc).timestamp()
+
+
+def read_access_report(path: str) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Read the periods of a point.txt / line.txt / area.txt report
+
+    Args:
+        path: Report path
+
+    Returns:
+        Tuple of (starts, stops, percents) in epoch seconds, percents are NaN for point and line reports
+    """
+    starts, stops, percents = [], [], []
+    with open(path, "r", encoding="utf-8") as f:
+        lines = f.read().splitlines()
+    for line in lines[2:]:
+        parts = line.split('|')
+        if len(parts) < 3:
+            continue
+        starts.append(_parse_time(parts[0]))
+        stops.append(_parse_time(parts[1]))
+        percents.append(float(parts[3].strip().rstrip('%')) if len(parts) > 3 else math.nan)
+    return np.array(starts, dtype=np.float64), np.array(stops, dtype=np.float64), np.array(percents, dtype=np.float64)
+
+
+def columns_from_text(satellite_dir: str):
+    """
+    Convert the posLLA.txt / sensorProjection.txt / point.txt / line.txt / area.txt results of a satellite
+    written before COLUMNS_FILE existed
+
+    Args:
+        satellite_dir: Result folder of the satellite
+    """
+    with open(os.path.join(satellite_dir, "posLLA.txt"), "r", encoding="utf-8") as f:
+        rows = [line.split() for line in f.read().splitlines()[1:] if line.strip()]
+    stamps = np.array([row[0] + "T" + row[1] for row in rows], dtype="datetime64[ms]")
+    times = stamps.astype(np.int64) / 1000.0
+    lon, lat, alt = (np.array([float(row[i]) for row in rows], dtype=np.float64) for i in (2, 3, 4))
+
+    with open(os.path.join(satellite_dir, "sensorProjection.txt"), "r", encoding="utf-8") as f:
+        vertices = np.array([line.split() for line in f.read().splitlines()[1:] if line.strip()], dtype=np.float64).reshape(-1, 2)
+    # Footprints have the same number of vertex rows at every timestep
+    per_sample = len(vertices) // len(rows) if rows else 0
+    offsets = np.arange(len(rows) + 1, dtype=np.int64) * per_sample
+
+    access = {}
+    for target_type, file_name in LEGACY_FILES.items():
+        starts, stops, percents = read_access_report(os.path.join(satellite_dir, file_name))
+        access[target_type] = (starts, stops, percents) if target_type == 3 else (starts, stops)
+    write_satellite_columns(satellite_dir, times, lon, lat, alt, vertices[:, 0], vertices[:, 1], offsets, access)
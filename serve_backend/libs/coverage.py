@@ -0,0 +1,165 @@
+from typing import Tuple
+
+import numpy as np
+from sgp4.api import Satrec
+
+from libs.propagation import WGS84_A
+from libs.access import target_visibility, mask_edges, refine_edges
+
+# Lat/lon grid resolution of the area coverage (deg), same as the STK CoverageDefinition
+COVERAGE_RESOLUTION = 0.1
+
+# Upper bound of timesteps x grid points evaluated at once
+COVERAGE_CHUNK = 1 << 21
+
+
+def point_in_polygon(points: np.ndarray, polygon: np.ndarray) -> np.ndarray:
+    """
+    Even-odd test of many points against one polygon in the lon/lat plane
+
+    Args:
+        points: Points (points, 2) of (lon, lat) in degrees
+        polygon: Vertices (vertices, 2) of (lon, lat) in degrees, implicitly closed
+
+    Returns:
+        Boolean array (points,)
+    """
+    x = points[:, 0][:, None]
+    y = points[:, 1][:, None]
+    x1, y1 = polygon[:, 0], polygon[:, 1]
+    x2, y2 = np.roll(x1, -1), np.roll(y1, -1)
+    crosses = (y1 > y) != (y2 > y)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        x_cross = x1 + (y - y1) * (x2 - x1) / (y2 - y1)
+    return np.count_nonzero(crosses & (x < x_cross), axis=1) % 2 == 1
+
+
+def coverage_grid(polygon: np.ndarray, resolution: float = COVERAGE_RESOLUTION) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Rasterize an area target into lat/lon grid points
+
+    Args:
+        polygon: Vertices (vertices, 2) of (lon, lat) in degrees
+        resolution: Grid spacing in degrees
+
+    Returns:
+        Tuple of grid points (points, 2) of (lon, lat) inside the polygon and their area weights (points,)
+    """
+    lon_min, lat_min = polygon.min(axis=0)
+    lon_max, lat_max = polygon.max(axis=0)
+    lons = np.arange(np.floor(lon_min / resolution), np.ceil(lon_max / resolution) + 1) * resolution
+    lats = np.arange(np.floor(lat_min / resolution), np.ceil(lat_max / resolution) + 1) * resolution
+    grid = np.stack(np.meshgrid(lons, lats), axis=-1).reshape(-1, 2)
+    grid = grid[point_in_polygon(grid, polygon)]
+    if len(grid) == 0:
+        # Area smaller than one grid cell
+        grid = polygon.mean(axis=0, keepdims=True)
+    return grid, np.cos(np.radians(grid[:, 1]))
+
+
+def coverage_bits(r: np.ndarray, frames: np.ndarray, hha: float, vha: float,
+                  targets: np.ndarray, up: np.ndarray) -> np.ndarray:
+    """
+    Per grid point coverage of one satellite, packed as bits over time
+
+    Timesteps where the area is beyond the satellite horizon are skipped without testing the grid.
+
+    Args:
+        r: Satellite ECEF positions (timesteps, 3) in km
+        frames: Sensor to ECEF rotations (timesteps, 3, 3)
+        hha, vha: Half angles in degrees
+        targets: Grid point ECEF positions (points, 3) in km
+        up: Grid point up unit vectors (points, 3)
+
+    Returns:
+        uint8 array (points, ceil(timesteps / 8)), bit t of a row is set when the point is covered at sample t
+    """
+    n_time = r.shape[0]
+    bits = np.zeros((len(targets), (n_time + 7) // 8), dtype=np.uint8)
+
+    # Horizon prefilter: central angle between sub-satellite point and area must be within horizon + area radius
+    center = up.mean(axis=0)
+    center /= np.linalg.norm(center)
+    radius = np.arccos(np.clip(up @ center, -1.0, 1.0)).max()
+    norm_r = np.linalg.norm(r, axis=-1)
+    horizon = np.arccos(np.clip(WGS84_A / norm_r, -1.0, 1.0))
+    central = np.arccos(np.clip((r @ center) / norm_r, -1.0, 1.0))
+    candidates = central <= horizon + radius + np.radians(1.0)
+
+    # Chunks of whole bit bytes holding candidate samples, packed as they are computed and merged into the rows
+    candidate_bytes = np.unique(np.flatnonzero(candidates) // 8)
+    chunk = max(1, COVERAGE_CHUNK // (8 * len(targets)))
+    for i in range(0, len(candidate_bytes), chunk):
+        byte_index = candidate_bytes[i:i + chunk]
+        index = (byte_index[:, None] * 8 + np.arange(8)).ravel()
+        tested = index < n_time
+        tested[tested] = candidates[index[tested]]
+        covered = np.zeros((len(targets), len(index)), dtype=bool)
+        covered[:, tested] = target_visibility(r[None, index[tested]], frames[None, index[tested]], targets, up, hha, vha)[0].T
+        bits[:, byte_index] |= np.packbits(covered, axis=1)
+    return bits
+
+
+def coverage_mask(bits: np.ndarray, n_time: int) -> np.ndarray:
+    """
+    Samples at which at least one grid point is covered
+
+    Args:
+        bits: Packed coverage (points, ceil(timesteps / 8))
+        n_time: Number of timesteps
+
+    Returns:
+        Boolean array (timesteps,)
+    """
+    return np.unpackbits(np.bitwise_or.reduce(bits, axis=0))[:n_time].astype(bool)
+
+
+def percent_coverage(bits: np.ndarray, weights: np.ndarray, first: int, last: int) -> float:
+    """
+    Area-weighted share of grid points covered at least once between two samples
+
+    Args:
+        bits: Packed coverage (points, ceil(timesteps / 8))
+        weights: Grid point area weights (points,)
+        first: First sample index
+        last: Last sample index (exclusive)
+
+    Returns:
+        Percent coverage
+    """
+    window = np.unpackbits(bits[:, first // 8:(last + 7) // 8], axis=1)[:, first % 8:first % 8 + last - first]
+    return float(weights[window.any(axis=1)].sum() / weights.sum() * 100.0)
+
+
+def coverage_by_pass(bits: np.ndarray, weights: np.ndarray, times: np.ndarray,
+                     satrec: Satrec = None, angles=None, targets: np.ndarray = None, up: np.ndarray = None):
+    """
+    "All Regions By Pass" of the area: periods where any grid point is covered, with percent coverage
+
+    Pass boundaries are refined by bisection when the satellite is given, otherwise (eg: the OR of
+    several satellites' bits) they stay on the sample grid.
+
+    Args:
+        bits: Packed coverage (points, ceil(timesteps / 8))
+        weights: Grid point area weights (points,)
+        times: Epoch seconds (timesteps,)
+        satrec: Satellite record, optional
+        angles: (hha, vha, roll, pitch, yaw) in degrees, with satrec
+        targets: Grid point ECEF positions, with satrec
+        up: Grid point up unit vectors, with satrec
+
+    Returns:
+        Tuple of (starts, stops, percents)
+    """
+    n_time = len(times)
+    rising, falling = mask_edges(coverage_mask(bits, n_time))
+    starts = times[rising].copy()
+    stops = times[falling - 1].copy()
+    percents = np.array([percent_coverage(bits, weights, a, b) for a, b in zip(rising, falling)], dtype=np.float64)
+
+    if satrec is not None:
+        inner = rising > 0
+        starts[inner] = refine_edges(satrec, angles, targets, up, times[rising[inner] - 1], times[rising[inner]], True)
+        inner = falling < n_time
+        stops[inner] = refine_edges(satrec, angles, targets, up, times[falling[inner] - 1], times[falling[inner]], False)
+    return starts, stops, percents
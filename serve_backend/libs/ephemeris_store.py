@@ -0,0 +1,252 @@
+import logging
+import math
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from configs.app_config import app_config
+from libs.columnar import allocate_columns, read_columns, read_attrs
+from libs.propagation import parse_tle, format_tle, propagate
+
+# Precomputed ephemeris of the active catalog (see precompute_ephemeris.py), one columnar file (libs.columnar):
+#   time (float64 epoch seconds, steps): regular grid start + k * step around the precompute time
+#   r / v (float32 km, km/s, satellites * steps * 3): TEME states, satellite-major, NaN where SGP4 failed
+# and in the header attributes the grid (start, step, count) and the ID, name and TLE of every satellite.
+# States between the samples are cubic Hermite interpolated from the positions and velocities: a few centimeters
+# for a LEO satellite at 30 s steps, well below the float32 resolution of the positions (~0.5 m).
+EPHEMERIS_FILE = "ephemeris.bin"
+EPHEMERIS_VERSION = 1
+
+# Satellites propagated per task of the precompute pool
+PRECOMPUTE_BATCH = 256
+
+
+def ephemeris_path() -> str:
+    """Path of the ephemeris store, EPHEMERIS_DIR or OUTPUT_DIR/ephemeris"""
+    return os.path.join(app_config.EPHEMERIS_DIR or os.path.join(app_config.OUTPUT_DIR, "ephemeris"), EPHEMERIS_FILE)
+
+
+def _tle_key(tle1: str, tle2: str) -> Tuple[str, str]:
+    return format_tle(tle1.strip(), tle2.strip())
+
+
+def _propagate_batch(path: str, first: int, tles: List[Tuple[str, str]]) -> int:
+    """Propagate the satellites [first, first + len(tles)) of a store being precomputed, returns the failures"""
+    columns = read_columns(path, writable=True)
+    times = np.array(columns["time"])
+    shape = (-1, len(times), 3)
+    r_out, v_out = columns["r"].reshape(shape), columns["v"].reshape(shape)
+
+    rows, satrecs = [], []
+    failed = 0
+    for k, (tle1, tle2) in enumerate(tles):
+        try:
+            satrecs.append(parse_tle(tle1, tle2))
+            rows.append(first + k)
+        except Exception:
+            r_out[first + k] = np.nan
+            v_out[first + k] = np.nan
+            failed += 1
+    if satrecs:
+        error, r, v = propagate(satrecs, times)
+        r[error != 0] = np.nan
+        v[error != 0] = np.nan
+        r_out[rows] = r
+        v_out[rows] = v
+        failed += int(np.count_nonzero(np.any(error != 0, axis=1)))
+    return failed
+
+
+def precompute_ephemeris(satellites: List[Tuple[str, str, str, str]], window_days: float, step: float, workers: int = 0,
+                         now: Optional[float] = None) -> Dict[str, Any]:
+    """
+    Propagate satellites over a window around now and replace the ephemeris store
+
+    The satellites are split into PRECOMPUTE_BATCH batches propagated (one vectorized SGP4 call each) by a
+    process pool, every process writing its rows straight into the mapped file. The new store replaces the
+    previous one atomically, readers keep the file they have mapped.
+
+    Args:
+        satellites: (ID, name, tle1, tle2) of every satellite
+        window_days: Half width of the window (days)
+        step: Sample step (s)
+        workers: Processes, 0 uses the CPU count
+        now: Window center (epoch seconds), defaults to the current time
+
+    Returns:
+        Dict with the store path, window and number of satellites and failures
+    """
+    now = time.time() if now is None else now
+    center = math.floor(now / step) * step
+    half = math.ceil(window_days * 86400.0 / step)
+    times = center + np.arange(-half, half + 1, dtype=np.float64) * step
+
+    path = ephemeris_path()
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    attrs = {
+        "version": EPHEMERIS_VERSION,
+        "start": float(times[0]),
+        "step": float(step),
+        "count": len(times),
+        "created": now,
+        "satellites": [item[0] for item in satellites],
+        "names": [item[1] for item in satellites],
+        "tle1": [item[2] for item in satellites],
+        "tle2": [item[3] for item in satellites]
+    }
+    size = len(satellites) * len(times) * 3
+    allocate_columns(tmp_path, {"time": (np.float64, len(times)), "r": (np.float32, size), "v": (np.float32, size)}, attrs)
+    read_columns(tmp_path, writable=True)["time"][:] = times
+
+    tles = [(item[2], item[3]) for item in satellites]
+    workers = workers if workers > 0 else os.cpu_count()
+    try:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+            failed = sum(pool.map(_propagate_batch, [tmp_path] * math.ceil(len(tles) / PRECOMPUTE_BATCH),
+                                  range(0, len(tles), PRECOMPUTE_BATCH),
+                                  [tles[i:i + PRECOMPUTE_BATCH] for i in range(0, len(tles), PRECOMPUTE_BATCH)]))
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return {"path": path, "start": float(times[0]), "stop": float(times[-1]), "step": float(step),
+            "satellites": len(satellites), "failed": failed}
+
+
+class EphemerisStore:
+    """Mapped ephemeris store, see EPHEMERIS_FILE"""
+
+    def __init__(self, path: str, mtime: int = 0):
+        attrs = read_attrs(path)
+        columns = read_columns(path)
+        self.mtime = mtime
+        self.start, self.step, self.count = attrs["start"], attrs["step"], attrs["count"]
+        self.created = attrs["created"]
+        self.stop = self.start + (self.count - 1) * self.step
+        self.ids = attrs["satellites"]
+        self.names = attrs["names"]
+        self._tle1, self._tle2 = attrs["tle1"], attrs["tle2"]
+        self._index = {ID: i for i, ID in enumerate(self.ids)}
+        self._r = columns["r"].reshape(-1, self.count, 3)
+        self._v = columns["v"].reshape(-1, self.count, 3)
+
+    def times(self) -> np.ndarray:
+        """Sample times of the store (epoch seconds)"""
+        return self.start + np.arange(self.count, dtype=np.float64) * self.step
+
+    def samples(self, first: int, stop: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Stored TEME positions and velocities of the rows [first, stop), (rows, steps, 3) float32 views"""
+        return self._r[first:stop], self._v[first:stop]
+
+    def covers(self, times: np.ndarray) -> bool:
+        """Whether every time is inside the window of the store"""
+        times = np.asarray(times, dtype=np.float64)
+        return times.size > 0 and float(times.min()) >= self.start and float(times.max()) <= self.stop
+
+    def lookup(self, satellite_id: str, tle1: Optional[str] = None, tle2: Optional[str] = None) -> Optional[int]:
+        """
+        Row of a satellite
+
+        Args:
+            satellite_id: Satellite identifier
+            tle1: First TLE line the stored states must have been propagated from, not checked when None
+            tle2: Second TLE line
+
+        Returns:
+            Row index, None when the satellite is missing or its TLE changed since the precompute
+        """
+        i = self._index.get(satellite_id)
+        if i is None or tle1 is None:
+            return i
+        try:
+            if _tle_key(tle1, tle2) != _tle_key(self._tle1[i], self._tle2[i]):
+                return None
+        except Exception:
+            return None
+        return i
+
+    def states(self, rows: np.ndarray, times: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Interpolate TEME states (cubic Hermite on the stored positions and velocities)
+
+        Args:
+            rows: Row indices (satellites,), see lookup
+            times: Epoch seconds inside the window (timesteps,)
+
+        Returns:
+            Tuple of TEME position (km) and velocity (km/s) arrays of shape (satellites, timesteps, 3),
+            NaN where the stored states are missing
+        """
+        rows = np.asarray(rows, dtype=np.int64)
+        u = (np.asarray(times, dtype=np.float64) - self.start) / self.step
+        k = np.clip(np.floor(u).astype(np.int64), 0, self.count - 2)
+        s = (u - k)[None, :, None]
+        h = self.step
+        p0 = self._r[rows[:, None], k[None, :]].astype(np.float64)
+        p1 = self._r[rows[:, None], k[None, :] + 1].astype(np.float64)
+        m0 = self._v[rows[:, None], k[None, :]].astype(np.float64) * h
+        m1 = self._v[rows[:, None], k[None, :] + 1].astype(np.float64) * h
+        s2, s3 = s * s, s * s * s
+        r = (2 * s3 - 3 * s2 + 1) * p0 + (s3 - 2 * s2 + s) * m0 + (-2 * s3 + 3 * s2) * p1 + (s3 - s2) * m1
+        v = ((6 * s2 - 6 * s) * (p0 - p1) + (3 * s2 - 4 * s + 1) * m0 + (3 * s2 - 2 * s) * m1) / h
+        return r, v
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_ephemeris_store() -> Optional[EphemerisStore]:
+    """Current ephemeris store, reloaded when the precompute replaced it; None when there is none"""
+    global _store
+    path = ephemeris_path()
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return None
+    with _store_lock:
+        if _store is None or _store.mtime != mtime:
+            _store = EphemerisStore(path, mtime)
+        return _store
+
+
+def propagate_or_lookup(satellites: List[Dict[str, Any]], satrecs: List, times: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Same as libs.propagation.propagate, taking the states of the satellites whose TLE was precomputed over
+    the time grid from the ephemeris store (EPHEMERIS_FOR_SIMULATION)
+
+    Args:
+        satellites: Satellite parameters with "ID", "tle1" and "tle2"
+        satrecs: Satellite records of the satellites
+        times: Epoch seconds, shape (timesteps,)
+
+    Returns:
+        Tuple of (error, r, v), see libs.propagation.propagate
+    """
+    store = get_ephemeris_store() if app_config.EPHEMERIS_FOR_SIMULATION else None
+    if store is None or not store.covers(times):
+        return propagate(satrecs, times)
+
+    error = np.zeros((len(satellites), len(times)), dtype=np.int64)
+    r = np.empty((len(satellites), len(times), 3))
+    v = np.empty((len(satellites), len(times), 3))
+    rows = [store.lookup(item['ID'], item['tle1'], item['tle2']) for item in satellites]
+    hits = [i for i, row in enumerate(rows) if row is not None]
+    # Interpolated in batches, bounding the gathered samples of a large constellation
+    for b in range(0, len(hits), PRECOMPUTE_BATCH):
+        batch = hits[b:b + PRECOMPUTE_BATCH]
+        r[batch], v[batch] = store.states(np.array([rows[i] for i in batch]), times)
+    # Samples SGP4 failed on are propagated again, for their error codes
+    hits = [i for i in hits if not np.isnan(r[i]).any()]
+    misses = sorted(set(range(len(satellites))) - set(hits))
+    if misses:
+        error[misses], r[misses], v[misses] = propagate([satrecs[i] for i in misses], times)
+    logging.info(f"{len(hits)} 颗卫星使用预计算星历，{len(misses)} 颗卫星重新外推")
+    return error, r, v
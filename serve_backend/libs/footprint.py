@@ -0,0 +1,165 @@
+from typing import Tuple
+
+import numpy as np
+
+from libs.propagation import WGS84_A, WGS84_B, ecef_to_lla
+
+# Boundary samples per rectangle edge, each timestamp has 4 * FOOTPRINT_EDGE_POINTS vertices
+FOOTPRINT_EDGE_POINTS = 8
+
+_AXES_SCALE = np.array([WGS84_A, WGS84_A, WGS84_B])
+
+
+def sensor_angles(sensor_value) -> Tuple[float, float, float, float, float]:
+    """
+    Read the rectangular sensor parameters from sensor_paras.sensor_value
+
+    Args:
+        sensor_value: [hha, vha, roll, pitch, yaw, mobility, band] as stored in ClickHouse
+
+    Returns:
+        Tuple of (hha, vha, roll, pitch, yaw) in degrees
+    """
+    return tuple(float(sensor_value[i]) for i in range(5))
+
+
+def body_frame(r: np.ndarray, v: np.ndarray) -> np.ndarray:
+    """
+    Satellite body axes for nadir alignment with ECF velocity constraint (STK's default attitude)
+
+    Args:
+        r: ECEF positions (..., 3)
+        v: ECEF velocities (..., 3)
+
+    Returns:
+        Rotation matrices (..., 3, 3) whose columns are the body X (along velocity), Y and Z (nadir) axes
+    """
+    z = -r / np.linalg.norm(r, axis=-1, keepdims=True)
+    y = np.cross(z, v)
+    y /= np.linalg.norm(y, axis=-1, keepdims=True)
+    x = np.cross(y, z)
+    return np.stack([x, y, z], axis=-1)
+
+
+def ypr_matrix(yaw: np.ndarray, pitch: np.ndarray, roll: np.ndarray) -> np.ndarray:
+    """
+    Sensor to body rotation for a fixed YPR pointing (yaw about Z, then pitch about Y, then roll about X)
+
+    Args:
+        yaw: Yaw angle in degrees
+        pitch: Pitch angle in degrees
+        roll: Roll angle in degrees
+
+    Returns:
+        Rotation matrices (..., 3, 3)
+    """
+    cy, sy = np.cos(np.radians(yaw)), np.sin(np.radians(yaw))
+    cp, sp = np.cos(np.radians(pitch)), np.sin(np.radians(pitch))
+    cr, sr = np.cos(np.radians(roll)), np.sin(np.radians(roll))
+    return np.stack([
+        np.stack([cy * cp, cy * sp * sr - sy * cr, cy * sp * cr + sy * sr], axis=-1),
+        np.stack([sy * cp, sy * sp * sr + cy * cr, sy * sp * cr - cy * sr], axis=-1),
+        np.stack([-sp, cp * sr, cp * cr], axis=-1),
+    ], axis=-2)
+
+
+def rectangle_rays(hha: np.ndarray, vha: np.ndarray, edge_points: int = FOOTPRINT_EDGE_POINTS) -> np.ndarray:
+    """
+    Unit boundary rays of a rectangular field of view in the sensor frame (boresight +Z)
+
+    Args:
+        hha: Horizontal half angle in degrees, measured towards the sensor X axis
+        vha: Vertical half angle in degrees, measured towards the sensor Y axis
+        edge_points: Samples per edge
+
+    Returns:
+        Rays (..., 4 * edge_points, 3), going around the rectangle
+    """
+    tx = np.tan(np.radians(np.asarray(hha, dtype=np.float64)))[..., None]
+    ty = np.tan(np.radians(np.asarray(vha, dtype=np.float64)))[..., None]
+    s = np.linspace(-1.0, 1.0, edge_points, endpoint=False)
+    ones = np.ones_like(s)
+    # Four edges, each starting at a corner and stopping before the next one
+    u = np.concatenate([s * tx, ones * tx, -s * tx, -ones * tx], axis=-1)
+    w = np.concatenate([-ones * ty, s * ty, ones * ty, -s * ty], axis=-1)
+    rays = np.stack([u, w, np.ones_like(u)], axis=-1)
+    return rays / np.linalg.norm(rays, axis=-1, keepdims=True)
+
+
+def intersect_ellipsoid(origin: np.ndarray, direction: np.ndarray) -> np.ndarray:
+    """
+    Intersect rays with the WGS84 ellipsoid, rays missing the Earth are clipped to the horizon
+
+    A missing ray is replaced by the limb point in the plane spanned by the ray and the origin,
+    so footprints that extend past the horizon follow the visible Earth edge.
+
+    Args:
+        origin: Ray origins (..., 3) in km, ECEF
+        direction: Ray directions (..., 3), ECEF
+
+    Returns:
+        Surface points (..., 3) in km, ECEF
+    """
+    # Work on the unit sphere obtained by scaling the ellipsoid axes
+    p = origin / _AXES_SCALE
+    d = direction / _AXES_SCALE
+    pd = np.sum(p * d, axis=-1)
+    dd = np.sum(d * d, axis=-1)
+    pp = np.sum(p * p, axis=-1)
+    disc = pd * pd - dd * (pp - 1.0)
+    t = (-pd - np.sqrt(np.maximum(disc, 0.0))) / dd
+    hit = (disc >= 0.0) & (t > 0.0)
+    surface = p + t[..., None] * d
+
+    # Horizon point: tangent from the origin, rotated from the nadir towards the ray
+    norm_p = np.sqrt(pp)
+    nadir = -p / norm_p[..., None]
+    side = d - np.sum(d * nadir, axis=-1, keepdims=True) * nadir
+    side_norm = np.linalg.norm(side, axis=-1, keepdims=True)
+    side = np.divide(side, side_norm, out=np.zeros_like(side), where=side_norm > 0)
+    sin_eta = 1.0 / norm_p
+    cos_eta = np.sqrt(np.maximum(1.0 - sin_eta * sin_eta, 0.0))
+    tangent = cos_eta[..., None] * nadir + sin_eta[..., None] * side
+    limb = p + (np.sqrt(np.maximum(pp - 1.0, 0.0)))[..., None] * tangent
+
+    return np.where(hit[..., None], surface, limb) * _AXES_SCALE
+
+
+def sensor_frames(r: np.ndarray, v: np.ndarray, roll, pitch, yaw) -> np.ndarray:
+    """
+    Sensor to ECEF rotations of many satellites and timesteps
+
+    Args:
+        r: ECEF positions (satellites, timesteps, 3) in km
+        v: ECEF velocities (satellites, timesteps, 3) in km/s
+        roll, pitch, yaw: Sensor pointing in degrees, scalars or (satellites,)
+
+    Returns:
+        Rotation matrices (satellites, timesteps, 3, 3) whose columns are the sensor axes, Z being the boresight
+    """
+    n_sat = r.shape[0]
+    sensor_to_body = ypr_matrix(np.broadcast_to(yaw, (n_sat,)), np.broadcast_to(pitch, (n_sat,)), np.broadcast_to(roll, (n_sat,)))
+    return body_frame(r, v) @ sensor_to_body[:, None, :, :]
+
+
+def project_footprints(r: np.ndarray, frames: np.ndarray, hha, vha,
+                       edge_points: int = FOOTPRINT_EDGE_POINTS) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Project rectangular sensor footprints of many satellites and timesteps in one batch
+
+    Args:
+        r: ECEF positions (satellites, timesteps, 3) in km
+        frames: Sensor to ECEF rotations (satellites, timesteps, 3, 3), see sensor_frames
+        hha, vha: Half angles in degrees, scalars or (satellites,)
+        edge_points: Samples per rectangle edge
+
+    Returns:
+        Tuple of (lat, lon) in degrees, each (satellites, timesteps, 4 * edge_points)
+    """
+    n_sat = r.shape[0]
+    rays = np.broadcast_to(rectangle_rays(np.broadcast_to(hha, (n_sat,)), np.broadcast_to(vha, (n_sat,)), edge_points),
+                           (n_sat, 4 * edge_points, 3))
+    rays_ecef = np.swapaxes(frames @ np.swapaxes(rays, -1, -2)[:, None, :, :], -1, -2)
+    points = intersect_ellipsoid(r[:, :, None, :], rays_ecef)
+    lon, lat, _ = ecef_to_lla(points)
+    return lat, lon
@@ -0,0 +1,96 @@
+import hashlib
+import json
+import logging
+import os
+from typing import Any, Dict
+
+from configs.app_config import app_config
+
+# Folder under OUTPUT_DIR/constellation holding the last run index of every scenario. Incremental runs reuse the
+# unchanged satellites through it only when the result cache, keyed by the same fingerprint, is disabled
+INDEX_DIR = "incremental_index"
+
+
+def scenario_key(constellation_id: str, simu_paras: Dict[str, Any]) -> str:
+    """
+    Hash of a constellation scenario: the constellation, time window, targets and algorithm
+
+    Args:
+        constellation_id: Constellation ID
+        simu_paras: Simulation request data
+
+    Returns:
+        Hex digest
+    """
+    inputs = {
+        "ID": str(constellation_id),
+        "start_time": simu_paras['start_time'],
+        "end_time": simu_paras['end_time'],
+        "interval": float(simu_paras['interval']),
+        "point": " ".join(simu_paras['point_data'].split()),
+        "line": "|".join(" ".join(p.split()) for p in simu_paras['line_data'].split('|')),
+        "area": "|".join(" ".join(p.split()) for p in simu_paras['area_data'].split('|')),
+        "algorithm_type": int(simu_paras['algorithm_type']),
+    }
+    return hashlib.sha256(json.dumps(inputs, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def _index_path(key: str) -> str:
+    return os.path.join(app_config.OUTPUT_DIR, "constellation", INDEX_DIR, key + ".json")
+
+
+def load_last_run(key: str) -> Dict[str, Dict[str, str]]:
+    """
+    Satellites of the last run of a scenario
+
+    Args:
+        key: Scenario key, see scenario_key
+
+    Returns:
+        Dict mapping satellite ID to {"fingerprint", "satellite_dir"} of its last successful simulation
+    """
+    try:
+        with open(_index_path(key), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+    except Exception as e:
+        logging.warning(f"读取增量仿真索引 {key} 失败: {e}")
+        return {}
+
+
+def save_last_run(key: str, satellites: Dict[str, Dict[str, str]]):
+    """
+    Record the satellites of a run, merged over the previous index so failed satellites keep their last result
+
+    Args:
+        key: Scenario key, see scenario_key
+        satellites: Dict mapping satellite ID to {"fingerprint", "satellite_dir"} of the successful simulations
+    """
+    index = {**load_last_run(key), **satellites}
+    path = _index_path(key)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + f".{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(index, f, ensure_ascii=False)
+    os.replace(tmp, path)
+
+
+def unchanged_satellite_dir(last_run: Dict[str, Dict[str, str]], ID: str, fingerprint: str) -> str:
+    """
+    Result folder of the last run that can be reused for a satellite
+
+    Used instead of the result cache when RESULT_CACHE_MAX_SIZE is 0.
+
+    Args:
+        last_run: Index loaded by load_last_run
+        ID: Satellite ID
+        fingerprint: Fingerprint of the satellite's TLE, sensor, targets and window (ResultCache.satellite_key)
+
+    Returns:
+        Folder path, empty when the satellite changed or its last results are gone
+    """
+    previous = last_run.get(ID)
+    if previous is None or previous['fingerprint'] != fingerprint or not os.path.isdir(previous['satellite_dir']):
+        return ""
+    return previous['satellite_dir']
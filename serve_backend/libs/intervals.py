@@ -0,0 +1,232 @@
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+# Periods are half-open [start, stop) arrays of epoch seconds; every function runs in O(n log n) on sorted
+# endpoints without Python loops over the periods
+
+
+def _as_periods(starts, stops) -> Tuple[np.ndarray, np.ndarray]:
+    starts = np.asarray(starts, dtype=np.float64).ravel()
+    stops = np.asarray(stops, dtype=np.float64).ravel()
+    keep = stops > starts
+    return starts[keep], stops[keep]
+
+
+def union(starts, stops, values: np.ndarray = None,
+          tolerance: float = 0.0) -> Tuple[np.ndarray, np.ndarray, Optional[np.ndarray]]:
+    """
+    Merge overlapping or touching periods
+
+    Args:
+        starts: Period start times
+        stops: Period stop times
+        values: Optional value per period, merged periods keep the largest one
+        tolerance: Gap (s) still considered touching
+
+    Returns:
+        Tuple of (starts, stops, values) of the disjoint periods sorted by start, values None when not given
+    """
+    starts = np.asarray(starts, dtype=np.float64).ravel()
+    stops = np.asarray(stops, dtype=np.float64).ravel()
+    if starts.size == 0:
+        empty = np.array([], dtype=np.float64)
+        return empty, empty.copy(), (empty.copy() if values is not None else None)
+
+    order = np.argsort(starts, kind='stable')
+    starts, stops = starts[order], stops[order]
+    reach = np.maximum.accumulate(stops)
+    # A period opens a new group when it starts after everything before it has ended
+    first = np.flatnonzero(np.r_[True, starts[1:] > reach[:-1] + tolerance])
+    last = np.r_[first[1:], starts.size] - 1
+    merged_values = None
+    if values is not None:
+        merged_values = np.maximum.reduceat(np.asarray(values, dtype=np.float64).ravel()[order], first)
+    return starts[first], reach[last], merged_values
+
+
+def depth(starts, stops) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Number of periods covering each instant
+
+    Args:
+        starts: Period start times
+        stops: Period stop times
+
+    Returns:
+        Tuple of (edges, counts): counts[i] periods cover [edges[i], edges[i + 1]), len(counts) == len(edges) - 1
+    """
+    starts, stops = _as_periods(starts, stops)
+    times = np.concatenate([starts, stops])
+    deltas = np.concatenate([np.ones(starts.size, dtype=np.int64), -np.ones(stops.size, dtype=np.int64)])
+    edges, inverse = np.unique(times, return_inverse=True)
+    change = np.zeros(edges.size, dtype=np.int64)
+    np.add.at(change, inverse, deltas)
+    return edges, np.cumsum(change)[:-1]
+
+
+def at_least(starts, stops, count: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Periods during which at least count of the given periods overlap
+
+    count=1 is the union; the intersection of k sets of disjoint periods is at_least(all, k).
+
+    Args:
+        starts: Period start times
+        stops: Period stop times
+        count: Minimum overlap
+
+    Returns:
+        Tuple of (starts, stops) of the disjoint periods
+    """
+    edges, counts = depth(starts, stops)
+    covered = counts >= count
+    merged_starts, merged_stops, _ = union(edges[:-1][covered], edges[1:][covered])
+    return merged_starts, merged_stops
+
+
+def intersect(a_starts, a_stops, b_starts, b_stops) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Periods covered by both sets of periods
+
+    Args:
+        a_starts: Start times of the first set
+        a_stops: Stop times of the first set
+        b_starts: Start times of the second set
+        b_stops: Stop times of the second set
+
+    Returns:
+        Tuple of (starts, stops) of the disjoint periods
+    """
+    a_starts, a_stops, _ = union(*_as_periods(a_starts, a_stops))
+    b_starts, b_stops, _ = union(*_as_periods(b_starts, b_stops))
+    return at_least(np.concatenate([a_starts, b_starts]), np.concatenate([a_stops, b_stops]), 2)
+
+
+def clip(starts, stops, window_start: float, window_stop: float) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Restrict periods to a window, dropping the ones outside of it
+
+    Args:
+        starts: Period start times
+        stops: Period stop times
+        window_start: Window start
+        window_stop: Window stop
+
+    Returns:
+        Tuple of (starts, stops)
+    """
+    return _as_periods(np.maximum(np.asarray(starts, dtype=np.float64), window_start),
+                       np.minimum(np.asarray(stops, dtype=np.float64), window_stop))
+
+
+def complement(starts, stops, window_start: float, window_stop: float) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Gaps of the periods within a window
+
+    Args:
+        starts: Period start times
+        stops: Period stop times
+        window_start: Window start
+        window_stop: Window stop
+
+    Returns:
+        Tuple of (starts, stops) of the uncovered periods
+    """
+    starts, stops, _ = union(*clip(starts, stops, window_start, window_stop))
+    return _as_periods(np.r_[window_start, stops], np.r_[starts, window_stop])
+
+
+def total(starts, stops) -> float:
+    """Covered time (s) of periods, overlaps counted once"""
+    starts, stops, _ = union(*_as_periods(starts, stops))
+    return float(np.sum(stops - starts))
+
+
+def simultaneous(satellite_periods: List[Tuple[np.ndarray, np.ndarray]], window_start: float,
+                 window_stop: float) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Number of satellites viewing a target at the same time
+
+    Args:
+        satellite_periods: (starts, stops) of every satellite
+        window_start: Window start
+        window_stop: Window stop
+
+    Returns:
+        Tuple of (starts, stops, counts) of the periods with a constant, non-zero number of satellites
+    """
+    parts = [union(*clip(starts, stops, window_start, window_stop)) for starts, stops in satellite_periods]
+    starts = np.concatenate([np.array([], dtype=np.float64)] + [part[0] for part in parts])
+    stops = np.concatenate([np.array([], dtype=np.float64)] + [part[1] for part in parts])
+    edges, counts = depth(starts, stops)
+    if counts.size == 0:
+        empty = np.array([], dtype=np.float64)
+        return empty, empty.copy(), np.array([], dtype=np.int64)
+    # A satellite leaving when another one arrives leaves the count unchanged, join those periods
+    first = np.flatnonzero(np.r_[True, counts[1:] != counts[:-1]])
+    last = np.r_[first[1:], counts.size]
+    keep = counts[first] > 0
+    return edges[first][keep], edges[last][keep], counts[first][keep]
+
+
+def constellation_summary(satellite_periods: List[Tuple[np.ndarray, np.ndarray]], window_start: float,
+                          window_stop: float) -> Dict[str, object]:
+    """
+    Combined visibility of a target by several satellites
+
+    Args:
+        satellite_periods: (starts, stops) of every satellite
+        window_start: Window start
+        window_stop: Window stop
+
+    Returns:
+        Dict with the union windows ("windows": (starts, stops)), the gaps ("gaps": (starts, stops)),
+        the simultaneous periods ("simultaneous": (starts, stops, counts)) and their statistics
+    """
+    count_starts, count_stops, counts = simultaneous(satellite_periods, window_start, window_stop)
+    starts, stops, _ = union(count_starts, count_stops)
+    gap_starts, gap_stops = complement(starts, stops, window_start, window_stop)
+    # Largest number of satellites of every union window
+    window_max = np.zeros(starts.size, dtype=np.int64)
+    if counts.size:
+        owner = np.searchsorted(starts, count_starts, side='right') - 1
+        np.maximum.at(window_max, owner, counts)
+
+    duration = max(window_stop - window_start, 0.0)
+    covered = float(np.sum(stops - starts))
+    gaps = gap_stops - gap_starts
+    count_durations = count_stops - count_starts
+    return {
+        "windows": (starts, stops, window_max),
+        "gaps": (gap_starts, gap_stops),
+        "simultaneous": (count_starts, count_stops, counts),
+        "duration": duration,
+        "covered": covered,
+        "fraction": covered / duration if duration > 0 else 0.0,
+        "max_gap": float(gaps.max()) if gaps.size else 0.0,
+        "mean_gap": float(gaps.mean()) if gaps.size else 0.0,
+        "max_simultaneous": int(counts.max()) if counts.size else 0,
+        "mean_simultaneous": float(np.sum(counts * count_durations)) / duration if duration > 0 else 0.0
+    }
+
+
+def next_start(starts, times) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    First period starting strictly after every time, eg: the next pass of a revisit calculation
+
+    Args:
+        starts: Period start times
+        times: Sorted query times
+
+    Returns:
+        Tuple of (index, waits): index of the next start in sorted(starts), len(starts) when there is none,
+        and the time until it, NaN when there is none
+    """
+    starts = np.sort(np.asarray(starts).ravel())
+    times = np.asarray(times)
+    index = np.searchsorted(starts, times, side='right')
+    waits = np.full(times.shape, np.nan)
+    found = index < starts.size
+    waits[found] = starts[index[found]] - times[found]
+    return index, waits
@@ -0,0 +1,130 @@
+import logging
+import os
+import threading
+from typing import Dict, Any, List
+
+import numpy as np
+
+from libs.propagation import time_grid, parse_tle, format_tle, teme_to_ecef, ecef_to_lla
+from libs.footprint import sensor_angles, sensor_frames, project_footprints
+from libs.access import parse_points, densify_polyline, target_geometry, batch_access
+from libs.coverage import coverage_grid, coverage_bits, coverage_by_pass
+from libs.profiling import span
+from libs.columnar import write_satellite_columns
+from libs.text_reports import write_access_report
+from libs.ephemeris_store import propagate_or_lookup
+
+# Satellites per footprint/access batch, bounds the (satellites, timesteps, vertices, 3) working arrays
+FOOTPRINT_BATCH = 64
+
+# Packed per grid point coverage of one satellite, combined by write_constellation_coverage
+COVERAGE_BITS_FILE = "coverage_bits.npy"
+
+def write_tle(save_path: str, tle1: str, tle2: str):
+    line1, line2 = format_tle(tle1, tle2)
+    with open(save_path + "/TLE.txt", "w", encoding="utf-8") as f:
+        f.write(line1 + '\n')
+        f.write(line2 + '\n')
+
+
+def run_native_simulation(satellites: List[Dict[str, Any]], simu_paras: Dict[str, Any],
+                          cancel: threading.Event = None) -> Dict[str, bool]:
+    """
+    Simulate satellites with the native SGP4 engine, without STK
+
+    All satellites are propagated over the whole time grid in one vectorized call and each
+    result folder receives the same files as an STK run.
+
+    Args:
+        satellites: Satellite and sensor parameters, each carrying its result folder in "save_path"
+        simu_paras: Simulation request data
+        cancel: Optional event stopping the simulation before the next satellite batch
+
+    Returns:
+        Dict mapping satellite ID to whether its results were written successfully, cancelled satellites are missing
+    """
+    status = {}
+    times = time_grid(simu_paras['start_time'], simu_paras['end_time'], simu_paras['interval'])
+
+    satrecs = []
+    valid = []
+    for item in satellites:
+        try:
+            satrecs.append(parse_tle(item['tle1'], item['tle2']))
+            valid.append(item)
+        except Exception as e:
+            logging.error(f"ID为{item['ID']}的卫星TLE解析失败: {e}")
+            status[item['ID']] = False
+    if not valid:
+        return status
+
+    with span("native.propagate", satellites=len(valid)):
+        error, r, v = propagate_or_lookup(valid, satrecs, times)
+        r_ecef, v_ecef = teme_to_ecef(r, v, times)
+        lon, lat, alt = ecef_to_lla(r_ecef)
+
+    point = parse_points(simu_paras['point_data'])
+    line = densify_polyline(parse_points(simu_paras['line_data']))
+    grid, weights = coverage_grid(parse_points(simu_paras['area_data']))
+    grid_targets, grid_up = target_geometry(grid)
+
+    for b in range(0, len(valid), FOOTPRINT_BATCH):
+        if cancel is not None and cancel.is_set():
+            logging.info("原生仿真引擎已取消")
+            break
+        batch = valid[b:b + FOOTPRINT_BATCH]
+        batch_satrecs = satrecs[b:b + len(batch)]
+        batch_r = r_ecef[b:b + len(batch)]
+        angles = np.array([sensor_angles(item['sensor_para']) for item in batch])
+        with span("native.footprint", satellites=len(batch)):
+            frames = sensor_frames(batch_r, v_ecef[b:b + len(batch)], angles[:, 2], angles[:, 3], angles[:, 4])
+            fp_lat, fp_lon = project_footprints(batch_r, frames, angles[:, 0], angles[:, 1])
+        with span("native.access", satellites=len(batch)):
+            point_access = batch_access(batch_satrecs, angles, times, batch_r, frames, point)
+            line_access = batch_access(batch_satrecs, angles, times, batch_r, frames, line)
+
+        for j, item in enumerate(batch):
+            i = b + j
+            if np.any(error[i] != 0):
+                logging.error(f"ID为{item['ID']}的卫星SGP4外推失败(error={int(error[i][error[i] != 0][0])})")
+                status[item['ID']] = False
+                continue
+            try:
+                save_path = item['save_path']
+                os.makedirs(save_path, exist_ok=True)
+                with span("native.coverage", ID=item['ID']):
+                    bits = coverage_bits(batch_r[j], frames[j], angles[j, 0], angles[j, 1], grid_targets, grid_up)
+                    area_access = coverage_by_pass(bits, weights, times, batch_satrecs[j], angles[j], grid_targets, grid_up)
+                with span("native.write", ID=item['ID']):
+                    write_tle(save_path, item['tle1'], item['tle2'])
+                    write_satellite_columns(save_path, times, lon[i], lat[i], alt[i], fp_lat[j], fp_lon[j],
+                                            np.arange(len(times) + 1, dtype=np.int64) * fp_lat.shape[2],
+                                            {1: point_access[j], 2: line_access[j], 3: area_access})
+                    np.save(save_path + "/" + COVERAGE_BITS_FILE, bits)
+                status[item['ID']] = True
+            except Exception as e:
+                logging.error(f"ID为{item['ID']}的卫星仿真结果写入失败: {e}")
+                status[item['ID']] = False
+    return status
+
+
+def write_constellation_coverage(satellite_dirs: List[str], simu_paras: Dict[str, Any], coverage_dir: str):
+    """
+    Write the area coverage of several satellites together (OR of their grid bits) as constellation_area.txt
+
+    Args:
+        satellite_dirs: Result folders written by run_native_simulation
+        simu_paras: Simulation request data
+        coverage_dir: Folder receiving constellation_area.txt
+    """
+    union = None
+    for satellite_dir in satellite_dirs:
+        path = satellite_dir + "/" + COVERAGE_BITS_FILE
+        if os.path.exists(path):
+            bits = np.load(path)
+            union = bits if union is None else union | bits
+    if union is None:
+        return
+    times = time_grid(simu_paras['start_time'], simu_paras['end_time'], simu_paras['interval'])
+    _, weights = coverage_grid(parse_points(simu_paras['area_data']))
+    write_access_report(coverage_dir, 3, *coverage_by_pass(union, weights, times), file_name="/constellation_area.txt")
@@ -0,0 +1,267 @@
+import math
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from libs.columnar import write_columns, read_columns, read_attrs
+from libs.ephemeris_store import EphemerisStore, ephemeris_path, get_ephemeris_store, PRECOMPUTE_BATCH
+from libs.propagation import teme_to_ecef, ecef_to_lla, parse_simulation_time
+
+# Overflight index of the ephemeris store, one columnar file (libs.columnar) next to it:
+#   radius (float32 km, satellites): swath radius, ground range at which the satellite rises above
+#       OVERFLIGHT_MIN_ELEVATION at its highest altitude
+#   offsets_<k> (int64, buckets * cells + 1) / satellites_<k> (int32): for the satellites of radius band k,
+#       the stored rows whose sub-satellite point is in the lat/lon cell during the time bucket
+#       key = bucket * cells + cell are satellites_<k>[offsets_<k>[key]:offsets_<k>[key + 1]]
+# A target is reachable by a satellite during a bucket when a cell of its track is within its swath radius of the
+# target; searching the cells within the largest radius of each band keeps the low satellites' search narrow.
+OVERFLIGHT_FILE = "overflight.bin"
+OVERFLIGHT_VERSION = 1
+
+# Upper swath radius (km) of every band: LEO, high LEO / low MEO, the rest (MEO, GEO, HEO)
+RADIUS_BANDS = (2500.0, 5000.0, math.inf)
+
+EARTH_RADIUS = 6371.0
+
+# Ground track distance (km) a sample covers on each side, fastest ground speed (~7.9 km/s) times half a step
+GROUND_SPEED = 7.9
+
+
+def overflight_path() -> str:
+    return os.path.join(os.path.dirname(ephemeris_path()), OVERFLIGHT_FILE)
+
+
+def swath_radius(altitude: np.ndarray, min_elevation: float) -> np.ndarray:
+    """
+    Ground range (km) from the sub-satellite point to where the satellite is seen at min_elevation
+
+    Args:
+        altitude: Satellite altitude (km)
+        min_elevation: Elevation (deg)
+
+    Returns:
+        Ground range along the spherical Earth (km)
+    """
+    e = math.radians(min_elevation)
+    ratio = np.clip(EARTH_RADIUS * math.cos(e) / (EARTH_RADIUS + np.asarray(altitude, dtype=np.float64)), -1.0, 1.0)
+    return EARTH_RADIUS * (np.arccos(ratio) - e)
+
+
+def _unit(lon, lat) -> np.ndarray:
+    lon, lat = np.radians(lon), np.radians(lat)
+    return np.stack([np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)], axis=-1)
+
+
+def _cell_centers(cell_deg: float) -> Tuple[np.ndarray, int]:
+    rows, cols = int(round(180 / cell_deg)), int(round(360 / cell_deg))
+    lat = -90 + (np.arange(rows) + 0.5) * cell_deg
+    lon = -180 + (np.arange(cols) + 0.5) * cell_deg
+    lon, lat = np.meshgrid(lon, lat)
+    return _unit(lon.ravel(), lat.ravel()), cols
+
+
+def _index_batch(path: str, first: int, stop: int, bucket_steps: int, cell_deg: float,
+                 min_elevation: float) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Cells of the tracks of the store rows [first, stop): (keys, rows) of every distinct entry and the swath radius"""
+    store = EphemerisStore(path)
+    times = store.times()
+    rows_count, cols = int(round(180 / cell_deg)), int(round(360 / cell_deg))
+    r, v = store.samples(first, stop)
+    r_ecef, _ = teme_to_ecef(r.astype(np.float64), v.astype(np.float64), times)
+    lon, lat, alt = ecef_to_lla(r_ecef)
+
+    valid = ~np.isnan(lon)
+    row_cells = np.clip(np.floor((lat + 90) / cell_deg), 0, rows_count - 1)
+    col_cells = np.floor((lon + 180) / cell_deg) % cols
+    buckets = np.arange(len(times)) // bucket_steps
+    keys = buckets[None, :] * (rows_count * cols) + np.where(valid, row_cells * cols + col_cells, 0).astype(np.int64)
+    satellite_rows = np.broadcast_to(np.arange(first, stop)[:, None], keys.shape)
+    entries = np.unique(np.stack([keys[valid], satellite_rows[valid]], axis=1), axis=0)
+    radius = swath_radius(np.nanmax(np.where(valid, alt, np.nan), axis=1, initial=0.0), min_elevation)
+    return entries[:, 0], entries[:, 1].astype(np.int32), radius.astype(np.float32)
+
+
+def build_overflight_index(bucket: float, cell_deg: float, min_elevation: float, workers: int = 0) -> Dict[str, Any]:
+    """
+    Build the overflight index of the current ephemeris store, replacing the previous one
+
+    Args:
+        bucket: Time bucket (s), rounded to a multiple of the ephemeris step
+        cell_deg: Lat/lon cell size (deg), dividing 180
+        min_elevation: Elevation (deg) above which a satellite counts as flying over
+        workers: Processes, 0 uses the CPU count
+
+    Returns:
+        Dict with the index path and its number of entries
+    """
+    path = ephemeris_path()
+    store = EphemerisStore(path)
+    satellites = len(store.ids)
+    bucket_steps = max(1, int(round(bucket / store.step)))
+    cells = int(round(180 / cell_deg)) * int(round(360 / cell_deg))
+    buckets = math.ceil(store.count / bucket_steps)
+
+    batches = list(range(0, satellites, PRECOMPUTE_BATCH))
+    workers = workers if workers > 0 else os.cpu_count()
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        parts = list(pool.map(_index_batch, [path] * len(batches), batches,
+                              [min(b + PRECOMPUTE_BATCH, satellites) for b in batches], [bucket_steps] * len(batches),
+                              [cell_deg] * len(batches), [min_elevation] * len(batches)))
+    keys = np.concatenate([np.array([], dtype=np.int64)] + [part[0] for part in parts])
+    rows = np.concatenate([np.array([], dtype=np.int32)] + [part[1] for part in parts])
+    radius = np.concatenate([np.array([], dtype=np.float32)] + [part[2] for part in parts])
+
+    columns = {"radius": radius}
+    band_radius = []
+    band = np.searchsorted(np.array(RADIUS_BANDS), radius)
+    for k in range(len(RADIUS_BANDS)):
+        members = band[rows] == k
+        order = np.argsort(keys[members], kind='stable')
+        band_keys = keys[members][order]
+        columns[f"offsets_{k}"] = np.searchsorted(band_keys, np.arange(buckets * cells + 1, dtype=np.int64))
+        columns[f"satellites_{k}"] = rows[members][order]
+        band_radius.append(float(radius[band == k].max()) if np.any(band == k) else 0.0)
+    attrs = {
+        "version": OVERFLIGHT_VERSION,
+        "ephemeris_created": store.created,
+        "start": store.start,
+        "bucket": bucket_steps * store.step,
+        "buckets": buckets,
+        "cell_deg": cell_deg,
+        "min_elevation": min_elevation,
+        "band_radius": band_radius,
+        "margin": GROUND_SPEED * store.step / 2
+    }
+    write_columns(overflight_path(), columns, attrs)
+    return {"path": overflight_path(), "entries": int(len(keys)), "satellites": satellites}
+
+
+class OverflightIndex:
+    """Mapped overflight index, see OVERFLIGHT_FILE"""
+
+    def __init__(self, path: str, mtime: int = 0):
+        attrs = read_attrs(path)
+        columns = read_columns(path)
+        self.mtime = mtime
+        self.ephemeris_created = attrs["ephemeris_created"]
+        self.start, self.bucket, self.buckets = attrs["start"], attrs["bucket"], attrs["buckets"]
+        self.margin = attrs["margin"]
+        self._band_radius = attrs["band_radius"]
+        self._centers, _ = _cell_centers(attrs["cell_deg"])
+        # Farthest point of a cell from its center, the equatorial cells being the widest
+        self._cell_reach = EARTH_RADIUS * math.radians(attrs["cell_deg"]) * math.sqrt(2) / 2
+        self.radius = columns["radius"]
+        self._bands = [(columns[f"offsets_{k}"], columns[f"satellites_{k}"]) for k in range(len(self._band_radius))]
+
+    def query(self, targets: List[List[Tuple[float, float]]], start: float, stop: float) -> Dict[int, Tuple[float, float]]:
+        """
+        Satellites that may fly over any of the targets during a window
+
+        Args:
+            targets: Targets as (lon, lat) lists: a point, the vertices of a line or of a polygon
+            start: Window start (epoch seconds)
+            stop: Window stop (epoch seconds)
+
+        Returns:
+            Ephemeris store row to the (start, stop) of its first and last bucket with an overflight
+        """
+        cells = len(self._centers)
+        b0 = max(0, int((start - self.start) // self.bucket))
+        b1 = min(self.buckets - 1, int((stop - self.start) // self.bucket))
+        if b1 < b0:
+            return {}
+
+        # Smallest ground distance from each target to each cell
+        distance = np.full(cells, np.inf)
+        for target in targets:
+            vertices = _unit(*np.array(target, dtype=np.float64).T)
+            center = vertices.sum(axis=0)
+            center /= np.linalg.norm(center)
+            cap = EARTH_RADIUS * float(np.arccos(np.clip(vertices @ center, -1.0, 1.0)).max())
+            to_cells = EARTH_RADIUS * np.arccos(np.clip(self._centers @ center, -1.0, 1.0))
+            distance = np.minimum(distance, np.maximum(to_cells - self._cell_reach - cap, 0.0))
+
+        found_rows, found_buckets = [], []
+        for (offsets, satellites), band_radius in zip(self._bands, self._band_radius):
+            near = np.flatnonzero(distance <= band_radius + self.margin)
+            if near.size == 0 or satellites.size == 0:
+                continue
+            keys = (np.arange(b0, b1 + 1, dtype=np.int64)[:, None] * cells + near[None, :]).ravel()
+            lo, hi = offsets[keys], offsets[keys + 1]
+            lengths = hi - lo
+            if lengths.sum() == 0:
+                continue
+            index = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths) + np.repeat(lo, lengths)
+            entry_keys = np.repeat(keys, lengths)
+            rows = satellites[index]
+            reach = distance[entry_keys % cells] <= self.radius[rows] + self.margin
+            found_rows.append(rows[reach])
+            found_buckets.append(entry_keys[reach] // cells)
+        if not found_rows:
+            return {}
+
+        rows = np.concatenate(found_rows)
+        buckets = np.concatenate(found_buckets)
+        order = np.lexsort((buckets, rows))
+        rows, buckets = rows[order], buckets[order]
+        first = np.flatnonzero(np.r_[True, rows[1:] != rows[:-1]])
+        last = np.r_[first[1:], rows.size] - 1
+        return {int(row): (max(start, self.start + int(buckets[i]) * self.bucket),
+                           min(stop, self.start + (int(buckets[j]) + 1) * self.bucket))
+                for row, i, j in zip(rows[first].tolist(), first.tolist(), last.tolist())}
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_overflight_index() -> Optional[OverflightIndex]:
+    """Current overflight index, reloaded when rebuilt; None when there is none"""
+    global _index
+    path = overflight_path()
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return None
+    with _index_lock:
+        if _index is None or _index.mtime != mtime:
+            _index = OverflightIndex(path, mtime)
+        return _index
+
+
+def parse_targets(data: str) -> List[Tuple[float, float]]:
+    """Target in the simulation request format "lon lat|lon lat|..." as (lon, lat) pairs"""
+    return [tuple(map(float, item.split())) for item in data.split('|') if item.strip()]
+
+
+def unreachable_satellites(satellites: List[Dict[str, Any]], simu_paras: Dict[str, Any]) -> List[str]:
+    """
+    Satellites the overflight index shows cannot fly over any target of a simulation
+
+    Satellites missing from the ephemeris store, with a changed TLE, or a window outside of the index are kept.
+
+    Args:
+        satellites: Satellite parameters with "ID", "tle1" and "tle2"
+        simu_paras: Simulation request data
+
+    Returns:
+        IDs of the satellites that can be left out of the simulation
+    """
+    store, index = get_ephemeris_store(), get_overflight_index()
+    if store is None or index is None or index.ephemeris_created != store.created:
+        return []
+    start, stop = parse_simulation_time(simu_paras['start_time']), parse_simulation_time(simu_paras['end_time'])
+    if not store.covers(np.array([start, stop])):
+        return []
+    targets = [parse_targets(simu_paras[key]) for key in ('point_data', 'line_data', 'area_data')]
+    reachable = index.query([target for target in targets if target], start, stop)
+    skipped = []
+    for item in satellites:
+        row = store.lookup(item['ID'], item['tle1'], item['tle2'])
+        if row is not None and row not in reachable:
+            skipped.append(item['ID'])
+    return skipped
@@ -0,0 +1,219 @@
+import logging
+import math
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from configs.app_config import app_config
+from libs.propagation import parse_tle, propagate, teme_to_ecef
+from libs.footprint import sensor_angles, sensor_frames
+from libs.access import target_geometry, target_visibility, access_intervals
+from libs.ephemeris_store import propagate_or_lookup
+
+# Satellite timesteps propagated and tested per task of the prediction pool, bounds the memory of one task
+BATCH_SAMPLES = 1000000
+
+# Perigee altitude (km) below which a satellite is considered decayed
+DECAY_ALTITUDE = 80.0
+
+# Slack (deg) of the prefilters: geodetic vs geocentric latitude and the osculating vs mean inclination
+PREFILTER_MARGIN = 1.0
+
+# Ranking orders of the predicted passes: key of a pass, in descending order of interest
+RANKINGS = {
+    "start": lambda item: item["start"],
+    "duration": lambda item: -item["duration"],
+    "elevation": lambda item: -item["max_elevation"]
+}
+
+_pass_pool = None
+
+
+def get_pass_pool() -> ProcessPoolExecutor:
+    global _pass_pool
+    if _pass_pool is None:
+        workers = app_config.PASS_PREDICTION_WORKERS if app_config.PASS_PREDICTION_WORKERS > 0 else os.cpu_count()
+        _pass_pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+    return _pass_pool
+
+
+def sensor_reach(off_nadir: np.ndarray, altitude: np.ndarray, earth_radius: float) -> np.ndarray:
+    """
+    Largest Earth central angle between the sub-satellite point and a ground point seen by a sensor
+
+    Args:
+        off_nadir: Largest angle (rad) between the nadir and a ray of the sensor
+        altitude: Satellite altitude (km)
+        earth_radius: Earth radius (km)
+
+    Returns:
+        Central angle (rad), the horizon when a ray of the sensor misses the Earth
+    """
+    ratio = (earth_radius + altitude) / earth_radius
+    horizon = np.arccos(1 / ratio)
+    sin_ground = ratio * np.sin(off_nadir)
+    return np.where(sin_ground >= 1, horizon, np.arcsin(np.minimum(sin_ground, 1)) - off_nadir)
+
+
+class ElementCatalog:
+    """TLEs and sensors of a satellite catalog parsed into arrays, see get_element_catalog"""
+
+    def __init__(self, rows: List[Tuple[str, str, str, str, Any]]):
+        self.rows = rows
+        self.ids, self.names, self.tles = [], [], []
+        angles, inclination, perigee, apogee, radius = [], [], [], [], []
+        self.invalid = 0
+        for ID, name, tle1, tle2, sensor_value in rows:
+            try:
+                satrec = parse_tle(tle1, tle2)
+                sensor = sensor_angles(sensor_value)
+            except Exception:
+                self.invalid += 1
+                continue
+            self.ids.append(ID)
+            self.names.append(name)
+            self.tles.append((tle1, tle2))
+            angles.append(sensor)
+            inclination.append(satrec.inclo)
+            perigee.append(satrec.altp * satrec.radiusearthkm)
+            apogee.append(satrec.alta * satrec.radiusearthkm)
+            radius.append(satrec.radiusearthkm)
+        # (hha, vha, roll, pitch, yaw) in degrees, inclination in rad, perigee and apogee altitudes in km
+        self.angles = np.array(angles, dtype=np.float64).reshape(-1, 5)
+        self.inclination = np.array(inclination, dtype=np.float64)
+        self.perigee = np.array(perigee, dtype=np.float64)
+        self.apogee = np.array(apogee, dtype=np.float64)
+
+        # Widest sensor ray off the nadir: boresight tilt plus the half diagonal of the field of view
+        hha, vha = np.radians(self.angles[:, 0]), np.radians(self.angles[:, 1])
+        tilt = np.radians(np.abs(self.angles[:, 2]) + np.abs(self.angles[:, 3]))
+        off_nadir = np.minimum(tilt + np.arctan(np.hypot(np.tan(hha), np.tan(vha))), math.pi / 2)
+        self.reach = sensor_reach(off_nadir, np.maximum(self.apogee, 0.0), np.array(radius, dtype=np.float64))
+
+    def candidates(self, lat: float) -> np.ndarray:
+        """
+        Satellites able to see a target latitude
+
+        A satellite is discarded when it decayed or when the latitude is farther from the equator than the
+        ground track ever goes (inclination, or its supplement when retrograde) plus the sensor reach.
+
+        Args:
+            lat: Target latitude (deg)
+
+        Returns:
+            Indices of the remaining satellites
+        """
+        track = np.minimum(self.inclination, math.pi - self.inclination)
+        reachable = np.abs(math.radians(lat)) <= track + self.reach + math.radians(PREFILTER_MARGIN)
+        return np.flatnonzero(reachable & (self.perigee >= DECAY_ALTITUDE))
+
+
+_catalog = None
+_catalog_lock = threading.Lock()
+
+
+def get_element_catalog(rows: List[Tuple[str, str, str, str, Any]]) -> ElementCatalog:
+    """Element arrays of (ID, name, tle1, tle2, sensor_value) rows, parsed again only when the rows changed"""
+    global _catalog
+    with _catalog_lock:
+        if _catalog is None or _catalog.rows != rows:
+            _catalog = ElementCatalog(rows)
+        return _catalog
+
+
+def _elevation(r: np.ndarray, target: np.ndarray, up: np.ndarray) -> np.ndarray:
+    d = r - target
+    return np.degrees(np.arcsin(np.clip((d @ up) / np.linalg.norm(d, axis=-1), -1.0, 1.0)))
+
+
+def predict_batch(satellites: List[Tuple[str, str, str, Any, float]], times: np.ndarray,
+                  point: Tuple[float, float]) -> Tuple[List[Tuple[str, float, float, float]], int]:
+    """
+    Passes of a batch of satellites over a ground point, run by the prediction pool
+
+    Only the samples within the sensor reach of the point get a sensor frame and a field of view test,
+    the access edges are then refined as in the simulations (libs.access.access_intervals).
+
+    Args:
+        satellites: (ID, tle1, tle2, (hha, vha, roll, pitch, yaw), reach in rad) of every satellite
+        times: Epoch seconds (timesteps,)
+        point: Target (lon, lat) in degrees
+
+    Returns:
+        Tuple of the passes (ID, start, stop, max elevation) and the number of satellites SGP4 failed on
+    """
+    items = [{'ID': item[0], 'tle1': item[1], 'tle2': item[2]} for item in satellites]
+    satrecs = [parse_tle(item[1], item[2]) for item in satellites]
+    angles = np.array([item[3] for item in satellites], dtype=np.float64)
+    reach = np.array([item[4] for item in satellites], dtype=np.float64)
+    error, r, v = propagate_or_lookup(items, satrecs, times)
+    r_ecef, v_ecef = teme_to_ecef(r, v, times)
+
+    targets, up = target_geometry(np.array([point], dtype=np.float64))
+    direction = targets[0] / np.linalg.norm(targets[0])
+    failed = np.any(error != 0, axis=1)
+    with np.errstate(invalid='ignore'):
+        cos_angle = (r_ecef @ direction) / np.linalg.norm(r_ecef, axis=-1)
+        near = (cos_angle >= np.cos(reach + math.radians(PREFILTER_MARGIN))[:, None]) & ~failed[:, None]
+    mask = np.zeros(near.shape, dtype=bool)
+    s, t = np.nonzero(near)
+    if s.size:
+        samples_r, samples_v = r_ecef[s, t][:, None], v_ecef[s, t][:, None]
+        frames = sensor_frames(samples_r, samples_v, angles[s, 2], angles[s, 3], angles[s, 4])
+        mask[s, t] = target_visibility(samples_r, frames, targets, up, angles[s, 0], angles[s, 1])[:, 0, 0]
+
+    passes = []
+    for i in np.flatnonzero(mask.any(axis=1)):
+        starts, stops = access_intervals(satrecs[i], angles[i], times, mask[i], targets, up)
+        # Highest elevation of every pass: the samples inside it and its middle
+        _, r_mid, v_mid = propagate([satrecs[i]], (starts + stops) / 2)
+        elevation_mid = _elevation(teme_to_ecef(r_mid, v_mid, (starts + stops) / 2)[0][0], targets[0], up[0])
+        elevation = _elevation(r_ecef[i], targets[0], up[0])
+        for start, stop, middle in zip(starts.tolist(), stops.tolist(), elevation_mid.tolist()):
+            inside = elevation[(times >= start) & (times <= stop)]
+            passes.append((satellites[i][0], start, stop, max([middle] + inside.tolist())))
+    return passes, int(np.count_nonzero(failed))
+
+
+def predict_passes(catalog: ElementCatalog, point: Tuple[float, float], start: float, stop: float, step: float,
+                   pool: Optional[ProcessPoolExecutor] = None) -> Dict[str, Any]:
+    """
+    Passes of a whole catalog over a ground point
+
+    The satellites the element prefilter keeps are split into batches of about BATCH_SAMPLES satellite
+    timesteps, propagated and tested by the prediction pool.
+
+    Args:
+        catalog: Element catalog, see get_element_catalog
+        point: Target (lon, lat) in degrees
+        start: Window start (epoch seconds)
+        stop: Window stop (epoch seconds)
+        step: Sample step (s), the passes shorter than it may be missed
+        pool: Process pool, get_pass_pool by default
+
+    Returns:
+        Dict with the passes (ID, name, start, stop, duration, max_elevation) sorted by start time and the
+        numbers of satellites kept by the prefilter and failed by SGP4
+    """
+    times = np.append(np.arange(start, stop, step, dtype=np.float64), stop)
+    candidates = catalog.candidates(point[1])
+    per_batch = max(1, BATCH_SAMPLES // len(times))
+    batches = [[(catalog.ids[i], *catalog.tles[i], catalog.angles[i].tolist(), float(catalog.reach[i]))
+                for i in candidates[b:b + per_batch]] for b in range(0, len(candidates), per_batch)]
+
+    pool = pool or get_pass_pool()
+    names = dict(zip(catalog.ids, catalog.names))
+    passes, failed = [], 0
+    for batch_passes, batch_failed in pool.map(predict_batch, batches, [times] * len(batches), [point] * len(batches)):
+        failed += batch_failed
+        passes.extend({"ID": ID, "name": names[ID], "start": pass_start, "stop": pass_stop,
+                       "duration": pass_stop - pass_start, "max_elevation": elevation}
+                      for ID, pass_start, pass_stop, elevation in batch_passes)
+    passes.sort(key=RANKINGS["start"])
+    logging.info(f"过境预报：{len(catalog.ids)} 颗卫星中 {len(candidates)} 颗通过轨道根数预筛选，"
+                 f"预报出 {len(passes)} 次过境")
+    return {"passes": passes, "satellites": len(catalog.ids), "candidates": int(len(candidates)), "failed": failed}
@@ -0,0 +1,72 @@
+import asyncio
+import base64
+import logging
+import os
+import re
+import signal
+import subprocess
+from typing import Any, Dict
+
+# Time (s) given to a process tree to exit after SIGTERM before it is killed
+KILL_TIMEOUT = 5
+
+
+def process_group_kwargs() -> Dict[str, Any]:
+    """
+    Subprocess arguments starting the command in its own process group, so its whole tree can be killed
+
+    Returns:
+        Keyword arguments for asyncio.create_subprocess_shell / subprocess.Popen
+    """
+    if os.name == 'nt':
+        return {"creationflags": subprocess.CREATE_NEW_PROCESS_GROUP}
+    return {"start_new_session": True}
+
+
+async def kill_process_tree(process: asyncio.subprocess.Process):
+    """
+    Kill a process started with process_group_kwargs together with all of its children
+
+    Args:
+        process: Process to kill
+    """
+    if process.returncode is not None:
+        return
+    try:
+        if os.name == 'nt':
+            killer = await asyncio.create_subprocess_exec("taskkill", "/F", "/T", "/PID", str(process.pid),
+                                                          stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.DEVNULL)
+            await killer.wait()
+        else:
+            os.killpg(process.pid, signal.SIGTERM)
+            try:
+                await asyncio.wait_for(process.wait(), KILL_TIMEOUT)
+            except asyncio.TimeoutError:
+                os.killpg(process.pid, signal.SIGKILL)
+        await process.wait()
+    except ProcessLookupError:
+        pass
+    logging.info(f"已终止进程 {process.pid} 及其子进程")
+
+
+def remote_kill_command(token: str, windows: bool = True) -> str:
+    """
+    Command killing, on a remote host, every process whose command line contains token
+
+    The token must be unique to the run, eg: its manifest or result path. On Windows the filter runs as
+    an encoded PowerShell command so that the token never appears in the killer's own command line.
+
+    Args:
+        token: Text identifying the processes to kill
+        windows: Whether the remote host runs Windows
+
+    Returns:
+        Command to execute over SSH
+    """
+    if windows:
+        script = ("Get-CimInstance Win32_Process | Where-Object { $_.CommandLine -and $_.CommandLine.Contains('"
+                  + token.replace("'", "''") + "') } | ForEach-Object { taskkill /F /T /PID $_.ProcessId }")
+        return "powershell -NoProfile -NonInteractive -EncodedCommand " + base64.b64encode(script.encode('utf-16-le')).decode('ascii')
+    # The bracket keeps the pattern from matching the command line of pkill's own shell
+    pattern = "[" + re.escape(token[0]) + "]" + re.escape(token[1:])
+    return "pkill -f -- '" + pattern.replace("'", "'\\''") + "'"
@@ -0,0 +1,200 @@
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from configs.app_config import app_config
+
+# File receiving the stage spans of a job, next to its simulation_paras.txt
+PROFILE_FILE = "profile.json"
+
+# Prefix of the stdout lines stk_simulation.py prints for its internal phases: TIMING <phase> <seconds> [ID]
+TIMING_PREFIX = "TIMING "
+
+_current: ContextVar[Optional["Profile"]] = ContextVar("simulation_profile", default=None)
+
+# Profiles of the most recent jobs, for the per-stage statistics
+_history: deque = deque(maxlen=max(1, app_config.SIMULATION_PROFILE_HISTORY))
+_history_lock = threading.Lock()
+
+
+class Profile:
+    """
+    Stage spans of one simulation job
+
+    Spans carry the offset (s) of their start from the job start, their duration (s) and optional
+    attributes such as the satellite ID or the STK host. Satellite spans of concurrent batches overlap.
+    """
+
+    def __init__(self, **attrs):
+        self.attrs = attrs
+        self.status = "failed"
+        self.created = time.time()
+        self.spans: List[Dict[str, Any]] = []
+        self._origin = time.perf_counter()
+
+    @contextmanager
+    def span(self, stage: str, **attrs) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter() - start, start - self._origin, **attrs)
+
+    def record(self, stage: str, seconds: float, offset: float = None, **attrs):
+        """
+        Add a span measured elsewhere
+
+        Args:
+            stage: Stage name, eg: stk.satellite
+            seconds: Duration of the span
+            offset: Start of the span relative to the job start, defaults to "ended just now"
+            attrs: Span attributes
+        """
+        if offset is None:
+            offset = time.perf_counter() - self._origin - seconds
+        # list.append is atomic, spans may come from worker threads
+        self.spans.append({"stage": stage, "offset": round(offset, 6), "seconds": round(seconds, 6), **attrs})
+
+    def stages(self) -> Dict[str, float]:
+        """Total seconds per stage"""
+        totals = {}
+        for item in self.spans:
+            totals[item["stage"]] = totals.get(item["stage"], 0.0) + item["seconds"]
+        return totals
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            **self.attrs,
+            "status": self.status,
+            "created": self.created,
+            "total": round(time.perf_counter() - self._origin, 6),
+            "stages": {stage: round(seconds, 6) for stage, seconds in self.stages().items()},
+            "spans": self.spans
+        }
+
+
+def start_profile(**attrs) -> Profile:
+    """
+    Start profiling the current job, spans recorded from its task, child tasks and threads go to it
+
+    Args:
+        attrs: Job attributes written to the profile, eg: ID, level, algorithm_type
+
+    Returns:
+        Profile instance
+    """
+    profile = Profile(**attrs)
+    _current.set(profile)
+    return profile
+
+
+def finish_profile(profile: Profile, directory: Optional[str] = None):
+    """
+    Write the profile as PROFILE_FILE into directory and remember it for stage_statistics
+
+    Args:
+        profile: Profile of the job
+        directory: Folder receiving the profile, skipped when missing (eg: removed cancelled job)
+    """
+    data = profile.to_dict()
+    with _history_lock:
+        _history.append(data)
+    if directory is None or not os.path.isdir(directory):
+        return
+    try:
+        with open(os.path.join(directory, PROFILE_FILE), "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+    except OSError as e:
+        logging.warning(f"仿真任务耗时记录写入失败: {e}")
+
+
+def span(stage: str, **attrs):
+    """
+    Context manager timing a stage of the current job, does nothing outside a profiled job
+
+    Args:
+        stage: Stage name
+        attrs: Span attributes
+    """
+    profile = _current.get()
+    if profile is None:
+        return nullcontext()
+    return profile.span(stage, **attrs)
+
+
+def record(stage: str, seconds: float, **attrs):
+    """Add a span that just ended to the current job, see Profile.record"""
+    profile = _current.get()
+    if profile is not None:
+        profile.record(stage, seconds, **attrs)
+
+
+def parse_timing_line(line: str) -> Optional[Tuple[str, float, Optional[str]]]:
+    """
+    Parse a TIMING line printed by stk_simulation.py
+
+    Args:
+        line: stdout line of the script
+
+    Returns:
+        Tuple of (phase, seconds, satellite ID or None), None for other lines
+    """
+    if not line.startswith(TIMING_PREFIX):
+        return None
+    parts = line[len(TIMING_PREFIX):].split()
+    try:
+        return parts[0], float(parts[1]), parts[2] if len(parts) > 2 else None
+    except (IndexError, ValueError):
+        return None
+
+
+def stage_statistics(limit: int = 0) -> Dict[str, Any]:
+    """
+    Duration percentiles of every stage over the recent successful jobs
+
+    A job contributes the total time of each stage it went through; stages per satellite are also
+    summarized per span, so that p95 tells the slowest satellites apart from the slowest jobs.
+
+    Args:
+        limit: Only consider the last limit jobs, 0 for all remembered jobs
+
+    Returns:
+        Dict with the number of jobs and per-stage count, p50, p95, mean and max in seconds
+    """
+    with _history_lock:
+        profiles = [item for item in _history if item["status"] == "succeeded"]
+    if limit > 0:
+        profiles = profiles[-limit:]
+
+    per_job: Dict[str, List[float]] = {"job": [item["total"] for item in profiles]}
+    per_span: Dict[str, List[float]] = {}
+    for item in profiles:
+        for stage, seconds in item["stages"].items():
+            per_job.setdefault(stage, []).append(seconds)
+        for entry in item["spans"]:
+            if "ID" in entry:
+                per_span.setdefault(entry["stage"], []).append(entry["seconds"])
+
+    def summarize(values: List[float]) -> Dict[str, Any]:
+        array = np.asarray(values, dtype=np.float64)
+        return {
+            "count": len(values),
+            "p50": round(float(np.percentile(array, 50)), 6),
+            "p95": round(float(np.percentile(array, 95)), 6),
+            "mean": round(float(array.mean()), 6),
+            "max": round(float(array.max()), 6)
+        }
+
+    return {
+        "jobs": len(profiles),
+        "stages": {stage: summarize(values) for stage, values in per_job.items() if values},
+        "satellite_stages": {stage: summarize(values) for stage, values in per_span.items()}
+    }
@@ -0,0 +1,262 @@
+import math
+from datetime import datetime, timezone
+from typing import List, Tuple
+
+import numpy as np
+from sgp4.api import Satrec, SatrecArray, WGS72
+
+# WGS84 ellipsoid (km)
+WGS84_A = 6378.137
+WGS84_F = 1 / 298.257223563
+WGS84_E2 = WGS84_F * (2 - WGS84_F)
+WGS84_B = WGS84_A * (1 - WGS84_F)
+
+# Earth rotation rate (rad/s)
+EARTH_ROTATION_RATE = 7.292115146706979e-5
+
+# Julian date of the Unix epoch
+JD_UNIX_EPOCH = 2440587.5
+
+
+def parse_simulation_time(value: str) -> float:
+    """
+    Convert a simulation time string to epoch seconds
+
+    Args:
+        value: UTC time in the SimulationRequest format, eg: 20130912032513
+
+    Returns:
+        Seconds since 1970-01-01T00:00:00Z
+    """
+    return datetime.strptime(value, "%Y%m%d%H%M%S").replace(tzinfo=timezone.utc).timestamp()
+
+
+def time_grid(start_time: str, end_time: str, interval: str) -> np.ndarray:
+    """
+    Build the sample times of a simulation, matching STK data providers: every step from
+    the start time, plus the stop time itself when it is not on the step grid
+
+    Args:
+        start_time: Simulation start time, eg: 20130912032513
+        end_time: Simulation end time, eg: 20130915032619
+        interval: Step size (s)
+
+    Returns:
+        Epoch seconds, float64 array
+    """
+    t0 = parse_simulation_time(start_time)
+    t1 = parse_simulation_time(end_time)
+    step = float(interval)
+    count = math.ceil((t1 - t0) / step)
+    offsets = np.arange(count + 1, dtype=np.float64) * step
+    offsets[-1] = min(offsets[-1], t1 - t0)
+    return t0 + offsets
+
+
+def split_julian(times: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Split epoch seconds into whole and fractional Julian dates, as expected by sgp4
+
+    Args:
+        times: Epoch seconds
+
+    Returns:
+        Tuple of (jd, fr) arrays
+    """
+    days = np.asarray(times, dtype=np.float64) / 86400.0
+    whole = np.floor(days)
+    return JD_UNIX_EPOCH + whole, days - whole
+
+
+def format_tle(tle1: str, tle2: str) -> Tuple[str, str]:
+    """
+    Re-space TLE lines to their fixed-width columns (same rules as stk_backprogress.format_tle)
+
+    Args:
+        tle1: First TLE line, possibly with collapsed spaces
+        tle2: Second TLE line, possibly with collapsed spaces
+
+    Returns:
+        Tuple of the formatted lines
+    """
+    paras = [x for x in tle1.split(' ') if x != '']
+    line1 = list(" ") * 69
+    line1[0] = '1'
+    line1[7 - len(paras[1]) + 1:8] = list(paras[1])
+    line1[9:9 + len(paras[2])] = list(paras[2])
+    line1[18:18 + len(paras[3])] = list(paras[3])
+    line1[42 - len(paras[4]) + 1:43] = list(paras[4])
+    line1[51 - len(paras[5]) + 1:52] = list(paras[5])
+    line1[60 - len(paras[6]) + 1:61] = list(paras[6])
+    line1[62] = paras[7]
+    line1[68 - len(paras[8]) + 1:69] = list(paras[8])
+
+    paras = [x for x in tle2.split(' ') if x != '']
+    line2 = list(" ") * 69
+    line2[0] = '2'
+    line2[6 - len(paras[1]) + 1:7] = list(paras[1])
+    line2[15 - len(paras[2]) + 1:16] = list(paras[2])
+    line2[24 - len(paras[3]) + 1:25] = list(paras[3])
+    line2[32 - len(paras[4]) + 1:33] = list(paras[4])
+    line2[41 - len(paras[5]) + 1:42] = list(paras[5])
+    line2[50 - len(paras[6]) + 1:51] = list(paras[6])
+    line2[52:69] = list(paras[7])
+
+    return "".join(line1), "".join(line2)
+
+
+def parse_tle(tle1: str, tle2: str) -> Satrec:
+    """
+    Parse one TLE into an sgp4 satellite record (WGS72 constants, as used by STK's SGP4 propagator)
+
+    Args:
+        tle1: First TLE line
+        tle2: Second TLE line
+
+    Returns:
+        Satrec instance
+    """
+    line1, line2 = format_tle(tle1.strip(), tle2.strip())
+    return Satrec.twoline2rv(line1, line2, WGS72)
+
+
+def propagate(satrecs: List[Satrec], times: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Propagate every satellite over the whole time grid in one batched SGP4 call
+
+    Args:
+        satrecs: Satellite records
+        times: Epoch seconds, shape (timesteps,)
+
+    Returns:
+        Tuple of (error, r, v): SGP4 error codes (satellites, timesteps) and TEME position (km) and
+        velocity (km/s) arrays of shape (satellites, timesteps, 3)
+    """
+    jd, fr = split_julian(times)
+    error, r, v = SatrecArray(satrecs).sgp4(jd, fr)
+    return error, r, v
+
+
+def gmst(times: np.ndarray) -> np.ndarray:
+    """
+    Greenwich mean sidereal time (IAU-82), UT1 taken as UTC
+
+    Args:
+        times: Epoch seconds
+
+    Returns:
+        GMST angle in radians
+    """
+    jd, fr = split_julian(times)
+    t = ((jd - 2451545.0) + fr) / 36525.0
+    seconds = 67310.54841 + (876600.0 * 3600.0 + 8640184.812866) * t + 0.093104 * t ** 2 - 6.2e-6 * t ** 3
+    return np.radians(np.mod(seconds, 86400.0) / 240.0)
+
+
+def teme_to_ecef(r: np.ndarray, v: np.ndarray, times: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Rotate TEME states to the Earth-fixed frame (polar motion neglected)
+
+    Args:
+        r: TEME positions (..., timesteps, 3)
+        v: TEME velocities (..., timesteps, 3)
+        times: Epoch seconds (timesteps,)
+
+    Returns:
+        Tuple of ECEF position and velocity arrays with the input shapes
+    """
+    theta = gmst(times)
+    c, s = np.cos(theta), np.sin(theta)
+    x = c * r[..., 0] + s * r[..., 1]
+    y = -s * r[..., 0] + c * r[..., 1]
+    r_ecef = np.stack([x, y, r[..., 2]], axis=-1)
+
+    vx = c * v[..., 0] + s * v[..., 1] + EARTH_ROTATION_RATE * y
+    vy = -s * v[..., 0] + c * v[..., 1] - EARTH_ROTATION_RATE * x
+    v_ecef = np.stack([vx, vy, v[..., 2]], axis=-1)
+    return r_ecef, v_ecef
+
+
+def ecef_to_teme(r: np.ndarray, v: np.ndarray, times: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Inverse of teme_to_ecef
+
+    Args:
+        r: ECEF positions (..., timesteps, 3)
+        v: ECEF velocities (..., timesteps, 3)
+        times: Epoch seconds (timesteps,)
+
+    Returns:
+        Tuple of TEME position and velocity arrays with the input shapes
+    """
+    theta = gmst(times)
+    c, s = np.cos(theta), np.sin(theta)
+    vx = v[..., 0] - EARTH_ROTATION_RATE * r[..., 1]
+    vy = v[..., 1] + EARTH_ROTATION_RATE * r[..., 0]
+    r_teme = np.stack([c * r[..., 0] - s * r[..., 1], s * r[..., 0] + c * r[..., 1], r[..., 2]], axis=-1)
+    v_teme = np.stack([c * vx - s * vy, s * vx + c * vy, v[..., 2]], axis=-1)
+    return r_teme, v_teme
+
+
+def ecef_to_lla(r: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Convert ECEF positions to WGS84 geodetic coordinates
+
+    Args:
+        r: ECEF positions (..., 3) in km
+
+    Returns:
+        Tuple of (lon, lat) in degrees and altitude in km
+    """
+    x, y, z = r[..., 0], r[..., 1], r[..., 2]
+    p = np.hypot(x, y)
+    lon = np.arctan2(y, x)
+    lat = np.arctan2(z, p * (1 - WGS84_E2))
+    for _ in range(5):
+        sin_lat = np.sin(lat)
+        n = WGS84_A / np.sqrt(1 - WGS84_E2 * sin_lat ** 2)
+        alt = p * np.cos(lat) + z * sin_lat - WGS84_A * WGS84_A / n
+        lat = np.arctan2(z, p * (1 - WGS84_E2 * n / (n + alt)))
+    sin_lat = np.sin(lat)
+    n = WGS84_A / np.sqrt(1 - WGS84_E2 * sin_lat ** 2)
+    alt = p * np.cos(lat) + z * sin_lat - WGS84_A * WGS84_A / n
+    return np.degrees(lon), np.degrees(lat), alt
+
+
+def lla_to_ecef(lon: np.ndarray, lat: np.ndarray, alt: np.ndarray = 0.0) -> np.ndarray:
+    """
+    Convert WGS84 geodetic coordinates to ECEF positions
+
+    Args:
+        lon: Longitude in degrees
+        lat: Latitude in degrees
+        alt: Altitude in km
+
+    Returns:
+        ECEF positions (..., 3) in km
+    """
+    lon = np.radians(lon)
+    lat = np.radians(lat)
+    sin_lat = np.sin(lat)
+    n = WGS84_A / np.sqrt(1 - WGS84_E2 * sin_lat ** 2)
+    x = (n + alt) * np.cos(lat) * np.cos(lon)
+    y = (n + alt) * np.cos(lat) * np.sin(lon)
+    z = (n * (1 - WGS84_E2) + alt) * sin_lat
+    return np.stack(np.broadcast_arrays(x, y, z), axis=-1)
+
+
+def format_times(times: np.ndarray) -> np.ndarray:
+    """
+    Format epoch seconds the way the STK reports do
+
+    Args:
+        times: Epoch seconds
+
+    Returns:
+        String array, eg: '2023-06-20 20:31:27.745'
+    """
+    times = np.asarray(times, dtype=np.float64)
+    if times.size == 0:
+        return np.array([], dtype=str)
+    ms = np.round(times * 1000.0).astype('int64').astype('datetime64[ms]')
+    return np.char.replace(np.datetime_as_string(ms, unit='ms'), 'T', ' ')
@@ -1,11 +1,111 @@
 import os
-import json
-import asyncio
-import zipfile
 import math
-from datetime import datetime, timedelta
+import logging
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Optional
+import numpy as np
+from configs.app_config import app_config
+from libs.profiling import span
+from libs.columnar import load_satellite_columns, access_periods
+from libs.propagation import format_times, parse_simulation_time
+from libs.intervals import constellation_summary, next_start
+from libs.report_archive import save_report_zip
+from libs.result_store import store_results
+from libs.visual_bundle import satellite_layout, allocate_visual_bundle, write_visual_satellite, finish_visual_bundle
+
+report_filename_dict = {1: '/point.txt', 2: '/line.txt', 3: '/area.txt'}
+revisit_filename_dict = {1: '/revisit_time_point.txt', 2: '/revisit_time_line.txt', 3: '/revisit_time_area.txt'}
+union_filename_dict = {1: '/union_point.txt', 2: '/union_line.txt', 3: '/union_area.txt'}
+
+# Processes running the CPU-bound report steps, so that the event loop keeps serving other requests
+_report_pool = None
+
+
+def get_report_pool() -> ProcessPoolExecutor:
+    global _report_pool
+    if _report_pool is None:
+        workers = app_config.SIMULATION_REPORT_WORKERS if app_config.SIMULATION_REPORT_WORKERS > 0 else os.cpu_count()
+        # Spawned workers do not inherit the locks held by the server threads (SSH pools, executors) at fork time
+        _report_pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+    return _report_pool
+
+
+# Combined visibility of the target by the whole constellation: union windows, gaps and simultaneous satellites
+def write_union_report(satellite_periods, save_dir, geo_type, start_time, end_time):
+    summary = constellation_summary(satellite_periods, parse_simulation_time(start_time), parse_simulation_time(end_time))
+
+    def rows(starts, stops, *extra):
+        for start, stop, duration, *values in zip(format_times(starts), format_times(stops), (stops - starts).tolist(),
+                                                  *(column.tolist() for column in extra)):
+            yield f"{start} |  {stop} |  {duration:10.3f}" + ''.join(f" |  {value:6d}" for value in values) + '\n'
+
+    with open(save_dir + '/simulation_report/' + union_filename_dict[geo_type], "w", encoding='utf-8') as f:
+        f.write('星座联合可见时段：\n')
+        f.write('                  开始时间（UTC）             结束时间（UTC）    持续时间（s）  最大同时可见卫星数\n')
+        f.writelines(rows(*summary['windows']))
+        f.write('\n星座不可见间隙：\n')
+        f.write('                  开始时间（UTC）             结束时间（UTC）    持续时间（s）\n')
+        f.writelines(rows(*summary['gaps']))
+        f.write('\n同时可见卫星数：\n')
+        f.write('                  开始时间（UTC）             结束时间（UTC）    持续时间（s）    卫星数\n')
+        f.writelines(rows(*summary['simultaneous']))
+        f.write('\n覆盖统计：\n')
+        f.write(f"仿真时长（s）：{summary['duration']:.3f}\n")
+        f.write(f"可见时长（s）：{summary['covered']:.3f}\n")
+        f.write(f"覆盖率（%）：{summary['fraction'] * 100:.2f}%\n")
+        f.write(f"间隙数量：{len(summary['gaps'][0])}\n")
+        f.write(f"最长间隙（s）：{summary['max_gap']:.3f}\n")
+        f.write(f"平均间隙（s）：{summary['mean_gap']:.3f}\n")
+        f.write(f"最大同时可见卫星数：{summary['max_simultaneous']}\n")
+        f.write(f"平均同时可见卫星数：{summary['mean_simultaneous']:.3f}\n")
+
+
+# Extract single-satellite report data to generate constellation coverage analysis reports and re-entry time calculations
+def extract_data(report_list, save_dir, geo_type, start_time, end_time, revisit_resolution=1, revisit_runs=False):
+    report_data = []
+    satellite_periods = []  # Observation periods of every satellite, for the union report and the return period
+    for item in report_list:
+        starts, stops, percents = access_periods(load_satellite_columns(item[1]), geo_type)
+        satellite_periods.append((starts, stops))
+        durations = (stops - starts).tolist()
+        for i, (start, stop) in enumerate(zip(format_times(starts), format_times(stops))):
+            line = [start, stop, f"{durations[i]:.3f}"] + ([f"{percents[i]:.2f}%"] if geo_type == 3 else [])
+            report_data.append(item[0] + '       ' + '       '.join(line))
+
+    with open(save_dir + '/simulation_report/' + report_filename_dict[geo_type], "a", encoding='utf-8') as f:
+        f.write(
+            '                  卫星名称(编号)                           开始时间（UTC）                  结束时间（UTC）               持续时间（s）  覆盖百分比（%）\n')
+        for item in report_data:
+            f.write(item + '\n')
+
+    write_union_report(satellite_periods, save_dir, geo_type, start_time, end_time)
+
+    # Calculate Return Time: time from every timestamp to the next pass start, in milliseconds like the reports
+    resolution = max(1, revisit_resolution)
+    window_start = int(parse_simulation_time(start_time)) * 1000
+    window_stop = int(parse_simulation_time(end_time)) * 1000
+    grid = np.arange(window_start, window_stop + 1, resolution * 1000, dtype=np.int64)
+    pass_starts = np.round(np.concatenate([np.array([], dtype=np.float64)] + [p[0] for p in satellite_periods]) * 1000).astype(np.int64)
+    index, waits = next_start(pass_starts, grid)
+    stamps = np.datetime_as_string(grid.astype('datetime64[ms]'), unit='s')
+    stamps = np.char.replace(stamps, 'T', ' ').tolist()
+    revisit = ['' if math.isnan(w) else str(w / 1000) for w in waits.tolist()]
+
+    with open(save_dir +  '/simulation_report/' + revisit_filename_dict[geo_type], "a", encoding='utf-8') as f:
+        if revisit_runs:
+            # One line per run of timestamps waiting for the same pass, the revisit time decreases linearly in between
+            first = np.flatnonzero(np.r_[True, index[1:] != index[:-1]]).tolist()
+            last = [i - 1 for i in first[1:]] + [len(stamps) - 1]
+            f.write('              开始时间戳                 结束时间戳                 开始重返周期(s)          结束重返周期(s)\n')
+            f.write(''.join(f"{stamps[i]}      {stamps[j]}      {revisit[i]}      {revisit[j]}\n" for i, j in zip(first, last)))
+        else:
+            f.write('              时间戳                                        重返周期(s)\n')
+            f.write(''.join(f"{stamp}                       {value}\n" for stamp, value in zip(stamps, revisit)))
 
-async def create_report(level, simulation_dict, interval):
+
+async def create_report(level, simulation_dict, interval, progress: Optional[Callable[[str], None]] = None):
     """
     simulation_dict={'point':(1,2),'line':[(1,2),(2,3)],
                     'polygon':[(1,2),(2,3),(3,4)], start_time:20130512041203,end_time:20130512041204,
@@ -15,163 +115,100 @@ async def create_report(level, simulation_dict, interval):
                               'id3': {......}
                               },
                     'payload': xxxxxxxx   Single-star simulation refers to the name of a single star / Constellation simulation refers to the name of a constellation.
+                    'ID': xxxxxxxx   Satellite ID / Constellation ID
                     }
     # The latitude comes first, followed by the longitude in the above coordinates
+
+    The steps run in the report process pool: the visualization bundle is written while the constellation
+    reports are, report.zip is only written here with SIMULATION_REPORT_ZIP_FILE. The results are inserted into
+    the ClickHouse result tables afterwards, see store_report_results.
+    progress, when given, receives a message as every stage finishes.
     """
-    report_filename_dict = {1: '/point.txt', 2: '/line.txt', 3: '/area.txt'}
-    revisit_filename_dict = {1: '/revisit_time_point.txt', 2: '/revisit_time_line.txt', 3: '/revisit_time_area.txt'}
-
-    # Extract single-satellite report data to generate constellation coverage analysis reports and re-entry time calculations
-    def extract_data(report_list, save_dir, geo_type):
-        report_data = []  
-        revisit_data = []  # When calculating the return period, load the array of observation periods for the entire constellation
-        for item in report_list:
-            with open(item[1], 'r', encoding='utf-8') as f:
-                line_count = sum(1 for _ in f)  
-                f.seek(0)
-                for i, line in enumerate(f):
-                    if i not in (0, 1, line_count - 1):
-                        line = list(map(lambda x: x.strip(), line.strip().split('|')))
-                        report_data.append(item[0] + '       ' + '       '.join(line))
-                        revisit_data.append(datetime.strptime(line[0], "%Y-%m-%d %H:%M:%S.%f"))
-
-        with open(save_dir + '/simulation_report/' + report_filename_dict[geo_type], "a", encoding='utf-8') as f:
-            f.write(
-                '                  卫星名称(编号)                           开始时间（UTC）                  结束时间（UTC）               持续时间（s）  覆盖百分比（%）\n')
-            for item in report_data:
-                f.write(item + '\n')
-
-        # Calculate Return Time
-        start_time = datetime.strptime(simulation_dict['start_time'], "%Y%m%d%H%M%S")
-        end_time = datetime.strptime(simulation_dict['end_time'], "%Y%m%d%H%M%S")
-        revisit_time_report = []
-
-        current_time = start_time
-        while current_time <= end_time:
-             # formatted: 2025-09-13 04:08:13.143
-            candidates = [t for t in revisit_data if t > current_time]
-            if candidates:
-                revisit_time = (min(candidates) - current_time).total_seconds()  # 以秒为单位
-            else:
-                revisit_time = ''
-            formatted = current_time.strftime("%Y-%m-%d %H:%M:%S")
-            revisit_time_report.append(formatted + '                       ' + str(revisit_time))
-            current_time += timedelta(seconds=1)
-
-        with open(save_dir +  '/simulation_report/' + revisit_filename_dict[geo_type], "a", encoding='utf-8') as f:
-            f.write('              时间戳                                        重返周期(s)\n')
-            for item in revisit_time_report:
-                f.write(item + '\n')
-
-    # posLLA and sensor projection post-processing functions
-    def back_progress(report_dir, pay_load, out_dir, interval):
-        # Processing posLLA.txt files
-        data_dict = {}
-        with open(os.path.join(report_dir, 'posLLA.txt'), "r", encoding="utf-8") as f:
-            lines = f.readlines()
-        for line in lines[1:]:
-            line = line.strip()
-            if not line:
-                continue
-            parts = line.split()
-            
-            time_str = parts[0] + " " + parts[1]
-            lon = float(parts[2])
-            lat = float(parts[3])
-            height = float(parts[4])
-            data_dict[time_str] = [lon, lat, height]
-        # Write to JSON file
-        with open(os.path.join(out_dir, 'poslla', f'posLLA_{pay_load}.json'), "w", encoding="utf-8") as f:
-            json.dump(data_dict, f, ensure_ascii=False, indent=4)
-
-        # Processing sensor projection files
-        sen_projection = {}
-        with open(os.path.join(report_dir, 'sensorProjection.txt'), "r", encoding="utf-8") as f:
-            lines = f.readlines()
-
-            t1 = datetime.strptime(simulation_dict['start_time'], "%Y%m%d%H%M%S")
-            t2 = datetime.strptime(simulation_dict['end_time'], "%Y%m%d%H%M%S")
-
-            time_step = float(interval) # Time step
-            diff_seconds = (t2 - t1).total_seconds() # Total Time (s)
-            time_length = math.ceil(diff_seconds / time_step) + 1  # Number of timestamps
-            row_step = int((len(lines) - 1) / time_length) # Line length of the txt file
-
-            fmt_out = "%Y-%m-%d %H:%M:%S.%f"
-
-            t = t1
-            row_start = 1
-            while t <= t2:
-                latlon_list = []
-                for i in range(row_start, row_start + row_step):
-                    line = lines[i].strip()
-                    if not line:
-                        continue
-
-                    parts = line.split()
-
-                    lat = float(parts[0])
-                    lon = float(parts[1])
-
-                    latlon_list.append([lat, lon])
-
-                sen_projection[t.strftime(fmt_out)[:-3]] = latlon_list
-
-                t += timedelta(seconds=time_step)
-                row_start += row_step
-
-        # Write to JSON file
-        with open(os.path.join(out_dir, 'sensorprojection', f'sensorProjection_{pay_load}.json'), "w", encoding="utf-8") as f:
-            json.dump(sen_projection, f, ensure_ascii=False, indent=4)
-
-        # Add point, line, and surface coordinate JSON
-        with open(os.path.join(out_dir, 'targets', f'targets.json'), "w",
-                  encoding="utf-8") as f:
-            targets_dict = {'point': simulation_dict['point'],
-                            'line': simulation_dict['line'],
-                            'polygon': simulation_dict['polygon']
-                            }
-            json.dump(targets_dict, f, ensure_ascii=False, indent=4)
-
-    # Extract the posLLA.txt and sensorprojection.txt files from the simulation report to their respective folders for dynamic visualization
-    def visual_json_extract(simulation_dict, interval):
-        visual_dir = os.path.join(simulation_dict['save_dir'], simulation_dict['payload'])
+    loop = asyncio.get_running_loop()
+    pool = get_report_pool()
+    save_dir = simulation_dict['save_dir']
+    start_time, end_time = simulation_dict['start_time'], simulation_dict['end_time']
+
+    def notify(message):
+        if progress is not None:
+            progress(message)
+
+    # Gather the positions, footprints and targets of every satellite into the bundle of the visualization page
+    async def visual_extract():
+        visual_dir = os.path.join(save_dir, simulation_dict['payload'])
         os.makedirs(visual_dir, exist_ok=True)
-        os.makedirs(os.path.join(visual_dir, 'poslla'), exist_ok=True)
-        os.makedirs(os.path.join(visual_dir, 'sensorprojection'), exist_ok=True)
-        os.makedirs(os.path.join(visual_dir, 'targets'), exist_ok=True)
-
-        for k, v in simulation_dict['result'].items():
-            back_progress(v['satellite_dir'], v['name'], visual_dir, interval)
-
-    if level == 1:
-        # Consolidate all coverage visibility period reports
-        point_report = []
-        line_report = []
-        polygon_report = []
-        for key, value in simulation_dict['result'].items():
-            point_report.append((value['name'] + '_' + key, value['satellite_dir'] + '/point.txt'))
-            line_report.append((value['name'] + '_' + key, value['satellite_dir'] + '/line.txt'))
-            polygon_report.append((value['name'] + '_' + key, value['satellite_dir'] + '/area.txt'))
-
-        await asyncio.to_thread(extract_data, point_report, simulation_dict['save_dir'], 1)
-        await asyncio.to_thread(extract_data, line_report, simulation_dict['save_dir'], 2)
-        await asyncio.to_thread(extract_data, polygon_report, simulation_dict['save_dir'], 3)
-
-    if level == 1:
-        files_dir = ["satellites_data", "simulation_report"]
-    else:
-        files_dir = ["simulation_report"]
-
-    zip_path = os.path.join(simulation_dict['save_dir'], "report.zip")
-    with zipfile.ZipFile(zip_path, "w", zipfile.ZIP_DEFLATED) as zipf:
-        for folder_name in files_dir:
-            folder_path = os.path.join(simulation_dict['save_dir'], folder_name)
-            if os.path.exists(folder_path):
-                for root, dirs, files in os.walk(folder_path):
-                    for file in files:
-                        file_path = os.path.join(root, file)
-                        arcname = os.path.relpath(file_path, simulation_dict['save_dir'])
-                        zipf.write(file_path, arcname)
-
-    visual_json_extract(simulation_dict, interval)
+        satellites = [(v['name'], v['satellite_dir']) for k, v in simulation_dict['result'].items()]
+        targets = {'point': simulation_dict['point'],
+                   'line': simulation_dict['line'],
+                   'polygon': simulation_dict['polygon']
+                   }
+        # One pool task per satellite to size its rows, then one per satellite to copy them into the mapped bundle
+        with span("report.visual", satellites=len(satellites)):
+            layout = await asyncio.gather(*(loop.run_in_executor(pool, satellite_layout, satellite_dir)
+                                            for _, satellite_dir in satellites))
+            path, offsets = await asyncio.to_thread(allocate_visual_bundle, visual_dir, satellites, layout, targets)
+            try:
+                await asyncio.gather(*(loop.run_in_executor(pool, write_visual_satellite, path, satellite_dir, *offset)
+                                       for (_, satellite_dir), offset in zip(satellites, offsets)))
+                await asyncio.to_thread(finish_visual_bundle, path)
+            except BaseException:
+                if os.path.exists(path):
+                    os.remove(path)
+                raise
+        notify("可视化数据已生成......")
+
+    async def archive():
+        if level == 1:
+            # Consolidate all coverage visibility period reports
+            satellite_report = []
+            for key, value in simulation_dict['result'].items():
+                satellite_report.append((value['name'] + '_' + key, value['satellite_dir']))
+
+            with span("report.extract"):
+                await asyncio.gather(*(loop.run_in_executor(pool, extract_data, satellite_report, save_dir, geo_type, start_time, end_time,
+                                                            app_config.SIMULATION_REVISIT_RESOLUTION, app_config.SIMULATION_REVISIT_RUNS)
+                                       for geo_type in (1, 2, 3)))
+            notify("星座可见时段、联合覆盖与重返周期报告已生成......")
+
+        # The archive is otherwise built while it is downloaded, see libs.report_archive
+        if app_config.SIMULATION_REPORT_ZIP_FILE:
+            with span("report.zip"):
+                await loop.run_in_executor(pool, save_report_zip, save_dir, app_config.SIMULATION_ZIP_COMPRESSION,
+                                           app_config.SIMULATION_TEXT_REPORTS)
+            notify("分析报告已打包完成......")
+
+    await asyncio.gather(archive(), visual_extract())
+
+
+# Detached result inserts, referenced until they finish
+_store_tasks = set()
+
+
+async def _store(level, simulation_dict):
+    save_dir = simulation_dict['save_dir']
+    satellites = [(k, v['name'], v['satellite_dir']) for k, v in simulation_dict['result'].items()]
+    targets = {'point': simulation_dict['point'],
+               'line': simulation_dict['line'],
+               'polygon': simulation_dict['polygon']
+               }
+    try:
+        await asyncio.get_running_loop().run_in_executor(
+            get_report_pool(), store_results, os.path.basename(save_dir), simulation_dict['ID'], level, satellites,
+            targets, simulation_dict['start_time'], simulation_dict['end_time'], app_config.SIMULATION_STORE_EPHEMERIS)
+    except Exception as e:
+        # The files of the job stay the reference, a database failure does not fail the simulation
+        logging.warning(f"{simulation_dict['ID']}的仿真结果写入数据库失败: {e}")
+
+
+def store_report_results(level, simulation_dict):
+    """
+    Insert the access intervals, ephemerides and coverage of a finished simulation into the result tables
+    (see libs.result_store) in the background, when SIMULATION_RESULT_STORE is set
+
+    Started as the result is sent, so that the inserts do not hold it back; failures are only logged.
+    """
+    if not app_config.SIMULATION_RESULT_STORE:
+        return
+    task = asyncio.get_running_loop().create_task(_store(level, simulation_dict))
+    _store_tasks.add(task)
+    task.add_done_callback(_store_tasks.discard)
@@ -0,0 +1,190 @@
+import asyncio
+import io
+import os
+import queue
+import threading
+import zipfile
+from typing import AsyncIterator, BinaryIO, Iterator, List, Tuple, Union
+
+from libs.columnar import COLUMNS_FILE
+from libs.text_reports import text_reports
+
+# File name of the report archive, written to the job folder or streamed on download
+REPORT_ZIP = "report.zip"
+
+# Folders of a job folder going into the archive
+REPORT_FOLDERS = ["satellites_data", "simulation_report"]
+
+# Compression choices of the archive: zip method and zlib level
+ZIP_COMPRESSION = {
+    "store": (zipfile.ZIP_STORED, None),
+    "fast": (zipfile.ZIP_DEFLATED, 1),
+    "deflate": (zipfile.ZIP_DEFLATED, 6)
+}
+
+# Size of the file reads and of the chunks handed to the HTTP response
+CHUNK_SIZE = 1 << 20
+
+# Chunks buffered between the archive thread and the response, bounds the memory of a download
+QUEUE_CHUNKS = 8
+
+# Entry of the archive: path of a file on disk, or text blocks generated on the fly
+Entry = Tuple[str, Union[str, Iterator[str]]]
+
+
+def report_entries(save_dir: str, text: bool = True) -> Iterator[Entry]:
+    """
+    Files of a job folder going into its report archive
+
+    Args:
+        save_dir: Job folder
+        text: Add the text reports of the satellites that only have columnar results
+
+    Returns:
+        Iterator of (archive name, file path or text blocks)
+    """
+    for folder_name in REPORT_FOLDERS:
+        folder_path = os.path.join(save_dir, folder_name)
+        if not os.path.exists(folder_path):
+            continue
+        for root, dirs, files in os.walk(folder_path):
+            dirs.sort()
+            for file in sorted(files):
+                file_path = os.path.join(root, file)
+                yield os.path.relpath(file_path, save_dir), file_path
+            if text and COLUMNS_FILE in files:
+                for file_name, blocks in text_reports(root):
+                    yield os.path.relpath(os.path.join(root, file_name), save_dir), blocks
+
+
+def write_report_zip(fileobj: BinaryIO, entries: Iterator[Entry], compression: str = "fast"):
+    """
+    Write a zip archive, to a file or to an unseekable stream
+
+    Every entry is written in chunks, with zip64 extensions where its size is not known in advance, so
+    neither the entry sizes nor the archive size are limited and the memory use does not depend on them.
+
+    Args:
+        fileobj: Binary output
+        entries: (archive name, file path or text blocks)
+        compression: Key of ZIP_COMPRESSION
+    """
+    method, level = ZIP_COMPRESSION[compression]
+    # Entries opened by name take the method and level of the archive
+    with zipfile.ZipFile(fileobj, "w", method, compresslevel=level) as zipf:
+        for arcname, source in entries:
+            if isinstance(source, str):
+                zipf.write(source, arcname)
+            else:
+                with zipf.open(arcname, "w", force_zip64=True) as dest:
+                    for block in source:
+                        dest.write(block.encode('utf-8'))
+
+
+class _QueueWriter(io.RawIOBase):
+    """Unseekable binary output handing CHUNK_SIZE chunks to a bounded queue"""
+
+    def __init__(self, chunks: queue.Queue, stop: threading.Event):
+        super().__init__()
+        self._chunks = chunks
+        self._stop = stop
+        self._buffer = bytearray()
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._position
+
+    def write(self, data) -> int:
+        self._buffer += data
+        self._position += len(data)
+        if len(self._buffer) >= CHUNK_SIZE:
+            self.flush_chunk()
+        return len(data)
+
+    def flush_chunk(self):
+        if not self._buffer:
+            return
+        chunk, self._buffer = bytes(self._buffer), bytearray()
+        while True:
+            if self._stop.is_set():
+                raise OSError("下载已中断")
+            try:
+                self._chunks.put(chunk, timeout=1)
+                return
+            except queue.Full:
+                continue
+
+
+async def stream_report_zip(save_dir: str, compression: str = "fast", text: bool = True) -> AsyncIterator[bytes]:
+    """
+    Build the report archive of a job while it is downloaded
+
+    The archive is written by a thread into a bounded queue, nothing is stored on disk.
+
+    Args:
+        save_dir: Job folder
+        compression: Key of ZIP_COMPRESSION
+        text: Add the text reports generated from the columnar results
+
+    Returns:
+        Async iterator of archive chunks
+    """
+    chunks: queue.Queue = queue.Queue(maxsize=QUEUE_CHUNKS)
+    stop = threading.Event()
+    done = object()
+    errors: List[BaseException] = []
+
+    def produce():
+        writer = _QueueWriter(chunks, stop)
+        try:
+            write_report_zip(writer, report_entries(save_dir, text), compression)
+            writer.flush_chunk()
+        except BaseException as e:
+            errors.append(e)
+        finally:
+            while not stop.is_set():
+                try:
+                    chunks.put(done, timeout=1)
+                    break
+                except queue.Full:
+                    continue
+
+    thread = threading.Thread(target=produce, name="report-zip", daemon=True)
+    thread.start()
+    try:
+        while True:
+            chunk = await asyncio.to_thread(chunks.get)
+            if chunk is done:
+                break
+            yield chunk
+        if errors:
+            raise errors[0]
+    finally:
+        # Client gone or archive finished: let the thread leave its blocking put, and a pending get return
+        stop.set()
+        try:
+            chunks.put_nowait(done)
+        except queue.Full:
+            pass
+
+
+def save_report_zip(save_dir: str, compression: str = "fast", text: bool = True) -> str:
+    """
+    Write the report archive of a job into the job folder
+
+    Args:
+        save_dir: Job folder
+        compression: Key of ZIP_COMPRESSION
+        text: Add the text reports generated from the columnar results
+
+    Returns:
+        Path of the archive
+    """
+    zip_path = os.path.join(save_dir, REPORT_ZIP)
+    with open(zip_path + ".tmp", "wb") as f:
+        write_report_zip(f, report_entries(save_dir, text), compression)
+    os.replace(zip_path + ".tmp", zip_path)
+    return zip_path
@@ -0,0 +1,215 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+import uuid
+from typing import Any, Dict, Iterable, List, Optional
+
+from configs.app_config import app_config
+
+# Entry metadata file, kept inside every cache entry and never materialized
+META_FILE = ".cache_meta.json"
+
+
+def _normalize_coords(data: str) -> List[List[float]]:
+    return [[float(x) for x in p.split()] for p in data.split('|')]
+
+
+def link_tree(src: str, dst: str, exclude: Iterable[str] = ()):
+    """
+    Recreate the tree of src under dst with hard links, falling back to copies across file systems
+
+    Args:
+        src: Source folder
+        dst: Destination folder, created if missing
+        exclude: File or folder names skipped at any depth
+    """
+    exclude = set(exclude)
+    for root, dirs, files in os.walk(src):
+        dirs[:] = [d for d in dirs if d not in exclude]
+        target_root = os.path.join(dst, os.path.relpath(root, src))
+        os.makedirs(target_root, exist_ok=True)
+        for name in files:
+            if name in exclude:
+                continue
+            source = os.path.join(root, name)
+            target = os.path.join(target_root, name)
+            if os.path.exists(target):
+                os.remove(target)
+            try:
+                os.link(source, target)
+            except OSError:
+                shutil.copy2(source, target)
+
+
+def _tree_size(path: str) -> int:
+    size = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            size += os.path.getsize(os.path.join(root, name))
+    return size
+
+
+class ResultCache:
+    """
+    Content-addressed store of simulation results
+
+    Entries live under <root>/<kind>/<key[:2]>/<key> where kind is "satellite" (the result folder of
+    one satellite) or "job" (the whole save_dir of a finished simulation). Files are shared with the
+    simulation folders through hard links, so cached files must never be modified in place.
+    """
+
+    def __init__(self, root: str, max_bytes: int):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def satellite_key(item: Dict[str, Any], simu_paras: Dict[str, Any]) -> str:
+        """
+        Hash of everything that determines the result folder of one satellite
+
+        Args:
+            item: Satellite and sensor parameters (tle1, tle2, sensor_type, sensor_para)
+            simu_paras: Simulation request data
+
+        Returns:
+            Hex digest
+        """
+        inputs = {
+            "tle1": " ".join(item['tle1'].split()),
+            "tle2": " ".join(item['tle2'].split()),
+            "sensor_type": int(item['sensor_type']),
+            "sensor_value": [float(x) for x in item['sensor_para']],
+            "start_time": simu_paras['start_time'],
+            "end_time": simu_paras['end_time'],
+            "interval": float(simu_paras['interval']),
+            "point": _normalize_coords(simu_paras['point_data']),
+            "line": _normalize_coords(simu_paras['line_data']),
+            "area": _normalize_coords(simu_paras['area_data']),
+            "algorithm_type": int(simu_paras['algorithm_type']),
+        }
+        return hashlib.sha256(json.dumps(inputs, sort_keys=True).encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def job_key(level: int, payload: str, satellite_keys: Iterable[str], skipped: Iterable[str] = ()) -> str:
+        """
+        Hash of a whole simulation: its satellites' keys plus what shapes the report
+
+        Args:
+            level: Simulation level, 0 - single satellite, 1 - constellation
+            payload: Satellite or constellation name (names the visual folder)
+            satellite_keys: satellite_key of every simulated satellite
+            skipped: IDs of satellites left out of the simulation (eg: SAR sensors)
+
+        Returns:
+            Hex digest
+        """
+        inputs = {"level": level, "payload": payload, "satellites": sorted(satellite_keys), "skipped": sorted(skipped)}
+        return hashlib.sha256(json.dumps(inputs, sort_keys=True).encode('utf-8')).hexdigest()
+
+    def _entry(self, kind: str, key: str) -> str:
+        return os.path.join(self.root, kind, key[:2], key)
+
+    def load(self, kind: str, key: str, dest: str) -> Optional[Dict[str, Any]]:
+        """
+        Materialize a cache entry into dest
+
+        Args:
+            kind: "satellite" or "job"
+            key: Entry key
+            dest: Folder receiving the cached files
+
+        Returns:
+            Metadata stored with the entry, None on a miss
+        """
+        entry = self._entry(kind, key)
+        meta_path = os.path.join(entry, META_FILE)
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            link_tree(entry, dest, exclude=(META_FILE,))
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logging.warning(f"读取仿真结果缓存 {kind}/{key} 失败: {e}")
+            return None
+        # Last use time drives eviction
+        os.utime(meta_path)
+        return meta
+
+    def store(self, kind: str, key: str, src: str, meta: Dict[str, Any] = None, exclude: Iterable[str] = ()):
+        """
+        Add a folder to the cache, then evict least recently used entries beyond max_bytes
+
+        Args:
+            kind: "satellite" or "job"
+            key: Entry key
+            src: Folder holding the results
+            meta: Extra metadata returned by load
+            exclude: File or folder names left out of the entry
+        """
+        entry = self._entry(kind, key)
+        if os.path.exists(entry):
+            return
+        tmp = os.path.join(self.root, "tmp", uuid.uuid4().hex)
+        try:
+            link_tree(src, tmp, exclude=exclude)
+            with open(os.path.join(tmp, META_FILE), "w", encoding="utf-8") as f:
+                json.dump({**(meta or {}), "size": _tree_size(tmp), "created": time.time()}, f, ensure_ascii=False)
+            os.makedirs(os.path.dirname(entry), exist_ok=True)
+            os.rename(tmp, entry)
+        except OSError as e:
+            # Another run stored the same key first, or the disk is full
+            logging.warning(f"写入仿真结果缓存 {kind}/{key} 失败: {e}")
+            shutil.rmtree(tmp, ignore_errors=True)
+            return
+        self.evict()
+
+    def evict(self):
+        """Remove least recently used entries until the cache fits in max_bytes"""
+        with self._lock:
+            entries = []
+            for kind in ("satellite", "job"):
+                kind_dir = os.path.join(self.root, kind)
+                if not os.path.isdir(kind_dir):
+                    continue
+                for prefix in os.listdir(kind_dir):
+                    for key in os.listdir(os.path.join(kind_dir, prefix)):
+                        meta_path = os.path.join(kind_dir, prefix, key, META_FILE)
+                        try:
+                            with open(meta_path, "r", encoding="utf-8") as f:
+                                size = json.load(f).get("size", 0)
+                            entries.append((os.path.getmtime(meta_path), size, os.path.join(kind_dir, prefix, key)))
+                        except (OSError, ValueError):
+                            continue
+
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                shutil.rmtree(path, ignore_errors=True)
+                total -= size
+                logging.info(f"仿真结果缓存已淘汰: {path}")
+
+
+_result_cache = None
+
+
+def get_result_cache() -> Optional[ResultCache]:
+    """
+    Shared cache under OUTPUT_DIR/result_cache
+
+    Returns:
+        ResultCache instance, None when RESULT_CACHE_MAX_SIZE is 0
+    """
+    global _result_cache
+    if app_config.RESULT_CACHE_MAX_SIZE <= 0:
+        return None
+    if _result_cache is None:
+        _result_cache = ResultCache(os.path.join(app_config.OUTPUT_DIR, "result_cache"),
+                                    app_config.RESULT_CACHE_MAX_SIZE * 1024 * 1024)
+    return _result_cache
@@ -0,0 +1,217 @@
+import logging
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+from clickhouse_driver import Client
+
+from configs.app_config import app_config
+from libs.columnar import load_satellite_columns, access_periods
+from libs.intervals import constellation_summary
+from libs.propagation import parse_simulation_time
+
+# Result tables of the simulations, partitioned by month of insert so the number of partitions stays bounded; the
+# job folder leads the sorting key so that the rows of a job are read or deleted together.
+# Times are DateTime64(3) (raw milliseconds on insert): Delta for the sorted pass bounds, DoubleDelta for the
+# regular ephemeris steps; Gorilla for the slowly varying coordinates and durations.
+# target_type: 1 - point, 2 - line, 3 - area; target: "lon lat|lon lat|..." like the simulation request
+RESULT_TABLES = {
+    "sim_access_intervals": """
+        CREATE TABLE IF NOT EXISTS sim_access_intervals
+        (
+            job_id         String,
+            simulation_id  String,
+            level          UInt8,
+            satellite_id   String,
+            satellite_name LowCardinality(String),
+            target_type    UInt8,
+            target         String,
+            start          DateTime64(3, 'UTC') CODEC(Delta, ZSTD(1)),
+            stop           DateTime64(3, 'UTC') CODEC(Delta, ZSTD(1)),
+            duration       Float64 CODEC(Gorilla, ZSTD(1)),
+            percent        Float32 CODEC(Gorilla, ZSTD(1)),
+            created_at     DateTime DEFAULT now()
+        )
+        ENGINE = MergeTree
+        PARTITION BY toYYYYMM(created_at)
+        ORDER BY (job_id, satellite_id, target_type, start)
+    """,
+    "sim_ephemeris": """
+        CREATE TABLE IF NOT EXISTS sim_ephemeris
+        (
+            job_id         String,
+            simulation_id  String,
+            satellite_id   String,
+            satellite_name LowCardinality(String),
+            time           DateTime64(3, 'UTC') CODEC(DoubleDelta, ZSTD(1)),
+            lon            Float32 CODEC(Gorilla, ZSTD(1)),
+            lat            Float32 CODEC(Gorilla, ZSTD(1)),
+            alt            Float32 CODEC(Gorilla, ZSTD(1)),
+            created_at     DateTime DEFAULT now()
+        )
+        ENGINE = MergeTree
+        PARTITION BY toYYYYMM(created_at)
+        ORDER BY (job_id, satellite_id, time)
+    """,
+    "sim_coverage": """
+        CREATE TABLE IF NOT EXISTS sim_coverage
+        (
+            job_id            String,
+            simulation_id     String,
+            level             UInt8,
+            target_type       UInt8,
+            target            String,
+            window_start      DateTime64(3, 'UTC') CODEC(Delta, ZSTD(1)),
+            window_stop       DateTime64(3, 'UTC') CODEC(Delta, ZSTD(1)),
+            satellites        UInt32,
+            duration          Float64,
+            covered           Float64,
+            fraction          Float64,
+            gap_count         UInt32,
+            max_gap           Float64,
+            mean_gap          Float64,
+            max_simultaneous  UInt32,
+            mean_simultaneous Float64,
+            created_at        DateTime DEFAULT now()
+        )
+        ENGINE = MergeTree
+        PARTITION BY toYYYYMM(created_at)
+        ORDER BY (job_id, simulation_id, target_type, window_start)
+    """
+}
+
+# Rows sent per INSERT, each insert becomes one part of the month partition
+INSERT_BATCH_ROWS = 1 << 20
+
+# Client of the report process, the tables are created on its first use
+_client = None
+
+
+def get_result_client() -> Client:
+    global _client
+    if _client is None:
+        client = Client(
+            host=app_config.CLICKHOUSE_HOST,
+            port=app_config.CLICKHOUSE_PORT_NATIVE,
+            user=app_config.CLICKHOUSE_USER,
+            password=app_config.CLICKHOUSE_PASSWORD,
+            database=app_config.CLICKHOUSE_DATABASE
+        )
+        for create_table_sql in RESULT_TABLES.values():
+            client.execute(create_table_sql)
+        _client = client
+    return _client
+
+
+def format_target(pairs) -> str:
+    """
+    Target geometry in the simulation request format
+
+    Args:
+        pairs: (lat, lon) pairs, or one (lat, lon) point
+
+    Returns:
+        "lon lat|lon lat|...", eg: "100.5 30.5"
+    """
+    if pairs and not isinstance(pairs[0], (list, tuple)):
+        pairs = [pairs]
+    return '|'.join(f"{float(lon):g} {float(lat):g}" for lat, lon in pairs)
+
+
+def _milliseconds(times) -> np.ndarray:
+    return np.round(np.asarray(times, dtype=np.float64) * 1000).astype(np.int64)
+
+
+def _column(values, count: int) -> np.ndarray:
+    """Column of rows added to an insert: arrays as they are, a value repeated over the rows"""
+    if isinstance(values, np.ndarray):
+        return values
+    return np.full(count, values, dtype=object if isinstance(values, str) else None)
+
+
+class _Inserter:
+    """Columnar rows of one table, sent as numpy columns in INSERT_BATCH_ROWS batches"""
+
+    def __init__(self, client: Client, table: str, names: List[str]):
+        self._client = client
+        self._query = f"INSERT INTO {table} ({', '.join(names)}) VALUES"
+        self._columns = [[] for _ in names]
+        self.rows = 0
+        self._pending = 0
+
+    def add(self, *columns):
+        """Add rows: arrays of one value per row, or single values shared by the rows (one row when all are)"""
+        count = next((len(values) for values in columns if isinstance(values, np.ndarray)), 1)
+        for column, values in zip(self._columns, columns):
+            column.append(_column(values, count))
+        self._pending += count
+        if self._pending >= INSERT_BATCH_ROWS:
+            self.flush()
+
+    def flush(self):
+        if self._pending:
+            self._client.execute(self._query, [np.concatenate(column) for column in self._columns], columnar=True,
+                                 settings={'use_numpy': True})
+            self.rows += self._pending
+            self._columns = [[] for _ in self._columns]
+            self._pending = 0
+
+
+def store_results(job_id: str, simulation_id: str, level: int, satellites: List[Tuple[str, str, str]],
+                  targets: Dict[str, Any], start_time: str, end_time: str, ephemeris: bool = False) -> Dict[str, int]:
+    """
+    Insert the results of a simulation into the result tables, replacing the ones of a previous insert of the job
+
+    Args:
+        job_id: Job folder name
+        simulation_id: Satellite ID (level 0) or constellation ID (level 1) of the simulation
+        level: Simulation level, 0 - single satellite 1 - constellation
+        satellites: (satellite ID, name, result folder) of every satellite
+        targets: Targets of the simulation: {'point': (lat, lon), 'line': [(lat, lon), ...], 'polygon': [(lat, lon), ...]}
+        start_time: Simulation start, eg: 20130912032513
+        end_time: Simulation end
+        ephemeris: Also insert the positions of every time step
+
+    Returns:
+        Number of rows inserted per table
+    """
+    client = get_result_client()
+    # A job stored again (report rebuilt) replaces its rows; sim_coverage always has rows for a stored job
+    if client.execute("SELECT count() FROM sim_coverage WHERE job_id = %(job_id)s", {"job_id": job_id})[0][0]:
+        for table in RESULT_TABLES:
+            client.execute(f"DELETE FROM {table} WHERE job_id = %(job_id)s", {"job_id": job_id})
+
+    target_names = {1: format_target(targets['point']), 2: format_target(targets['line']), 3: format_target(targets['polygon'])}
+    intervals = _Inserter(client, "sim_access_intervals", ["job_id", "simulation_id", "level", "satellite_id", "satellite_name",
+                                                           "target_type", "target", "start", "stop", "duration", "percent"])
+    positions = _Inserter(client, "sim_ephemeris", ["job_id", "simulation_id", "satellite_id", "satellite_name",
+                                                    "time", "lon", "lat", "alt"])
+    satellite_periods = {target_type: [] for target_type in target_names}
+    for satellite_id, name, satellite_dir in satellites:
+        columns = load_satellite_columns(satellite_dir)
+        for target_type, target in target_names.items():
+            starts, stops, percents = access_periods(columns, target_type)
+            satellite_periods[target_type].append((starts, stops))
+            if percents is None:
+                percents = np.full(len(starts), np.nan)
+            intervals.add(job_id, simulation_id, level, satellite_id, name, target_type, target,
+                          _milliseconds(starts), _milliseconds(stops), np.asarray(stops - starts, dtype=np.float64),
+                          np.asarray(percents, dtype=np.float64))
+        if ephemeris:
+            positions.add(job_id, simulation_id, satellite_id, name, _milliseconds(columns['time']),
+                          columns['lon'], columns['lat'], columns['alt'])
+    intervals.flush()
+    positions.flush()
+
+    window_start, window_stop = parse_simulation_time(start_time), parse_simulation_time(end_time)
+    coverage = _Inserter(client, "sim_coverage", ["job_id", "simulation_id", "level", "target_type", "target", "window_start",
+                                                  "window_stop", "satellites", "duration", "covered", "fraction", "gap_count",
+                                                  "max_gap", "mean_gap", "max_simultaneous", "mean_simultaneous"])
+    for target_type, target in target_names.items():
+        summary = constellation_summary(satellite_periods[target_type], window_start, window_stop)
+        coverage.add(job_id, simulation_id, level, target_type, target, int(window_start) * 1000, int(window_stop) * 1000,
+                     len(satellites), summary['duration'], summary['covered'], summary['fraction'], len(summary['gaps'][0]),
+                     summary['max_gap'], summary['mean_gap'], summary['max_simultaneous'], summary['mean_simultaneous'])
+    coverage.flush()
+
+    logging.info(f"作业 {job_id} 的仿真结果已写入数据库：{intervals.rows} 条可见时段，{positions.rows} 条星历，{coverage.rows} 条覆盖统计")
+    return {"sim_access_intervals": intervals.rows, "sim_ephemeris": positions.rows, "sim_coverage": coverage.rows}
@@ -0,0 +1,202 @@
+import asyncio
+import logging
+import select
+import threading
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+import paramiko
+
+from configs.app_config import app_config
+
+# Coroutine receiving every line the remote command writes to stdout
+LineCallback = Callable[[str], Awaitable[None]]
+
+
+class SSHConnectionPool:
+    """
+    Keep-alive SSH connections to one host
+
+    Connections are reused across commands instead of paying TCP setup, key exchange and password
+    authentication for every STK run. Each command runs on its own channel in a worker thread, so the
+    event loop stays free while the remote process works, and its stdout is forwarded line by line.
+    """
+
+    def __init__(self, host: str, username: str, password: str, port: int = 22, size: int = 4, keepalive: int = 30):
+        self.host = host
+        self.username = username
+        self.password = password
+        self.port = port
+        self.keepalive = keepalive
+        self._idle: List[paramiko.SSHClient] = []
+        self._lock = threading.Lock()
+        self._slots = asyncio.Semaphore(max(1, size))
+
+    def _connect(self) -> paramiko.SSHClient:
+        client = paramiko.SSHClient()
+        client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+        client.connect(
+            hostname=self.host,
+            port=self.port,
+            username=self.username,
+            password=self.password,
+            timeout=30
+        )
+        # Keepalive packets stop firewalls and NAT from dropping idle pooled connections
+        client.get_transport().set_keepalive(self.keepalive)
+        logging.info(f"已建立到 {self.host} 的SSH连接")
+        return client
+
+    @staticmethod
+    def _healthy(client: paramiko.SSHClient) -> bool:
+        transport = client.get_transport()
+        if transport is None or not transport.is_active():
+            return False
+        try:
+            transport.send_ignore()
+        except Exception:
+            return False
+        return True
+
+    def _acquire(self) -> paramiko.SSHClient:
+        with self._lock:
+            while self._idle:
+                client = self._idle.pop()
+                if self._healthy(client):
+                    return client
+                client.close()
+        return self._connect()
+
+    def _release(self, client: paramiko.SSHClient):
+        if self._healthy(client):
+            with self._lock:
+                self._idle.append(client)
+        else:
+            client.close()
+
+    @staticmethod
+    def _exec(channel: paramiko.Channel, command: str, emit: Callable[[str], None],
+              stop: threading.Event = None) -> Tuple[int, str, str]:
+        channel.exec_command(command)
+        stdout, stderr = [], []
+        partial = b''
+        while True:
+            select.select([channel], [], [], 1.0)
+            if stop is not None and stop.is_set():
+                # Cancelled, closing the channel abandons the command
+                return -1, b''.join(stdout).decode('utf-8', errors='replace'), 'cancelled'
+            if channel.recv_ready():
+                chunk = channel.recv(65536)
+                stdout.append(chunk)
+                *lines, partial = (partial + chunk).split(b'\n')
+                for line in lines:
+                    emit(line.decode('utf-8', errors='replace').rstrip('\r'))
+            if channel.recv_stderr_ready():
+                stderr.append(channel.recv_stderr(65536))
+            if (channel.eof_received or channel.closed) and channel.exit_status_ready() \
+                    and not channel.recv_ready() and not channel.recv_stderr_ready():
+                break
+        if partial:
+            emit(partial.decode('utf-8', errors='replace').rstrip('\r'))
+        return channel.recv_exit_status(), b''.join(stdout).decode('utf-8'), b''.join(stderr).decode('utf-8')
+
+    def _run_blocking(self, command: str, emit: Callable[[str], None], stop: threading.Event = None) -> Tuple[int, str, str]:
+        for attempt in range(2):
+            client = self._acquire()
+            try:
+                channel = client.get_transport().open_session()
+            except (paramiko.SSHException, EOFError, OSError) as e:
+                # The pooled connection died since its health check, retry once on a fresh one
+                client.close()
+                if attempt:
+                    raise
+                logging.warning(f"到 {self.host} 的SSH连接已失效，正在重新连接: {e}")
+                continue
+            try:
+                result = self._exec(channel, command, emit, stop)
+            except Exception:
+                client.close()
+                raise
+            finally:
+                channel.close()
+            self._release(client)
+            return result
+
+    async def run(self, command: str, on_line: Optional[LineCallback] = None,
+                  kill_command: Optional[str] = None) -> Tuple[int, str, str]:
+        """
+        Execute a command on the host without blocking the event loop
+
+        At most `size` commands run at the same time, later ones wait for a free connection.
+        When the calling task is cancelled the channel is closed and kill_command, if given, is
+        executed so that the remote process does not keep running.
+
+        Args:
+            command: Command to execute on the remote server
+            on_line: Optional coroutine called with every stdout line while the command runs
+            kill_command: Optional command terminating the remote process on cancellation
+
+        Returns:
+            Tuple of (returncode, stdout, stderr)
+        """
+        async with self._slots:
+            loop = asyncio.get_running_loop()
+            lines = asyncio.Queue()
+            stop = threading.Event()
+
+            def work():
+                try:
+                    return self._run_blocking(command, lambda line: loop.call_soon_threadsafe(lines.put_nowait, line), stop)
+                finally:
+                    loop.call_soon_threadsafe(lines.put_nowait, None)
+
+            future = asyncio.ensure_future(asyncio.to_thread(work))
+            try:
+                while (line := await lines.get()) is not None:
+                    if on_line is not None:
+                        try:
+                            await on_line(line)
+                        except Exception as e:
+                            logging.warning(f"处理 {self.host} 的SSH输出失败: {e}")
+                return await future
+            except asyncio.CancelledError:
+                stop.set()
+                if kill_command:
+                    try:
+                        await asyncio.wait_for(asyncio.to_thread(self._run_blocking, kill_command, lambda line: None), 30)
+                        logging.info(f"已终止 {self.host} 上被取消的远程命令")
+                    except Exception as e:
+                        logging.warning(f"终止 {self.host} 上的远程命令失败: {e}")
+                raise
+
+    def close(self):
+        """Close the idle connections"""
+        with self._lock:
+            for client in self._idle:
+                client.close()
+            self._idle.clear()
+
+
+_pools: Dict[Tuple[str, int, str], SSHConnectionPool] = {}
+
+
+def get_ssh_pool(host: str = None, username: str = None, password: str = None, port: int = 22) -> SSHConnectionPool:
+    """
+    Shared connection pool of one SSH host, the configured SSH_HOST by default
+
+    Args:
+        host: Host name or address
+        username: SSH username
+        password: SSH password
+        port: SSH port
+
+    Returns:
+        SSHConnectionPool instance
+    """
+    host = host or app_config.SSH_HOST
+    username = username or app_config.SSH_USER
+    password = password or app_config.SSH_PASSWORD
+    key = (host, port, username)
+    if key not in _pools:
+        _pools[key] = SSHConnectionPool(host, username, password, port,
+                                        size=app_config.SSH_POOL_SIZE, keepalive=app_config.SSH_KEEPALIVE)
+    return _pools[key]
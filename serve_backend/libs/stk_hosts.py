@@ -0,0 +1,190 @@
+import asyncio
+import json
+import logging
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, List, TypeVar
+
+from configs.app_config import app_config
+
+T = TypeVar("T")
+
+# A host whose run failed is skipped for this long (s) while other hosts are available
+HOST_COOLDOWN = 60
+
+# Window (s) over which the recent throughput of a host is measured
+THROUGHPUT_WINDOW = 600
+
+
+class StkHostError(RuntimeError):
+    """The STK host could not run the job at all, the dispatcher retries it elsewhere"""
+
+
+class StkHost:
+    """One machine able to run stk_simulation.py, locally or over SSH"""
+
+    def __init__(self, name: str, python_exe: str, script_path: str, local: bool = False, host: str = "",
+                 port: int = 22, user: str = "", password: str = "", replace_base: str = "", max_jobs: int = 2,
+                 windows: bool = True):
+        self.name = name
+        self.python_exe = python_exe
+        self.script_path = script_path
+        self.local = local
+        self.host = host
+        self.port = port
+        self.user = user
+        self.password = password
+        self.replace_base = replace_base
+        self.max_jobs = max(1, max_jobs)
+        self.windows = windows
+        self.running = 0
+        self.queued = 0
+        self.completed = 0
+        self.failed = 0
+        self.busy_seconds = 0.0
+        self.last_error = None
+        self.unavailable_until = 0.0
+        self._slots = asyncio.Semaphore(self.max_jobs)
+        self._recent = deque()
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "StkHost":
+        """
+        Build a host from one STK_HOSTS entry
+
+        Args:
+            data: Dict with name, python_exe, script_path and either local: true or host, user, password
+                  and replace_base; port, max_jobs and windows (remote OS, default true) are optional
+
+        Returns:
+            StkHost instance
+        """
+        return cls(
+            name=data.get('name') or data.get('host') or 'local',
+            python_exe=data['python_exe'],
+            script_path=data['script_path'],
+            local=bool(data.get('local', False)),
+            host=data.get('host', ''),
+            port=int(data.get('port', 22)),
+            user=data.get('user', ''),
+            password=data.get('password', ''),
+            replace_base=data.get('replace_base', ''),
+            max_jobs=int(data.get('max_jobs', app_config.STK_HOST_MAX_JOBS)),
+            windows=bool(data.get('windows', True))
+        )
+
+    @property
+    def available(self) -> bool:
+        return time.time() >= self.unavailable_until
+
+    def load(self) -> float:
+        return (self.running + self.queued) / self.max_jobs
+
+    def throughput(self) -> float:
+        """Satellites simulated per minute over the last THROUGHPUT_WINDOW seconds"""
+        horizon = time.time() - THROUGHPUT_WINDOW
+        while self._recent and self._recent[0][0] < horizon:
+            self._recent.popleft()
+        return sum(count for _, count in self._recent) / (THROUGHPUT_WINDOW / 60)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "host": "localhost" if self.local else self.host,
+            "max_jobs": self.max_jobs,
+            "running": self.running,
+            "queued": self.queued,
+            "completed": self.completed,
+            "failed": self.failed,
+            "busy_seconds": round(self.busy_seconds, 3),
+            "throughput": round(self.throughput(), 3),
+            "available": self.available,
+            "last_error": self.last_error
+        }
+
+
+class StkHostRegistry:
+    """
+    Execution hosts of stk_simulation.py with least-loaded dispatch
+
+    Every run is queued on the available host with the lowest (running + queued) / max_jobs, waits
+    there for one of its max_jobs slots, and is retried on another host when the host fails.
+    """
+
+    def __init__(self, hosts: List[StkHost]):
+        self.hosts = hosts
+
+    def _pick(self, tried: List[StkHost]) -> StkHost:
+        candidates = [host for host in self.hosts if host not in tried] or self.hosts
+        available = [host for host in candidates if host.available] or candidates
+        return min(available, key=lambda host: (host.load(), host.running))
+
+    async def dispatch(self, run: Callable[[StkHost], Awaitable[T]], satellites: int = 1) -> T:
+        """
+        Execute run on the least loaded host, moving to another host when it raises StkHostError
+
+        Args:
+            run: Coroutine function performing the STK run on the given host
+            satellites: Number of satellites of the run, for the throughput statistics
+
+        Returns:
+            Result of run
+        """
+        tried = []
+        while True:
+            host = self._pick(tried)
+            tried.append(host)
+            host.queued += 1
+            try:
+                await host._slots.acquire()
+            finally:
+                host.queued -= 1
+            host.running += 1
+            start = time.time()
+            try:
+                result = await run(host)
+            except StkHostError as e:
+                host.failed += 1
+                host.last_error = str(e)
+                host.unavailable_until = time.time() + HOST_COOLDOWN
+                if len(tried) >= len(self.hosts):
+                    raise
+                logging.warning(f"STK执行主机 {host.name} 执行失败，转交其他主机重试: {e}")
+                continue
+            finally:
+                host.running -= 1
+                host.busy_seconds += time.time() - start
+                host._slots.release()
+            host.completed += 1
+            host._recent.append((time.time(), satellites))
+            return result
+
+    def stats(self) -> List[Dict[str, Any]]:
+        return [host.stats() for host in self.hosts]
+
+
+_registry = None
+
+
+def default_hosts() -> List[StkHost]:
+    """The single STK host described by the STK_LOCAL / SSH_* settings"""
+    if app_config.STK_LOCAL:
+        return [StkHost("local", app_config.STK_PYTHON_LOCAL_EXE, app_config.STK_SCRIPT_LOCAL_PATH, local=True,
+                        max_jobs=app_config.STK_HOST_MAX_JOBS)]
+    return [StkHost(app_config.SSH_HOST, app_config.STK_PYTHON_REMOTE_EXE, app_config.STK_SCRIPT_REMOTE_PATH,
+                    host=app_config.SSH_HOST, user=app_config.SSH_USER, password=app_config.SSH_PASSWORD,
+                    replace_base=app_config.REPLACE_BASE, max_jobs=app_config.STK_HOST_MAX_JOBS)]
+
+
+def get_stk_registry() -> StkHostRegistry:
+    """
+    Shared registry of the STK execution hosts (STK_HOSTS, or the single STK_LOCAL / SSH_* host)
+
+    Returns:
+        StkHostRegistry instance
+    """
+    global _registry
+    if _registry is None:
+        hosts = [StkHost.from_dict(item) for item in json.loads(app_config.STK_HOSTS)] if app_config.STK_HOSTS else []
+        _registry = StkHostRegistry(hosts or default_hosts())
+    return _registry
@@ -0,0 +1,61 @@
+import asyncio
+import json
+import logging
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+
+def parse_address(address: str) -> tuple[str, int]:
+    """
+    Split a "host:port" worker address
+    
+    Args:
+        address: Worker address, eg: 127.0.0.1:9530
+        
+    Returns:
+        Tuple of (host, port)
+    """
+    host, port = address.rsplit(':', 1)
+    return host, int(port)
+
+
+async def submit_job(address: str, job: Dict[str, Any],
+                     on_event: Optional[Callable[[Dict[str, Any]], Awaitable[None]]] = None) -> Dict[str, Any]:
+    """
+    Submit a simulation job to the warm STK worker daemon (stk_scripts/stk_worker.py)
+    
+    Args:
+        address: Worker address "host:port"
+        job: Job parameters: start_time, end_time, step, point, line, area and satellites (each with save_path)
+        on_event: Optional coroutine called with every event the worker sends
+        
+    Returns:
+        Dict containing "status" (satellite ID -> success) and the worker's "finished" event with per-job timings
+    """
+    host, port = parse_address(address)
+    # Job events carry per-satellite data, allow lines larger than the asyncio default of 64 KiB
+    reader, writer = await asyncio.open_connection(host, port, limit=16 * 1024 * 1024)
+    try:
+        writer.write((json.dumps({'op': 'run', 'job': job}, ensure_ascii=False) + '\n').encode('utf-8'))
+        await writer.drain()
+        
+        status = {}
+        while True:
+            line = await reader.readline()
+            if not line:
+                raise ConnectionError(f"STK worker {address} 在任务结束前关闭了连接")
+            event = json.loads(line)
+            if event['event'] == 'satellite':
+                status[event['ID']] = event['status'] == 'done'
+            if on_event is not None:
+                await on_event(event)
+            if event['event'] == 'error':
+                raise RuntimeError(f"STK worker {address} 拒绝了任务: {event.get('error')}")
+            if event['event'] == 'finished':
+                logging.info(f"STK worker 任务 {event['job_id']} 完成，耗时: {event['timings']}")
+                return {'status': status, 'finished': event}
+    finally:
+        writer.close()
+        try:
+            await writer.wait_closed()
+        except OSError:
+            pass
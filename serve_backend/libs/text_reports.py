@@ -0,0 +1,130 @@
+import os
+from typing import Iterator, Tuple
+
+import numpy as np
+
+from libs.propagation import format_times
+from libs.columnar import load_satellite_columns, access_periods
+
+# Rows formatted at once by the text exports, bounds their memory on long windows
+TEXT_BLOCK = 65536
+
+# Text report headers, identical to the ones the STK engine used to write
+POS_LLA_HEADER = "时间                         经度(°)         纬度(°)        高度(km)\n"
+SENSOR_PROJECTION_HEADER = "  lat(deg)       lon(deg)\n"
+ACCESS_HEADERS = {
+    1: ("/point.txt", "start|          |点位可见时段：\n",
+        "                  开始时间（UTC）             结束时间（UTC）    持续时间（s）\n"),
+    2: ("/line.txt", "start|          |线可见时段：\n",
+        "                  开始时间（UTC）             结束时间（UTC）    持续时间（s）\n"),
+    3: ("/area.txt", "start|          |面可见时段：\n",
+        "                  开始时间（UTC）             结束时间（UTC）    持续时间（s）    覆盖百分比（%）\n"),
+}
+
+
+def pos_lla_text(times: np.ndarray, lon: np.ndarray, lat: np.ndarray, alt: np.ndarray) -> Iterator[str]:
+    """
+    Text of posLLA.txt, the export of the satellite positions, in blocks of TEXT_BLOCK rows
+
+    Args:
+        times: Epoch seconds (timesteps,)
+        lon: Longitude in degrees (timesteps,)
+        lat: Latitude in degrees (timesteps,)
+        alt: Altitude in km (timesteps,)
+    """
+    yield POS_LLA_HEADER
+    for i in range(0, len(times), TEXT_BLOCK):
+        block = slice(i, i + TEXT_BLOCK)
+        yield ''.join(f"{t}     {x:.6f}     {y:.6f}     {z:.6f}\n" for t, x, y, z in
+                      zip(format_times(times[block]), lon[block].tolist(), lat[block].tolist(), alt[block].tolist()))
+
+
+def sensor_projection_text(lats: np.ndarray = None, lons: np.ndarray = None) -> Iterator[str]:
+    """
+    Text of sensorProjection.txt, one block of vertices per timestamp, in blocks of TEXT_BLOCK rows
+
+    Args:
+        lats: Footprint vertex latitudes, (timesteps, vertices) or concatenated, None for the header only
+        lons: Footprint vertex longitudes, (timesteps, vertices) or concatenated, None for the header only
+    """
+    yield SENSOR_PROJECTION_HEADER
+    if lats is None:
+        return
+    lats, lons = lats.ravel(), lons.ravel()
+    for i in range(0, len(lats), TEXT_BLOCK):
+        block = slice(i, i + TEXT_BLOCK)
+        yield ''.join(f"      {y:.3f}      {x:.3f}\n" for y, x in zip(lats[block].tolist(), lons[block].tolist()))
+
+
+def access_report_text(target_type: int, starts: np.ndarray = (), stops: np.ndarray = (), percents: np.ndarray = None) -> Iterator[str]:
+    """
+    Text of point.txt / line.txt / area.txt with the visible periods of one target
+
+    Args:
+        target_type: 1 - point, 2 - line, 3 - area
+        starts: Period start times, epoch seconds
+        stops: Period stop times, epoch seconds
+        percents: Area coverage percentage of each period (area only)
+    """
+    _, header, sec_header = ACCESS_HEADERS[target_type]
+    starts = np.asarray(starts, dtype=np.float64)
+    stops = np.asarray(stops, dtype=np.float64)
+    yield header
+    yield sec_header
+    if target_type == 3:
+        for start, stop, duration, percent in zip(format_times(starts), format_times(stops), (stops - starts).tolist(), np.asarray(percents).tolist()):
+            yield f"{start} |  {stop} |  {duration:10.3f} |  {percent:10.2f}%\n"
+    else:
+        for start, stop, duration in zip(format_times(starts), format_times(stops), (stops - starts).tolist()):
+            yield f"{start} |  {stop} |  {duration:6.3f}\n"
+    yield "end"
+
+
+def write_access_report(save_path: str, target_type: int, starts: np.ndarray = (), stops: np.ndarray = (), percents: np.ndarray = None,
+                        file_name: str = None):
+    """
+    Write point.txt / line.txt / area.txt with the visible periods of one target
+
+    Args:
+        save_path: Result folder of the satellite
+        target_type: 1 - point, 2 - line, 3 - area
+        starts: Period start times, epoch seconds
+        stops: Period stop times, epoch seconds
+        percents: Area coverage percentage of each period (area only)
+        file_name: Report file name overriding the default of the target type, eg: /constellation_area.txt
+    """
+    with open(save_path + (file_name or ACCESS_HEADERS[target_type][0]), "w", encoding="utf-8") as f:
+        f.writelines(access_report_text(target_type, starts, stops, percents))
+
+
+def text_reports(satellite_dir: str) -> Iterator[Tuple[str, Iterator[str]]]:
+    """
+    Text reports of a satellite (posLLA.txt, sensorProjection.txt, point.txt, line.txt, area.txt)
+    generated from its columnar results, skipping the ones present as files
+
+    Args:
+        satellite_dir: Result folder of the satellite
+
+    Returns:
+        Iterator of (file name, text blocks)
+    """
+    columns = load_satellite_columns(satellite_dir)
+    if not os.path.exists(satellite_dir + "/posLLA.txt"):
+        yield "posLLA.txt", pos_lla_text(columns['time'], columns['lon'], columns['lat'], columns['alt'])
+    if not os.path.exists(satellite_dir + "/sensorProjection.txt"):
+        yield "sensorProjection.txt", sensor_projection_text(columns['footprint_lat'], columns['footprint_lon'])
+    for target_type, (file_name, _, _) in ACCESS_HEADERS.items():
+        if not os.path.exists(satellite_dir + file_name):
+            yield file_name.lstrip('/'), access_report_text(target_type, *access_periods(columns, target_type))
+
+
+def export_text_reports(satellite_dir: str):
+    """
+    Write the text reports of a satellite from its columnar results, the ones already present are kept
+
+    Args:
+        satellite_dir: Result folder of the satellite
+    """
+    for file_name, text in text_reports(satellite_dir):
+        with open(os.path.join(satellite_dir, file_name), "w", encoding="utf-8") as f:
+            f.writelines(text)
@@ -0,0 +1,100 @@
+import os
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+
+from libs.columnar import allocate_columns, read_columns, load_satellite_columns
+
+# Visualization data of a simulation, one columnar file (see libs.columnar) in the visualization folder,
+# read by visual_backend/visual_bundle.py:
+#   time (float64 epoch seconds): shared time axis, satellite i has its samples at time[:n_i]
+#   position_offsets (int64, satellites + 1): samples of satellite i are [position_offsets[i], position_offsets[i + 1])
+#   lon / lat / alt (float32 deg, deg, km): positions of every satellite, concatenated
+#   footprint_offsets (int64, samples + 1): footprint vertices of sample k are [footprint_offsets[k], footprint_offsets[k + 1])
+#   footprint_lat / footprint_lon (float32 deg): footprint vertices, concatenated
+# and the satellite names and targets (point, line, polygon as lat/lon pairs) in the header attributes
+VISUAL_BUNDLE_FILE = "visual.bin"
+VISUAL_BUNDLE_VERSION = 1
+
+
+def satellite_layout(satellite_dir: str) -> Tuple[int, int]:
+    """
+    Size of one satellite in the visualization bundle, converting legacy text results on first read
+
+    Args:
+        satellite_dir: Result folder of the satellite
+
+    Returns:
+        Tuple of (samples, footprint vertices)
+    """
+    columns = load_satellite_columns(satellite_dir)
+    return len(columns['time']), int(columns['footprint_offsets'][-1])
+
+
+def allocate_visual_bundle(visual_dir: str, satellites: List[Tuple[str, str]], layout: List[Tuple[int, int]],
+                           targets: Dict[str, Any]) -> Tuple[str, List[Tuple[int, int]]]:
+    """
+    Create the visualization bundle of a simulation, filled by write_visual_satellite for every satellite
+
+    The bundle is created under a temporary name, see finish_visual_bundle.
+
+    Args:
+        visual_dir: Visualization folder of the simulation (data_path of the visualization page)
+        satellites: (name, result folder) of every satellite, in display order
+        layout: (samples, footprint vertices) of every satellite, see satellite_layout
+        targets: Targets of the simulation: {'point': (lat, lon), 'line': [(lat, lon), ...], 'polygon': [(lat, lon), ...]}
+
+    Returns:
+        Tuple of the temporary path and the (sample, vertex) offsets of every satellite
+    """
+    counts = np.array([item[0] for item in layout], dtype=np.int64)
+    vertices = np.array([item[1] for item in layout], dtype=np.int64)
+    position_offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+    vertex_offsets = np.concatenate([[0], np.cumsum(vertices)]).astype(np.int64)
+    samples, total_vertices = int(position_offsets[-1]), int(vertex_offsets[-1])
+    # Shared time axis: the one of the satellite with the most samples
+    longest = int(np.argmax(counts)) if len(counts) else -1
+    times = np.array(load_satellite_columns(satellites[longest][1])['time'], dtype=np.float64) if longest >= 0 else np.array([])
+
+    path = os.path.join(visual_dir, VISUAL_BUNDLE_FILE)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    attrs = {"version": VISUAL_BUNDLE_VERSION, "satellites": [name for name, _ in satellites], "targets": targets}
+    allocate_columns(tmp_path, {
+        "time": (np.float64, len(times)),
+        "position_offsets": (np.int64, len(satellites) + 1),
+        "lon": (np.float32, samples),
+        "lat": (np.float32, samples),
+        "alt": (np.float32, samples),
+        "footprint_offsets": (np.int64, samples + 1),
+        "footprint_lat": (np.float32, total_vertices),
+        "footprint_lon": (np.float32, total_vertices)
+    }, attrs)
+    columns = read_columns(tmp_path, writable=True)
+    columns["time"][:] = times
+    columns["position_offsets"][:] = position_offsets
+    return tmp_path, list(zip(position_offsets[:-1].tolist(), vertex_offsets[:-1].tolist()))
+
+
+def write_visual_satellite(path: str, satellite_dir: str, sample_offset: int, vertex_offset: int):
+    """
+    Copy the positions and footprints of one satellite into its rows of an allocated visualization bundle
+
+    Args:
+        path: Bundle being filled, see allocate_visual_bundle
+        satellite_dir: Result folder of the satellite
+        sample_offset: First sample of the satellite in the bundle
+        vertex_offset: First footprint vertex of the satellite in the bundle
+    """
+    source = load_satellite_columns(satellite_dir)
+    columns = read_columns(path, writable=True)
+    count, vertices = len(source['time']), int(source['footprint_offsets'][-1])
+    for key in ("lon", "lat", "alt"):
+        columns[key][sample_offset:sample_offset + count] = source[key]
+    columns["footprint_offsets"][sample_offset + 1:sample_offset + count + 1] = source['footprint_offsets'][1:] + vertex_offset
+    for key in ("footprint_lat", "footprint_lon"):
+        columns[key][vertex_offset:vertex_offset + vertices] = source[key]
+
+
+def finish_visual_bundle(path: str):
+    """Publish a filled visualization bundle under VISUAL_BUNDLE_FILE"""
+    os.replace(path, os.path.join(os.path.dirname(path), VISUAL_BUNDLE_FILE))
@@ -0,0 +1,50 @@
+import logging
+import time
+
+from clickhouse_driver import Client
+
+from configs.app_config import app_config
+from libs.ephemeris_store import precompute_ephemeris
+from libs.overflight_index import build_overflight_index
+
+
+def main():
+    """
+    Precompute the ephemeris of every active catalog satellite (status '+') over
+    +-EPHEMERIS_WINDOW_DAYS around now and index its ground tracks (OVERFLIGHT_INDEX),
+    run by timer.py after every TLE ingest when EPHEMERIS_PRECOMPUTE is set
+    """
+    client = Client(
+        host=app_config.CLICKHOUSE_HOST,
+        port=app_config.CLICKHOUSE_PORT_NATIVE,
+        user=app_config.CLICKHOUSE_USER,
+        password=app_config.CLICKHOUSE_PASSWORD,
+        database=app_config.CLICKHOUSE_DATABASE
+    )
+    rows = client.execute("""
+                          SELECT ID, name, tle1, tle2
+                          FROM satellites FINAL
+                          WHERE status = '+' AND tle1 != '' AND tle2 != ''
+                          ORDER BY ID
+                          """)
+    client.disconnect()
+    logging.info(f"正在预计算 {len(rows)} 颗在轨卫星的星历......")
+
+    start = time.perf_counter()
+    result = precompute_ephemeris(rows, app_config.EPHEMERIS_WINDOW_DAYS, app_config.EPHEMERIS_STEP,
+                                  app_config.EPHEMERIS_WORKERS)
+    logging.info(f"星历预计算完成，耗时 {time.perf_counter() - start:.1f} s：{result['satellites']} 颗卫星，"
+                 f"{result['failed']} 颗外推失败，已写入 {result['path']}")
+
+    if app_config.OVERFLIGHT_INDEX:
+        start = time.perf_counter()
+        result = build_overflight_index(app_config.OVERFLIGHT_BUCKET, app_config.OVERFLIGHT_CELL_DEG,
+                                        app_config.OVERFLIGHT_MIN_ELEVATION, app_config.EPHEMERIS_WORKERS)
+        logging.info(f"过境索引构建完成，耗时 {time.perf_counter() - start:.1f} s：{result['entries']} 条索引，"
+                     f"已写入 {result['path']}")
+
+
+if __name__ == "__main__":
+    # Configured here only, the spawned workers of the precompute import this module as __mp_main__
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    main()
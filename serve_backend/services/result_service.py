@@ -0,0 +1,196 @@
+from datetime import datetime
+from typing import Dict, Any, List, Optional
+import logging
+
+# Filters of the result queries: request parameter -> condition, see libs/result_store.py for the tables
+_FILTERS = {
+    "job_id": "job_id = %(job_id)s",
+    "simulation_id": "simulation_id = %(simulation_id)s",
+    "satellite_id": "satellite_id = %(satellite_id)s",
+    "target_type": "target_type = %(target_type)s",
+    "target": "target = %(target)s"
+}
+
+
+class ResultService:
+    """Service for querying the simulation results stored in ClickHouse"""
+
+    @staticmethod
+    def _conditions(filters: Dict[str, Any], start_column: str, stop_column: str):
+        """
+        WHERE clause of a result query
+
+        Args:
+            filters: Request parameters, None values are ignored; start_time / end_time keep the rows
+                     overlapping the window (UTC, eg: 20130912032513)
+            start_column: Column holding the start time of a row
+            stop_column: Column holding the stop time of a row
+
+        Returns:
+            Tuple of (clause, parameters)
+
+        Raises:
+            ValueError: If a time is not in the simulation request format
+        """
+        from libs.result_store import format_target
+        conditions, params = [], {}
+        for key, value in filters.items():
+            if value is None:
+                continue
+            if key == "start_time":
+                conditions.append(f"{stop_column} >= toDateTime64(%(start_time)s, 3, 'UTC')")
+                value = datetime.strptime(value, "%Y%m%d%H%M%S").strftime("%Y-%m-%d %H:%M:%S")
+            elif key == "end_time":
+                conditions.append(f"{start_column} <= toDateTime64(%(end_time)s, 3, 'UTC')")
+                value = datetime.strptime(value, "%Y%m%d%H%M%S").strftime("%Y-%m-%d %H:%M:%S")
+            else:
+                conditions.append(_FILTERS[key])
+                if key == "target":
+                    # Same formatting as the stored geometry, eg: "100.50 30.5" -> "100.5 30.5"
+                    value = format_target([tuple(map(float, item.split()))[::-1] for item in value.split('|')])
+            params[key] = value
+        return (" WHERE " + " AND ".join(conditions) if conditions else ""), params
+
+    @staticmethod
+    def _value(value: Any) -> Any:
+        """JSON value of a result column: times in the format of the reports (eg: '2023-06-20 20:31:27.745'), NaN as None"""
+        if isinstance(value, datetime):
+            return value.strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]
+        if isinstance(value, float) and value != value:
+            return None
+        return value
+
+    async def _query(self, query: str, params: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """
+        Run a result query
+
+        Args:
+            query: SQL query
+            params: Query parameters
+
+        Returns:
+            List of rows as column name to value dicts
+        """
+        from constellation_app import get_app
+        app = get_app()
+        pool = app.state.clickhouse_pool
+        client = await pool.acquire()
+
+        try:
+            rows, columns = await client.execute(query, params, with_column_types=True)
+            keys = [column[0] for column in columns]
+            return [{key: self._value(value) for key, value in zip(keys, row)} for row in rows]
+        except Exception as e:
+            logging.error(f"仿真结果查询出错: {e}")
+            raise
+        finally:
+            await pool.release(client)
+
+    async def access_intervals(self, filters: Dict[str, Any], limit: int = 1000) -> Dict[str, Any]:
+        """
+        Get the access intervals of the stored simulations
+
+        Args:
+            filters: job_id, simulation_id, satellite_id, target_type, target, start_time, end_time
+            limit: Maximum number of intervals
+
+        Returns:
+            Dict with the intervals sorted by start time
+        """
+        try:
+            where, params = self._conditions(filters, "start", "stop")
+        except ValueError as e:
+            return {"error": f"参数格式错误: {e}"}
+        params["limit"] = limit
+        query = f"""
+                SELECT job_id, simulation_id, satellite_id, satellite_name, target_type, target,
+                       start, stop, duration, percent
+                FROM sim_access_intervals{where}
+                ORDER BY start, satellite_id
+                LIMIT %(limit)s
+                """
+        return {"intervals": await self._query(query, params)}
+
+    async def access_statistics(self, filters: Dict[str, Any], limit: int = 1000) -> Dict[str, Any]:
+        """
+        Get the pass statistics of every satellite and target type over the stored simulations
+
+        Args:
+            filters: job_id, simulation_id, satellite_id, target_type, target, start_time, end_time
+            limit: Maximum number of rows
+
+        Returns:
+            Dict with, per satellite and target type, the number of passes and jobs and the pass durations
+        """
+        try:
+            where, params = self._conditions(filters, "start", "stop")
+        except ValueError as e:
+            return {"error": f"参数格式错误: {e}"}
+        params["limit"] = limit
+        query = f"""
+                SELECT satellite_id, satellite_name, target_type,
+                       uniqExact(job_id) AS jobs, count() AS passes,
+                       sum(duration) AS total_duration, avg(duration) AS mean_duration, max(duration) AS max_duration,
+                       min(start) AS first_start, max(stop) AS last_stop
+                FROM sim_access_intervals{where}
+                GROUP BY satellite_id, satellite_name, target_type
+                ORDER BY satellite_id, target_type
+                LIMIT %(limit)s
+                """
+        return {"statistics": await self._query(query, params)}
+
+    async def coverage(self, filters: Dict[str, Any], limit: int = 1000) -> Dict[str, Any]:
+        """
+        Get the coverage statistics of the stored simulations
+
+        Args:
+            filters: job_id, simulation_id, target_type, target, start_time, end_time
+            limit: Maximum number of rows
+
+        Returns:
+            Dict with the coverage rows (one per job and target type, newest first)
+        """
+        try:
+            where, params = self._conditions(filters, "window_start", "window_stop")
+        except ValueError as e:
+            return {"error": f"参数格式错误: {e}"}
+        params["limit"] = limit
+        query = f"""
+                SELECT job_id, simulation_id, level, target_type, target,
+                       window_start, window_stop,
+                       satellites, duration, covered, fraction, gap_count, max_gap, mean_gap,
+                       max_simultaneous, mean_simultaneous, created_at
+                FROM sim_coverage{where}
+                ORDER BY created_at DESC, job_id, target_type
+                LIMIT %(limit)s
+                """
+        return {"coverage": await self._query(query, params)}
+
+    async def ephemeris(self, job_id: str, satellite_id: str, start_time: Optional[str] = None,
+                        end_time: Optional[str] = None, limit: int = 10000) -> Dict[str, Any]:
+        """
+        Get the positions of one satellite of a stored simulation
+
+        Args:
+            job_id: Job folder name
+            satellite_id: Satellite identifier
+            start_time: Window start (UTC), eg: 20130912032513
+            end_time: Window end (UTC)
+            limit: Maximum number of positions
+
+        Returns:
+            Dict with the positions (time, lon, lat, alt) sorted by time
+        """
+        filters = {"job_id": job_id, "satellite_id": satellite_id, "start_time": start_time, "end_time": end_time}
+        try:
+            where, params = self._conditions(filters, "time", "time")
+        except ValueError as e:
+            return {"error": f"参数格式错误: {e}"}
+        params["limit"] = limit
+        query = f"""
+                SELECT time, lon, lat, alt
+                FROM sim_ephemeris{where}
+                ORDER BY time
+                LIMIT %(limit)s
+                """
+        return {"positions": await self._query(query, params)}
@@ -1,5 +1,7 @@
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
+import asyncio
 import logging
+import time
 
 
 class SatelliteService:
@@ -166,3 +168,180 @@ class SatelliteService:
             raise
         finally:
             await pool.release(client)
+    
+    async def satellite_positions(self, ids: Optional[List[str]] = None, at_time: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Get the current positions of satellites from the precomputed ephemeris, without propagating them
+        
+        Args:
+            ids: Satellite identifiers, None for every stored satellite
+            at_time: UTC time eg:20130912032513, None for now
+            
+        Returns:
+            Dict with the time, the positions (ID, name, lon, lat, alt) and the requested satellites not stored
+        """
+        return await asyncio.to_thread(self._satellite_positions, ids, at_time)
+
+    def _satellite_positions(self, ids: Optional[List[str]], at_time: Optional[str]) -> Dict[str, Any]:
+        """Positions of satellite_positions, interpolated in a worker thread"""
+        import numpy as np
+        from libs.ephemeris_store import get_ephemeris_store
+        from libs.propagation import parse_simulation_time, teme_to_ecef, ecef_to_lla, format_times
+        
+        store = get_ephemeris_store()
+        if store is None:
+            return {"error": "星历库尚未生成，请先运行 precompute_ephemeris.py"}
+        try:
+            t = parse_simulation_time(at_time) if at_time else time.time()
+        except ValueError as e:
+            return {"error": f"时间格式错误: {e}"}
+        times = np.array([t])
+        if not store.covers(times):
+            return {"error": "请求时间超出星历库的时间范围"}
+        
+        ids = store.ids if ids is None else ids
+        rows = [store.lookup(ID) for ID in ids]
+        found = [i for i, row in enumerate(rows) if row is not None]
+        r, v = store.states(np.array([rows[i] for i in found], dtype=np.int64), times)
+        r_ecef, _ = teme_to_ecef(r, v, times)
+        lon, lat, alt = ecef_to_lla(r_ecef[:, 0])
+        
+        positions = []
+        missing = [ID for ID, row in zip(ids, rows) if row is None]
+        for k, i in enumerate(found):
+            if np.isnan(lon[k]):
+                # SGP4 failed on it during the precompute (eg: decayed)
+                missing.append(ids[i])
+                continue
+            positions.append({"ID": ids[i], "name": store.names[rows[i]],
+                              "lon": float(lon[k]), "lat": float(lat[k]), "alt": float(alt[k])})
+        return {"time": str(format_times(times)[0]), "positions": positions, "missing": missing}
+
+    async def overflight(self, point_data: str = "", line_data: str = "", area_data: str = "",
+                         start_time: Optional[str] = None, end_time: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Get the catalog satellites that may fly over targets within a window, from the overflight index
+        
+        Args:
+            point_data: Point (Longitude first, Latitude second) eg:123 41
+            line_data: Line vertices eg:123 31|124 31
+            area_data: Polygon vertices eg:123 34|134 41|127 37
+            start_time: Window start (UTC) eg:20130912032513, None for now
+            end_time: Window end (UTC), None for the end of the index
+            
+        Returns:
+            Dict with the window, the satellites (ID, name, first and last bucket with an overflight) and the query time
+        """
+        return await asyncio.to_thread(self._overflight, point_data, line_data, area_data, start_time, end_time)
+
+    def _overflight(self, point_data: str, line_data: str, area_data: str, start_time: Optional[str],
+                    end_time: Optional[str]) -> Dict[str, Any]:
+        """Index query of overflight, run in a worker thread"""
+        from libs.ephemeris_store import get_ephemeris_store
+        from libs.overflight_index import get_overflight_index, parse_targets
+        from libs.propagation import parse_simulation_time, format_times
+        import numpy as np
+        
+        store, index = get_ephemeris_store(), get_overflight_index()
+        if store is None or index is None:
+            return {"error": "过境索引尚未生成，请先运行 precompute_ephemeris.py"}
+        if index.ephemeris_created != store.created:
+            return {"error": "过境索引与星历库不一致，请重新运行 precompute_ephemeris.py"}
+        try:
+            targets = [parse_targets(data) for data in (point_data, line_data, area_data) if data]
+            start = parse_simulation_time(start_time) if start_time else time.time()
+            stop = parse_simulation_time(end_time) if end_time else store.stop
+        except ValueError as e:
+            return {"error": f"参数格式错误: {e}"}
+        if not targets:
+            return {"error": "请至少指定一个点、线或面目标"}
+        if stop < start or stop < store.start or start > store.stop:
+            return {"error": "请求时间超出星历库的时间范围"}
+        
+        query_start = time.perf_counter()
+        found = index.query(targets, start, stop)
+        elapsed = (time.perf_counter() - query_start) * 1000
+        rows = sorted(found, key=lambda row: (found[row][0], store.ids[row]))
+        bounds = format_times(np.array([value for row in rows for value in found[row]] + [max(start, store.start), min(stop, store.stop)]))
+        satellites = [{"ID": store.ids[row], "name": store.names[row], "first": str(bounds[2 * k]), "last": str(bounds[2 * k + 1])}
+                      for k, row in enumerate(rows)]
+        return {"start_time": str(bounds[-2]), "end_time": str(bounds[-1]), "satellites": satellites,
+                "elapsed_ms": round(elapsed, 3)}
+
+    async def predict_passes(self, point_data: str, start_time: Optional[str] = None, end_time: Optional[str] = None,
+                             step: Optional[float] = None, order: str = "start", limit: int = 1000) -> Dict[str, Any]:
+        """
+        Predict the passes of every active catalog satellite (status '+') over a ground point
+        
+        The optical sensor of each satellite (sensor_paras) must see the point. Satellites whose orbit can never
+        bring the point into their sensor reach are discarded from their elements before any propagation.
+        
+        Args:
+            point_data: Point (Longitude first, Latitude second) eg:123 41
+            start_time: Window start (UTC) eg:20130912032513, None for now
+            end_time: Window end (UTC), None for one day after the start
+            step: Sample step (s), PASS_PREDICTION_STEP when None
+            order: Ranking of the passes: start, duration or elevation
+            limit: Maximum number of passes
+            
+        Returns:
+            Dict with the window, the ranked passes (ID, name, start, stop, duration, max_elevation) and the
+            numbers of satellites in the catalog, kept by the prefilter and failed by SGP4
+        """
+        from libs.pass_prediction import RANKINGS, get_element_catalog, predict_passes
+        from libs.propagation import parse_simulation_time, format_times
+        from configs.app_config import app_config
+        import numpy as np
+        
+        try:
+            lon, lat = (float(x) for x in point_data.split())
+            start = parse_simulation_time(start_time) if start_time else time.time()
+            stop = parse_simulation_time(end_time) if end_time else start + 86400.0
+        except ValueError as e:
+            return {"error": f"参数格式错误: {e}"}
+        step = step or app_config.PASS_PREDICTION_STEP
+        if order not in RANKINGS:
+            return {"error": f"不支持的排序方式: {order}"}
+        if not -90 <= lat <= 90 or stop <= start or step <= 0:
+            return {"error": "目标点或时间范围无效"}
+        if stop - start > app_config.PASS_PREDICTION_MAX_DAYS * 86400:
+            return {"error": f"预报时间范围不能超过 {app_config.PASS_PREDICTION_MAX_DAYS} 天"}
+        
+        from constellation_app import get_app
+        app = get_app()
+        pool = app.state.clickhouse_pool
+        client = await pool.acquire()
+        
+        try:
+            satellites = await client.execute("""
+                                              SELECT ID, name, tle1, tle2
+                                              FROM satellites FINAL
+                                              WHERE status = '+' AND tle1 != '' AND tle2 != ''
+                                              ORDER BY ID
+                                              """)
+            sensors = await client.execute("""
+                                           SELECT ID, sensor_type, sensor_value
+                                           FROM sensor_paras
+                                           """)
+        except Exception as e:
+            logging.error(f"过境预报的卫星参数查询出错: {e}")
+            raise
+        finally:
+            await pool.release(client)
+        
+        # Only the optical sensors are modelled, as in the simulations
+        optical = {row[0]: row[2] for row in sensors if row[1] != 2}
+        rows = [(ID, name, tle1, tle2, optical[ID]) for ID, name, tle1, tle2 in satellites if ID in optical]
+        # Parsing the catalog and comparing it with the cached one take a while, keep them off the event loop
+        catalog = await asyncio.to_thread(get_element_catalog, rows)
+        result = await asyncio.to_thread(predict_passes, catalog, (lon, lat), start, stop, step)
+        
+        passes = sorted(result["passes"], key=RANKINGS[order])[:limit]
+        bounds = format_times(np.array([value for item in passes for value in (item["start"], item["stop"])] + [start, stop]))
+        for k, item in enumerate(passes):
+            item.update(start=str(bounds[2 * k]), stop=str(bounds[2 * k + 1]), duration=round(item["duration"], 3),
+                        max_elevation=round(item["max_elevation"], 3))
+        return {"start_time": str(bounds[-2]), "end_time": str(bounds[-1]), "passes": passes,
+                "total": len(result["passes"]), "satellites": result["satellites"],
+                "without_sensor": len(satellites) - len(rows), "invalid": catalog.invalid,
+                "candidates": result["candidates"], "failed": result["failed"]}
@@ -1,54 +1,139 @@
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional, Callable
 import asyncio
 import logging
+import math
 import os
+import shutil
+import threading
 import time
 import json
 from datetime import datetime
+from urllib.parse import quote
 from pathlib import Path
 from fastapi.responses import StreamingResponse
 from configs.app_config import app_config
-import paramiko
+from libs.result_cache import ResultCache, get_result_cache, link_tree
+from libs.chunking import CHUNKS_DIR, TimeChunk, time_chunks, chunk_dir, stitch_satellite
+from libs.incremental import scenario_key, load_last_run, save_last_run, unchanged_satellite_dir
+from libs.ssh_pool import LineCallback, get_ssh_pool
+from libs.process_control import process_group_kwargs, kill_process_tree, remote_kill_command
+from libs.profiling import span, record, parse_timing_line, start_profile, finish_profile, stage_statistics
+from libs.stk_hosts import StkHost, StkHostError, get_stk_registry
+from libs.report_archive import REPORT_ZIP, ZIP_COMPRESSION, stream_report_zip
+
+
+def replace_before_output(old_path, new_base, keyword="output"):
+    """
+    Replace the portion of the path preceding keyword with new_base, 
+    retaining keyword and everything following it（The backend service and STK are not deployed on the same server.）.
+    """
+    p = Path(old_path)
+    parts = p.parts  
+    try:
+        idx = parts.index(keyword)
+    except ValueError:
+        raise ValueError(f"路径中没有 {keyword} 文件夹")
+
+    suffix = parts[idx:]
+
+    new_path = Path(new_base, *suffix)
+    return str(new_path)
+
+
+def parse_batch_status(stdout: str) -> Dict[str, bool]:
+    """
+    Parse the per-satellite status lines printed by stk_simulation.py
+    
+    Args:
+        stdout: Standard output of the STK script
+        
+    Returns:
+        Dict mapping satellite ID to True (SATELLITE_DONE) or False (SATELLITE_FAILED)
+    """
+    status = {}
+    for line in stdout.splitlines():
+        parts = line.strip().split(' ')
+        if len(parts) >= 2 and parts[0] in ('SATELLITE_DONE', 'SATELLITE_FAILED'):
+            status[parts[1]] = parts[0] == 'SATELLITE_DONE'
+    return status
+
+
+def result_url(save_dir: str, payload: str) -> str:
+    """
+    Visualization page URL of a finished simulation
+    
+    zip_path is where report.zip is written with SIMULATION_REPORT_ZIP_FILE, report_url downloads
+    the archive built on the fly.
+    
+    Args:
+        save_dir: Job folder
+        payload: Satellite or constellation name, the visualization folder inside save_dir
+        
+    Returns:
+        Relative URL of the visualization page
+    """
+    report_url = f"{app_config.REPORT_DOWNLOAD_URL.rstrip('/')}/simulation_report?path={quote(save_dir)}"
+    return f"/?data_path={os.path.join(save_dir, payload)}&zip_path={os.path.join(save_dir, REPORT_ZIP)}&report_url={quote(report_url, safe='')}"
+
+
+def stk_progress_message(line: str) -> str:
+    """
+    Turn one stdout line of stk_simulation.py into an SSE progress message
+    
+    Args:
+        line: Output line
+    
+    Returns:
+        Progress message, empty for blank lines
+    """
+    parts = line.strip().split(' ', 2)
+    if len(parts) >= 2 and parts[0] == 'SATELLITE_DONE':
+        return f"{parts[1]}号卫星STK仿真计算完成......"
+    if len(parts) >= 2 and parts[0] == 'SATELLITE_FAILED':
+        return f"{parts[1]}号卫星STK仿真计算失败: {parts[2] if len(parts) > 2 else ''}"
+    return line.strip()
+
+
+# Files of a satellite result folder written after the simulation, kept out of the result cache
+SATELLITE_CACHE_EXCLUDE = ("simulation_paras.txt",)
+
+# SimulationRequest.algorithm_type of the native SGP4 engine, other values run STK
+ALGORITHM_NATIVE = 2
+
+
+def algorithm_name(algorithm_type: int) -> str:
+    """Name of the simulation algorithm written to simulation_paras.txt"""
+    return {1: '行业算法', ALGORITHM_NATIVE: 'SGP4'}.get(algorithm_type, 'STK')
+
 
 class SimulationService:
     """Service for simulation operations"""
     
-    async def execute_ssh_command(self, command: str) -> tuple[int, str, str]:
+    async def execute_ssh_command(self, command: str, on_line: Optional[LineCallback] = None,
+                                  host: Optional[StkHost] = None, kill_command: Optional[str] = None) -> tuple[int, str, str]:
         """
-        Execute command on remote SSH server using paramiko
+        Execute command on remote SSH server over a pooled keep-alive connection
         
         Args:
             command: Command to execute on remote server
+            on_line: Optional coroutine called with every stdout line while the command runs
+            host: STK execution host, the SSH_* server when omitted
+            kill_command: Optional command terminating the remote process when the run is cancelled
             
         Returns:
             Tuple of (returncode, stdout, stderr)
         """
-        ssh = paramiko.SSHClient()
-        ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-        
-        try:
-            ssh.connect(
-                hostname=app_config.SSH_HOST,
-                username=app_config.SSH_USER,
-                password=app_config.SSH_PASSWORD,
-                timeout=30
-            )
-            
-            stdin, stdout, stderr = ssh.exec_command(command)
-            stdout_str = stdout.read().decode('utf-8')
-            stderr_str = stderr.read().decode('utf-8')
-            returncode = stdout.channel.recv_exit_status()
-            
-            return returncode, stdout_str, stderr_str
-        finally:
-            ssh.close()
+        if host is None:
+            return await get_ssh_pool().run(command, on_line, kill_command)
+        return await get_ssh_pool(host.host, host.user, host.password, host.port).run(command, on_line, kill_command)
     
-    async def execute_local_command(self, command: str) -> tuple[int, str, str]:
+    async def execute_local_command(self, command: str, on_line: Optional[LineCallback] = None) -> tuple[int, str, str]:
         """
         Execute command on local machine
         
         Args:
             command: Command to execute on local machine
+            on_line: Optional coroutine called with every stdout line while the command runs
             
         Returns:
             Tuple of (returncode, stdout, stderr)
@@ -56,16 +141,401 @@ class SimulationService:
         process = await asyncio.create_subprocess_shell(
             command,
             stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE
+            stderr=asyncio.subprocess.PIPE,
+            # Allow output lines larger than the asyncio default of 64 KiB
+            limit=16 * 1024 * 1024,
+            # Own process group, cancellation kills the script together with the STK processes it starts
+            **process_group_kwargs()
         )
-        stdout, stderr = await process.communicate()
-        returncode = process.returncode
         
-        return returncode, stdout.decode('utf-8'), stderr.decode('utf-8')
+        async def read_stdout():
+            lines = []
+            async for raw in process.stdout:
+                line = raw.decode('utf-8')
+                lines.append(line)
+                if on_line is not None:
+                    await on_line(line.rstrip('\r\n'))
+            return ''.join(lines)
+        
+        try:
+            stdout, stderr = await asyncio.gather(read_stdout(), process.stderr.read())
+            returncode = await process.wait()
+        except asyncio.CancelledError:
+            await kill_process_tree(process)
+            raise
+        
+        return returncode, stdout, stderr.decode('utf-8')
+    
+    def stk_path(self, path: str, host: Optional[StkHost] = None) -> str:
+        """
+        Map a backend output path to the path seen by the STK host
+        
+        Args:
+            path: Path under OUTPUT_DIR on the backend
+            host: STK execution host, the STK_LOCAL / REPLACE_BASE settings when omitted
+            
+        Returns:
+            The same path for local STK, the REPLACE_BASE-relative path for remote STK
+        """
+        if host is None:
+            if app_config.STK_LOCAL:
+                return path
+            return replace_before_output(path, app_config.REPLACE_BASE)
+        if host.local:
+            return path
+        return replace_before_output(path, host.replace_base)
+    
+    async def execute_stk_script(self, io_args: List[str], simu_paras: Dict[str, Any], host: StkHost,
+                                 on_line: Optional[LineCallback] = None) -> tuple[int, str, str]:
+        """
+        Build the stk_simulation.py command line and execute it on an STK host, locally or over SSH
+        
+        Args:
+            io_args: Arguments selecting the satellites and result paths (--satellites/--path or --manifest)
+            simu_paras: Simulation request data
+            host: STK execution host
+            on_line: Optional coroutine called with every stdout line of the script
+            
+        Returns:
+            Tuple of (returncode, stdout, stderr)
+        """
+        args = [
+            host.script_path,
+            "--start_time", simu_paras['start_time'],
+            "--end_time", simu_paras['end_time'],
+            "--step", simu_paras['interval'],
+            *io_args,
+            "--point", simu_paras['point_data'],
+            "--line", simu_paras['line_data'],
+            "--area", simu_paras['area_data']
+        ]
+        cmd = f'"{host.python_exe}" ' + " ".join(f'"{a}"' for a in args)
+        
+        async def handle_line(line):
+            # TIMING lines carry the script's internal phases for the job profile, the others are progress
+            timing = parse_timing_line(line)
+            if timing is not None:
+                phase, seconds, ID = timing
+                record(f"stk.{phase}", seconds, host=host.name, **({"ID": ID} if ID else {}))
+            elif on_line is not None:
+                await on_line(line)
+        
+        try:
+            if host.local:
+                returncode, stdout, stderr = await self.execute_local_command(cmd, handle_line)
+            else:
+                # The manifest or result path (last argument) is unique to this run and identifies its processes
+                kill_command = remote_kill_command(io_args[-1], host.windows)
+                returncode, stdout, stderr = await self.execute_ssh_command(cmd, handle_line, host, kill_command)
+        except Exception as e:
+            raise StkHostError(f"{host.name}: {e}") from e
+        
+        if returncode != 0:
+            logging.warning(f"STK脚本在 {host.name} 上执行失败(returncode={returncode}): {stderr}")
+            if not parse_batch_status(stdout):
+                # No satellite got processed, the host itself is broken (missing STK, script or share)
+                raise StkHostError(f"{host.name}: returncode={returncode} {stderr.strip()}")
+        return returncode, stdout, stderr
     
-    async def simulation_stream(self, data: Dict[str, Any]):
+    async def dispatch_stk_script(self, io_args: Callable[[StkHost], List[str]], simu_paras: Dict[str, Any],
+                                  satellites: int, on_line: Optional[LineCallback] = None) -> tuple[int, str, str]:
         """
-        Execute simulation and stream results
+        Execute stk_simulation.py on the least loaded STK host, retrying on another host when one fails
+        
+        Args:
+            io_args: Function building the satellite and path arguments for a given host
+            simu_paras: Simulation request data
+            satellites: Number of satellites of the run
+            on_line: Optional coroutine called with every stdout line of the script
+            
+        Returns:
+            Tuple of (returncode, stdout, stderr), returncode 1 when every host failed
+        """
+        async def run(host):
+            with span("stk.run", host=host.name, satellites=satellites):
+                return await self.execute_stk_script(io_args(host), simu_paras, host, on_line)
+        
+        try:
+            return await get_stk_registry().dispatch(run, satellites)
+        except StkHostError as e:
+            logging.error(f"所有STK执行主机均执行失败: {e}")
+            return 1, '', str(e)
+    
+    async def run_stk_script(self, satellites: List[Dict[str, Any]], save_path: str, simu_paras: Dict[str, Any]) -> tuple[int, str, str]:
+        """
+        Invoke stk_simulation.py for the given satellites, locally or over SSH
+        
+        Args:
+            satellites: Satellite and sensor parameters passed through --satellites
+            save_path: Folder path for storing simulation result reports
+            simu_paras: Simulation request data
+            
+        Returns:
+            Tuple of (returncode, stdout, stderr)
+        """
+        if app_config.STK_WORKER_ADDRESS:
+            status = await self.run_stk_worker([{**item, "save_path": save_path} for item in satellites], simu_paras)
+            returncode = 0 if status and all(status.values()) else 1
+            return returncode, '', ''
+        
+        satellites_json = json.dumps(satellites)
+        satellites_json = satellites_json.replace('"', '\\"')
+        return await self.dispatch_stk_script(lambda host: ["--satellites", satellites_json, "--path", self.stk_path(save_path, host)],
+                                              simu_paras, len(satellites))
+    
+    async def run_stk_batch(self, satellites: List[Dict[str, Any]], manifest_path: str, simu_paras: Dict[str, Any],
+                            on_line: Optional[LineCallback] = None) -> Dict[str, bool]:
+        """
+        Simulate a batch of satellites in a single STK process (batch mode)
+        
+        The satellites are handed over through a manifest file instead of the command line,
+        so STK startup and scenario construction are paid once for the whole batch.
+        
+        Args:
+            satellites: Satellite and sensor parameters, each carrying the backend path of its result folder in "save_path"
+            manifest_path: Backend path of the manifest file to write
+            simu_paras: Simulation request data
+            on_line: Optional coroutine called with every stdout line of the STK script
+            
+        Returns:
+            Dict mapping satellite ID to whether its results were written successfully
+        """
+        if app_config.STK_WORKER_ADDRESS:
+            return await self.run_stk_worker(satellites, simu_paras)
+        
+        def manifest_args(host):
+            # Result paths depend on the host's REPLACE_BASE, the manifest is rewritten for every attempt
+            manifest = [{**item, "save_path": self.stk_path(item['save_path'], host)} for item in satellites]
+            os.makedirs(os.path.dirname(manifest_path), exist_ok=True)
+            with open(manifest_path, "w", encoding="utf-8") as f:
+                json.dump(manifest, f, ensure_ascii=False)
+            return ["--manifest", self.stk_path(manifest_path, host)]
+        
+        returncode, stdout, stderr = await self.dispatch_stk_script(manifest_args, simu_paras, len(satellites), on_line)
+        return parse_batch_status(stdout)
+    
+    async def run_stk_worker(self, satellites: List[Dict[str, Any]], simu_paras: Dict[str, Any]) -> Dict[str, bool]:
+        """
+        Submit satellites to the warm STK worker daemon (STK_WORKER_ADDRESS) instead of spawning stk_simulation.py
+        
+        Args:
+            satellites: Satellite and sensor parameters, each carrying the backend path of its result folder in "save_path"
+            simu_paras: Simulation request data
+            
+        Returns:
+            Dict mapping satellite ID to whether its results were written successfully
+        """
+        from libs.stk_worker_client import submit_job
+        job = {
+            "start_time": simu_paras['start_time'],
+            "end_time": simu_paras['end_time'],
+            "step": simu_paras['interval'],
+            "point": simu_paras['point_data'],
+            "line": simu_paras['line_data'],
+            "area": simu_paras['area_data'],
+            "satellites": [{**item, "save_path": self.stk_path(item['save_path'])} for item in satellites]
+        }
+        with span("stk.run", host=app_config.STK_WORKER_ADDRESS, satellites=len(satellites)):
+            result = await submit_job(app_config.STK_WORKER_ADDRESS, job)
+        timings = result['finished'].get('timings', {})
+        for phase in ('queue_wait', 'reset', 'scenario'):
+            if phase in timings:
+                record(f"stk.{phase}", timings[phase], host=app_config.STK_WORKER_ADDRESS)
+        for ID, seconds in timings.get('satellites', {}).items():
+            record("stk.satellite", seconds, host=app_config.STK_WORKER_ADDRESS, ID=ID)
+        return result['status']
+    
+    async def run_native_batch(self, satellites: List[Dict[str, Any]], simu_paras: Dict[str, Any]) -> Dict[str, bool]:
+        """
+        Simulate satellites with the native SGP4 engine (algorithm_type == ALGORITHM_NATIVE)
+        
+        Args:
+            satellites: Satellite and sensor parameters, each carrying the backend path of its result folder in "save_path"
+            simu_paras: Simulation request data
+            
+        Returns:
+            Dict mapping satellite ID to whether its results were written successfully
+        """
+        from libs.native_engine import run_native_simulation
+        cancel = threading.Event()
+        future = asyncio.ensure_future(asyncio.to_thread(run_native_simulation, satellites, simu_paras, cancel))
+        try:
+            return await asyncio.shield(future)
+        except asyncio.CancelledError:
+            # The engine stops at its next satellite batch, wait for it so no file is written after cleanup
+            cancel.set()
+            await asyncio.wait([future])
+            raise
+    
+    async def run_simulation_batch(self, satellites: List[Dict[str, Any]], manifest_path: str, simu_paras: Dict[str, Any],
+                                   on_line: Optional[LineCallback] = None,
+                                   limiter: Optional[asyncio.Semaphore] = None) -> Dict[str, bool]:
+        """
+        Simulate a batch of satellites with the engine selected by algorithm_type
+        
+        Args:
+            satellites: Satellite and sensor parameters, each carrying the backend path of its result folder in "save_path"
+            manifest_path: Backend path of the STK manifest file
+            simu_paras: Simulation request data
+            on_line: Optional coroutine called with every stdout line of the STK script
+            limiter: Semaphore shared by the engine runs of the job, a new one of SIMULATION_MAX_WORKERS slots by default
+            
+        Returns:
+            Dict mapping satellite ID to whether its results were written successfully
+        """
+        limiter = limiter or asyncio.Semaphore(max(1, app_config.SIMULATION_MAX_WORKERS))
+        chunks = time_chunks(simu_paras, app_config.SIMULATION_CHUNK_SAMPLES)
+        if len(chunks) > 1:
+            return await self.run_chunked_batch(satellites, manifest_path, simu_paras, chunks, limiter, on_line)
+        async with limiter:
+            if simu_paras['algorithm_type'] == ALGORITHM_NATIVE:
+                return await self.run_native_batch(satellites, simu_paras)
+            return await self.run_stk_batch(satellites, manifest_path, simu_paras, on_line)
+    
+    async def run_chunked_batch(self, satellites: List[Dict[str, Any]], manifest_path: str, simu_paras: Dict[str, Any],
+                                chunks: List[TimeChunk], limiter: asyncio.Semaphore,
+                                on_line: Optional[LineCallback] = None) -> Dict[str, bool]:
+        """
+        Simulate a long window as concurrent sub-windows, then stitch every satellite's results together
+        
+        Args:
+            satellites: Satellite and sensor parameters, each carrying the backend path of its result folder in "save_path"
+            manifest_path: Backend path of the STK manifest file, suffixed with the chunk index
+            simu_paras: Simulation request data
+            chunks: Sub-windows of the simulation, see libs.chunking.time_chunks
+            limiter: Semaphore shared by the engine runs of the job, held by every chunk while it runs
+            on_line: Optional coroutine called with every stdout line of the STK script
+            
+        Returns:
+            Dict mapping satellite ID to whether the results of all its chunks were written and stitched successfully
+        """
+        root, ext = os.path.splitext(manifest_path)
+        
+        async def run_chunk(chunk):
+            chunk_satellites = [{**item, "save_path": chunk_dir(item['save_path'], chunk.index)} for item in satellites]
+            for item in chunk_satellites:
+                os.makedirs(item['save_path'], exist_ok=True)
+            chunk_paras = chunk.paras(simu_paras)
+            async with limiter:
+                if simu_paras['algorithm_type'] == ALGORITHM_NATIVE:
+                    return await self.run_native_batch(chunk_satellites, chunk_paras)
+                return await self.run_stk_batch(chunk_satellites, f"{root}_chunk{chunk.index}{ext}", chunk_paras, on_line)
+        
+        results = await asyncio.gather(*(run_chunk(chunk) for chunk in chunks), return_exceptions=True)
+        
+        status = {}
+        for item in satellites:
+            ID = item['ID']
+            ok = all(not isinstance(result, BaseException) and result.get(ID) for result in results)
+            if ok:
+                try:
+                    chunk_dirs = [chunk_dir(item['save_path'], chunk.index) for chunk in chunks]
+                    with span("chunk.stitch", ID=ID):
+                        await asyncio.to_thread(stitch_satellite, chunk_dirs, chunks, simu_paras, item['save_path'])
+                except Exception as e:
+                    logging.error(f"ID为{ID}的卫星分段仿真结果拼接失败: {e}")
+                    ok = False
+            status[ID] = ok
+            shutil.rmtree(os.path.join(item['save_path'], CHUNKS_DIR), ignore_errors=True)
+        return status
+    
+    async def build_report(self, level: int, simulation_dict: Dict[str, Any], interval: str):
+        """
+        Generate the analysis report of a simulation and stream the progress of its stages
+        
+        The report steps run in the report process pool, this only relays their progress.
+        
+        Args:
+            level: Simulation level, 0 - single satellite, 1 - constellation
+            simulation_dict: Targets, time window and result folders, see libs.report.create_report
+            interval: Simulation step (s)
+            
+        Returns:
+            Async generator of SSE formatted progress messages
+        """
+        from libs.report import create_report
+        messages = asyncio.Queue()
+        task = asyncio.create_task(create_report(level, simulation_dict, interval, messages.put_nowait))
+        try:
+            while True:
+                getter = asyncio.create_task(messages.get())
+                await asyncio.wait([getter, task], return_when=asyncio.FIRST_COMPLETED)
+                if not getter.done():
+                    getter.cancel()
+                    break
+                yield f"data: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}   {getter.result()}\n\n"
+            while not messages.empty():
+                yield f"data: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}   {messages.get_nowait()}\n\n"
+            # Re-raise the failure of the report, if any
+            await task
+        finally:
+            if not task.done():
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+    
+    def report_archive(self, path: str, compression: Optional[str] = None):
+        """
+        Download the report.zip of a finished simulation, built while it is sent
+        
+        Args:
+            path: Job folder, as in the zip_path / report_url of the result
+            compression: store, fast or deflate, defaults to SIMULATION_ZIP_COMPRESSION
+            
+        Returns:
+            Streaming zip response, or dict with error message
+        """
+        compression = compression if compression in ZIP_COMPRESSION else app_config.SIMULATION_ZIP_COMPRESSION
+        # Only job folders under OUTPUT_DIR can be downloaded
+        output_dir = os.path.realpath(app_config.OUTPUT_DIR)
+        save_dir = os.path.realpath(path)
+        if os.path.commonpath([output_dir, save_dir]) != output_dir or save_dir == output_dir or not os.path.isdir(save_dir):
+            return {"error": f"Simulation result {path} not found"}
+        
+        zip_path = os.path.join(save_dir, REPORT_ZIP)
+        if os.path.exists(zip_path):
+            async def read_file():
+                with open(zip_path, "rb") as f:
+                    while chunk := await asyncio.to_thread(f.read, 1 << 20):
+                        yield chunk
+            content = read_file()
+        else:
+            content = stream_report_zip(save_dir, compression, app_config.SIMULATION_TEXT_REPORTS)
+        return StreamingResponse(content, media_type="application/zip",
+                                 headers={"Content-Disposition": f"attachment; filename={REPORT_ZIP}"})
+    
+    def profile_statistics(self, limit: int = 0) -> Dict[str, Any]:
+        """
+        Get the duration percentiles of every simulation stage over the recent jobs
+        
+        Args:
+            limit: Only consider the last limit successful jobs, 0 for all remembered jobs
+            
+        Returns:
+            Dict with the number of jobs and per-stage count, p50, p95, mean and max in seconds
+        """
+        return stage_statistics(limit)
+    
+    def stk_workers(self) -> List[Dict[str, Any]]:
+        """
+        Get the load of the STK execution hosts
+        
+        Returns:
+            List of host statistics: running and queued runs, completed and failed runs, busy time and throughput
+        """
+        return get_stk_registry().stats()
+    
+    def job_manager(self):
+        """Background simulation job manager (extensions.ext_jobs)"""
+        from constellation_app import get_app
+        return get_app().state.job_manager
+    
+    async def simulation_stream(self, data: Dict[str, Any], last_event_id: int = 0):
+        """
+        Execute simulation as a background job and stream its progress
+        
+        The job keeps running when the connection drops, the X-Job-ID response header allows
+        re-attaching through /simulation_jobs/{job_id}/events. It is cancelled, and its engine
+        processes killed, when nobody re-attaches within SIMULATION_DISCONNECT_GRACE seconds.
         
         Args:
             data: Simulation request data containing ID, level, algorithm_type, start_time, end_time, interval, point_data, line_data, area_data
@@ -73,6 +543,88 @@ class SimulationService:
         Returns:
             Streaming response with simulation results
         """
+        job = self.job_manager().submit(data, cancel_on_disconnect=True)
+        return StreamingResponse(job.sse(last_event_id), media_type="text/event-stream", headers={"X-Job-ID": job.id})
+    
+    def submit_job(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Start a simulation job without attaching to it
+        
+        Args:
+            data: Simulation request data
+            
+        Returns:
+            Dict containing the job status
+        """
+        return self.job_manager().submit(data).info()
+    
+    def list_jobs(self) -> List[Dict[str, Any]]:
+        """
+        Get the status of the known simulation jobs, newest first
+        
+        Returns:
+            List of job status dicts
+        """
+        return self.job_manager().list_jobs()
+    
+    def get_job(self, job_id: str) -> Dict[str, Any]:
+        """
+        Get the status of one simulation job
+        
+        Args:
+            job_id: Job identifier
+            
+        Returns:
+            Dict containing the job status or error information
+        """
+        job = self.job_manager().get(job_id)
+        if job is None:
+            return {"error": f"Simulation job {job_id} not found"}
+        return job.info()
+    
+    def cancel_job(self, job_id: str) -> Dict[str, Any]:
+        """
+        Cancel a pending or running simulation job
+        
+        Args:
+            job_id: Job identifier
+            
+        Returns:
+            Dict containing the cancellation result or error information
+        """
+        manager = self.job_manager()
+        if manager.get(job_id) is None:
+            return {"error": f"Simulation job {job_id} not found"}
+        if not manager.cancel(job_id):
+            return {"error": f"Simulation job {job_id} has already ended"}
+        return {"job_id": job_id, "message": "cancelling"}
+    
+    def job_events(self, job_id: str, last_event_id: int = 0):
+        """
+        Replay the buffered progress of a job after last_event_id and follow it until it ends
+        
+        Args:
+            job_id: Job identifier
+            last_event_id: Last event id received by the viewer (Last-Event-ID)
+            
+        Returns:
+            Streaming response, None when the job does not exist
+        """
+        job = self.job_manager().get(job_id)
+        if job is None:
+            return None
+        return StreamingResponse(job.sse(last_event_id), media_type="text/event-stream", headers={"X-Job-ID": job.id})
+    
+    def simulation_events(self, data: Dict[str, Any]):
+        """
+        Execute simulation
+        
+        Args:
+            data: Simulation request data containing ID, level, algorithm_type, start_time, end_time, interval, point_data, line_data, area_data
+            
+        Returns:
+            Async generator of SSE formatted progress messages, the last one carrying __RESULT__
+        """
         from constellation_app import get_app
         app = get_app()
         pool = app.state.clickhouse_pool
@@ -83,26 +635,12 @@ class SimulationService:
         # Configuration Path
         abs_path = app_config.OUTPUT_DIR
         
-        def replace_before_output(old_path, new_base, keyword="output"):
-            """
-            Replace the portion of the path preceding keyword with new_base, 
-            retaining keyword and everything following it（The backend service and STK are not deployed on the same server.）.
-            """
-            p = Path(old_path)
-            parts = p.parts  
-            try:
-                idx = parts.index(keyword)
-            except ValueError:
-                raise ValueError(f"路径中没有 {keyword} 文件夹")
-
-            suffix = parts[idx:]
-
-            new_path = Path(new_base, *suffix)
-            return str(new_path)
-        
         async def event_generator():
             """Generator function for streaming simulation results"""
             client = await pool.acquire()
+            save_dir = None
+            profile = start_profile(ID=simu_paras['ID'], level=simu_paras['level'], algorithm_type=simu_paras['algorithm_type'],
+                                    start_time=simu_paras['start_time'], end_time=simu_paras['end_time'], interval=simu_paras['interval'])
             try:
                 yield f"data: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}   数据库已连接\n\n"
                 
@@ -125,8 +663,9 @@ class SimulationService:
 
                     try:
                         yield f"data: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}   正在从数据库提取卫星的轨道和传感器参数......\n\n"
-                        result_sat = await client.execute(query_sat, values)
-                        result_sen = await client.execute(query_sen, values)
+                        with span("clickhouse"):
+                            result_sat = await client.execute(query_sat, values)
+                            result_sen = await client.execute(query_sen, values)
                         
                         if len(result_sat) == 0 or len(result_sen) == 0:
                             yield f"data: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}   没有从数据库查询到卫星的相关信息，任务终止！\n\n"
@@ -169,46 +708,36 @@ class SimulationService:
                             yield f"data: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}   仿真算法的输入参数已配置完成，准备调用算法包进行仿真计算......\n\n"
                             
                             satellites_json = [{"ID": ID, "name": name, "tle1": result_sat[1], "tle2": result_sat[2], "sensor_type": result_sen[0], "sensor_para": result_sen[1]}]
-                            satellites_json = json.dumps(satellites_json)
-                            satellites_json = satellites_json.replace('"', '\\"')
-
-                            if app_config.STK_LOCAL:
-                                # STK On-Premises Deployment
-                                exe_path = app_config.STK_PYTHON_LOCAL_EXE
-                                script_full_path = app_config.STK_SCRIPT_LOCAL_PATH
-                                args = [
-                                    script_full_path,
-                                    "--start_time", simu_paras['start_time'],
-                                    "--end_time", simu_paras['end_time'],
-                                    "--step", interval,
-                                    "--satellites", satellites_json,
-                                    "--path", simulation_path,
-                                    "--point", simu_paras['point_data'],
-                                    "--line", simu_paras['line_data'],
-                                    "--area", simu_paras['area_data']
-                                ]
-                                local_cmd = f'"{exe_path}" ' + " ".join(f'"{a}"' for a in args)
-                                returncode, stdout, stderr = await self.execute_local_command(local_cmd)
-                                print(stderr)
-                                result = type('obj', (object,), {'returncode': returncode})
+                            
+                            # Identical inputs reuse the stored results instead of simulating again
+                            cache = get_result_cache()
+                            if cache is not None:
+                                satellite_key = cache.satellite_key(satellites_json[0], simu_paras)
+                                job_key = cache.job_key(simu_paras['level'], name, [satellite_key])
+                                with span("cache"):
+                                    meta = await asyncio.to_thread(cache.load, "job", job_key, save_dir)
+                                if meta is not None:
+                                    url = result_url(save_dir, name)
+                                    yield f"data: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}   已命中仿真结果缓存，ID为{ID}的卫星仿真任务的相关结果均已生成！\n\n"
+                                    logging.info(f'ID为{ID}的卫星仿真任务命中仿真结果缓存！')
+                                    profile.status = "succeeded"
+                                    yield f"data: __RESULT__:{ {'url': url, 'message': meta['message']} }\n\n"
+                                    return
+                            
+                            if cache is not None and await asyncio.to_thread(cache.load, "satellite", satellite_key, simulation_path) is not None:
+                                yield f"data: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}   已命中仿真结果缓存，跳过仿真计算......\n\n"
+                                returncode = 0
+                            elif simu_paras['algorithm_type'] == ALGORITHM_NATIVE or len(time_chunks(simu_paras, app_config.SIMULATION_CHUNK_SAMPLES)) > 1:
+                                with span("simulate", satellites=1):
+                                    status = await self.run_simulation_batch([{**satellites_json[0], "save_path": simulation_path}],
+                                                                             save_dir + "/stk_manifests/manifest_0.json", simu_paras)
+                                returncode = 0 if status.get(ID) else 1
                             else:
-                                # STK Non-On-Premises Deployment
-                                exe_path = app_config.STK_PYTHON_REMOTE_EXE
-                                script_full_path = app_config.STK_SCRIPT_REMOTE_PATH
-                                args = [
-                                    script_full_path,
-                                    "--start_time", simu_paras['start_time'],
-                                    "--end_time", simu_paras['end_time'],
-                                    "--step", interval,
-                                    "--satellites", satellites_json,
-                                    "--path", replace_before_output(simulation_path, app_config.REPLACE_BASE),
-                                    "--point", simu_paras['point_data'],
-                                    "--line", simu_paras['line_data'],
-                                    "--area", simu_paras['area_data']
-                                ]
-                                remote_cmd = f'"{exe_path}" ' + " ".join(f'"{a}"' for a in args)
-                                returncode, stdout, stderr = await self.execute_ssh_command(remote_cmd)
-                                result = type('obj', (object,), {'returncode': returncode})
+                                with span("simulate", satellites=1):
+                                    returncode, stdout, stderr = await self.run_stk_script(satellites_json, simulation_path, simu_paras)
+                            if returncode == 0 and cache is not None:
+                                await asyncio.to_thread(cache.store, "satellite", satellite_key, simulation_path, exclude=SATELLITE_CACHE_EXCLUDE)
+                            result = type('obj', (object,), {'returncode': returncode})
 
                             yield f"data: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}   仿真算法执行完毕，准备确认结果......\n\n"
 
@@ -222,24 +751,26 @@ class SimulationService:
                             simulation_dict['mount_path'] = mount_path
                             simulation_dict['result'] = {ID: {'name': name, 'satellite_dir': simulation_path}}
                             simulation_dict['payload'] = name
+                            simulation_dict['ID'] = ID
                             
                             if result.returncode == 0:
                                 yield f"data: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}   仿真算法结果已确认！\n\n"
                                 yield f"data: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}   正在构建分析报告......\n\n"
                                 
                                 # Call the simulation report generation function
-                                from libs.report import create_report
-                                await create_report(simu_paras['level'], simulation_dict, interval)
+                                with span("report"):
+                                    async for message in self.build_report(simu_paras['level'], simulation_dict, interval):
+                                        yield message
                                 
                                 yield f"data: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}   正在设置仿真结果可视化页面......\n\n"
-                                url = f'/?data_path={os.path.join(save_dir, name)}&zip_path={os.path.join(save_dir, 'report.zip')}'
+                                url = result_url(save_dir, name)
                                 yield f"data: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}   ID为{ID}的卫星仿真任务执行成功，相关结果均已成功生成！\n\n"
                                 logging.info(f'ID为{ID}的卫星仿真任务执行成功！')
                                 
                                 # Generate Simulation Log File.txt
                                 dt_start = datetime.strptime(start_time, '%Y %m %d %H %M %S')
                                 dt_end = datetime.strptime(end_time, '%Y %m %d %H %M %S')
-                                algorithm = 'STK'
+                                algorithm = algorithm_name(simu_paras['algorithm_type'])
                                 with open(simulation_path + "/simulation_paras.txt", "a", encoding="utf-8") as f:
                                     f.write(f"卫星名称：{name}\n")
                                     f.write(f"卫星编号：{ID}\n")
@@ -256,6 +787,12 @@ class SimulationService:
                                     f.write(f"仿真算法：{algorithm}\n")
                                 yield f"data: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}   仿真任务的参数信息已保存！\n\n"
                                 logging.info(f'ID为{ID}的卫星仿真任务的相关执行参数已保存！')
+                                if cache is not None:
+                                    with span("cache"):
+                                        await asyncio.to_thread(cache.store, "job", job_key, save_dir, {'message': 'success'}, exclude=("stk_manifests",))
+                                profile.status = "succeeded"
+                                from libs.report import store_report_results
+                                store_report_results(simu_paras['level'], simulation_dict)
                                 yield f"data: __RESULT__:{ {'url': url, 'message':'success'} }\n\n"
                             else:
                                 yield f"data: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}   仿真算法结果确认失败，任务终止！\n\n"
@@ -283,19 +820,21 @@ class SimulationService:
                     values = {"constellation_id": str(simu_paras['ID'])}
 
                     try:
-                        result_con = await client.execute(query_con, values)
+                        with span("clickhouse"):
+                            result_con = await client.execute(query_con, values)
                         constellation_name = result_con[0][0]
 
                         yield f"data: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}   正在从数据库提取星座内所有卫星的轨道和传感器参数......\n\n"
-                        result_sat = await client.execute(query_sat, values)
-                        ids = [row[0] for row in result_sat]
-                        query_sen = """
-                                    SELECT ID, sensor_type, sensor_value
-                                    FROM sensor_paras
-                                    WHERE ID IN %(ids)s\
-                                    """
-                        values = {"ids": ids}
-                        result_sen = await client.execute(query_sen, values)
+                        with span("clickhouse"):
+                            result_sat = await client.execute(query_sat, values)
+                            ids = [row[0] for row in result_sat]
+                            query_sen = """
+                                        SELECT ID, sensor_type, sensor_value
+                                        FROM sensor_paras
+                                        WHERE ID IN %(ids)s\
+                                        """
+                            values = {"ids": ids}
+                            result_sen = await client.execute(query_sen, values)
                         
                         if len(result_sat) == 0 or len(result_sen) == 0:
                             yield f"data: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}   没有从数据库查询到卫星的相关信息，任务终止！\n\n"
@@ -314,6 +853,15 @@ class SimulationService:
                                 **sensor_dict.get(ID, {})
                             })
                         
+                        # Overflight filter: satellites whose ground track never comes within their horizon of a target
+                        # during the window (libs/overflight_index.py) are left out of the simulation
+                        if simu_paras.get('overflight_filter'):
+                            from libs.overflight_index import unreachable_satellites
+                            with span("overflight"):
+                                skipped = set(await asyncio.to_thread(unreachable_satellites, satellites_dict, simu_paras))
+                            satellites_dict = [item for item in satellites_dict if item['ID'] not in skipped]
+                            yield f"data: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}   过境索引筛选：{len(skipped)}颗卫星在仿真时段内不会飞越目标，跳过仿真计算......\n\n"
+                        
                         yield f"data: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}   正在进行仿真算法的参数配置！\n\n"
                         
                         # Parameter Configuration
@@ -342,81 +890,133 @@ class SimulationService:
                         simulation_dict['mount_path'] = mount_path
                         simulation_dict['result'] = {}
 
+                        simulation_dict['payload'] = constellation_name
+                        simulation_dict['ID'] = simu_paras['ID']
+
                         no_optical_id = []
                         no_result_id = []
-                        
+
+                        # Satellites are split into batches, each batch is simulated by one STK process (batch mode).
+                        # Batches run concurrently, bounded by SIMULATION_MAX_WORKERS engine runs at a time over the
+                        # whole job (the time chunks of a batch take their slots from the same limiter).
+                        # Workers report through the events queue so progress interleaves as satellites finish.
+                        limiter = asyncio.Semaphore(max(1, app_config.SIMULATION_MAX_WORKERS))
+                        events = asyncio.Queue()
+
+                        async def report_line(line):
+                            message = stk_progress_message(line)
+                            if message:
+                                await events.put(('progress', message))
+
+                        async def simulate_batch(batch, index):
+                            batch_ids = '、'.join(item['ID'] for item in batch)
+                            status = {}
+                            try:
+                                await events.put(('progress', f"正在对{batch_ids}号卫星进行仿真计算......"))
+                                manifest = [{"ID": item['ID'], "name": item['name'], "tle1": item['tle1'], "tle2": item['tle2'],
+                                             "sensor_type": item["sensor_type"], "sensor_para": item['sensor_para'],
+                                             "save_path": satellites_path + '/' + item['name'] + "_" + item['ID']} for item in batch]
+                                with span("simulate.batch", batch=index, satellites=len(batch)):
+                                    status = await self.run_simulation_batch(manifest, save_dir + f"/stk_manifests/manifest_{index}.json",
+                                                                             simu_paras, report_line, limiter)
+                            except Exception as e:
+                                logging.error(f"{simu_paras['ID']}号星座中ID为{batch_ids}的卫星仿真任务执行出错: {e}")
+                            finally:
+                                for item in batch:
+                                    await events.put(('done', (item, 0 if status.get(item['ID']) else 1)))
+
+                        pending = []
                         for item in satellites_dict:
                             if item["sensor_type"] == 2:
                                 no_optical_id.append(item['ID'])
                                 yield f"data: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}   {item['ID']}号卫星搭载不是光学传感器，目前仿真算法暂不支持......\n\n"
                             else:
+                                ID = item['ID']
+                                name = item['name']
+                                os.makedirs(satellites_path + '/' + name + "_" + ID, exist_ok=True)
+                                simulation_dict['result'][ID] = {'name': name, 'satellite_dir': satellites_path + '/' + name + "_" + ID}
+                                pending.append(item)
+
+                        # Identical inputs reuse the stored results: the whole job, or the unchanged satellites
+                        cache = get_result_cache()
+                        satellite_keys = {item['ID']: ResultCache.satellite_key(item, simu_paras) for item in pending}
+                        cached_ids = set()
+                        if cache is not None:
+                            job_key = cache.job_key(simu_paras['level'], constellation_name, satellite_keys.values(), no_optical_id)
+                            with span("cache"):
+                                meta = await asyncio.to_thread(cache.load, "job", job_key, save_dir)
+                            if meta is not None:
+                                url = result_url(save_dir, constellation_name)
+                                yield f"data: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}   已命中仿真结果缓存，ID为{simu_paras['ID']}的星座仿真任务的相关结果均已生成！\n\n"
+                                logging.info(f'{simu_paras['ID']}号星座的仿真任务命中仿真结果缓存！')
+                                profile.status = "succeeded"
+                                yield f"data: __RESULT__:{ {'url': url, 'message': meta['message']} }\n\n"
+                                return
+
+                        # Unchanged satellites are taken from the result cache. Without it (RESULT_CACHE_MAX_SIZE=0),
+                        # incremental requests take them from the last incremental run of the same scenario instead
+                        incremental = cache is None and simu_paras.get('incremental')
+                        incremental_key = scenario_key(simu_paras['ID'], simu_paras)
+                        last_run = await asyncio.to_thread(load_last_run, incremental_key) if incremental else {}
+                        to_simulate = []
+                        cache_start = time.perf_counter()
+                        for item in pending:
+                            satellite_dir = simulation_dict['result'][item['ID']]['satellite_dir']
+                            if cache is not None and await asyncio.to_thread(cache.load, "satellite", satellite_keys[item['ID']], satellite_dir) is not None:
+                                cached_ids.add(item['ID'])
+                                await events.put(('progress', f"{item['ID']}号卫星已命中仿真结果缓存，跳过仿真计算......"))
+                                await events.put(('done', (item, 0)))
+                                continue
+                            previous_dir = unchanged_satellite_dir(last_run, item['ID'], satellite_keys[item['ID']])
+                            if previous_dir:
+                                if os.path.abspath(previous_dir) != os.path.abspath(satellite_dir):
+                                    await asyncio.to_thread(link_tree, previous_dir, satellite_dir, SATELLITE_CACHE_EXCLUDE)
+                                await events.put(('progress', f"{item['ID']}号卫星的轨道和传感器参数与上次仿真相同，复用上次仿真结果......"))
+                                await events.put(('done', (item, 0)))
+                            else:
+                                to_simulate.append(item)
+                        record("cache", time.perf_counter() - cache_start, satellites=len(pending))
+                        if incremental:
+                            yield f"data: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}   增量仿真：{len(pending) - len(to_simulate)}颗卫星无变化，{len(to_simulate)}颗卫星需要重新仿真计算......\n\n"
+
+                        batch_size = app_config.STK_BATCH_SIZE
+                        if simu_paras['algorithm_type'] == ALGORITHM_NATIVE:
+                            # The native engine propagates the whole constellation in one vectorized call
+                            batch_size = max(1, len(to_simulate))
+                        elif batch_size <= 0:
+                            batch_size = max(1, math.ceil(len(to_simulate) / max(1, app_config.SIMULATION_MAX_WORKERS)))
+                        tasks = [asyncio.create_task(simulate_batch(to_simulate[i:i + batch_size], i // batch_size))
+                                 for i in range(0, len(to_simulate), batch_size)]
+
+                        simulate_start = time.perf_counter()
+                        try:
+                            finished = 0
+                            while finished < len(pending):
+                                kind, payload = await events.get()
+                                if kind == 'progress':
+                                    yield f"data: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}   {payload}\n\n"
+                                    continue
+
+                                finished += 1
+                                item, returncode = payload
                                 ID = item['ID']
                                 name = item['name']
                                 tle = item['tle1'].strip() + r'\n' + item['tle2'].strip()
                                 attitude_angle = " ".join([item['sensor_para'][4], item['sensor_para'][3], item['sensor_para'][2]])
                                 manoeuvrability = item['sensor_para'][5]
-
-                                point_path = satellites_path + '/' + name + "_" + ID + "/point.txt"
-                                line_path = satellites_path + '/' + name + "_" + ID + "/line.txt"
-                                area_path = satellites_path + '/' + name + "_" + ID + "/area.txt"
-                                os.makedirs(satellites_path + '/' + name + "_" + ID, exist_ok=True)
                                 sensor_data = str(float(item['sensor_para'][0]) * 2) + ' ' + str(float(item['sensor_para'][1]) * 2)
-                                
-                                yield f"data: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}   正在对{ID}号卫星进行仿真计算......\n\n"
-                                
-                                satellites_json = [{"ID": ID, "name": name, "tle1": item['tle1'], "tle2": item['tle2'],
-                                                        "sensor_type": item["sensor_type"], "sensor_para": item['sensor_para']}]
-                                satellites_json = json.dumps(satellites_json)
-                                satellites_json = satellites_json.replace('"', '\\"')
-                                
-                                if app_config.STK_LOCAL:
-                                    # STK On-Premises Deployment
-                                    exe_path = app_config.STK_PYTHON_LOCAL_EXE
-                                    script_full_path = app_config.STK_SCRIPT_LOCAL_PATH
-                                    args = [
-                                        script_full_path,
-                                        "--start_time", simu_paras['start_time'],
-                                        "--end_time", simu_paras['end_time'],
-                                        "--step", interval,
-                                        "--satellites", satellites_json,
-                                        "--path", satellites_path + '/' + name + "_" + ID,
-                                        "--point", simu_paras['point_data'],
-                                        "--line", simu_paras['line_data'],
-                                        "--area", simu_paras['area_data']
-                                    ]
-                                    local_cmd = f'"{exe_path}" ' + " ".join(f'"{a}"' for a in args)
-                                    returncode, stdout, stderr = await self.execute_local_command(local_cmd)
-                                    result = type('obj', (object,), {'returncode': returncode})
-                                else:
-                                    # STK Non-On-Premises Deployment
-                                    exe_path = app_config.STK_PYTHON_REMOTE_EXE
-                                    script_full_path = app_config.STK_SCRIPT_REMOTE_PATH
-                                    args = [
-                                        script_full_path,
-                                        "--start_time", simu_paras['start_time'],
-                                        "--end_time", simu_paras['end_time'],
-                                        "--step", interval,
-                                        "--satellites", satellites_json,
-                                        "--path", replace_before_output(satellites_path + '/' + name + "_" + ID, app_config.REPLACE_BASE),
-                                        "--point", simu_paras['point_data'],
-                                        "--line", simu_paras['line_data'],
-                                        "--area", simu_paras['area_data']
-                                    ]
-                                    remote_cmd = f'"{exe_path}" ' + " ".join(f'"{a}"' for a in args)
-                                    returncode, stdout, stderr = await self.execute_ssh_command(remote_cmd)
-                                    result = type('obj', (object,), {'returncode': returncode})
 
-                                simulation_dict['result'][ID] = {'name': name, 'satellite_dir': satellites_path + '/' + name + "_" + ID}
-                                simulation_dict['payload'] = constellation_name
-                                
-                                if result.returncode != 0:
+                                if returncode != 0:
                                     yield f"data: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}   {ID}号卫星仿真计算的结果确认失败......\n\n"
                                     no_result_id.append(ID)
                                     logging.info(f'{simu_paras['ID']}号星座中ID为{ID}的卫星仿真任务执行失败！')
                                 else:
                                     yield f"data: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}   {ID}号卫星仿真计算的结果已确认......\n\n"
                                     logging.info(f'{simu_paras['ID']}号星座中ID为{ID}的卫星仿真任务执行成功！')
-                                    
+                                    if cache is not None and ID not in cached_ids:
+                                        await asyncio.to_thread(cache.store, "satellite", satellite_keys[ID], satellites_path + '/' + name + "_" + ID,
+                                                                exclude=SATELLITE_CACHE_EXCLUDE)
+
                                     dt_start = datetime.strptime(start_time, '%Y %m %d %H %M %S')
                                     dt_end = datetime.strptime(end_time, '%Y %m %d %H %M %S')
 
@@ -436,22 +1036,39 @@ class SimulationService:
 
                                     yield f"data: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}   {ID}号卫星仿真计算的参数信息已保存......\n\n"
                                     logging.info(f'{simu_paras['ID']}号星座中ID为{ID}的卫星仿真任务的相关执行参数已保存！')
-                        
+                        finally:
+                            for task in tasks:
+                                task.cancel()
+                            # Wait for cancelled batches to stop their engines before going on
+                            await asyncio.gather(*tasks, return_exceptions=True)
+                            record("simulate", time.perf_counter() - simulate_start, satellites=len(to_simulate))
+
                         yield f"data: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}   星座所有卫星的仿真计算均已完成，正在分析所有仿真结果......\n\n"
+                        if incremental:
+                            await asyncio.to_thread(save_last_run, incremental_key, {
+                                ID: {'fingerprint': satellite_keys[ID], 'satellite_dir': value['satellite_dir']}
+                                for ID, value in simulation_dict['result'].items() if ID not in no_result_id
+                            })
+                        if simu_paras['algorithm_type'] == ALGORITHM_NATIVE:
+                            from libs.native_engine import write_constellation_coverage
+                            satellite_dirs = [value['satellite_dir'] for key, value in simulation_dict['result'].items() if key not in no_result_id]
+                            with span("constellation_coverage"):
+                                await asyncio.to_thread(write_constellation_coverage, satellite_dirs, simu_paras, simulation_path)
                         yield f"data: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}   正在构建分析报告......\n\n"
                         
-                        from libs.report import create_report
-                        await create_report(simu_paras['level'], simulation_dict, interval)
+                        with span("report"):
+                            async for message in self.build_report(simu_paras['level'], simulation_dict, interval):
+                                yield message
                         
                         yield f"data: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}   正在生成仿真结果可视化页面......\n\n"
-                        url = f'/?data_path={os.path.join(save_dir, constellation_name)}&zip_path={os.path.join(save_dir, 'report.zip')}'
+                        url = result_url(save_dir, constellation_name)
                         yield f"data: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}   ID为{simu_paras['ID']}的星座仿真任务执行成功，相关结果均已成功生成！\n\n"
                         logging.info(f'{simu_paras['ID']}号星座的仿真任务执行完成！')
                         
                         # Generate Simulation Log File.txt
                         dt_start = datetime.strptime(start_time, '%Y %m %d %H %M %S')
                         dt_end = datetime.strptime(end_time, '%Y %m %d %H %M %S')
-                        algorithm = '行业算法' if simu_paras['algorithm_type'] == 1 else 'STK'
+                        algorithm = algorithm_name(simu_paras['algorithm_type'])
                         with open(simulation_path + "/simulation_paras.txt", "a", encoding="utf-8") as f:
                             f.write(f"星座编号：{simu_paras['ID']}\n")
                             f.write(f"仿真开始时间：{dt_start.year}年{dt_start.month}月{dt_start.day}日{dt_start.hour}时{dt_start.minute}分{dt_start.second}秒\n")
@@ -464,25 +1081,40 @@ class SimulationService:
                         logging.info(f'{simu_paras['ID']}号星座仿真任务的相关执行参数已保存！')
 
                         if len(no_optical_id) == 0 and len(no_result_id) == 0:
-                            yield f"data: __RESULT__:{ {'url': url, 'message': 'success'} }\n\n"
-                            return
+                            message = 'success'
                         elif len(no_optical_id) == 0 and len(no_result_id) != 0:
-                            yield f"data: __RESULT__:{ {'url': url, 'message': f'success, but the simulation algorithm for the {('、'.join(no_result_id))} satellite in this constellation has encountered an execution error. Please check the input parameter format or review the log.'} }\n\n"
-                            return
+                            message = f'success, but the simulation algorithm for the {('、'.join(no_result_id))} satellite in this constellation has encountered an execution error. Please check the input parameter format or review the log.'
                         elif len(no_optical_id) != 0 and len(no_result_id) == 0:
-                            yield f"data: __RESULT__:{ {'url': url, 'message': f'success, but the {('、'.join(no_optical_id))} satellite sensor in this constellation is of the SAR type and does not currently support simulation calculations.'} }\n\n"
-                            return
+                            message = f'success, but the {('、'.join(no_optical_id))} satellite sensor in this constellation is of the SAR type and does not currently support simulation calculations.'
                         else:
-                            yield f"data: __RESULT__:{ {'url': url, 'message': f'success, but the {('、'.join(no_optical_id))} satellite sensor in this constellation is of the SAR type and does not currently support simulation calculations.\
-                                                            Additionally, the simulation algorithm for the {('、'.join(no_result_id))} satellite among the remaining satellites has encountered an execution error, please verify the format of the input parameters or review the log.'} }\n\n"
-                            return
+                            message = f'success, but the {('、'.join(no_optical_id))} satellite sensor in this constellation is of the SAR type and does not currently support simulation calculations.\
+                                                            Additionally, the simulation algorithm for the {('、'.join(no_result_id))} satellite among the remaining satellites has encountered an execution error, please verify the format of the input parameters or review the log.'
+
+                        # Jobs with failed satellites are not cached, the failure may not happen again
+                        if cache is not None and len(no_result_id) == 0:
+                            with span("cache"):
+                                await asyncio.to_thread(cache.store, "job", job_key, save_dir, {'message': message}, exclude=("stk_manifests",))
+                        profile.status = "succeeded"
+                        from libs.report import store_report_results
+                        store_report_results(simu_paras['level'], simulation_dict)
+                        yield f"data: __RESULT__:{ {'url': url, 'message': message} }\n\n"
+                        return
                     except Exception as e:
                         logging.error(f"{simu_paras['ID']}号星座的仿真任务执行出错: {e}")
                         yield f"data: 仿真任务执行出错: {str(e)}\n\n"
+            except asyncio.CancelledError:
+                profile.status = "cancelled"
+                # Cancelled job: the engines are stopped by now, remove the partial results
+                if save_dir is not None:
+                    await asyncio.to_thread(shutil.rmtree, save_dir, True)
+                    logging.info(f"仿真任务已取消，已清理未完成的仿真结果: {save_dir}")
+                raise
             except Exception as e:
                 logging.error(f"仿真执行出错: {str(e)}")
                 yield f"data: 仿真任务执行出错: {str(e)}\n\n"
             finally:
                 await pool.release(client)
+                # Stage timings next to simulation_paras.txt, see /simulation_profiles for the aggregate
+                finish_profile(profile, os.path.join(save_dir, "simulation_report") if save_dir else None)
 
-        return StreamingResponse(event_generator(), media_type="text/event-stream")
\ No newline at end of file
+        return event_generator()
\ No newline at end of file
@@ -1,3 +1,9 @@
+import calendar
+import json
+import os
+import struct
+import sys
+from array import array
 from datetime import datetime
 
 def trans_date_stk(date1):
@@ -5,73 +11,93 @@ def trans_date_stk(date1):
     date2 = dt.strftime("%d %b %Y %H:%M:%S.%f")[:-3]
     return date2
 
-def trans_date(date1):
-    '''
-    :param date1: Original time format, eg: '20 Jun 2023 20:31:27.744707798'
-    :return:  Converted time format, eg: '2023-06-20 20:31:27.745'
-    '''
-    date_part = date1.split('.')[0]
-    nanosec = date1.split('.')[1]
-
-    millis = float('0.' + nanosec)
+MONTHS = {'Jan': 1, 'Feb': 2, 'Mar': 3, 'Apr': 4, 'May': 5, 'Jun': 6,
+          'Jul': 7, 'Aug': 8, 'Sep': 9, 'Oct': 10, 'Nov': 11, 'Dec': 12}
 
-    dt = datetime.strptime(date_part, "%d %b %Y %H:%M:%S")
-
-    date2 = dt.strftime("%Y-%m-%d %H:%M:%S.") + f"{format(millis, ".3f").split('.')[1][:3]}"
-    return date2
+# Columnar result file read by serve_backend/libs/columnar.py:
+#   8 bytes magic, little-endian uint64 header length, UTF-8 JSON header
+#   {"columns": [{"name", "dtype", "length", "offset"}, ...]}, then every column as raw little-endian
+#   data, 64-byte aligned, offsets relative to the first aligned byte after the header
+COLUMNS_FILE = "columns.bin"
+COLUMNS_MAGIC = b"SCOLUMN1"
+COLUMNS_ALIGN = 64
+COLUMN_DTYPES = {'d': '<f8', 'f': '<f4', 'q': '<i8'}
 
-def posLLA(save_path, time_table, lons, lats, alts):
+def stk_epoch_seconds(values):
     '''
-    :param time_table: Time table
-    :param lats: Latitude projection list
-    :param lons: Longitude projection list
-    :param alts: Elevation list
-    :return: Generate a text file for position LLA
+    :param values: STK UTCG times, eg: '20 Jun 2023 20:31:27.744707798'
+    :return: Epoch seconds (UTC) list, calendar dates are converted once per day instead of strptime per row
     '''
-
-    header_label = "时间                         经度(°)         纬度(°)        高度(km)\n"
-    with open(save_path + "/posLLA.txt", "w", encoding="utf-8") as f:
-        f.write(header_label)
-        for t in zip(time_table, lons, lats, alts):
-            new_row = '     '.join([trans_date(t[0]), format(t[1], ".6f"), format(t[2], ".6f"), format(t[3], ".6f")]) + '\n'
-            f.write(new_row)
-
-def sensorProjection(save_path, all_latitudes, all_longitudes):
-
-    header_label = "  lat(deg)       lon(deg)\n"
-    with open(save_path + "/sensorProjection.txt", "w", encoding="utf-8") as f:
-        f.write(header_label)
-        for t in zip(all_latitudes, all_longitudes):
-            for i in zip(t[0], t[1]):
-                new_row = '      ' + '      '.join([format(i[0], ".3f"), format(i[1], ".3f")]) + '\n'
-                f.write(new_row)
-
-def stk_report(save_path, paras, target_type):
-    # Obtain Coverage Analysis Reports for Point/Line/Area Targets
-
-    hearder_label_dict = {1: "start|          |点位可见时段：\n",
-                          2: "start|          |线可见时段：\n",
-                          3: "start|          |面可见时段：\n"}
-    sec_headers_label_dict = {1: "                  开始时间（UTC）             结束时间（UTC）    持续时间（s）\n",
-                              2: "                  开始时间（UTC）             结束时间（UTC）    持续时间（s）\n",
-                              3: "                  开始时间（UTC）             结束时间（UTC）    持续时间（s）    覆盖百分比（%）\n"
-    }
-    file_name_dict = {1: "/point.txt",
-                      2: "/line.txt",
-                      3: "/area.txt"}
-
-    with open(save_path + file_name_dict[target_type], "w", encoding="utf-8") as f:
-        f.write(hearder_label_dict[target_type])
-        f.write(sec_headers_label_dict[target_type])
-        if target_type == 1 or target_type == 2:
-            for t in zip(paras[0], paras[1], paras[2]):
-                new_row = f"{trans_date(t[0])} |  {trans_date(t[1])} |  {t[2]:6.3f}" + "\n"
-                f.write(new_row)
-        else:
-            for t in zip(paras[0], paras[1], paras[2], paras[3]):
-                new_row = f"{trans_date(t[0])} |  {trans_date(t[1])} |  {t[2]:10.3f} |  {t[3]:10.2f}%" + "\n"
-                f.write(new_row)
-        f.write("end")
+    days = {}
+    seconds = []
+    for value in values:
+        day, month, year, clock = value.split()
+        key = (day, month, year)
+        if key not in days:
+            days[key] = calendar.timegm((int(year), MONTHS[month], int(day), 0, 0, 0))
+        hour, minute, second = clock.split(':')
+        seconds.append(days[key] + int(hour) * 3600 + int(minute) * 60 + float(second))
+    return seconds
+
+def _align(size):
+    return (size + COLUMNS_ALIGN - 1) // COLUMNS_ALIGN * COLUMNS_ALIGN
+
+def write_columns(path, columns):
+    '''
+    :param path: File path
+    :param columns: List of (name, typecode, values), typecode 'd' float64, 'f' float32 or 'q' int64
+    :return: Write the columns as a columnar file, atomically
+    '''
+    entries, blobs, offset = [], [], 0
+    for name, typecode, values in columns:
+        data = array(typecode, values)
+        if sys.byteorder == 'big':
+            data.byteswap()
+        blob = data.tobytes()
+        entries.append({"name": name, "dtype": COLUMN_DTYPES[typecode], "length": len(data), "offset": offset})
+        blobs.append(blob)
+        offset += _align(len(blob))
+    header = json.dumps({"columns": entries}).encode('utf-8')
+
+    with open(path + ".tmp", "wb") as f:
+        f.write(COLUMNS_MAGIC)
+        f.write(struct.pack('<Q', len(header)))
+        f.write(header)
+        f.write(b'\0' * (_align(16 + len(header)) - 16 - len(header)))
+        for blob in blobs:
+            f.write(blob)
+            f.write(b'\0' * (_align(len(blob)) - len(blob)))
+    os.replace(path + ".tmp", path)
+
+def write_satellite_columns(save_path, time_table, lons, lats, alts, all_latitudes, all_longitudes, access):
+    '''
+    :param save_path: Result folder of the satellite
+    :param time_table: STK UTCG time of every position
+    :param lons: Longitude list
+    :param lats: Latitude list
+    :param alts: Elevation list (km)
+    :param all_latitudes: Sensor projection vertex latitudes, one list per timestamp
+    :param all_longitudes: Sensor projection vertex longitudes, one list per timestamp
+    :param access: {1: point, 2: line, 3: area} access data, [start_times, stop_times] and, for the area, coverage_percent
+    :return: Generate the columnar result file of the satellite, the backend exports the text reports from it
+    '''
+    offsets = [0]
+    for values in all_latitudes:
+        offsets.append(offsets[-1] + len(values))
+    columns = [
+        ("time", 'd', stk_epoch_seconds(time_table)),
+        ("lon", 'd', lons),
+        ("lat", 'd', lats),
+        ("alt", 'd', alts),
+        ("footprint_lat", 'f', [round(v, 3) for values in all_latitudes for v in values]),
+        ("footprint_lon", 'f', [round(v, 3) for values in all_longitudes for v in values]),
+        ("footprint_offsets", 'q', offsets)
+    ]
+    for target_type, target in ((1, "point"), (2, "line"), (3, "area")):
+        columns.append((target + "_start", 'd', stk_epoch_seconds(access[target_type][0])))
+        columns.append((target + "_stop", 'd', stk_epoch_seconds(access[target_type][1])))
+    columns.append(("area_percent", 'd', access[3][2]))
+    write_columns(os.path.join(save_path, COLUMNS_FILE), columns)
 
 def format_tle_line1(line1: str) -> str:
     """
@@ -1,4 +1,5 @@
 import os
+import sys
 from agi.stk12.stkruntime import STKRuntime
 from agi.stk12.stkobjects import *
 from agi.stk12.stkutil import AgEYPRAnglesSequence
@@ -7,6 +8,261 @@ import argparse
 import json
 import socket
 import contextlib
+import time
+
+
+# Search for an available port
+def get_free_port():
+    with contextlib.closing(socket.socket(socket.AF_INET, socket.SOCK_STREAM)) as s:
+        s.bind(('', 0))
+        s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        return s.getsockname()[1]
+
+
+def report_timing(phase, start, ID=None):
+    '''
+    Print how long a phase took as "TIMING <phase> <seconds> [ID]", the backend adds it to the job profile
+    :param phase: Phase name
+    :param start: time.perf_counter() at the start of the phase
+    :param ID: Satellite ID for the per-satellite phases
+    '''
+    suffix = f" {ID}" if ID is not None else ""
+    print(f"TIMING {phase} {time.perf_counter() - start:.6f}{suffix}", flush=True)
+
+
+def start_stk():
+    '''
+    Start an STK runtime on a free port
+    :return: (stk, root) the runtime handle and its object root
+    '''
+    free_port = get_free_port()
+    stk = STKRuntime.StartApplication(grpc_host="0.0.0.0", grpc_port=free_port, userControl=False)
+    root = stk.NewObjectRoot()
+    return stk, root
+
+
+def build_scenario(root, start_time, end_time, point, line, area):
+    '''
+    Create the scenario with its ground targets, the reusable satellite/sensor pair and the area coverage definition
+    :param root: STK object root
+    :param start_time: Simulation start time 20130912032513
+    :param end_time: Simulation end time 20130915032619
+    :param point: Point data (longitude first, latitude second) "123 41"
+    :param line: Line data "123 31|124 31"
+    :param area: Area data "123 34|134 41|127 37"
+    :return: dict of the scenario objects used by simulate_satellite
+    '''
+    root.NewScenario("MyScenario")
+
+    scenario = root.CurrentScenario
+    scenario.SetTimePeriod(trans_date_stk(start_time), trans_date_stk(end_time))
+
+    # ------------------------------Create Ground Point Target--------------------------------------------
+    target_point = scenario.Children.New(23, 'PointTarget')
+    point_lat = float(point.split(' ')[1])
+    point_lon = float(point.split(' ')[0])
+    # 纬度在前，经度在后
+    target_point.Position.AssignGeodetic(point_lat, point_lon, 0)
+
+    # ------------------------------Create Ground Line Target--------------------------------------------
+    target_line = scenario.Children.New(2, 'LineTarget')
+    line_coords = line.split('|')
+    target_line.AreaType = AgEAreaType.ePattern
+    line_pattern = target_line.AreaTypeData
+    for coords in line_coords:
+        coord_lat = coords.split(' ')[1]
+        coord_lon = coords.split(' ')[0]
+        line_pattern.Add(coord_lat, coord_lon)
+
+    line_pattern.Add(line_coords[0].split(' ')[1], line_coords[0].split(' ')[0])  
+
+    # ------------------------------Create a ground surface target---------------------------------------------
+    target_area = scenario.Children.New(2, 'AreaTarget')
+    area_coords = area.split('|')
+    target_area.AreaType = AgEAreaType.ePattern
+    area_pattern = target_area.AreaTypeData
+    for coords in area_coords:
+        coord_lat = coords.split(' ')[1]
+        coord_lon = coords.split(' ')[0]
+        area_pattern.Add(coord_lat, coord_lon)
+
+    # -------------------------Create satellite------------------------------------
+    satellite = scenario.Children.New(18, "Satellite")  
+
+    # ------------------------Create Sensor------------------------------------
+    sensor = satellite.Children.New(20, "Sensor") 
+
+    # ------------------------Create Ground Cover Analysis Target----------------------------
+    coveragedefinition = scenario.Children.New(7, 'GroundCoverage')  # CoverageDefinition
+
+    coveragedefinition.Grid.BoundsType = AgECvBounds.eBoundsCustomBoundary
+    bounds = coveragedefinition.Grid.Bounds
+    bounds.BoundaryObjects.AddObject(target_area)
+
+    coveragedefinition.Grid.ResolutionType = AgECvResolution.eResolutionLatLon
+    coveragedefinition.Grid.Resolution.LatLon = 0.1
+
+    coveragedefinition.AssetList.Add(sensor.Path)
+
+    return {
+        'scenario': scenario,
+        'target_point': target_point,
+        'target_line': target_line,
+        'target_area': target_area,
+        'satellite': satellite,
+        'sensor': sensor,
+        'coveragedefinition': coveragedefinition
+    }
+
+
+def simulate_satellite(ctx, item, step):
+    '''
+    Simulate one satellite in a scenario built by build_scenario and write its reports to item["save_path"]
+    :param ctx: Scenario objects returned by build_scenario
+    :param item: Satellite and sensor parameters with the result folder in "save_path"
+    :param step: Step size (s)
+    '''
+    scenario = ctx['scenario']
+    target_point = ctx['target_point']
+    target_line = ctx['target_line']
+    satellite = ctx['satellite']
+    sensor = ctx['sensor']
+    coveragedefinition = ctx['coveragedefinition']
+
+    save_path = item['save_path']
+    os.makedirs(save_path, exist_ok=True)
+    t = time.perf_counter()
+    # --------------------------------------Save TLE file---------------------------------------------
+    line1_fmt, line2_fmt = format_tle(item['tle1'], item['tle2'])
+    tle1 = line1_fmt + '\n'
+    tle2 = line2_fmt + '\n'
+
+    with open(save_path + "/TLE.txt", "w", encoding="utf-8") as f:
+        f.write(tle1)
+        f.write(tle2)
+
+    # --------------------------------------Set satellite orbital parameters------------------------------------------
+    satellite.SetPropagatorType(4)  # 4 = ePropagatorSGP4
+    propagator = satellite.Propagator
+    # The satellite object is reused across the batch, drop the previous member's TLE segments
+    propagator.Segments.RemoveAllSegs()
+    # Load Tracks from TLE File
+    propagator.CommonTasks.AddSegsFromFile(str(item['ID']), save_path + "/TLE.txt")
+    propagator.Propagate()
+
+    # --------------------------------------Set sensor parameters------------------------------------------
+    sensor.CommonTasks.SetPatternRectangular(float(item['sensor_para'][0]) * 2, float(item['sensor_para'][1]) * 2)  # 矩形视场
+    yaw = item['sensor_para'][4]
+    pitch = item['sensor_para'][3]
+    roll = item['sensor_para'][2]
+    sensor.CommonTasks.SetPointingFixedYPR(AgEYPRAnglesSequence.eYPR, float(yaw), float(pitch), float(roll))  # 传感器姿态角
+    report_timing("propagate", t, item['ID'])
+    t = time.perf_counter()
+
+    # ------------------------------------LLA POSITION----------------------------------------------
+
+    lla_DP = satellite.DataProviders["LLA State"].Group.Item(1)
+
+    startTime = scenario.StartTime
+    stopTime = scenario.StopTime
+    result = lla_DP.Exec(startTime, stopTime, float(step))
+
+    time_table = result.DataSets.GetDataSetByName("Time").GetValues()
+    lons = result.DataSets.GetDataSetByName("Lon").GetValues()
+    lats = result.DataSets.GetDataSetByName("Lat").GetValues()
+    alts = result.DataSets.GetDataSetByName("Alt").GetValues()
+
+    report_timing("position", t, item['ID'])
+    t = time.perf_counter()
+
+    # -------------------------------------Sensor Projection----------------------------------------
+    sensor_dp = sensor.DataProviders['Pattern Intersection']
+
+    # float(step)
+    result = sensor_dp.Exec(startTime, stopTime, float(step)).DataSets 
+    element_names = result.ElementNames
+    latitude_indices = [i for i, name in enumerate(element_names) if name == 'Latitude']
+    longitude_indices = [i for i, name in enumerate(element_names) if name == "Longitude"]
+
+    all_latitudes = []
+    for idx in latitude_indices:
+        ds = result.Item(idx)
+        values = ds.GetValues()
+        all_latitudes.append(values)
+
+    all_longitudes = []
+    for idx in longitude_indices:
+        ds = result.Item(idx)
+        values = ds.GetValues()
+        all_longitudes.append(values)
+
+    report_timing("projection", t, item['ID'])
+    t = time.perf_counter()
+
+    # ---------------------------------------simulation report-----------------------------------------
+
+    # ----------point
+    access = sensor.GetAccessToObject(target_point)
+    access.ComputeAccess()
+    dp = access.DataProviders.Item('Access Data')
+    results = dp.Exec(scenario.StartTime, scenario.StopTime)
+    if results.DataSets.Count != 0:
+        # Overlapping results
+        start_times = results.DataSets.GetDataSetByName('Start Time').GetValues()
+        stop_times = results.DataSets.GetDataSetByName('Stop Time').GetValues()
+        durations = results.DataSets.GetDataSetByName('Duration').GetValues()
+    else:
+        start_times = []
+        stop_times = []
+        durations = []
+
+    paras_point = [start_times, stop_times, durations]
+
+    # -----------line
+    access = sensor.GetAccessToObject(target_line)
+    access.ComputeAccess()
+    dp = access.DataProviders.Item('Access Data')
+    results = dp.Exec(scenario.StartTime, scenario.StopTime)
+
+    if results.DataSets.Count != 0:
+        start_times = results.DataSets.GetDataSetByName('Start Time').GetValues()
+        stop_times = results.DataSets.GetDataSetByName('Stop Time').GetValues()
+        durations = results.DataSets.GetDataSetByName('Duration').GetValues()
+    else:
+        start_times = []
+        stop_times = []
+        durations = []
+
+    paras_line = [start_times, stop_times, durations]
+    report_timing("access", t, item['ID'])
+    t = time.perf_counter()
+
+    # -----------area
+    coveragedefinition.ComputeAccesses()
+
+    coverage_access = coveragedefinition.DataProviders['All Regions By Pass']
+    coverage_result = coverage_access.Exec().DataSets
+
+    if coverage_result.Count != 0:
+        start_times = coverage_result.GetDataSetByName('Access Start').GetValues()
+        stop_times = coverage_result.GetDataSetByName('Access End').GetValues()
+        durations = coverage_result.GetDataSetByName('Duration').GetValues()
+        coverage_percent = coverage_result.GetDataSetByName('Percent Coverage').GetValues()
+    else:
+        start_times = []
+        stop_times = []
+        durations = []
+        coverage_percent = []
+
+    paras_area = [start_times, stop_times, durations, coverage_percent]
+    report_timing("coverage", t, item['ID'])
+    t = time.perf_counter()
+
+    # ---------------------------------------columnar results------------------------------------------
+    write_satellite_columns(save_path, time_table, lons, lats, alts, all_latitudes, all_longitudes,
+                            {1: paras_point, 2: paras_line, 3: [paras_area[0], paras_area[1], paras_area[3]]})
+    report_timing("write", t, item['ID'])
+
 
 def main():
     '''
@@ -22,223 +278,70 @@ def main():
              “sensor_para”: xxx
            }, ...... ]
     path: str # Folder path for storing simulation result reports
+    manifest: str # Batch mode: JSON file holding the satellites list, each item carrying its own "save_path";
+                  # replaces --satellites/--path so one STK process simulates a whole batch
     point: str # Point data (longitude first, latitude second) “123 41”
     line: str # Line data “123 31|124 31”
     area: str # Area data “123 34|134 41|127 37”
     :return:
     '''
 
-     # Search for an available port
-    def get_free_port():
-        with contextlib.closing(socket.socket(socket.AF_INET, socket.SOCK_STREAM)) as s:
-            s.bind(('', 0))
-            s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-            return s.getsockname()[1]
-
-
     parser = argparse.ArgumentParser(description="stk engine api")
     parser.add_argument("--start_time", type=str, required=True, help="仿真任务开始时间")
     parser.add_argument("--end_time", type=str, required=True, help="仿真任务结束时间")
     parser.add_argument("--step", type=str, required=True, help="仿真步长")
-    parser.add_argument("--satellites", type=json.loads, required=True, help="存储卫星ID、name、TLE、传感器视场角、传感器姿态角的dict")
-    parser.add_argument("--path", type=str, required=True, help="存储仿真结果报告的文件夹路径")
+    parser.add_argument("--satellites", type=json.loads, help="存储卫星ID、name、TLE、传感器视场角、传感器姿态角的dict")
+    parser.add_argument("--path", type=str, help="存储仿真结果报告的文件夹路径")
+    parser.add_argument("--manifest", type=str, help="批量仿真清单文件路径，每颗卫星自带结果存储路径save_path")
     parser.add_argument("--point", type=str, required=True, help="点目标经纬度")
     parser.add_argument("--line", type=str, required=True, help="线目标经纬度")
     parser.add_argument("--area", type=str, required=True, help="面目标经纬度")
 
     args = parser.parse_args()  
-    # Dynamically obtain an available port
-    free_port = get_free_port()
 
-    stk = None
-    try:
-        # ------------------------------Create an STK instance-------------------------------------------
-        stk = STKRuntime.StartApplication(grpc_host="0.0.0.0", grpc_port=free_port, userControl=False)
-        root=stk.NewObjectRoot()
-        root.NewScenario("MyScenario")
-
-        scenario = root.CurrentScenario
-        scenario.SetTimePeriod(trans_date_stk(args.start_time), trans_date_stk(args.end_time))
-
-        # ------------------------------Create Ground Point Target--------------------------------------------
-        target_point = scenario.Children.New(23, 'PointTarget')
-        point_lat = float(args.point.split(' ')[1])
-        point_lon = float(args.point.split(' ')[0])
-        # 纬度在前，经度在后
-        target_point.Position.AssignGeodetic(point_lat, point_lon, 0)
-
-        # ------------------------------Create Ground Line Target--------------------------------------------
-        target_line = scenario.Children.New(2, 'LineTarget')
-        line_coords = args.line.split('|')
-        target_line.AreaType = AgEAreaType.ePattern
-        line_pattern = target_line.AreaTypeData
-        for coords in line_coords:
-            coord_lat = coords.split(' ')[1]
-            coord_lon = coords.split(' ')[0]
-            line_pattern.Add(coord_lat, coord_lon)
-
-        line_pattern.Add(line_coords[0].split(' ')[1], line_coords[0].split(' ')[0])  
-
-        # ------------------------------Create a ground surface target---------------------------------------------
-        target_area = scenario.Children.New(2, 'AreaTarget')
-        area_coords = args.area.split('|')
-        target_area.AreaType = AgEAreaType.ePattern
-        area_pattern = target_area.AreaTypeData
-        for coords in area_coords:
-            coord_lat = coords.split(' ')[1]
-            coord_lon = coords.split(' ')[0]
-            area_pattern.Add(coord_lat, coord_lon)
-
-        # -------------------------Create satellite------------------------------------
-        satellite = scenario.Children.New(18, "Satellite")  
-
-        # ------------------------Create Sensor------------------------------------
-        sensor = satellite.Children.New(20, "Sensor") 
-
-        # ------------------------Create Ground Cover Analysis Target----------------------------
-        coveragedefinition = scenario.Children.New(7, 'GroundCoverage')  # CoverageDefinition
-
-        coveragedefinition.Grid.BoundsType = AgECvBounds.eBoundsCustomBoundary
-        bounds = coveragedefinition.Grid.Bounds
-        bounds.BoundaryObjects.AddObject(target_area)
-
-        coveragedefinition.Grid.ResolutionType = AgECvResolution.eResolutionLatLon
-        coveragedefinition.Grid.Resolution.LatLon = 0.1
-
-        coveragedefinition.AssetList.Add(sensor.Path)
-
-        constellation_simu = len(args.satellites) > 1
-
-        for item in args.satellites:
+    if args.manifest:
+        with open(args.manifest, "r", encoding="utf-8") as f:
+            satellites = json.load(f)
+    elif args.satellites is not None and args.path:
+        satellites = args.satellites
+        constellation_simu = len(satellites) > 1
+        for item in satellites:
             if constellation_simu:
-                save_path = args.path + '/' + item['name'] + '_' + item['ID']
-            else:
-                save_path = args.path
-
-            os.makedirs(save_path, exist_ok=True)
-            # --------------------------------------Save TLE file---------------------------------------------
-            line1_fmt, line2_fmt = format_tle(item['tle1'], item['tle2'])
-            tle1 = line1_fmt + '\n'
-            tle2 = line2_fmt + '\n'
-
-            with open(save_path + "/TLE.txt", "w", encoding="utf-8") as f:
-                f.write(tle1)
-                f.write(tle2)
-
-            # --------------------------------------Set satellite orbital parameters------------------------------------------
-            satellite.SetPropagatorType(4)  # 4 = ePropagatorSGP4
-            propagator = satellite.Propagator
-            # Load Tracks from TLE File
-            propagator.CommonTasks.AddSegsFromFile(str(item['ID']), save_path + "/TLE.txt")
-            propagator.Propagate()
-
-            # --------------------------------------Set sensor parameters------------------------------------------
-            sensor.CommonTasks.SetPatternRectangular(float(item['sensor_para'][0]) * 2, float(item['sensor_para'][1]) * 2)  # 矩形视场
-            yaw = item['sensor_para'][4]
-            pitch = item['sensor_para'][3]
-            roll = item['sensor_para'][2]
-            sensor.CommonTasks.SetPointingFixedYPR(AgEYPRAnglesSequence.eYPR, float(yaw), float(pitch), float(roll))  # 传感器姿态角
-
-            # ------------------------------------LLA POSITION----------------------------------------------
-
-            lla_DP = satellite.DataProviders["LLA State"].Group.Item(1)
-
-            startTime = scenario.StartTime
-            stopTime = scenario.StopTime
-            result = lla_DP.Exec(startTime, stopTime, float(args.step))
-
-            time_table = result.DataSets.GetDataSetByName("Time").GetValues()
-            lons = result.DataSets.GetDataSetByName("Lon").GetValues()
-            lats = result.DataSets.GetDataSetByName("Lat").GetValues()
-            alts = result.DataSets.GetDataSetByName("Alt").GetValues()
-
-            posLLA(save_path, time_table, lons, lats, alts)
-
-            # -------------------------------------Sensor Projection----------------------------------------
-            sensor_dp = sensor.DataProviders['Pattern Intersection']
-
-            # float(args.step)
-            result = sensor_dp.Exec(startTime, stopTime, float(args.step)).DataSets 
-            element_names = result.ElementNames
-            latitude_indices = [i for i, name in enumerate(element_names) if name == 'Latitude']
-            longitude_indices = [i for i, name in enumerate(element_names) if name == "Longitude"]
-
-            all_latitudes = []
-            for idx in latitude_indices:
-                ds = result.Item(idx)
-                values = ds.GetValues()
-                all_latitudes.append(values)
-
-            all_longitudes = []
-            for idx in longitude_indices:
-                ds = result.Item(idx)
-                values = ds.GetValues()
-                all_longitudes.append(values)
-
-            sensorProjection(save_path, all_latitudes, all_longitudes)
-
-            # ---------------------------------------simulation report-----------------------------------------
-
-            # ----------point
-            access = sensor.GetAccessToObject(target_point)
-            access.ComputeAccess()
-            dp = access.DataProviders.Item('Access Data')
-            results = dp.Exec(scenario.StartTime, scenario.StopTime)
-            if results.DataSets.Count != 0:
-                # Overlapping results
-                start_times = results.DataSets.GetDataSetByName('Start Time').GetValues()
-                stop_times = results.DataSets.GetDataSetByName('Stop Time').GetValues()
-                durations = results.DataSets.GetDataSetByName('Duration').GetValues()
+                item['save_path'] = args.path + '/' + item['name'] + '_' + item['ID']
             else:
-                start_times = []
-                stop_times = []
-                durations = []
-
-            paras_point = [start_times, stop_times, durations]
-            stk_report(save_path, paras_point, 1)
-
-            # -----------line
-            access = sensor.GetAccessToObject(target_line)
-            access.ComputeAccess()
-            dp = access.DataProviders.Item('Access Data')
-            results = dp.Exec(scenario.StartTime, scenario.StopTime)
-
-            if results.DataSets.Count != 0:
-                start_times = results.DataSets.GetDataSetByName('Start Time').GetValues()
-                stop_times = results.DataSets.GetDataSetByName('Stop Time').GetValues()
-                durations = results.DataSets.GetDataSetByName('Duration').GetValues()
-            else:
-                start_times = []
-                stop_times = []
-                durations = []
-
-            paras_line = [start_times, stop_times, durations]
-            stk_report(save_path, paras_line, 2)
+                item['save_path'] = args.path
+    else:
+        parser.error("必须提供 --manifest，或同时提供 --satellites 与 --path")
 
-            # -----------area
-            coveragedefinition.ComputeAccesses()
-
-            coverage_access = coveragedefinition.DataProviders['All Regions By Pass']
-            coverage_result = coverage_access.Exec().DataSets
-
-            if coverage_result.Count != 0:
-                start_times = coverage_result.GetDataSetByName('Access Start').GetValues()
-                stop_times = coverage_result.GetDataSetByName('Access End').GetValues()
-                durations = coverage_result.GetDataSetByName('Duration').GetValues()
-                coverage_percent = coverage_result.GetDataSetByName('Percent Coverage').GetValues()
+    stk = None
+    failed = []
+    try:
+        # ------------------------------Create an STK instance-------------------------------------------
+        t = time.perf_counter()
+        stk, root = start_stk()
+        report_timing("startup", t)
+        t = time.perf_counter()
+        ctx = build_scenario(root, args.start_time, args.end_time, args.point, args.line, args.area)
+        report_timing("scenario", t)
+
+        for item in satellites:
+            t = time.perf_counter()
+            try:
+                simulate_satellite(ctx, item, args.step)
+            except Exception as e:
+                # Keep going so one bad satellite does not discard the rest of the batch
+                failed.append(item['ID'])
+                print(f"SATELLITE_FAILED {item['ID']} {e}", flush=True)
             else:
-                start_times = []
-                stop_times = []
-                durations = []
-                coverage_percent = []
-
-            paras_area = [start_times, stop_times, durations, coverage_percent]
-            stk_report(save_path, paras_area, 3)
+                print(f"SATELLITE_DONE {item['ID']}", flush=True)
+            report_timing("satellite", t, item['ID'])
     finally:
         if stk is not None:
+            t = time.perf_counter()
             stk.ShutDown() # Terminate the STK process
+            report_timing("shutdown", t)
 
-if __name__ == "__main__":
-    main()
-
+    return 1 if failed else 0
 
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,280 @@
+'''
+Warm STK worker daemon
+
+Keeps N STK runtimes started and serves simulation jobs over a local TCP socket, so a simulation no longer
+pays for StartApplication on every run. Between jobs the previous scenario is closed and a new one is built.
+
+Protocol: newline-delimited JSON, one request per line, any number of requests per connection.
+
+    -> {"op": "run", "job": {"start_time": "20130912032513", "end_time": "20130915032619", "step": "60",
+                             "point": "123 41", "line": "123 31|124 31", "area": "123 34|134 41|127 37",
+                             "satellites": [{"ID": xxx, "name": xxx, "tle1": xxx, "tle2": xxx,
+                                             "sensor_type": xxx, "sensor_para": xxx, "save_path": xxx}, ......]}}
+    <- {"event": "accepted", "job_id": xxx}
+    <- {"event": "satellite", "job_id": xxx, "ID": xxx, "status": "done" | "failed", "error": xxx, "seconds": xxx}
+    <- {"event": "finished", "job_id": xxx, "returncode": 0 | 1, "failed": [ID, ...], "error": xxx,
+        "timings": {"queue_wait": s, "reset": s, "scenario": s, "satellites": {ID: s}, "total": s}}
+
+    A job whose connection closes before it finishes is cancelled: the satellites not started yet are
+    reported failed with the error "cancelled" and the engine goes back to the idle pool.
+
+    -> {"op": "ping"}
+    <- {"event": "pong", "engines": N, "idle": n, "jobs": n, "failed_jobs": n}
+
+Usage:
+    python stk_worker.py --port 9530 --engines 2             # STK runtimes
+    python stk_worker.py --port 9530 --engine fake           # no STK, for exercising the protocol
+'''
+
+import argparse
+import json
+import logging
+import os
+import queue
+import socketserver
+import threading
+import time
+import uuid
+
+
+class StkEngine:
+    """One warm STK runtime reused across jobs"""
+
+    def __init__(self):
+        self.stk = None
+        self.root = None
+        self._simulation = None
+
+    def start(self):
+        # Imported lazily so the daemon can run with the fake engine on hosts without the STK python API
+        import stk_simulation
+        self._simulation = stk_simulation
+        self.stk, self.root = stk_simulation.start_stk()
+
+    def reset(self):
+        """Unload the scenario left by the previous job"""
+        if self.root.CurrentScenario is not None:
+            self.root.CloseScenario()
+
+    def build(self, job):
+        return self._simulation.build_scenario(self.root, job['start_time'], job['end_time'],
+                                               job['point'], job['line'], job['area'])
+
+    def simulate(self, ctx, item, step):
+        self._simulation.simulate_satellite(ctx, item, step)
+
+    def shutdown(self):
+        if self.stk is not None:
+            self.stk.ShutDown()
+        self.stk = None
+        self.root = None
+
+
+class FakeEngine:
+    """Engine without STK: writes the TLE file only, fails satellites flagged with "fail" """
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+
+    def start(self):
+        pass
+
+    def reset(self):
+        pass
+
+    def build(self, job):
+        return dict(job)
+
+    def simulate(self, ctx, item, step):
+        time.sleep(self.delay)
+        if item.get('fail'):
+            raise RuntimeError(f"fake failure for {item['ID']}")
+        os.makedirs(item['save_path'], exist_ok=True)
+        with open(os.path.join(item['save_path'], 'TLE.txt'), 'w', encoding='utf-8') as f:
+            f.write(item['tle1'].strip() + '\n' + item['tle2'].strip() + '\n')
+
+    def shutdown(self):
+        pass
+
+
+class StkWorker:
+    """Pool of warm engines executing jobs one at a time per engine"""
+
+    def __init__(self, engine_factory, engines=1):
+        self.engine_factory = engine_factory
+        self.engines = engines
+        self.idle = queue.Queue()
+        self.jobs = 0
+        self.failed_jobs = 0
+        self._lock = threading.Lock()
+
+    def start(self):
+        for _ in range(self.engines):
+            self.idle.put(self._start_engine())
+        logging.info(f"已预热 {self.engines} 个仿真引擎")
+
+    def shutdown(self):
+        while not self.idle.empty():
+            engine = self.idle.get()
+            if engine is not None:
+                engine.shutdown()
+
+    def status(self):
+        with self._lock:
+            return {'engines': self.engines, 'idle': self.idle.qsize(), 'jobs': self.jobs, 'failed_jobs': self.failed_jobs}
+
+    def _start_engine(self):
+        engine = self.engine_factory()
+        engine.start()
+        return engine
+
+    def _restart(self, engine):
+        # The runtime may be wedged after an engine-level error, give the next job a fresh one. When it cannot be
+        # started, None takes its place in the idle pool and the next job taking it tries again
+        try:
+            engine.shutdown()
+        except Exception as e:
+            logging.warning(f"关闭仿真引擎出错: {e}")
+        try:
+            return self._start_engine()
+        except Exception as e:
+            logging.error(f"重启仿真引擎失败: {e}")
+            return None
+
+    def run_job(self, job, emit, cancelled=lambda: False):
+        """
+        Run one job on the next idle engine
+
+        Args:
+            job: Job parameters, see the protocol description
+            emit: Callable receiving each protocol event dict
+            cancelled: Callable telling whether the job should stop before its next satellite
+        """
+        job_id = job.get('job_id') or uuid.uuid4().hex
+        emit({'event': 'accepted', 'job_id': job_id})
+
+        timings = {}
+        failed = []
+        error = None
+        job_start = time.perf_counter()
+        engine = self.idle.get()
+        timings['queue_wait'] = time.perf_counter() - job_start
+        try:
+            if engine is None:
+                engine = self._start_engine()
+
+            t = time.perf_counter()
+            engine.reset()
+            timings['reset'] = time.perf_counter() - t
+
+            t = time.perf_counter()
+            ctx = engine.build(job)
+            timings['scenario'] = time.perf_counter() - t
+
+            timings['satellites'] = {}
+            for item in job['satellites']:
+                if cancelled():
+                    failed.append(item['ID'])
+                    emit({'event': 'satellite', 'job_id': job_id, 'ID': item['ID'], 'status': 'failed', 'error': 'cancelled', 'seconds': 0.0})
+                    continue
+                t = time.perf_counter()
+                try:
+                    engine.simulate(ctx, item, job['step'])
+                except Exception as e:
+                    failed.append(item['ID'])
+                    seconds = time.perf_counter() - t
+                    emit({'event': 'satellite', 'job_id': job_id, 'ID': item['ID'], 'status': 'failed', 'error': str(e), 'seconds': seconds})
+                else:
+                    seconds = time.perf_counter() - t
+                    emit({'event': 'satellite', 'job_id': job_id, 'ID': item['ID'], 'status': 'done', 'seconds': seconds})
+                timings['satellites'][item['ID']] = seconds
+        except Exception as e:
+            error = str(e)
+            logging.error(f"仿真任务 {job_id} 执行出错: {e}")
+            failed = [item['ID'] for item in job['satellites']]
+            if engine is not None:
+                engine = self._restart(engine)
+        finally:
+            self.idle.put(engine)
+
+        timings['total'] = time.perf_counter() - job_start
+        with self._lock:
+            self.jobs += 1
+            if failed:
+                self.failed_jobs += 1
+        logging.info(f"仿真任务 {job_id} 完成，耗时 {timings['total']:.3f}s，失败卫星 {failed}")
+        emit({'event': 'finished', 'job_id': job_id, 'returncode': 1 if failed else 0,
+              'failed': failed, 'error': error, 'timings': timings})
+
+
+class JobHandler(socketserver.StreamRequestHandler):
+    """Serves newline-delimited JSON requests on one connection"""
+
+    def send(self, message):
+        try:
+            self.wfile.write((json.dumps(message, ensure_ascii=False) + '\n').encode('utf-8'))
+            self.wfile.flush()
+        except OSError:
+            # The client went away, the running job stops before its next satellite
+            self.disconnected = True
+
+    def handle(self):
+        worker = self.server.worker
+        self.disconnected = False
+        for raw in self.rfile:
+            if not raw.strip():
+                continue
+            try:
+                request = json.loads(raw)
+            except ValueError as e:
+                self.send({'event': 'error', 'error': f"invalid request: {e}"})
+                continue
+
+            op = request.get('op')
+            if op == 'run':
+                worker.run_job(request['job'], self.send, lambda: self.disconnected)
+            elif op == 'ping':
+                self.send({'event': 'pong', **worker.status()})
+            else:
+                self.send({'event': 'error', 'error': f"unknown op: {op}"})
+
+
+class WorkerServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address, worker):
+        super().__init__(address, JobHandler)
+        self.worker = worker
+
+
+def main():
+    parser = argparse.ArgumentParser(description="warm stk worker daemon")
+    parser.add_argument("--host", type=str, default="127.0.0.1", help="监听地址")
+    parser.add_argument("--port", type=int, default=9530, help="监听端口")
+    parser.add_argument("--engines", type=int, default=1, help="保持预热的STK引擎数量")
+    parser.add_argument("--engine", type=str, default="stk", choices=["stk", "fake"], help="仿真引擎类型，fake不依赖STK")
+    parser.add_argument("--fake_delay", type=float, default=0.0, help="fake引擎每颗卫星的模拟耗时(s)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+    if args.engine == "fake":
+        worker = StkWorker(lambda: FakeEngine(args.fake_delay), args.engines)
+    else:
+        worker = StkWorker(StkEngine, args.engines)
+
+    worker.start()
+    server = WorkerServer((args.host, args.port), worker)
+    logging.info(f"STK worker 已在 {args.host}:{args.port} 上启动")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        worker.shutdown()
+
+
+if __name__ == "__main__":
+    main()
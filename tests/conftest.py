@@ -0,0 +1,18 @@
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# The scripts are run from their own folder and the backend from serve_backend, import them the same way
+sys.path.insert(0, os.path.join(ROOT, "stk_scripts"))
+sys.path.insert(0, os.path.join(ROOT, "serve_backend"))
+
+# Required settings of configs.app_config, for running the tests without a .env file
+for key, value in {
+    "DEBUG": "False", "FLASK_DEBUG": "False", "CLICKHOUSE_HOST": "localhost", "CLICKHOUSE_PORT_NATIVE": "9000",
+    "CLICKHOUSE_USER": "default", "CLICKHOUSE_PASSWORD": "", "CLICKHOUSE_DATABASE": "default", "STK_LOCAL": "True",
+    "STK_PYTHON_LOCAL_EXE": "python", "STK_SCRIPT_LOCAL_PATH": "stk_simulation.py", "STK_PYTHON_REMOTE_EXE": "python",
+    "STK_SCRIPT_REMOTE_PATH": "stk_simulation.py", "REPLACE_BASE": "", "SSH_PASSWORD": "", "SSH_USER": "",
+    "SSH_HOST": "", "OUTPUT_DIR": "output", "OLLAMA_URL": "http://localhost:11434/api/chat"
+}.items():
+    os.environ.setdefault(key, value)
@@ -0,0 +1,83 @@
+import numpy as np
+import pytest
+
+from configs.app_config import app_config
+from libs.chunking import chunk_dir, stitch_satellite, time_chunks
+from libs.columnar import ACCESS_TARGETS, access_periods, load_satellite_columns
+from libs.native_engine import run_native_simulation
+from libs.propagation import ecef_to_lla, parse_simulation_time, parse_tle, propagate, teme_to_ecef
+
+# ISS, as in test_stk_worker
+TLE1 = "1 25544U 98067A   13255.14047407  .00008544  00000-0  15258-3 0  9993"
+TLE2 = "2 25544  51.6493 242.4011 0003766 126.3491 338.0330 15.50568402848930"
+
+SIMU_PARAS = {'start_time': '20130912040000', 'end_time': '20130913040010', 'interval': '30'}
+
+
+def test_time_chunks_align_on_the_grid():
+    chunks = time_chunks(SIMU_PARAS, 961)
+    assert len(chunks) == 3
+    assert [chunk.kept_samples(30.0) for chunk in chunks] == [961, 961, None]
+    assert chunks[0].paras(SIMU_PARAS)['end_time'] == '20130912120130'
+    assert chunks[1].paras(SIMU_PARAS)['start_time'] == '20130912120030'
+    assert chunks[-1].paras(SIMU_PARAS)['end_time'] == SIMU_PARAS['end_time']
+
+    assert len(time_chunks(SIMU_PARAS, 0)) == 1
+    assert len(time_chunks(SIMU_PARAS, 3000)) == 1
+    assert len(time_chunks({**SIMU_PARAS, 'interval': '0.5'}, 961)) == 1
+
+
+def seam_target(seam):
+    """Sub-satellite point at a chunk seam, seen by a pass crossing it"""
+    times = np.array([parse_simulation_time(seam)])
+    _, r, v = propagate([parse_tle(TLE1, TLE2)], times)
+    lon, lat, _ = ecef_to_lla(teme_to_ecef(r, v, times)[0][0])
+    return float(lon[0]), float(lat[0])
+
+
+def test_stitched_chunks_match_single_run(tmp_path, monkeypatch):
+    monkeypatch.setattr(app_config, "EPHEMERIS_FOR_SIMULATION", False)
+    chunks = time_chunks(SIMU_PARAS, 961)
+    seam = chunks[1].paras(SIMU_PARAS)['start_time']
+    lon, lat = seam_target(seam)
+    simu_paras = {**SIMU_PARAS, 'point_data': f"{lon} {lat}", 'line_data': f"{lon - 1} {lat}|{lon + 1} {lat}",
+                  'area_data': f"{lon - 1} {lat - 1}|{lon + 1} {lat - 1}|{lon + 1} {lat + 1}|{lon - 1} {lat + 1}"}
+    satellite = {'ID': '25544', 'tle1': TLE1, 'tle2': TLE2, 'sensor_para': ['20', '20', '0', '0', '0', '1', '1']}
+
+    full_dir = tmp_path / "full"
+    assert run_native_simulation([{**satellite, 'save_path': str(full_dir)}], simu_paras) == {'25544': True}
+    stitched_dir = tmp_path / "stitched"
+    chunk_dirs = [chunk_dir(str(stitched_dir), chunk.index) for chunk in chunks]
+    for chunk, directory in zip(chunks, chunk_dirs):
+        assert run_native_simulation([{**satellite, 'save_path': directory}], chunk.paras(simu_paras)) == {'25544': True}
+    stitch_satellite(chunk_dirs, chunks, simu_paras, str(stitched_dir))
+
+    full = load_satellite_columns(str(full_dir))
+    stitched = load_satellite_columns(str(stitched_dir))
+    assert sorted(full) == sorted(stitched)
+    for name in ("time", "lon", "lat", "alt", "footprint_lat", "footprint_lon", "footprint_offsets"):
+        np.testing.assert_array_equal(stitched[name], full[name], err_msg=name)
+
+    seam_time = parse_simulation_time(seam)
+    for target_type in ACCESS_TARGETS:
+        expected = access_periods(full, target_type)
+        periods = access_periods(stitched, target_type)
+        # The pass over the target crosses the seam and comes out in one piece
+        assert np.any((periods[0] < seam_time) & (periods[1] > seam_time))
+        np.testing.assert_allclose(periods[0], expected[0], rtol=0, atol=1e-6)
+        np.testing.assert_allclose(periods[1], expected[1], rtol=0, atol=1e-6)
+        if target_type == 3:
+            np.testing.assert_allclose(periods[2], expected[2], rtol=0, atol=1e-9)
+    assert (stitched_dir / "TLE.txt").read_text() == (full_dir / "TLE.txt").read_text()
+    np.testing.assert_array_equal(np.load(stitched_dir / "coverage_bits.npy"), np.load(full_dir / "coverage_bits.npy"))
+
+
+@pytest.mark.parametrize("max_samples", [961, 1500])
+def test_chunk_samples_cover_the_window(max_samples):
+    chunks = time_chunks(SIMU_PARAS, max_samples)
+    kept = [chunk.kept_samples(30.0) for chunk in chunks[:-1]]
+    assert all(samples <= max_samples for samples in kept)
+    # Every chunk starts at the sample following the ones kept from the previous chunk
+    for chunk, following, samples in zip(chunks, chunks[1:], kept):
+        assert (following.start - chunk.start).total_seconds() == samples * 30.0
+        assert chunk.end > chunk.stop
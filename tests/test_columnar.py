@@ -0,0 +1,196 @@
+import json
+import os
+import struct
+from datetime import datetime, timezone
+
+import numpy as np
+import pytest
+
+import stk_backprogress
+from libs.columnar import (COLUMNS_ALIGN, COLUMNS_FILE, access_periods, allocate_columns, load_satellite_columns,
+                           read_attrs, read_columns, write_columns, write_satellite_columns)
+from libs.text_reports import export_text_reports
+
+START = 1704067200.0
+
+
+@pytest.mark.parametrize("mmap", [True, False])
+def test_write_read_columns(tmp_path, mmap):
+    path = str(tmp_path / COLUMNS_FILE)
+    columns = {
+        "float64": np.linspace(-1.0, 1.0, 11),
+        "float32": np.arange(5, dtype=np.float32) / 3,
+        "int64": np.array([0, -1, 2 ** 40], dtype=np.int64),
+        "uint8": np.arange(200, dtype=np.uint8),
+        "empty": np.array([], dtype=np.float64),
+        # Written in little-endian order whatever the input
+        "big_endian": np.array([1.5, -2.25, 1e300], dtype='>f8'),
+        "strided": np.arange(20, dtype=np.int64)[::3]
+    }
+    write_columns(path, columns, {"satellite": "卫星-1", "step": 30})
+
+    loaded = read_columns(path, mmap=mmap)
+    assert list(loaded) == list(columns)
+    for name, values in columns.items():
+        assert loaded[name].dtype == values.dtype.newbyteorder('<')
+        np.testing.assert_array_equal(loaded[name], values)
+    assert read_attrs(path) == {"satellite": "卫星-1", "step": 30}
+    # No temporary file left behind
+    assert os.listdir(tmp_path) == [COLUMNS_FILE]
+
+    # Columns are aligned in the file
+    with open(path, "rb") as f:
+        f.seek(8)
+        header_size = struct.unpack('<Q', f.read(8))[0]
+        header = json.loads(f.read(header_size))
+    assert all(entry["offset"] % COLUMNS_ALIGN == 0 for entry in header["columns"])
+    assert os.path.getsize(path) % COLUMNS_ALIGN == 0
+    if mmap:
+        with pytest.raises(ValueError):
+            loaded["float64"][0] = 2.0
+
+
+def test_read_columns_rejects_other_files(tmp_path):
+    path = tmp_path / "posLLA.txt"
+    path.write_text("时间 经度 纬度 高度\n", encoding="utf-8")
+    with pytest.raises(ValueError):
+        read_columns(str(path))
+    with pytest.raises(ValueError):
+        read_attrs(str(path))
+
+
+def test_allocate_columns_filled_in_place(tmp_path):
+    path = str(tmp_path / "bundle.bin")
+    allocate_columns(path, {"position": (np.float32, 1000), "index": (np.int64, 10), "flags": ("u1", 3)}, {"rows": 10})
+
+    columns = read_columns(path)
+    assert {name: (values.dtype.str, values.size) for name, values in columns.items()} == \
+        {"position": ("<f4", 1000), "index": ("<i8", 10), "flags": ("|u1", 3)}
+    assert not any(values.any() for values in columns.values())
+    assert read_attrs(path) == {"rows": 10}
+
+    # Rows written through separate writable maps, as by several processes
+    first = read_columns(path, writable=True)
+    first["position"][:500] = np.arange(500)
+    first["position"].flush()
+    second = read_columns(path, writable=True)
+    second["position"][500:] = -np.arange(500)
+    second["index"][:] = np.arange(10) * 7
+    second["index"].flush()
+    del first, second
+
+    columns = read_columns(path, mmap=False)
+    np.testing.assert_array_equal(columns["position"], np.r_[np.arange(500), -np.arange(500)].astype(np.float32))
+    np.testing.assert_array_equal(columns["index"], np.arange(10) * 7)
+    np.testing.assert_array_equal(columns["flags"], np.zeros(3))
+
+
+def make_satellite(satellite_dir, rng):
+    times = START + np.arange(50) * 30.0
+    offsets = np.arange(len(times) + 1) * 4
+    access = {1: (times[[3, 20]] + 0.125, times[[9, 31]] + 0.5),
+              2: (times[[4]] + 0.001, times[[30]] + 0.999),
+              3: (times[[1, 25]] + 12.25, times[[12, 40]] + 3.5, np.array([12.34, 100.0]))}
+    write_satellite_columns(str(satellite_dir), times, rng.uniform(-180, 180, len(times)), rng.uniform(-90, 90, len(times)),
+                            rng.uniform(400, 600, len(times)), rng.uniform(-90, 90, offsets[-1]),
+                            rng.uniform(-180, 180, offsets[-1]), offsets, access)
+    return times, offsets, access
+
+
+def test_satellite_columns_round_trip(tmp_path):
+    times, offsets, access = make_satellite(tmp_path, np.random.default_rng(0))
+
+    columns = load_satellite_columns(str(tmp_path))
+    np.testing.assert_array_equal(columns["time"], times)
+    np.testing.assert_array_equal(columns["footprint_offsets"], offsets)
+    assert columns["footprint_lat"].dtype == np.float32
+    for target_type, periods in access.items():
+        loaded = access_periods(columns, target_type)
+        np.testing.assert_array_equal(loaded[0], periods[0])
+        np.testing.assert_array_equal(loaded[1], periods[1])
+        if target_type == 3:
+            np.testing.assert_array_equal(loaded[2], periods[2])
+        else:
+            assert loaded[2] is None
+
+    # Areas without coverage percents and targets without access
+    write_satellite_columns(str(tmp_path), times, times, times, times, np.zeros(0), np.zeros(0),
+                            np.zeros(len(times) + 1, dtype=np.int64), {3: (times[:2], times[1:3])})
+    columns = load_satellite_columns(str(tmp_path))
+    assert np.isnan(access_periods(columns, 3)[2]).all()
+    assert access_periods(columns, 1)[0].size == 0
+
+
+def test_columns_from_text(tmp_path):
+    satellite_dir = tmp_path / "SAT-1_1"
+    satellite_dir.mkdir()
+    make_satellite(satellite_dir, np.random.default_rng(1))
+    expected = {name: np.array(values) for name, values in load_satellite_columns(str(satellite_dir)).items()}
+
+    # Results of a run older than the columnar files: text reports only
+    export_text_reports(str(satellite_dir))
+    os.remove(satellite_dir / COLUMNS_FILE)
+
+    columns = load_satellite_columns(str(satellite_dir))
+    assert os.path.exists(satellite_dir / COLUMNS_FILE)
+    assert sorted(columns) == sorted(expected)
+    np.testing.assert_allclose(columns["time"], expected["time"], rtol=0, atol=5e-4)
+    for name in ("lon", "lat", "alt"):
+        np.testing.assert_allclose(columns[name], expected[name], rtol=0, atol=5e-7)
+    # Footprints are stored with the 3 decimals of the report
+    for name in ("footprint_lat", "footprint_lon", "footprint_offsets"):
+        np.testing.assert_array_equal(columns[name], expected[name])
+    for name in ("point_start", "point_stop", "line_start", "line_stop", "area_start", "area_stop"):
+        np.testing.assert_allclose(columns[name], expected[name], rtol=0, atol=5e-4)
+    np.testing.assert_allclose(columns["area_percent"], expected["area_percent"], rtol=0, atol=5e-3)
+
+
+def stk_time(seconds):
+    """STK UTCG time of an epoch second, eg: '1 Jan 2024 00:00:30.125000000'"""
+    dt = datetime.fromtimestamp(seconds, timezone.utc)
+    return f"{dt.day} {dt.strftime('%b %Y %H:%M:%S')}.{dt.microsecond:06d}000"
+
+
+def test_stk_writer_read_by_backend(tmp_path):
+    rng = np.random.default_rng(2)
+    times = START + 86400 * 40 + np.arange(30) * 0.5
+    lons, lats, alts = (rng.uniform(-90, 90, len(times)).tolist() for _ in range(3))
+    vertex_counts = rng.integers(0, 6, len(times))
+    all_latitudes = [rng.uniform(-90, 90, count).tolist() for count in vertex_counts]
+    all_longitudes = [rng.uniform(-180, 180, count).tolist() for count in vertex_counts]
+    access = {1: [[stk_time(times[2])], [stk_time(times[7])]],
+              2: [[], []],
+              3: [[stk_time(times[1]), stk_time(times[20])], [stk_time(times[5]), stk_time(times[29])], [12.5, 99.99]]}
+    stk_backprogress.write_satellite_columns(str(tmp_path), [stk_time(t) for t in times], lons, lats, alts,
+                                             all_latitudes, all_longitudes, access)
+
+    columns = load_satellite_columns(str(tmp_path))
+    assert read_attrs(str(tmp_path / COLUMNS_FILE)) == {}
+    np.testing.assert_allclose(columns["time"], times, rtol=0, atol=1e-6)
+    np.testing.assert_array_equal(columns["lon"], lons)
+    np.testing.assert_array_equal(columns["lat"], lats)
+    np.testing.assert_array_equal(columns["alt"], alts)
+    np.testing.assert_array_equal(columns["footprint_offsets"], np.r_[0, np.cumsum(vertex_counts)])
+    assert columns["footprint_lat"].dtype == np.float32
+    np.testing.assert_array_equal(columns["footprint_lat"], np.round(np.concatenate(all_latitudes), 3).astype(np.float32))
+    np.testing.assert_array_equal(columns["footprint_lon"], np.round(np.concatenate(all_longitudes), 3).astype(np.float32))
+
+    starts, stops, _ = access_periods(columns, 1)
+    np.testing.assert_allclose([starts[0], stops[0]], times[[2, 7]], rtol=0, atol=1e-6)
+    assert access_periods(columns, 2)[0].size == 0
+    starts, stops, percents = access_periods(columns, 3)
+    np.testing.assert_allclose(starts, times[[1, 20]], rtol=0, atol=1e-6)
+    np.testing.assert_allclose(stops, times[[5, 29]], rtol=0, atol=1e-6)
+    np.testing.assert_array_equal(percents, [12.5, 99.99])
+
+
+def test_stk_writer_column_types(tmp_path):
+    path = str(tmp_path / COLUMNS_FILE)
+    stk_backprogress.write_columns(path, [("d", 'd', [1.0, -2.5]), ("f", 'f', [0.125]), ("q", 'q', [-3, 2 ** 50]),
+                                          ("empty", 'd', [])])
+    columns = read_columns(path)
+    assert {name: values.dtype.str for name, values in columns.items()} == {"d": "<f8", "f": "<f4", "q": "<i8", "empty": "<f8"}
+    np.testing.assert_array_equal(columns["d"], [1.0, -2.5])
+    np.testing.assert_array_equal(columns["f"], [0.125])
+    np.testing.assert_array_equal(columns["q"], [-3, 2 ** 50])
+    assert columns["empty"].size == 0
@@ -0,0 +1,127 @@
+import numpy as np
+import pytest
+
+from libs.intervals import complement, constellation_summary, next_start, simultaneous, union
+
+# Brute force checks run on a grid of whole seconds, the random periods have whole second endpoints
+WINDOW = (0.0, 200.0)
+
+
+def random_periods(rng, count):
+    starts = rng.integers(-20, 210, count).astype(np.float64)
+    return starts, starts + rng.integers(0, 30, count)
+
+
+def coverage(starts, stops, grid):
+    """Number of [start, stop) periods covering every grid instant"""
+    return ((grid[:, None] >= starts) & (grid[:, None] < stops)).sum(axis=1)
+
+
+def test_union_merges_overlapping_and_touching():
+    starts, stops, values = union([10, 0, 5, 30, 20], [15, 6, 8, 40, 30], values=[1, 2, 3, 4, 5])
+    np.testing.assert_array_equal(starts, [0, 10, 20])
+    np.testing.assert_array_equal(stops, [8, 15, 40])
+    np.testing.assert_array_equal(values, [3, 1, 5])
+
+    starts, stops, values = union([0, 10.5], [10, 20], tolerance=1.0)
+    np.testing.assert_array_equal(starts, [0])
+    np.testing.assert_array_equal(stops, [20])
+    assert values is None
+
+    starts, stops, values = union([], [], values=[])
+    assert starts.size == stops.size == values.size == 0
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_union_matches_brute_force(seed):
+    rng = np.random.default_rng(seed)
+    starts, stops = random_periods(rng, 30)
+    merged_starts, merged_stops, _ = union(starts, stops)
+
+    assert np.all(merged_stops >= merged_starts)
+    assert np.all(merged_starts[1:] > merged_stops[:-1])
+    grid = np.arange(-20.0, 240.0, 0.5)
+    np.testing.assert_array_equal(coverage(merged_starts, merged_stops, grid) > 0, coverage(starts, stops, grid) > 0)
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_complement_matches_brute_force(seed):
+    rng = np.random.default_rng(seed)
+    starts, stops = random_periods(rng, 10)
+    gap_starts, gap_stops = complement(starts, stops, *WINDOW)
+
+    assert np.all(gap_stops > gap_starts)
+    assert gap_starts.size == 0 or (gap_starts[0] >= WINDOW[0] and gap_stops[-1] <= WINDOW[1])
+    grid = np.arange(*WINDOW, 0.5)
+    np.testing.assert_array_equal(coverage(gap_starts, gap_stops, grid) > 0, coverage(starts, stops, grid) == 0)
+
+
+def test_complement_edges():
+    np.testing.assert_array_equal(complement([], [], *WINDOW), ([0.0], [200.0]))
+    np.testing.assert_array_equal(complement([-10], [300], *WINDOW), ([], []))
+    np.testing.assert_array_equal(complement([0, 50], [20, 200], *WINDOW), ([20.0], [50.0]))
+
+
+def test_simultaneous_joins_handovers():
+    # Satellite 1 hands over to satellite 2 at 20, satellite 3 overlaps both
+    starts, stops, counts = simultaneous([(np.array([0.0]), np.array([20.0])), (np.array([20.0]), np.array([40.0])),
+                                          (np.array([10.0, 35.0]), np.array([25.0, 60.0]))], *WINDOW)
+    np.testing.assert_array_equal(starts, [0, 10, 25, 35, 40])
+    np.testing.assert_array_equal(stops, [10, 25, 35, 40, 60])
+    np.testing.assert_array_equal(counts, [1, 2, 1, 2, 1])
+
+    starts, stops, counts = simultaneous([], *WINDOW)
+    assert starts.size == stops.size == counts.size == 0
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_simultaneous_matches_brute_force(seed):
+    rng = np.random.default_rng(seed)
+    satellites = [random_periods(rng, 5) for _ in range(4)]
+    starts, stops, counts = simultaneous(satellites, *WINDOW)
+
+    assert np.all(counts > 0)
+    assert np.all(stops > starts)
+    grid = np.arange(*WINDOW, 0.5)
+    # Every satellite counts once, even where its own periods overlap
+    expected = sum((coverage(*satellite, grid) > 0).astype(int) for satellite in satellites)
+    owner = np.searchsorted(starts, grid, side='right') - 1
+    inside = (owner >= 0) & (grid < stops[np.maximum(owner, 0)])
+    np.testing.assert_array_equal(np.where(inside, counts[np.maximum(owner, 0)], 0), expected)
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_constellation_summary_matches_brute_force(seed):
+    rng = np.random.default_rng(seed)
+    satellites = [random_periods(rng, 4) for _ in range(3)]
+    summary = constellation_summary(satellites, *WINDOW)
+
+    step = 0.5
+    grid = np.arange(*WINDOW, step)
+    counts = sum((coverage(*satellite, grid) > 0).astype(int) for satellite in satellites)
+    starts, stops, window_max = summary["windows"]
+    gap_starts, gap_stops = summary["gaps"]
+    np.testing.assert_array_equal(coverage(starts, stops, grid) > 0, counts > 0)
+    np.testing.assert_array_equal(coverage(gap_starts, gap_stops, grid) > 0, counts == 0)
+    for start, stop, value in zip(starts, stops, window_max):
+        assert value == counts[(grid >= start) & (grid < stop)].max()
+
+    assert summary["duration"] == 200.0
+    assert summary["covered"] == pytest.approx(np.count_nonzero(counts) * step)
+    assert summary["fraction"] == pytest.approx(summary["covered"] / 200.0)
+    assert summary["max_gap"] == pytest.approx(max(gap_stops - gap_starts, default=0.0))
+    assert summary["max_simultaneous"] == counts.max()
+    assert summary["mean_simultaneous"] == pytest.approx(counts.sum() * step / 200.0)
+
+
+def test_constellation_summary_without_access():
+    summary = constellation_summary([(np.array([]), np.array([]))], *WINDOW)
+    assert summary["windows"][0].size == 0
+    np.testing.assert_array_equal(summary["gaps"], ([0.0], [200.0]))
+    assert summary["fraction"] == 0.0 and summary["max_gap"] == 200.0 and summary["max_simultaneous"] == 0
+
+
+def test_next_start_is_strictly_after():
+    index, waits = next_start([30, 10, 20], [0, 10, 15, 30, 40])
+    np.testing.assert_array_equal(index, [0, 1, 1, 3, 3])
+    np.testing.assert_array_equal(waits, [10, 10, 5, np.nan, np.nan])
@@ -0,0 +1,172 @@
+import asyncio
+
+import pytest
+
+from configs import app_config
+from extensions.ext_jobs import RESULT_PREFIX, JobManager
+from services.simulation_service import SimulationService
+
+
+async def fake_simulation_events(self, data):
+    """Stand-in for the simulation: data carries its messages and an optional event to wait for before the result"""
+    for message in data.get("messages", []):
+        yield f"data: {message}\n\n"
+    if "gate" in data:
+        await data["gate"].wait()
+    if data.get("result", True):
+        yield f"data: {RESULT_PREFIX}{ {'url': 'http://result'} }\n\n"
+
+
+@pytest.fixture(autouse=True)
+def fake_simulation(monkeypatch):
+    monkeypatch.setattr(SimulationService, "simulation_events", fake_simulation_events)
+    monkeypatch.setattr(app_config, "SIMULATION_MAX_JOBS", 2)
+    monkeypatch.setattr(app_config, "SIMULATION_JOB_EVENT_BUFFER", 1000)
+    monkeypatch.setattr(app_config, "SIMULATION_JOB_HISTORY", 50)
+    monkeypatch.setattr(app_config, "SIMULATION_DISCONNECT_GRACE", 30)
+
+
+async def collect(stream, count=None):
+    items = []
+    async for item in stream:
+        items.append(item)
+        if len(items) == count:
+            break
+    return items
+
+
+def test_replay_after_last_event_id(monkeypatch):
+    monkeypatch.setattr(app_config, "SIMULATION_JOB_EVENT_BUFFER", 5)
+
+    async def scenario():
+        manager = JobManager()
+        gate = asyncio.Event()
+        job = manager.submit({"messages": [f"步骤{i}" for i in range(1, 9)], "gate": gate})
+        # Attached while running: resumes after event 6 and follows the job to its end
+        follower = asyncio.create_task(collect(job.sse(last_event_id=6)))
+        while job.last_seq < 8:
+            await asyncio.sleep(0)
+        assert job.status == "running"
+        gate.set()
+        await job.task
+        assert job.status == "succeeded" and job.result == "{'url': 'http://result'}"
+
+        replayed = await collect(job.sse(last_event_id=6))
+        assert replayed == await follower
+        assert replayed == ["id: 7\ndata: 步骤7\n\n", "id: 8\ndata: 步骤8\n\n",
+                            f"id: 9\ndata: {RESULT_PREFIX}{ {'url': 'http://result'} }\n\n"]
+        # The ring buffer only keeps the last SIMULATION_JOB_EVENT_BUFFER messages
+        assert [seq for seq, _ in await collect(job.events())] == [5, 6, 7, 8, 9]
+        assert await collect(job.events(9)) == []
+
+    asyncio.run(scenario())
+
+
+def test_failed_job_without_result():
+    async def scenario():
+        job = JobManager().submit({"messages": ["仿真失败"], "result": False})
+        await job.task
+        assert job.status == "failed" and job.result is None
+        assert job.info()["last_event_id"] == 1
+
+    asyncio.run(scenario())
+
+
+def test_disconnect_grace_cancels_orphaned_job(monkeypatch):
+    monkeypatch.setattr(app_config, "SIMULATION_DISCONNECT_GRACE", 0)
+
+    async def scenario():
+        manager = JobManager()
+        job = manager.submit({"messages": ["开始仿真"], "gate": asyncio.Event()}, cancel_on_disconnect=True)
+        stream = job.sse()
+        assert await stream.__anext__() == "id: 1\ndata: 开始仿真\n\n"
+        # Client gone
+        await stream.aclose()
+        await asyncio.gather(job.task, return_exceptions=True)
+        assert job.status == "cancelled"
+        assert [message for _, message in await collect(job.events())][-1] == "仿真任务已取消"
+
+        # Jobs submitted without cancel_on_disconnect keep running
+        other = manager.submit({"messages": ["开始仿真"], "gate": asyncio.Event()})
+        stream = other.sse()
+        await stream.__anext__()
+        await stream.aclose()
+        await asyncio.sleep(0.05)
+        assert other.status == "running"
+        await manager.close()
+        assert other.status == "cancelled"
+
+    asyncio.run(scenario())
+
+
+def test_reattach_within_grace_keeps_job(monkeypatch):
+    monkeypatch.setattr(app_config, "SIMULATION_DISCONNECT_GRACE", 1)
+
+    async def scenario():
+        gate = asyncio.Event()
+        job = JobManager().submit({"messages": ["开始仿真"], "gate": gate}, cancel_on_disconnect=True)
+        stream = job.sse()
+        await stream.__anext__()
+        await stream.aclose()
+        assert job.viewers == 0
+
+        # Reconnects with Last-Event-ID before the grace period ends
+        viewer = asyncio.create_task(collect(job.sse(last_event_id=1)))
+        await asyncio.sleep(1.2)
+        assert job.status == "running" and job.viewers == 1
+        gate.set()
+        assert await viewer == [f"id: 2\ndata: {RESULT_PREFIX}{ {'url': 'http://result'} }\n\n"]
+        assert job.status == "succeeded"
+
+    asyncio.run(scenario())
+
+
+def test_max_jobs_queue(monkeypatch):
+    monkeypatch.setattr(app_config, "SIMULATION_MAX_JOBS", 1)
+
+    async def scenario():
+        manager = JobManager()
+        gates = [asyncio.Event() for _ in range(3)]
+        jobs = [manager.submit({"gate": gate}) for gate in gates]
+        await asyncio.sleep(0.01)
+        assert [job.status for job in jobs] == ["running", "pending", "pending"]
+
+        # A cancelled pending job never runs, the next one takes the free slot
+        assert manager.cancel(jobs[1].id)
+        gates[0].set()
+        await jobs[0].task
+        await asyncio.gather(jobs[1].task, return_exceptions=True)
+        await asyncio.sleep(0.01)
+        assert [job.status for job in jobs] == ["succeeded", "cancelled", "running"]
+        assert jobs[1].started is None
+        assert not manager.cancel(jobs[0].id)
+        assert not manager.cancel("unknown")
+
+        gates[2].set()
+        await jobs[2].task
+        assert jobs[2].status == "succeeded"
+
+    asyncio.run(scenario())
+
+
+def test_prune_keeps_running_jobs(monkeypatch):
+    monkeypatch.setattr(app_config, "SIMULATION_JOB_HISTORY", 2)
+
+    async def scenario():
+        manager = JobManager()
+        running = manager.submit({"gate": asyncio.Event()})
+        finished = []
+        for _ in range(4):
+            job = manager.submit({})
+            await job.task
+            finished.append(job)
+        # Pruned when the next job is submitted: the last SIMULATION_JOB_HISTORY finished jobs stay
+        latest = manager.submit({"gate": asyncio.Event()})
+        assert list(manager.jobs) == [running.id, finished[2].id, finished[3].id, latest.id]
+        assert manager.get(finished[0].id) is None and manager.get(finished[1].id) is None
+        assert [info["job_id"] for info in manager.list_jobs()] == [latest.id, finished[3].id, finished[2].id, running.id]
+        await asyncio.sleep(0)
+        await manager.close()
+        assert running.status == latest.status == "cancelled"
+
+    asyncio.run(scenario())
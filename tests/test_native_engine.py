@@ -0,0 +1,171 @@
+from datetime import datetime, timezone
+
+import numpy as np
+import pytest
+
+from libs.access import ACCESS_TOLERANCE, access_intervals, mask_edges, target_geometry, visibility
+from libs.coverage import coverage_by_pass, coverage_mask, percent_coverage
+from libs.footprint import _AXES_SCALE, intersect_ellipsoid, project_footprints, sensor_frames
+from libs.propagation import (JD_UNIX_EPOCH, WGS84_A, WGS84_B, ecef_to_lla, ecef_to_teme, lla_to_ecef, parse_tle,
+                              propagate, teme_to_ecef)
+
+# ISS, as in test_stk_worker
+TLE1 = "1 25544U 98067A   13255.14047407  .00008544  00000-0  15258-3 0  9993"
+TLE2 = "2 25544  51.6493 242.4011 0003766 126.3491 338.0330 15.50568402848930"
+
+
+def epoch_seconds(satrec):
+    return (satrec.jdsatepoch - JD_UNIX_EPOCH + satrec.jdsatepochF) * 86400.0
+
+
+def test_propagate_matches_sgp4_verification():
+    # Satellite 00005 of the SGP4 verification set (Vallado, "Revisiting Spacetrack Report #3"), WGS72, tsince = 0
+    satrec = parse_tle("1 00005U 58002B   00179.78495062  .00000023  00000-0  28098-4 0  4753",
+                       "2 00005  34.2682 348.7242 1859667 331.7664  19.3264 10.82419157413667")
+    error, r, v = propagate([satrec], np.array([epoch_seconds(satrec)]))
+    assert error[0, 0] == 0
+    np.testing.assert_allclose(r[0, 0], [7022.46529266, -1400.08296755, 0.03995155], atol=1e-6)
+    np.testing.assert_allclose(v[0, 0], [1.893841015, 6.405893759, 4.534807250], atol=1e-8)
+
+
+def test_teme_to_ecef_reference_point():
+    # TEME -> ITRF example of the same paper, 2004-04-06 07:51:28.386009 UTC with UT1 - UTC = -0.4399619 s.
+    # Polar motion (0.14", 0.33") is neglected, it moves the point by about 15 m
+    time = datetime(2004, 4, 6, 7, 51, 28, 386009, tzinfo=timezone.utc).timestamp() - 0.4399619
+    r, v = teme_to_ecef(np.array([[[5094.18016210, 6127.64465950, 6380.34453270]]]),
+                        np.array([[[-4.746131487, 0.785818041, 5.531931288]]]), np.array([time]))
+    np.testing.assert_allclose(r[0, 0], [-1033.4793830, 7901.2952754, 6380.3565958], atol=0.02)
+    np.testing.assert_allclose(v[0, 0], [-3.225636520, -2.872451450, 5.531924446], atol=2e-5)
+
+    r_teme, v_teme = ecef_to_teme(r, v, np.array([time]))
+    np.testing.assert_allclose(r_teme[0, 0], [5094.18016210, 6127.64465950, 6380.34453270], atol=1e-8)
+    np.testing.assert_allclose(v_teme[0, 0], [-4.746131487, 0.785818041, 5.531931288], atol=1e-11)
+
+
+def test_ecef_lla_reference_points():
+    lon, lat, alt = ecef_to_lla(np.array([[WGS84_A + 500.0, 0.0, 0.0], [0.0, WGS84_A, 0.0], [0.0, 0.0, WGS84_B + 100.0]]))
+    np.testing.assert_allclose(lon[:2], [0.0, 90.0], atol=1e-9)
+    np.testing.assert_allclose(lat, [0.0, 0.0, 90.0], atol=1e-9)
+    np.testing.assert_allclose(alt, [500.0, 0.0, 100.0], atol=1e-6)
+
+    rng = np.random.default_rng(0)
+    lon = rng.uniform(-180.0, 180.0, 1000)
+    lat = rng.uniform(-89.0, 89.0, 1000)
+    alt = rng.uniform(0.0, 40000.0, 1000)
+    lon2, lat2, alt2 = ecef_to_lla(lla_to_ecef(lon, lat, alt))
+    np.testing.assert_allclose(lon2, lon, atol=1e-9)
+    np.testing.assert_allclose(lat2, lat, atol=1e-9)
+    np.testing.assert_allclose(alt2, alt, atol=1e-6)
+
+
+def test_iss_sub_satellite_point():
+    satrec = parse_tle(TLE1, TLE2)
+    times = epoch_seconds(satrec) + np.arange(0.0, 5400.0, 60.0)
+    _, r, v = propagate([satrec], times)
+    lon, lat, alt = ecef_to_lla(teme_to_ecef(r, v, times)[0][0])
+    assert np.all((alt > 390.0) & (alt < 440.0))
+    # Geodetic latitudes peak slightly above the inclination
+    assert 51.0 < np.abs(lat).max() < 51.6493 + 0.3
+
+
+def test_intersect_ellipsoid_limb_clipping():
+    altitude = 700.0
+    origin = np.array([WGS84_A + altitude, 0.0, 0.0])
+    angles = np.radians(np.arange(0.0, 90.0, 1.0))
+    # Rays in the equatorial plane, from the nadir towards the +Y side
+    directions = np.stack([-np.cos(angles), np.sin(angles), np.zeros_like(angles)], axis=-1)
+    points = intersect_ellipsoid(np.broadcast_to(origin, directions.shape), directions)
+
+    # Every point is on the surface
+    assert np.allclose(np.linalg.norm(points / _AXES_SCALE, axis=-1), 1.0, atol=1e-12)
+    # The nadir ray hits the sub-satellite point
+    np.testing.assert_allclose(points[0], [WGS84_A, 0.0, 0.0], atol=1e-9)
+
+    # Rays past the horizon stop at the limb, where the line of sight is tangent to the Earth
+    horizon = np.arcsin(WGS84_A / (WGS84_A + altitude))
+    missing = angles > horizon
+    assert missing.any() and not missing.all()
+    limb = points[missing]
+    np.testing.assert_allclose(np.sum((limb - origin) * limb, axis=-1), 0.0, atol=1e-6)
+    central = np.arctan2(points[:, 1], points[:, 0])
+    np.testing.assert_allclose(central[missing], np.arccos(WGS84_A / (WGS84_A + altitude)), atol=1e-12)
+    # Hitting rays land closer to the nadir
+    assert np.all(np.diff(central[~missing]) > 0.0)
+    assert central[~missing].max() < central[missing].min()
+
+
+def test_project_footprints_past_horizon():
+    altitude = 700.0
+    r = np.array([[[WGS84_A + altitude, 0.0, 0.0]]])
+    v = np.array([[[0.0, 0.0, 7.5]]])
+    frames = sensor_frames(r, v, 0.0, 0.0, 0.0)
+    horizon = np.degrees(np.arccos(WGS84_A / (WGS84_A + altitude)))
+
+    # Narrow sensor: the footprint stays around the sub-satellite point
+    lat, lon = project_footprints(r, frames, 1.0, 1.0)
+    assert np.abs(lat).max() < 0.2 and np.abs(lon).max() < 0.2
+
+    # Wider than the Earth seen from orbit: every edge point is clipped to the limb
+    lat, lon = project_footprints(r, frames, 80.0, 80.0)
+    ecef = lla_to_ecef(lon[0, 0], lat[0, 0])
+    central = np.degrees(np.arccos(ecef[:, 0] / np.linalg.norm(ecef, axis=-1)))
+    assert np.all(central <= horizon + 0.2)
+    assert np.abs(central - horizon).min() < 0.2
+
+
+def visible_mask(satrec, angles, times, targets, up):
+    _, r, v = propagate([satrec], times)
+    r, v = teme_to_ecef(r, v, times)
+    return visibility(r, sensor_frames(r, v, angles[2], angles[3], angles[4]), targets, up, angles[0], angles[1])[0]
+
+
+def test_refine_edges_matches_fine_mask():
+    satrec = parse_tle(TLE1, TLE2)
+    angles = (20.0, 20.0, 0.0, 0.0, 0.0)
+    start = epoch_seconds(satrec)
+    # Target under the ground track, half a minute before a coarse sample
+    _, r, v = propagate([satrec], np.array([start + 3015.0]))
+    lon, lat, _ = ecef_to_lla(teme_to_ecef(r, v, np.array([start + 3015.0]))[0][0])
+    targets, up = target_geometry(np.array([[lon[0], lat[0]]]))
+
+    times = start + np.arange(0.0, 6000.0, 60.0)
+    mask = visible_mask(satrec, angles, times, targets, up)
+    starts, stops = access_intervals(satrec, angles, times, mask, targets, up)
+    assert len(starts) == 1 and starts[0] < start + 3015.0 < stops[0]
+
+    # Edges of the visibility sampled every 10 ms around the coarse edges
+    rising, falling = mask_edges(mask)
+    step = 0.01
+    fine = times[rising[0] - 1] + np.arange(0.0, 60.0 + step, step)
+    fine_start = fine[np.argmax(visible_mask(satrec, angles, fine, targets, up))]
+    fine = times[falling[0] - 1] + np.arange(0.0, 60.0 + step, step)
+    fine_stop = fine[np.flatnonzero(visible_mask(satrec, angles, fine, targets, up))[-1]]
+    assert fine_start - step - ACCESS_TOLERANCE <= starts[0] <= fine_start + ACCESS_TOLERANCE
+    assert fine_stop - ACCESS_TOLERANCE <= stops[0] <= fine_stop + step + ACCESS_TOLERANCE
+
+
+@pytest.mark.parametrize("first, last", [(0, 20), (3, 13), (8, 16), (9, 10), (15, 20)])
+def test_percent_coverage_synthetic_grid(first, last):
+    rng = np.random.default_rng(first * 100 + last)
+    covered = rng.random((6, 20)) < 0.15
+    weights = np.array([1.0, 1.0, 2.0, 4.0, 0.5, 0.5])
+    bits = np.packbits(covered, axis=1)
+
+    expected = weights[covered[:, first:last].any(axis=1)].sum() / weights.sum() * 100.0
+    assert percent_coverage(bits, weights, first, last) == pytest.approx(expected)
+
+
+def test_coverage_by_pass_synthetic_grid():
+    covered = np.zeros((3, 20), dtype=bool)
+    covered[0, 2:5] = True
+    covered[1, 4:7] = True
+    covered[2, 12:19] = True
+    weights = np.array([1.0, 1.0, 2.0])
+    bits = np.packbits(covered, axis=1)
+    times = 1000.0 + np.arange(20) * 10.0
+
+    np.testing.assert_array_equal(coverage_mask(bits, 20), covered.any(axis=0))
+    starts, stops, percents = coverage_by_pass(bits, weights, times)
+    np.testing.assert_array_equal(starts, [1020.0, 1120.0])
+    np.testing.assert_array_equal(stops, [1060.0, 1180.0])
+    np.testing.assert_allclose(percents, [50.0, 50.0])
@@ -0,0 +1,94 @@
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pytest
+
+from libs.columnar import write_satellite_columns
+from libs.propagation import parse_simulation_time
+from libs.report import extract_data, revisit_filename_dict
+
+START_TIME, END_TIME = "20240101000000", "20240101020000"
+
+
+def make_satellites(tmp_path, pass_starts):
+    """One result folder per list of point pass starts, returns the report list of extract_data"""
+    (tmp_path / "simulation_report").mkdir()
+    report_list = []
+    for i, starts in enumerate(pass_starts):
+        satellite_dir = tmp_path / "satellites_data" / f"SAT-{i}"
+        satellite_dir.mkdir(parents=True)
+        starts = np.sort(np.asarray(starts, dtype=np.float64))
+        times = np.array([parse_simulation_time(START_TIME)])
+        write_satellite_columns(str(satellite_dir), times, times * 0, times * 0, times * 0 + 500, np.zeros(0),
+                                np.zeros(0), np.zeros(2, dtype=np.int64), {1: (starts, starts + 60.0)})
+        report_list.append((f"SAT-{i}_{i}", str(satellite_dir)))
+    return report_list
+
+
+def per_second_revisit(pass_starts):
+    """Revisit report lines of the former per-second scan"""
+    revisit_data = [datetime.fromtimestamp(round(float(t), 3), timezone.utc).replace(tzinfo=None)
+                    for starts in pass_starts for t in starts]
+    lines = []
+    current_time = datetime.strptime(START_TIME, "%Y%m%d%H%M%S")
+    end_time = datetime.strptime(END_TIME, "%Y%m%d%H%M%S")
+    while current_time <= end_time:
+        candidates = [t for t in revisit_data if t > current_time]
+        revisit_time = (min(candidates) - current_time).total_seconds() if candidates else ''
+        lines.append(current_time.strftime("%Y-%m-%d %H:%M:%S") + '                       ' + str(revisit_time))
+        current_time += timedelta(seconds=1)
+    return lines
+
+
+def revisit_lines(tmp_path, report_list, **kwargs):
+    extract_data(report_list, str(tmp_path), 1, START_TIME, END_TIME, **kwargs)
+    text = (tmp_path / "simulation_report" / revisit_filename_dict[1].lstrip('/')).read_text(encoding='utf-8')
+    return text.splitlines()[1:]
+
+
+def random_pass_starts(seed):
+    rng = np.random.default_rng(seed)
+    window_start = parse_simulation_time(START_TIME)
+    # Millisecond starts plus one on a whole second; the window ends after the last pass, without a revisit time
+    starts = [window_start + np.round(rng.uniform(-600, 6000, rng.integers(1, 8)), 3) for _ in range(3)]
+    starts[0] = np.append(starts[0], window_start + 1800.0)
+    return starts
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_revisit_matches_per_second_scan(tmp_path, seed):
+    pass_starts = random_pass_starts(seed)
+    assert revisit_lines(tmp_path, make_satellites(tmp_path, pass_starts)) == per_second_revisit(pass_starts)
+
+
+def test_revisit_without_passes(tmp_path):
+    lines = revisit_lines(tmp_path, make_satellites(tmp_path, [[]]))
+    assert lines == per_second_revisit([[]])
+    assert lines[0].endswith('                       ')
+
+
+def test_revisit_resolution(tmp_path):
+    pass_starts = random_pass_starts(0)
+    expected = per_second_revisit(pass_starts)[::7]
+    assert revisit_lines(tmp_path, make_satellites(tmp_path, pass_starts), revisit_resolution=7) == expected
+
+
+def test_revisit_runs(tmp_path):
+    pass_starts = random_pass_starts(1)
+    expected = [line.split('                       ') for line in per_second_revisit(pass_starts)]
+    runs = [line.split('      ') for line in revisit_lines(tmp_path, make_satellites(tmp_path, pass_starts), revisit_runs=True)]
+
+    # The runs cover every timestamp once, in order, with the revisit times of their first and last timestamps
+    stamps = [stamp for stamp, _ in expected]
+    position = 0
+    for first, last, first_revisit, last_revisit in runs:
+        assert first == stamps[position]
+        end = stamps.index(last)
+        assert [first_revisit, last_revisit] == [expected[position][1], expected[end][1]]
+        # Waiting for the same pass: one second less at every timestamp
+        if first_revisit:
+            values = [float(value) for _, value in expected[position:end + 1]]
+            np.testing.assert_allclose(np.diff(values), -1.0)
+        position = end + 1
+    assert position == len(stamps)
+    assert len(runs) == len({t for starts in pass_starts for t in starts if t > parse_simulation_time(START_TIME)}) + 1
@@ -0,0 +1,76 @@
+import asyncio
+import io
+import zipfile
+
+import numpy as np
+import pytest
+
+from libs.columnar import write_satellite_columns
+from libs.report_archive import save_report_zip, stream_report_zip
+from libs.text_reports import text_reports
+
+START = 1704067200.0
+
+
+def make_job(tmp_path):
+    satellite_dir = tmp_path / "satellites_data" / "SAT-1_1"
+    satellite_dir.mkdir(parents=True)
+    times = START + np.arange(200) * 30.0
+    rng = np.random.default_rng(0)
+    offsets = np.arange(len(times) + 1) * 4
+    write_satellite_columns(str(satellite_dir), times, rng.uniform(-180, 180, len(times)), rng.uniform(-90, 90, len(times)),
+                            rng.uniform(400, 600, len(times)), rng.uniform(-90, 90, offsets[-1]),
+                            rng.uniform(-180, 180, offsets[-1]), offsets,
+                            {1: (times[[10, 100]], times[[20, 110]]), 3: (times[[5]], times[[50]], np.array([12.5]))})
+    (satellite_dir / "TLE.txt").write_text("1 25544U\n2 25544\n", encoding="utf-8")
+    report_dir = tmp_path / "simulation_report"
+    report_dir.mkdir()
+    (report_dir / "report.html").write_text("<html></html>" * 1000, encoding="utf-8")
+    # Not part of the archive
+    (tmp_path / "stk_manifests").mkdir()
+    (tmp_path / "stk_manifests" / "manifest_0.json").write_text("[]", encoding="utf-8")
+    return satellite_dir
+
+
+def stream(save_dir, compression):
+    async def collect():
+        return b"".join([chunk async for chunk in stream_report_zip(save_dir, compression)])
+    return zipfile.ZipFile(io.BytesIO(asyncio.run(collect())))
+
+
+@pytest.mark.parametrize("compression, method", [("store", zipfile.ZIP_STORED), ("fast", zipfile.ZIP_DEFLATED),
+                                                 ("deflate", zipfile.ZIP_DEFLATED)])
+def test_stream_report_zip(tmp_path, compression, method):
+    satellite_dir = make_job(tmp_path)
+    archive = stream(str(tmp_path), compression)
+
+    assert archive.testzip() is None
+    assert archive.namelist() == [
+        "satellites_data/SAT-1_1/TLE.txt", "satellites_data/SAT-1_1/columns.bin",
+        "satellites_data/SAT-1_1/posLLA.txt", "satellites_data/SAT-1_1/sensorProjection.txt",
+        "satellites_data/SAT-1_1/point.txt", "satellites_data/SAT-1_1/line.txt", "satellites_data/SAT-1_1/area.txt",
+        "simulation_report/report.html"
+    ]
+    assert all(info.compress_type == method for info in archive.infolist())
+    assert archive.read("satellites_data/SAT-1_1/columns.bin") == (satellite_dir / "columns.bin").read_bytes()
+    texts = dict(text_reports(str(satellite_dir)))
+    for name, blocks in texts.items():
+        assert archive.read(f"satellites_data/SAT-1_1/{name}").decode("utf-8") == "".join(blocks)
+
+
+def test_compression_levels(tmp_path):
+    make_job(tmp_path)
+    sizes = {compression: sum(info.compress_size for info in stream(str(tmp_path), compression).infolist())
+             for compression in ("store", "fast", "deflate")}
+    # Level 1 for fast, 6 for deflate: the level of the archive applies to every entry
+    assert sizes["deflate"] < sizes["fast"] < sizes["store"]
+
+
+def test_save_report_zip_matches_stream(tmp_path):
+    make_job(tmp_path)
+    path = save_report_zip(str(tmp_path), "fast")
+    with zipfile.ZipFile(path) as saved:
+        assert saved.testzip() is None
+        streamed = stream(str(tmp_path), "fast")
+        assert saved.namelist() == streamed.namelist()
+        assert all(saved.read(name) == streamed.read(name) for name in saved.namelist())
@@ -0,0 +1,142 @@
+import os
+
+import pytest
+
+from libs.result_cache import META_FILE, ResultCache
+from services.simulation_service import SATELLITE_CACHE_EXCLUDE
+
+TLE1 = "1 25544U 98067A   13255.14047407  .00008544  00000-0  15258-3 0  9993"
+TLE2 = "2 25544  51.6493 242.4011 0003766 126.3491 338.0330 15.50568402848930"
+
+
+def make_result(path, size, paras=True):
+    """Result folder of one satellite with a size bytes columns.bin"""
+    os.makedirs(path, exist_ok=True)
+    with open(os.path.join(path, "columns.bin"), "wb") as f:
+        f.write(os.urandom(size))
+    with open(os.path.join(path, "TLE.txt"), "w", encoding="utf-8") as f:
+        f.write(TLE1 + '\n' + TLE2 + '\n')
+    if paras:
+        with open(os.path.join(path, "simulation_paras.txt"), "w", encoding="utf-8") as f:
+            f.write("卫星名称：ISS\n")
+    return path
+
+
+def entries(cache):
+    """Key to data size of every entry of the cache"""
+    found = {}
+    for root, dirs, files in os.walk(cache.root):
+        if META_FILE in files:
+            found[os.path.basename(root)] = sum(os.path.getsize(os.path.join(walk_root, name))
+                                                for walk_root, _, names in os.walk(root)
+                                                for name in names if name != META_FILE)
+    return found
+
+
+def test_store_and_load(tmp_path):
+    cache = ResultCache(str(tmp_path / "cache"), 1 << 20)
+    src = make_result(str(tmp_path / "run1"), 1000)
+    cache.store("satellite", "ab" * 32, src, meta={"message": "ok"}, exclude=SATELLITE_CACHE_EXCLUDE)
+
+    dest = str(tmp_path / "run2")
+    meta = cache.load("satellite", "ab" * 32, dest)
+    assert meta["message"] == "ok" and meta["size"] == 1000 + len(TLE1 + TLE2) + 2
+    assert sorted(os.listdir(dest)) == ["TLE.txt", "columns.bin"]
+    with open(os.path.join(src, "columns.bin"), "rb") as a, open(os.path.join(dest, "columns.bin"), "rb") as b:
+        assert a.read() == b.read()
+
+    assert cache.load("satellite", "cd" * 32, str(tmp_path / "run3")) is None
+    assert cache.load("job", "ab" * 32, str(tmp_path / "run3")) is None
+    assert not os.path.exists(tmp_path / "run3")
+
+
+def test_entries_share_files_through_hard_links(tmp_path):
+    cache = ResultCache(str(tmp_path / "cache"), 1 << 20)
+    src = make_result(str(tmp_path / "run1"), 1000)
+    cache.store("satellite", "ab" * 32, src, exclude=SATELLITE_CACHE_EXCLUDE)
+    dest = str(tmp_path / "run2")
+    cache.load("satellite", "ab" * 32, dest)
+
+    stats = [os.stat(os.path.join(path, "columns.bin")) for path in (src, dest)]
+    assert stats[0].st_ino == stats[1].st_ino
+    assert stats[0].st_nlink == 3
+
+    # Storing the same key again keeps the first entry
+    other = make_result(str(tmp_path / "run3"), 10)
+    cache.store("satellite", "ab" * 32, other, exclude=SATELLITE_CACHE_EXCLUDE)
+    assert entries(cache) == {"ab" * 32: os.path.getsize(os.path.join(src, "columns.bin")) + len(TLE1 + TLE2) + 2}
+
+
+def read_tree(path):
+    files = {}
+    for name in os.listdir(path):
+        with open(os.path.join(path, name), "rb") as f:
+            files[name] = f.read()
+    return files
+
+
+def test_simulation_paras_append_leaves_entry_unchanged(tmp_path):
+    cache = ResultCache(str(tmp_path / "cache"), 1 << 20)
+    key = "ab" * 32
+    src = make_result(str(tmp_path / "run1"), 1000)
+    cache.store("satellite", key, src, exclude=SATELLITE_CACHE_EXCLUDE)
+    entry = os.path.join(cache.root, "satellite", key[:2], key)
+    before = read_tree(entry)
+    assert "simulation_paras.txt" not in before
+
+    # The service appends the parameters of the run to the result folder once stored, and again on every hit
+    with open(os.path.join(src, "simulation_paras.txt"), "a", encoding="utf-8") as f:
+        f.write("卫星编号：25544\n")
+    for run in ("run2", "run3"):
+        dest = str(tmp_path / run)
+        assert cache.load("satellite", key, dest) is not None
+        with open(os.path.join(dest, "simulation_paras.txt"), "a", encoding="utf-8") as f:
+            f.write(f"卫星名称：{run}\n")
+        with open(os.path.join(dest, "simulation_paras.txt"), "r", encoding="utf-8") as f:
+            assert f.read() == f"卫星名称：{run}\n"
+
+    assert read_tree(entry) == before
+
+
+def test_evicts_least_recently_used(tmp_path):
+    cache = ResultCache(str(tmp_path / "cache"), 2500)
+    keys = ["aa" * 32, "bb" * 32, "cc" * 32]
+    for i, key in enumerate(keys[:2]):
+        cache.store("satellite", key, make_result(str(tmp_path / f"run{i}"), 1000, paras=False))
+        # Older uses, oldest first
+        meta_path = os.path.join(cache.root, "satellite", key[:2], key, META_FILE)
+        os.utime(meta_path, (1000.0 + i, 1000.0 + i))
+    assert sorted(entries(cache)) == keys[:2]
+
+    # A hit makes the first entry the most recently used one
+    assert cache.load("satellite", keys[0], str(tmp_path / "hit")) is not None
+    cache.store("satellite", keys[2], make_result(str(tmp_path / "run2"), 1000, paras=False))
+    assert sorted(entries(cache)) == [keys[0], keys[2]]
+    # The materialized results outlive their entry
+    assert os.path.getsize(tmp_path / "run1" / "columns.bin") == 1000
+
+
+@pytest.mark.parametrize("max_bytes", [0, 3000, 20000])
+def test_eviction_stays_within_budget(tmp_path, max_bytes):
+    cache = ResultCache(str(tmp_path / "cache"), max_bytes)
+    for i, size in enumerate([1500, 200, 4000, 900, 2500, 100, 3000, 700]):
+        cache.store("job" if i % 3 == 0 else "satellite", f"{i:02d}" * 32, make_result(str(tmp_path / f"run{i}"), size))
+        assert sum(entries(cache).values()) <= max_bytes
+    assert not os.listdir(os.path.join(cache.root, "tmp"))
+
+
+def test_satellite_key_normalizes_inputs():
+    item = {'tle1': TLE1, 'tle2': TLE2, 'sensor_type': '1', 'sensor_para': ['20', '15', '0', '0', '0', '1', '1']}
+    simu_paras = {'start_time': '20240101000000', 'end_time': '20240102000000', 'interval': '30',
+                  'point_data': '100 30', 'line_data': '100 30|101 31', 'area_data': '100 30|110 30|110 40',
+                  'algorithm_type': 2}
+    key = ResultCache.satellite_key(item, simu_paras)
+
+    same_item = {**item, 'tle1': TLE1.replace(' ', '  ') + ' ', 'sensor_type': 1, 'sensor_para': [20.0, 15, 0, 0, 0, 1, 1]}
+    same_paras = {**simu_paras, 'interval': 30, 'point_data': '100.0 30.0', 'algorithm_type': '2'}
+    assert ResultCache.satellite_key(same_item, same_paras) == key
+    assert ResultCache.satellite_key(item, {**simu_paras, 'interval': '10'}) != key
+    assert ResultCache.satellite_key({**item, 'sensor_para': ['21'] + item['sensor_para'][1:]}, simu_paras) != key
+
+    assert ResultCache.job_key(1, "星座", ["b", "a"]) == ResultCache.job_key(1, "星座", ["a", "b"])
+    assert ResultCache.job_key(1, "星座", ["a", "b"]) != ResultCache.job_key(1, "星座", ["a", "b"], ["SAR-1"])
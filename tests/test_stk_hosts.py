@@ -0,0 +1,180 @@
+import asyncio
+import time
+
+import pytest
+
+from libs.stk_hosts import HOST_COOLDOWN, THROUGHPUT_WINDOW, StkHost, StkHostError, StkHostRegistry
+
+
+def make_registry(max_jobs_a=2, max_jobs_b=1):
+    return StkHostRegistry([StkHost("a", "python", "stk_simulation.py", local=True, max_jobs=max_jobs_a),
+                            StkHost("b", "python", "stk_simulation.py", local=True, max_jobs=max_jobs_b)])
+
+
+class FakeRuns:
+    """Runs held until released, recording the hosts they ran on and the most runs seen at once per host"""
+
+    def __init__(self):
+        self.release = asyncio.Event()
+        self.hosts = []
+        self.active = {}
+        self.peak = {}
+
+    async def __call__(self, host):
+        self.hosts.append(host.name)
+        self.active[host.name] = self.active.get(host.name, 0) + 1
+        self.peak[host.name] = max(self.peak.get(host.name, 0), self.active[host.name])
+        try:
+            await self.release.wait()
+        finally:
+            self.active[host.name] -= 1
+        return host.name
+
+
+async def settle():
+    for _ in range(10):
+        await asyncio.sleep(0)
+
+
+def test_least_loaded_dispatch():
+    async def scenario():
+        registry = make_registry()
+        a, b = registry.hosts
+        runs = FakeRuns()
+        tasks = []
+        for _ in range(3):
+            tasks.append(asyncio.create_task(registry.dispatch(runs)))
+            await settle()
+        # a: 1/2 after the first run, b: 0/1 takes the second, a: 1/2 < b: 1/1 takes the third
+        assert runs.hosts == ["a", "b", "a"]
+        assert (a.running, b.running) == (2, 1)
+
+        runs.release.set()
+        assert await asyncio.gather(*tasks) == ["a", "b", "a"]
+        assert (a.completed, b.completed) == (2, 1)
+        assert (a.running, a.queued, b.running, b.queued) == (0, 0, 0, 0)
+
+    asyncio.run(scenario())
+
+
+def test_max_jobs_per_host():
+    async def scenario():
+        registry = make_registry()
+        a, b = registry.hosts
+        runs = FakeRuns()
+        tasks = [asyncio.create_task(registry.dispatch(runs)) for _ in range(7)]
+        await settle()
+        # 3 slots in total, the other runs wait in the host queues spread by load
+        assert (a.running, b.running) == (2, 1)
+        assert (a.queued, b.queued) == (2, 2)
+        assert (a.load(), b.load()) == (2.0, 3.0)
+
+        runs.release.set()
+        results = await asyncio.gather(*tasks)
+        assert runs.peak == {"a": 2, "b": 1}
+        assert results.count("a") == a.completed and results.count("b") == b.completed
+        assert a.completed + b.completed == 7
+
+    asyncio.run(scenario())
+
+
+def test_failed_host_cools_down_and_run_moves():
+    async def scenario():
+        registry = make_registry()
+        a, b = registry.hosts
+        hosts = []
+
+        async def run(host):
+            hosts.append(host.name)
+            if host.name == "a":
+                raise StkHostError("ssh: connection refused")
+            return host.name
+
+        assert await registry.dispatch(run) == "b"
+        assert hosts == ["a", "b"]
+        assert (a.failed, a.completed, b.failed, b.completed) == (1, 0, 0, 1)
+        assert a.last_error == "ssh: connection refused"
+        assert not a.available
+        assert a.unavailable_until == pytest.approx(time.time() + HOST_COOLDOWN, abs=5)
+
+        # a is idle but cooling down, the next run goes to b directly
+        hosts.clear()
+        assert await registry.dispatch(run) == "b"
+        assert hosts == ["b"]
+
+        # Back once the cooldown is over
+        a.unavailable_until = 0.0
+
+        async def ok(host):
+            return host.name
+        assert await registry.dispatch(ok) == "a"
+
+    asyncio.run(scenario())
+
+
+def test_all_hosts_failing_raises():
+    async def scenario():
+        registry = make_registry()
+        hosts = []
+
+        async def run(host):
+            hosts.append(host.name)
+            raise StkHostError(f"{host.name} down")
+
+        with pytest.raises(StkHostError, match="b down"):
+            await registry.dispatch(run)
+        assert hosts == ["a", "b"]
+        assert all(host.failed == 1 and not host.available for host in registry.hosts)
+        assert all(host.running == 0 and host.queued == 0 for host in registry.hosts)
+
+    asyncio.run(scenario())
+
+
+def test_other_errors_are_not_retried():
+    async def scenario():
+        registry = make_registry()
+        hosts = []
+
+        async def run(host):
+            hosts.append(host.name)
+            raise ValueError("bad job")
+
+        with pytest.raises(ValueError):
+            await registry.dispatch(run)
+        assert hosts == ["a"]
+        assert registry.hosts[0].available
+
+    asyncio.run(scenario())
+
+
+def test_stats():
+    async def scenario():
+        registry = make_registry()
+
+        async def run(host):
+            await asyncio.sleep(0.05)
+            return host.name
+
+        await registry.dispatch(run, satellites=5)
+        await registry.dispatch(run, satellites=3)
+        return registry.stats()
+
+    stats = asyncio.run(scenario())
+    assert [item["name"] for item in stats] == ["a", "b"]
+    a, b = stats
+    assert set(a) == {"name", "host", "max_jobs", "running", "queued", "completed", "failed", "busy_seconds",
+                      "throughput", "available", "last_error"}
+    assert (a["host"], a["max_jobs"], a["running"], a["queued"], a["failed"]) == ("localhost", 2, 0, 0, 0)
+    # Both runs start on idle hosts: a wins the tie, then the now idle a wins again
+    assert (a["completed"], b["completed"]) == (2, 0)
+    assert a["busy_seconds"] >= 0.1
+    assert a["throughput"] == round(8 / (THROUGHPUT_WINDOW / 60), 3)
+    assert b["throughput"] == 0
+    assert a["available"] and a["last_error"] is None
+
+
+def test_from_dict():
+    host = StkHost.from_dict({"host": "10.0.0.2", "python_exe": "python.exe", "script_path": "C:/stk/stk_simulation.py",
+                              "user": "stk", "password": "secret", "replace_base": "C:/data", "max_jobs": 3})
+    assert (host.name, host.local, host.port, host.max_jobs, host.windows) == ("10.0.0.2", False, 22, 3, True)
+    assert host.stats()["host"] == "10.0.0.2"
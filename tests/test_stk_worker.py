@@ -0,0 +1,227 @@
+import json
+import os
+import socket
+import struct
+import threading
+import time
+
+import pytest
+
+from stk_worker import FakeEngine, StkWorker, WorkerServer
+
+TLE1 = "1 25544U 98067A   13255.14047407  .00008544  00000-0  15258-3 0  9993"
+TLE2 = "2 25544  51.6493 242.4011 0003766 126.3491 338.0330 15.50568402848930"
+
+
+class RecordingWorker(StkWorker):
+    """Worker keeping the finished event of every job, whether its client is still there or not"""
+
+    def __init__(self, engine_factory, engines=1):
+        super().__init__(engine_factory, engines)
+        self.finished = []
+
+    def run_job(self, job, emit, cancelled=lambda: False):
+        def record(message):
+            if message['event'] == 'finished':
+                self.finished.append(message)
+            emit(message)
+        super().run_job(job, record, cancelled)
+
+
+def start_server(worker):
+    worker.start()
+    server = WorkerServer(("127.0.0.1", 0), worker)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+@pytest.fixture
+def created():
+    return []
+
+
+@pytest.fixture
+def serve(created):
+    servers = []
+
+    def serve(engines=1, delay=0.0, engine_class=FakeEngine):
+        def factory():
+            engine = engine_class(delay)
+            created.append(engine)
+            return engine
+        worker = RecordingWorker(factory, engines)
+        server = start_server(worker)
+        servers.append(server)
+        return worker, server.server_address
+
+    yield serve
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+        server.worker.shutdown()
+
+
+class Client:
+    def __init__(self, address):
+        self.sock = socket.create_connection(address, timeout=10)
+        self.file = self.sock.makefile('rb')
+
+    def send(self, request):
+        self.sock.sendall((json.dumps(request) + '\n').encode('utf-8'))
+
+    def receive(self):
+        return json.loads(self.file.readline())
+
+    def run(self, job):
+        self.send({'op': 'run', 'job': job})
+        events = [self.receive()]
+        while events[-1]['event'] != 'finished':
+            events.append(self.receive())
+        return events
+
+    def close(self):
+        self.file.close()
+        self.sock.close()
+
+
+def make_job(tmp_path, count, **extra):
+    satellites = [{'ID': f"sat{i}", 'name': f"sat{i}", 'tle1': TLE1, 'tle2': TLE2, 'sensor_type': 'rectangular',
+                   'sensor_para': '10 10', 'save_path': str(tmp_path / f"sat{i}")} for i in range(count)]
+    return {'start_time': '20130912032513', 'end_time': '20130912042513', 'step': '60', 'point': '123 41',
+            'line': '123 31|124 31', 'area': '123 34|134 41|127 37', 'satellites': satellites, **extra}
+
+
+def test_run_events(serve, tmp_path):
+    _, address = serve()
+    job = make_job(tmp_path, 3, job_id='job1')
+    job['satellites'][1]['fail'] = True
+    client = Client(address)
+    try:
+        events = client.run(job)
+    finally:
+        client.close()
+
+    assert [event['event'] for event in events] == ['accepted', 'satellite', 'satellite', 'satellite', 'finished']
+    assert all(event['job_id'] == 'job1' for event in events)
+    assert [(event['ID'], event['status']) for event in events[1:4]] == [('sat0', 'done'), ('sat1', 'failed'), ('sat2', 'done')]
+    assert events[2]['error'] == 'fake failure for sat1'
+
+    finished = events[-1]
+    assert finished['returncode'] == 1
+    assert finished['failed'] == ['sat1']
+    assert finished['error'] is None
+    assert set(finished['timings']) == {'queue_wait', 'reset', 'scenario', 'satellites', 'total'}
+    assert set(finished['timings']['satellites']) == {'sat0', 'sat1', 'sat2'}
+    assert (tmp_path / 'sat0' / 'TLE.txt').read_text(encoding='utf-8') == TLE1 + '\n' + TLE2 + '\n'
+    assert not (tmp_path / 'sat1').exists()
+
+
+def test_ping(serve, tmp_path):
+    _, address = serve(engines=2)
+    client = Client(address)
+    try:
+        client.send({'op': 'ping'})
+        assert client.receive() == {'event': 'pong', 'engines': 2, 'idle': 2, 'jobs': 0, 'failed_jobs': 0}
+
+        client.run(make_job(tmp_path, 1))
+        client.send({'op': 'ping'})
+        assert client.receive() == {'event': 'pong', 'engines': 2, 'idle': 2, 'jobs': 1, 'failed_jobs': 0}
+
+        client.send({'op': 'nope'})
+        assert client.receive() == {'event': 'error', 'error': 'unknown op: nope'}
+        client.sock.sendall(b'not json\n')
+        assert client.receive()['event'] == 'error'
+    finally:
+        client.close()
+
+
+def test_engine_reuse(serve, created, tmp_path):
+    _, address = serve(engines=1)
+    client = Client(address)
+    try:
+        # Several jobs on one connection, then on another connection
+        for job_id in ('job1', 'job2'):
+            assert client.run(make_job(tmp_path, 2, job_id=job_id))[-1]['returncode'] == 0
+    finally:
+        client.close()
+    client = Client(address)
+    try:
+        assert client.run(make_job(tmp_path, 1, job_id='job3'))[-1]['returncode'] == 0
+        client.send({'op': 'ping'})
+        assert client.receive()['jobs'] == 3
+    finally:
+        client.close()
+
+    assert len(created) == 1
+
+
+class BrokenEngine(FakeEngine):
+    """Fake engine whose scenario build fails while broken is set, and that cannot be started meanwhile"""
+
+    broken = False
+
+    def start(self):
+        if BrokenEngine.broken:
+            raise RuntimeError("engine start failed")
+
+    def build(self, job):
+        if BrokenEngine.broken:
+            raise RuntimeError("engine crashed")
+        return super().build(job)
+
+
+def test_engine_restart_failure(serve, created, tmp_path):
+    worker, address = serve(engines=1, engine_class=BrokenEngine)
+    client = Client(address)
+    try:
+        BrokenEngine.broken = True
+        # The build fails and so does the restart of the engine: the job still finishes, failed
+        finished = client.run(make_job(tmp_path, 2, job_id='crash'))[-1]
+        assert (finished['returncode'], finished['failed'], finished['error']) == (1, ['sat0', 'sat1'], 'engine crashed')
+        # The next job tries once to start an engine and fails the same way
+        finished = client.run(make_job(tmp_path, 1, job_id='down'))[-1]
+        assert (finished['returncode'], finished['error']) == (1, 'engine start failed')
+        client.send({'op': 'ping'})
+        assert client.receive() == {'event': 'pong', 'engines': 1, 'idle': 1, 'jobs': 2, 'failed_jobs': 2}
+        assert len(created) == 3
+
+        # Once the engine starts again the pool recovers, and keeps the new engine warm
+        BrokenEngine.broken = False
+        assert client.run(make_job(tmp_path, 1, job_id='back'))[-1]['returncode'] == 0
+        assert client.run(make_job(tmp_path, 1, job_id='again'))[-1]['returncode'] == 0
+        assert len(created) == 4
+    finally:
+        BrokenEngine.broken = False
+        client.close()
+
+
+def test_client_disconnect_cancels_job(serve, created, tmp_path):
+    worker, address = serve(engines=1, delay=0.1)
+    count = 20
+    client = Client(address)
+    client.send({'op': 'run', 'job': make_job(tmp_path, count, job_id='gone')})
+    assert client.receive()['event'] == 'accepted'
+    assert client.receive()['ID'] == 'sat0'
+    # Reset on close, so the next writes of the worker fail at once
+    client.sock.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, struct.pack('ii', 1, 0))
+    client.close()
+
+    deadline = time.time() + count * 0.1 + 5
+    while not worker.finished and time.time() < deadline:
+        time.sleep(0.05)
+    assert worker.finished, "the job did not finish"
+
+    finished = worker.finished[0]
+    simulated = sorted(os.listdir(tmp_path))
+    assert finished['returncode'] == 1
+    assert 0 < len(simulated) < count
+    assert sorted(finished['failed']) == sorted(f"sat{i}" for i in range(count) if f"sat{i}" not in simulated)
+    assert worker.status() == {'engines': 1, 'idle': 1, 'jobs': 1, 'failed_jobs': 1}
+
+    # The engine went back to the pool and serves the next client
+    client = Client(address)
+    try:
+        assert client.run(make_job(tmp_path / 'next', 1))[-1]['returncode'] == 0
+    finally:
+        client.close()
+    assert len(created) == 1
@@ -1,5 +1,7 @@
 import os
+import sys
 import logging
+import subprocess
 import httpx
 import traceback
 from clickhouse_driver import Client
@@ -44,6 +46,19 @@ client = Client(
     database=os.getenv("CLICKHOUSE_DATABASE")
 )
 
+# Ephemeris precompute of serve_backend, run after every ingest when EPHEMERIS_PRECOMPUTE is set
+EPHEMERIS_PRECOMPUTE = os.getenv("EPHEMERIS_PRECOMPUTE", "False").lower() in ("true", "1")
+PRECOMPUTE_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "serve_backend", "precompute_ephemeris.py")
+
+
+def run_ephemeris_precompute():
+    logging.info("开始预计算在轨卫星星历.....................................")
+    result = subprocess.run([sys.executable, PRECOMPUTE_SCRIPT], cwd=os.path.dirname(PRECOMPUTE_SCRIPT))
+    if result.returncode == 0:
+        logging.info("在轨卫星星历预计算完成")
+    else:
+        logging.error(f"在轨卫星星历预计算失败，返回码 {result.returncode}")
+
 def fetch_and_update():
     try:
 
@@ -447,6 +462,10 @@ def fetch_and_update():
             else:
                 logging.info("无卫星传感器数据需要更新")          
 
+        # Refresh the precomputed ephemeris with the new TLEs
+        if EPHEMERIS_PRECOMPUTE:
+            run_ephemeris_precompute()
+
     except Exception as e:
         logging.error(f"程序出错: {e}")
         logging.error(traceback.format_exc())  
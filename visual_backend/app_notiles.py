@@ -4,6 +4,7 @@ import plotly.graph_objects as go
 import os
 import glob
 import json
+from visual_bundle import VISUAL_BUNDLE_FILE, load_bundle
 
 # --------------------------------------------Basic Page Configuration-------------------------------------------------------
 st.set_page_config(
@@ -127,14 +128,22 @@ def parse_sensor_json(file_path):
 #@st.cache_data(ttl=3600)
 def parse_targets_json(file_path):
     """targets.json"""
-    targets = {"points": [], "lines": [], "polygons": []}
     if not os.path.exists(file_path):
-        return targets
+        return {"points": [], "lines": [], "polygons": []}
 
     try:
         with open(file_path, 'r', encoding='utf-8') as f:
             raw_data = json.load(f)
+    except Exception as e:
+        st.warning(f"⚠️ 目标文件解析异常: {e}")
+        raw_data = {}
+    return parse_targets(raw_data)
 
+
+def parse_targets(raw_data):
+    """Targets of targets.json or of the visualization bundle"""
+    targets = {"points": [], "lines": [], "polygons": []}
+    try:
         # point
         if "point" in raw_data and raw_data["point"]:
             p_data = raw_data["point"]
@@ -175,6 +184,16 @@ def load_data_from_server_path(root_path):
     if not os.path.exists(root_path):
         return None, None, "服务器路径不存在"
 
+    # Simulations since the visualization bundle: one memory-mapped file for all satellites
+    if os.path.exists(os.path.join(root_path, VISUAL_BUNDLE_FILE)):
+        try:
+            satellites, raw_targets = load_bundle(root_path, ensure_clockwise_winding)
+        except Exception as e:
+            return None, None, f"可视化数据解析失败: {e}"
+        if not satellites:
+            return None, None, "可视化数据为空"
+        return satellites, parse_targets(raw_targets), None
+
     pos_dir = os.path.join(root_path, "poslla")
     sensor_dir = os.path.join(root_path, "sensorprojection")
     target_file = os.path.join(root_path, "targets", "targets.json")
@@ -235,6 +254,7 @@ def ensure_clockwise_winding(lats, lons):
 query_params = st.query_params
 data_path_arg = query_params.get("data_path", None)
 zip_path_arg = query_params.get("zip_path", None)
+report_url_arg = query_params.get("report_url", None)
 
 if not data_path_arg:
     st.info("👋 欢迎使用ScAI仿真可视化服务。请等待后端重定向数据...")
@@ -267,6 +287,10 @@ with st.sidebar:
                 )
         except Exception as e:
             st.error(f"文件读取失败: {e}")
+    elif report_url_arg:
+        # The archive is built by the simulation service while it is downloaded
+        st.success("✅ 覆盖性分析已完成")
+        st.link_button("📥 下载结果报告", report_url_arg, use_container_width=True)
     else:
         if zip_path_arg:
             st.warning("⚠️ 指定的下载文件不存在")
@@ -4,6 +4,7 @@ import plotly.graph_objects as go
 import os
 import glob
 import json
+from visual_bundle import VISUAL_BUNDLE_FILE, load_bundle
 import socket
 
 # --------------------------------------------Basic Page Configuration-------------------------------------------------------
@@ -81,11 +82,19 @@ def parse_sensor_json(file_path):
 
 def parse_targets_json(file_path):
     """targets.json"""
-    targets = {"points": [], "lines": [], "polygons": []}
-    if not os.path.exists(file_path): return targets
+    if not os.path.exists(file_path): return {"points": [], "lines": [], "polygons": []}
     try:
         with open(file_path, 'r', encoding='utf-8') as f:
             raw_data = json.load(f)
+    except Exception:
+        raw_data = {}
+    return parse_targets(raw_data)
+
+
+def parse_targets(raw_data):
+    """Targets of targets.json or of the visualization bundle"""
+    targets = {"points": [], "lines": [], "polygons": []}
+    try:
         if "point" in raw_data:
             p_data = raw_data["point"]
             targets["points"] = [{"lat": p[0], "lon": p[1]} for p in
@@ -147,6 +156,14 @@ def handle_dateline_crossing(lons, lats):
 
 def load_data_from_server_path(root_path):
     if not os.path.exists(root_path): return None, None, "服务器路径不存在"
+    # Simulations since the visualization bundle: one memory-mapped file for all satellites
+    if os.path.exists(os.path.join(root_path, VISUAL_BUNDLE_FILE)):
+        try:
+            satellites, raw_targets = load_bundle(root_path, ensure_clockwise_winding)
+        except Exception as e:
+            return None, None, f"可视化数据解析失败: {e}"
+        if not satellites: return None, None, "可视化数据为空"
+        return satellites, parse_targets(raw_targets), None
     pos_dir, sensor_dir = os.path.join(root_path, "poslla"), os.path.join(root_path, "sensorprojection")
     pos_files = glob.glob(os.path.join(pos_dir, "*.json"))
     if not pos_files: return None, None, "poslla 文件夹为空"
@@ -184,6 +201,7 @@ def get_host_ip():
 query_params = st.query_params
 data_path_arg = query_params.get("data_path", None)
 zip_path_arg = query_params.get("zip_path", None)
+report_url_arg = query_params.get("report_url", None)
 
 if not data_path_arg:
     st.info("👋 欢迎使用ScAI仿真可视化服务。请等待后端重定向数据...")
@@ -205,6 +223,9 @@ with st.sidebar:
     if zip_path_arg and os.path.exists(zip_path_arg):
         with open(zip_path_arg, "rb") as fp:
             st.download_button("📥 下载结果报告", fp, os.path.basename(zip_path_arg), "application/zip")
+    elif report_url_arg:
+        # The archive is built by the simulation service while it is downloaded
+        st.link_button("📥 下载结果报告", report_url_arg)
 
     st.divider()
 
@@ -0,0 +1,105 @@
+import json
+import os
+import struct
+from collections.abc import Mapping
+
+import numpy as np
+import pandas as pd
+
+# Visualization bundle written by the simulation report (serve_backend/libs/visual_bundle.py)
+VISUAL_BUNDLE_FILE = "visual.bin"
+COLUMNS_MAGIC = b"SCOLUMN1"
+COLUMNS_ALIGN = 64
+
+
+def _align(size):
+    return (size + COLUMNS_ALIGN - 1) // COLUMNS_ALIGN * COLUMNS_ALIGN
+
+
+def read_bundle(path):
+    """Memory-map the columns of a bundle, returns (columns, attrs)"""
+    with open(path, "rb") as f:
+        if f.read(8) != COLUMNS_MAGIC:
+            raise ValueError(f"不是有效的可视化数据文件: {path}")
+        header_size = struct.unpack('<Q', f.read(8))[0]
+        header = json.loads(f.read(header_size))
+    data = np.memmap(path, dtype=np.uint8, mode='r')
+    start = _align(16 + header_size)
+    columns = {}
+    for entry in header["columns"]:
+        dtype = np.dtype(entry["dtype"])
+        begin = start + entry["offset"]
+        columns[entry["name"]] = data[begin:begin + entry["length"] * dtype.itemsize].view(dtype)
+    return columns, header.get("attrs", {})
+
+
+def format_times(times):
+    """Epoch seconds to '2023-06-20 20:31:27.745', the keys of the former posLLA / sensorProjection JSON"""
+    ms = np.round(np.asarray(times, dtype=np.float64) * 1000.0).astype('int64').astype('datetime64[ms]')
+    return np.char.replace(np.datetime_as_string(ms, unit='ms'), 'T', ' ').tolist()
+
+
+class SensorFootprints(Mapping):
+    """
+    Footprints of one satellite keyed by time string, read from the mapped bundle on access
+
+    Values are {"lats": [...], "lons": [...]} like the parsed sensorProjection JSON, oriented with winding.
+    """
+
+    def __init__(self, times, offsets, lats, lons, first, count, winding):
+        self._index = {t: first + k for k, t in enumerate(times[:count])}
+        self._offsets, self._lats, self._lons = offsets, lats, lons
+        self._winding = winding
+        self._cache = {}
+
+    def __getitem__(self, time_str):
+        if time_str not in self._cache:
+            k = self._index[time_str]
+            begin, end = int(self._offsets[k]), int(self._offsets[k + 1])
+            lats = np.round(self._lats[begin:end].astype(np.float64), 3).tolist()
+            lons = np.round(self._lons[begin:end].astype(np.float64), 3).tolist()
+            lats, lons = self._winding(lats, lons)
+            self._cache[time_str] = {"lats": lats, "lons": lons}
+        return self._cache[time_str]
+
+    def __contains__(self, time_str):
+        return time_str in self._index
+
+    def __iter__(self):
+        return iter(self._index)
+
+    def __len__(self):
+        return len(self._index)
+
+
+def load_bundle(root_path, winding):
+    """
+    Load the visualization bundle of a simulation
+
+    Args:
+        root_path: Visualization folder of the simulation
+        winding: Function orienting a footprint polygon, (lats, lons) -> (lats, lons)
+
+    Returns:
+        (satellites, raw targets): satellites maps the name to {"df": positions DataFrame, "sensor": footprints},
+        raw targets is the {'point', 'line', 'polygon'} dict of the former targets.json
+    """
+    columns, attrs = read_bundle(os.path.join(root_path, VISUAL_BUNDLE_FILE))
+    times = format_times(columns["time"])
+    offsets = columns["position_offsets"]
+    satellites = {}
+    for i, name in enumerate(attrs.get("satellites", [])):
+        first, last = int(offsets[i]), int(offsets[i + 1])
+        count = last - first
+        if count == 0:
+            continue
+        df = pd.DataFrame({
+            "time": times[:count],
+            "lon": columns["lon"][first:last].astype(np.float64),
+            "lat": columns["lat"][first:last].astype(np.float64),
+            "alt": columns["alt"][first:last].astype(np.float64)
+        })
+        sensor = SensorFootprints(times, columns["footprint_offsets"], columns["footprint_lat"], columns["footprint_lon"],
+                                  first, count, winding)
+        satellites[name] = {"df": df, "sensor": sensor}
+    return satellites, attrs.get("targets", {})